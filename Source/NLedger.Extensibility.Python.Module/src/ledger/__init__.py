@@ -29,6 +29,16 @@ class classproperty(property):
     def __get__(self, cls, owner):
         return classmethod(self.fget).__get__(None, owner)()
 
+# Metaclass for classes with static properties: assigning a static property on the class calls its setter
+# rather than replacing the property with a class attribute (instances have no __dict__ because of __slots__)
+class ClassPropertyMeta(type):
+    def __setattr__(cls, name, value):
+        for klass in cls.__mro__:
+            attr = klass.__dict__.get(name)
+            if isinstance(attr, classproperty) and not attr.fset is None:
+                return attr.fset(cls, value)
+        super().__setattr__(name, value)
+
 ############################
 # CLR Runtime initialization
 
@@ -123,6 +133,8 @@ from NLedger.Commodities import CommodityFlagsEnum
 from NLedger.Expressions import Expr as OriginExpr
 from NLedger.Journals import Journal as OriginJournal
 from NLedger.Journals import JournalFileInfo as OriginJournalFileInfo
+from NLedger.Journals import JournalRefreshStatusEnum as OriginJournalRefreshStatusEnum
+from NLedger.Journals import JournalSnapshotCache as OriginJournalSnapshotCache
 from NLedger.Items import Item as OriginItem
 from NLedger.Items import ItemStateEnum as OriginItemStateEnum
 from NLedger.Items import ItemPosition as OriginItemPosition
@@ -141,23 +153,37 @@ from NLedger import Predicate
 from NLedger import MainApplicationContext
 from NLedger.Extensibility import ExtendedSession
 from NLedger.Extensibility import SessionExtensions
+from NLedger.Extensibility import CommandOutputReader
+from NLedger.Extensibility import SessionPool as OriginSessionPool
+from NLedger.Extensibility import SessionExecutor
+from NLedger.Extensibility import SessionOperation
+from NLedger.Extensibility import SessionOperationStatus
 from NLedger.Extensibility.Export import FlagsAdapter
 from NLedger.Extensibility.Export import ListAdapter as NetListAdapter
 from NLedger.Extensibility.Export import ExportedConsts
+from NLedger.Extensibility.Export import PostColumns as OriginPostColumns
+from NLedger.Extensibility.Export import ReportRows
 from NLedger.Scopus import SymbolKindEnum as SymbolKind
 from NLedger.Times import TimesCommon
 from NLedger.Times import DateInterval
 from NLedger.Utility import Date
+from NLedger.Utility import CommandLine
 
 # Import .Net classes
 
 from System import DateTime
+from System import Action as NetAction
 from System import Boolean
 from System import Tuple as NetTuple
 from System import Enum as NetEnum
 from System import String as NetString
+from System import IntPtr
+from System import Int64
+from System import Object as NetObject
 from System.Collections.Generic import List as NetList
 from System.Globalization import DateTimeStyles
+from System.Runtime.InteropServices import Marshal
+from System.Runtime.CompilerServices import RuntimeHelpers
 
 ###########################
 # Date/time conversions
@@ -268,11 +294,14 @@ class NList(MutableSequence):
     def __len__(self) -> int:
         return self.origin.Count
 
+    # Items are wrapped one at a time while the consumer iterates, so breaking out of the loop
+    # stops wrapping and no intermediate list of Python wrappers is built
     def __iter__(self):
-        lst = []
-        for index in range(len(self)):
-            lst.append(self.to_pitem(self.origin[index]))
-        return iter(lst)
+        origin = self.origin
+        index = 0
+        while index < origin.Count:
+            yield self.to_pitem(origin[index])
+            index += 1
 
     def __getitem__(self, row):
         item = self.origin[row] if row < self.origin.Count else None
@@ -338,6 +367,12 @@ class PostingList(NList):
     def to_pitem(self, item):
         return Posting.from_origin(item)
 
+    def to_columns(self) -> 'PostingColumns':
+        return PostingColumns(OriginPostColumns.FromPosts(self.origin.Origin))
+
+    def to_frame(self):
+        return self.to_columns().to_frame()
+
 class AccountList(NList):
     def __init__(self, origin = None) -> None:
         super().__init__(origin=origin)
@@ -416,16 +451,127 @@ class FileInfoList(NList):
     def to_pitem(self, item):
         return FileInfo.from_origin(item)
 
+###########################
+# Caches
+
+from collections import OrderedDict
+import threading
+import weakref
+
+# Thread-safe dictionary with a limited number of items. When the limit is reached, least recently used items are evicted.
+# Zero size disables caching (nothing is stored and every lookup is a miss).
+class LruCache:
+
+    def __init__(self, max_size: int = 128) -> None:
+        assert isinstance(max_size, int) and max_size >= 0
+        self._items = OrderedDict()
+        self._lock = threading.RLock()
+        self._max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, value: int):
+        assert isinstance(value, int) and value >= 0
+        with self._lock:
+            self._max_size = value
+            self.shrink()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key) -> bool:
+        return key in self._items
+
+    # Returns a cached value and marks it as recently used; returns default value if the key is not found
+    def get(self, key, default = None):
+        with self._lock:
+            try:
+                value = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if self._max_size > 0:
+                self._items[key] = value
+                self._items.move_to_end(key)
+                self.shrink()
+
+    def remove(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def shrink(self):
+        with self._lock:
+            while len(self._items) > self._max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._items), "max_size": self._max_size, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+# Cache of Python wrappers keyed by identity of .Net origin objects. Wrappers are referenced weakly,
+# so the cache does not keep them alive; dead references are treated as misses.
+# It is disabled by default; set 'max_size' to a positive value to make 'from_origin' reuse wrappers for
+# accounts, commodities, transactions, postings and journals (e.g. ledger.wrapper_cache.max_size = 10000)
+class WrapperCache(LruCache):
+
+    def __init__(self, max_size: int = 0) -> None:
+        super().__init__(max_size)
+
+    # Returns a cached wrapper for the origin or creates a new one by calling the factory
+    def get_wrapper(self, origin, factory):
+        if self._max_size == 0:
+            return factory()
+
+        key = RuntimeHelpers.GetHashCode(origin)
+        with self._lock:
+            ref = self._items.get(key)
+            wrapper = ref() if not ref is None else None
+            if not wrapper is None and NetObject.ReferenceEquals(wrapper.origin, origin):
+                self._items.move_to_end(key)
+                self.hits += 1
+                return wrapper
+
+            self.misses += 1
+            wrapper = factory()
+            self.put(key, weakref.ref(wrapper))
+            return wrapper
+
+wrapper_cache = WrapperCache()
+
 ###########################
 # Base wrapper class (origin keeper)
 
+# Wrappers are slotted: the only per-instance state is the origin reference (and list view stamps for wrappers
+# that provide indexed access), so they do not carry per-instance dictionaries. Derived classes should declare '__slots__' too.
 class OriginKeeper:
 
-    _origin = None
+    __slots__ = ('_origin', '__weakref__')
 
     @property
     def origin(self):
-        return self._origin if not self._origin is None else self.get_origin()
+        origin = getattr(self, '_origin', None)
+        return origin if not origin is None else self.get_origin()
 
     @origin.setter
     def origin(self, value):
@@ -434,24 +580,142 @@ class OriginKeeper:
     def get_origin(self):
         raise Exception("Method 'get_origin' should be defined in derived class if 'origin' value is not specified explicitly.")
 
+    # Returns a cached .Net list adapter for indexed access to the owner's items.
+    # The adapter is stamped with the owner's generation and the current number of items,
+    # so it is rebuilt only when the owner is mutated rather than on every indexing operation.
+    # Generations are kept by wrappers: adapters that copy the items (e.g. child accounts) do not see changes
+    # made through the origin or through another wrapper that keep the number of items (see invalidate_list_view).
+    def get_list_view(self, factory, count: int):
+        stamp = (getattr(self, '_generation', 0), count)
+        view = getattr(self, '_list_view', None)
+        if view is None or self._list_view_stamp != stamp:
+            view = self._list_view = factory(self.origin)
+            self._list_view_stamp = stamp
+        return view
+
+    def invalidate_list_view(self):
+        self._generation = getattr(self, '_generation', 0) + 1
+
 ###########################
 # Ported extras
 
 def execute_command(args, readJournalFiles: bool = None) -> str:
     assert isinstance(session, Session)
 
+    if readJournalFiles:
+        query_cache.clear_journal(session.origin.Journal)
+
+    reset_functor_stats()
+    session_origin = session.origin
+    cmd_args = to_command_args(args)
+    return run_session_call(session_origin,
+        lambda executor, completed: executor.ExecuteCommand(cmd_args, bool(readJournalFiles), completed),
+        lambda: SessionExtensions.ExecuteCommand(session_origin, cmd_args, bool(readJournalFiles)))
+
+def to_command_args(args):
     if isinstance(args, str):
-        return SessionExtensions.ExecuteCommand(session.origin, args) if readJournalFiles is None else SessionExtensions.ExecuteCommand(session.origin, args, readJournalFiles)
+        return args
 
     if isinstance(args, Iterable):
         args_list = NetList[NetString]()
         for arg in args:
             assert isinstance(arg, str)
             args_list.Add(NetString(arg))
-        return SessionExtensions.ExecuteCommand(session.origin, args_list) if readJournalFiles is None else SessionExtensions.ExecuteCommand(session.origin, args_list, readJournalFiles)
+        return args_list
 
     raise Exception("Unexpected argument type")
 
+def execute_commands(commands: Iterable, readJournalFiles: bool = None) -> list:
+    """Executes a sequence of commands in one call and returns a list of results (one per command).
+
+    Every command is either a string or a list of arguments. Results have Output, Error and ExecutionTime
+    (.Net TimeSpan) properties; failed commands do not stop the batch. Commands share the journal and
+    commodities; if readJournalFiles is set, journal files are read once before the first command.
+    """
+    assert isinstance(session, Session)
+
+    if readJournalFiles:
+        query_cache.clear_journal(session.origin.Journal)
+
+    commands_list = NetList[NetList[NetString]]()
+    for command in commands:
+        args = to_command_args(command)
+        commands_list.Add(NetList[NetString](CommandLine.PreprocessSingleQuotes(args)) if isinstance(args, str) else args)
+
+    session_origin = session.origin
+    return list(run_session_call(session_origin,
+        lambda executor, completed: executor.ExecuteCommands(commands_list, bool(readJournalFiles), completed),
+        lambda: SessionExtensions.ExecuteCommands(session_origin, commands_list, bool(readJournalFiles))))
+
+# Timeout (ms) of a single wait for the end of an interrupted command; the interpreter is released between waits
+# so that a Python function called by the report can finish on the command thread.
+COMMAND_OUTPUT_POLL_TIMEOUT = 20
+
+def execute_command_iter(args, readJournalFiles: bool = None, capacity: int = None) -> Iterable[str]:
+    """Executes a command and yields output lines (including line terminators) as the report writes them.
+
+    The command runs on a background thread and pauses when more than 'capacity' lines are not consumed,
+    so memory use does not depend on the size of the report. Other ledger objects should not be used
+    until the iteration is over. Raises an exception with error messages if the command fails.
+    """
+    assert isinstance(session, Session)
+
+    if readJournalFiles:
+        query_cache.clear_journal(session.origin.Journal)
+
+    reset_functor_stats()
+    # The reader signals new lines and the completion of the command; lines are taken without waiting in .Net code,
+    # so the interpreter lock is released while the command is running (Python functions called by the report need it)
+    available = threading.Event()
+    reader = CommandOutputReader(session.origin, to_command_args(args), bool(readJournalFiles), capacity or CommandOutputReader.DefaultCapacity,
+        NetAction[CommandOutputReader](lambda reader: available.set()))
+    try:
+        while True:
+            line = reader.ReadLine(0)
+            if line is not None:
+                yield line
+            elif reader.IsCompleted:
+                break
+            else:
+                available.wait()
+                available.clear()
+    finally:
+        reader.Dispose()
+        while not reader.WaitForCompletion(0):
+            available.wait(COMMAND_OUTPUT_POLL_TIMEOUT / 1000)
+
+    if reader.Error:
+        raise Exception(reader.Error)
+
+def execute_rows(args, readJournalFiles: bool = None) -> List[tuple]:
+    """Executes a balance or register command and returns the report as a list of tuples rather than text.
+
+    Balance rows are (account_fullname, Balance); register rows are (date, payee, account_fullname, amount, running_total)
+    where amount is Amount (Balance if it has several commodities) and running_total is Balance. All report options are
+    supported; the values are not rounded to display precision. Raises an exception with error messages if the command fails.
+    """
+    assert isinstance(session, Session)
+
+    if readJournalFiles:
+        query_cache.clear_journal(session.origin.Journal)
+
+    reset_functor_stats()
+    rows = ReportRows()
+    cmd_args = to_command_args(args)
+    session_origin = session.origin
+    cmd_result = run_session_call(session_origin,
+        lambda executor, completed: executor.ExecuteCommand(cmd_args, rows, bool(readJournalFiles), completed),
+        lambda: SessionExtensions.ExecuteCommand(session_origin, cmd_args, rows, bool(readJournalFiles)))
+
+    if (cmd_result.Error):
+        raise Exception(cmd_result.Error)
+
+    result = [(row.Account, Balance.from_origin(row.Total)) for row in rows.AccountRows]
+    for row in rows.PostRows:
+        amount = Amount.from_origin(row.Amount.AsAmount) if row.Amount.Type == OriginValueTypeEnum.Amount else Balance.from_origin(row.Amount.AsBalance or OriginBalance())
+        result.append((to_pdate(row.Date), row.Payee, row.Account, amount, Balance.from_origin(row.Total)))
+    return result
+
 def print_command(args, readJournalFiles: bool = None) -> str:
     cmd_result = execute_command(args, readJournalFiles)
 
@@ -467,13 +731,30 @@ ANNOTATION_DATE_CALCULATED = ExportedConsts.ANNOTATION_DATE_CALCULATED
 ANNOTATION_TAG_CALCULATED = ExportedConsts.ANNOTATION_TAG_CALCULATED
 ANNOTATION_VALUE_EXPR_CALCULATED = ExportedConsts.ANNOTATION_VALUE_EXPR_CALCULATED
 
+# Interning cache of compiled masks keyed by pattern strings. Origin masks are immutable,
+# so the same compiled regular expression can be shared by all masks with the same pattern.
+class MaskCache(LruCache):
+
+    def get_mask(self, pattern: str) -> OriginMask:
+        mask = self.get(pattern)
+        if mask is None:
+            mask = OriginMask(pattern)
+            self.put(pattern, mask)
+        return mask
+
+mask_cache = MaskCache(1024)
+
 class Mask(OriginKeeper):
 
+    __slots__ = ()
+
     def __init__(self, val = None) -> None:
         if val is None:
             self.origin = OriginMask()
         elif isinstance(val, OriginMask):
             self.origin = val
+        elif isinstance(val, str):
+            self.origin = mask_cache.get_mask(val)
         else:
             self.origin = OriginMask(val)
 
@@ -481,6 +762,15 @@ class Mask(OriginKeeper):
     def from_origin(cls, origin):
         return Mask(origin) if not origin is None else None
 
+    # Returns origin mask for either Mask or a pattern string (compiled masks for patterns are taken from 'mask_cache')
+    @classmethod
+    def to_omask(cls, val) -> OriginMask:
+        if isinstance(val, Mask):
+            return val.origin
+        if isinstance(val, str):
+            return mask_cache.get_mask(val)
+        raise Exception("Unexpected argument type: Mask or str is expected")
+
     def match(self, text: str) -> bool:
         return self.origin.Match(text)
 
@@ -529,13 +819,31 @@ def times_shutdown():
 ###########################
 # Ported from py_expr.cc
 
+# Cache of compiled expressions keyed by session identity, expression text and a wrapper class of the scope
+# the expression was compiled against (see Expr.__call__). Compiled expressions can refer to functions and options
+# of the session they were compiled in, so they are not shared between sessions (e.g. sessions of a SessionPool).
+class ExprCache(LruCache):
+
+    # Returns a cached compiled expression for the session or None
+    def find_expr(self, session_origin, text: str, scope_type):
+        entry = self.get((RuntimeHelpers.GetHashCode(session_origin), text, scope_type))
+        return entry[1] if not entry is None and NetObject.ReferenceEquals(entry[0], session_origin) else None
+
+    def put_expr(self, session_origin, text: str, scope_type, compiled):
+        self.put((RuntimeHelpers.GetHashCode(session_origin), text, scope_type), (session_origin, compiled))
+
+expr_cache = ExprCache(256)
+
 class Expr(OriginKeeper):
 
+    __slots__ = ('_text',)
+
     def __init__(self, val = None) -> None:
+        self._text = None
         if val is None:
             self.origin = OriginExpr()
         elif isinstance(val, str):
-            self.origin = OriginExpr(val)
+            self._text = val    # Origin expression is created on demand (see get_origin)
         elif isinstance(val, OriginExpr):
             self.origin = val
         else:
@@ -545,6 +853,10 @@ class Expr(OriginKeeper):
     def from_origin(cls, origin) -> 'Expr':
         return Expr(origin) if not origin is None else None
 
+    def get_origin(self):
+        self.origin = OriginExpr(self._text)
+        return self._origin
+
     def __bool__(self) -> bool:
         return not self.origin.IsEmpty
 
@@ -555,12 +867,25 @@ class Expr(OriginKeeper):
 
     def set_text(self, val: str):
         self.origin.Text = val
+        self._text = None
 
+    # Expressions that were created from text and were not changed afterwards are calculated by compiled expressions
+    # from 'expr_cache' of the current session when the scope is a journal item (a posting or a transaction). Functions of journal items
+    # are resolved against the scope that is passed to the calculation, so an expression compiled for one posting
+    # is valid for any other posting. Other expressions are compiled on the first call as usual.
     def __call__(self, scope: 'Scope' = None) -> 'Value':
         if scope is None:
             return Value.to_value(self.origin.Calc())
         else:
             assert isinstance(scope, Scope)
+            session_origin = session.origin
+            if not self._text is None and isinstance(scope, JournalItem) and not session_origin is None:
+                compiled = expr_cache.find_expr(session_origin, self._text, type(scope))
+                if compiled is None:
+                    compiled = OriginExpr(self._text)
+                    compiled.Compile(scope.origin)
+                    expr_cache.put_expr(session_origin, self._text, type(scope), compiled)
+                return Value.to_value(compiled.Calc(scope.origin))
             return Value.to_value(self.origin.Calc(scope.origin))
 
     @property
@@ -570,10 +895,12 @@ class Expr(OriginKeeper):
     @context.setter
     def context(self, scope: 'Scope'):
         self.origin.Context = scope.origin if not scope is None else None
+        self._text = None
 
     def compile(self, scope: 'Scope'):
         assert isinstance(scope, Scope)
         self.origin.Compile(scope.origin)
+        self._text = None
 
     def is_constant(self) -> bool:
         return self.origin.IsConstant
@@ -593,6 +920,8 @@ class ParseFlags(enum.IntFlag):     # ParseFlags enum
 
 class Amount(OriginKeeper):
 
+    __slots__ = ()
+
     def __init__(self,value = None, origin = None) -> None:
         if not (origin is None):
             assert isinstance(origin, OriginAmount)
@@ -858,6 +1187,8 @@ class Amount(OriginKeeper):
 
 class Balance(OriginKeeper):
 
+    __slots__ = ('_generation', '_list_view', '_list_view_stamp')
+
     def __init__(self, val = None) -> None:
         if val is None:
             self.origin = OriginBalance()
@@ -954,10 +1285,16 @@ class Balance(OriginKeeper):
     __abs__ = abs
 
     def __len__(self) -> int:
-        return NetListAdapter.GetAmounts(self.origin).Count
+        return NetListAdapter.GetAmountsCount(self.origin)
 
     def __getitem__(self, row: int) -> 'Amount':
-        return Amount.from_origin(NetListAdapter.GetAmounts(self.origin)[row])
+        """Returns an amount by its position in the balance.
+
+        Amounts are taken from a cached copy that is refreshed when the number of amounts changes or when
+        in_place_reduce/in_place_unreduce is called on this wrapper. Call invalidate_list_view() after replacing
+        amounts in another way (e.g. through 'origin') without changing their number.
+        """
+        return Amount.from_origin(self.get_list_view(NetListAdapter.GetAmounts, len(self))[row])
 
     def __iter__(self):
         return iter(AmountList(NetListAdapter.GetAmounts(self.origin)))
@@ -994,12 +1331,14 @@ class Balance(OriginKeeper):
 
     def in_place_reduce(self):
         self.origin.InPlaceReduce()
+        self.invalidate_list_view()
 
     def unreduced(self) -> 'Balance':
         return Balance.from_origin(self.origin.Unreduced())
 
     def in_place_unreduce(self):
         self.origin.InPlaceUnreduce()
+        self.invalidate_list_view()
 
     def value(self, in_terms_of: 'Commodity' = None, moment = None) -> 'Balance':
         if moment is None and in_terms_of is None:
@@ -1061,6 +1400,8 @@ class Balance(OriginKeeper):
 
 class CommodityPool(OriginKeeper):
 
+    __slots__ = ()
+
     def __init__(self, origin = None) -> None:
         if not origin is None:
             assert isinstance(origin, OriginCommodityPool)
@@ -1194,7 +1535,9 @@ COMMODITY_WALKED = ExportedConsts.COMMODITY_WALKED
 COMMODITY_KNOWN = ExportedConsts.COMMODITY_KNOWN
 COMMODITY_PRIMARY = ExportedConsts.COMMODITY_PRIMARY
 
-class Commodity(OriginKeeper):
+class Commodity(OriginKeeper, metaclass=ClassPropertyMeta):
+
+    __slots__ = ()
 
     def __init__(self,origin) -> None:
         assert isinstance(origin, OriginCommodity)
@@ -1206,9 +1549,9 @@ class Commodity(OriginKeeper):
             return None
 
         if isinstance(origin, OriginAnnotatedCommodity):
-            return AnnotatedCommodity(origin)
+            return wrapper_cache.get_wrapper(origin, lambda: AnnotatedCommodity(origin))
 
-        return Commodity(origin)
+        return wrapper_cache.get_wrapper(origin, lambda: Commodity(origin))
 
     @classproperty
     def decimal_comma_by_default(cls) -> bool:
@@ -1340,6 +1683,8 @@ class Commodity(OriginKeeper):
 
 class Annotation(OriginKeeper):
 
+    __slots__ = ()
+
     flags_adapter = FlagsAdapter.AnnotationFlagsAdapter()
 
     def __init__(self,origin=None) -> None:
@@ -1413,6 +1758,8 @@ class Annotation(OriginKeeper):
 
 class KeepDetails(OriginKeeper):
 
+    __slots__ = ()
+
     def __init__(self, keepPrice = False, keepDate = False, keepTag = False, onlyActuals = False, origin = None) -> None:
 
         if not(origin is None):
@@ -1465,6 +1812,8 @@ class KeepDetails(OriginKeeper):
 
 class PricePoint(OriginKeeper):
 
+    __slots__ = ()
+
     def __init__(self, when, price, origin = None) -> None:
 
         if not(origin is None):
@@ -1503,6 +1852,8 @@ class PricePoint(OriginKeeper):
 
 class AnnotatedCommodity(Commodity):
 
+    __slots__ = ()
+
     def __init__(self,origin) -> None:
         assert isinstance(origin, OriginAnnotatedCommodity)
         self.origin = origin
@@ -1533,6 +1884,8 @@ ACCOUNT_EXT_DISPLAYED = ExportedConsts.ACCOUNT_EXT_DISPLAYED
 
 class AccountXDataDetails(OriginKeeper):
 
+    __slots__ = ()
+
     def __init__(self, origin = None) -> None:
         if not(origin is None):
             assert isinstance(origin, OriginAccountXDataDetails)
@@ -1625,6 +1978,8 @@ class AccountXDataDetails(OriginKeeper):
 
 class AccountXData(OriginKeeper):
 
+    __slots__ = ()
+
     flags_adapter = FlagsAdapter.AccountXDataFlagsAdapter()
 
     def __init__(self, origin = None) -> None:
@@ -1681,6 +2036,8 @@ ACCOUNT_GENERATED = ExportedConsts.ACCOUNT_GENERATED
 
 class Account(OriginKeeper):
 
+    __slots__ = ('_generation', '_list_view', '_list_view_stamp')
+
     flags_adapter = FlagsAdapter.AccountFlagsAdapter()
 
     def __init__(self, parent: 'Account' = None, name: str = None, note: str = None, origin = None) -> None:
@@ -1693,7 +2050,7 @@ class Account(OriginKeeper):
 
     @classmethod
     def from_origin(cls, origin):
-        return Account(origin=origin) if not origin is None else None
+        return wrapper_cache.get_wrapper(origin, lambda: Account(origin=origin)) if not origin is None else None
 
     @property
     def flags(self):
@@ -1742,15 +2099,17 @@ class Account(OriginKeeper):
 
     def add_account(self, account: 'Account'):
         self.origin.AddAccount(account.origin)
+        self.invalidate_list_view()
 
     def remove_account(self, account: 'Account'):
         self.origin.RemoveAccount(account.origin)
+        self.invalidate_list_view()
 
     def find_account(self, acctname: str, auto_create: bool = None) -> 'Account':
         return Account.from_origin(self.origin.FindAccount(acctname, auto_create) if not auto_create is None else self.origin.FindAccount(acctname))
 
     def find_account_re(self, regexp: str) -> 'Account':
-        return Account.from_origin(self.origin.FindAccountRe(regexp))
+        return Account.from_origin(self.origin.FindAccountRe(Mask.to_omask(regexp)))
 
     def add_post(self, post: 'Posting'):
         assert isinstance(post, Posting)
@@ -1764,10 +2123,16 @@ class Account(OriginKeeper):
         return self.origin.Valid()
 
     def __len__(self) -> int:
-        return NetListAdapter.GetAccounts(self.origin).Count
+        return NetListAdapter.GetAccountsCount(self.origin)
 
     def __getitem__(self, row: int) -> 'Account':
-        return Account.from_origin(NetListAdapter.GetAccounts(self.origin)[row])
+        """Returns a child account by its position.
+
+        Child accounts are taken from a cached copy that is refreshed when the number of children changes or when
+        add_account/remove_account is called on this wrapper. Call invalidate_list_view() after replacing children
+        in another way (e.g. through 'origin' or another wrapper of the same account) without changing their number.
+        """
+        return Account.from_origin(self.get_list_view(NetListAdapter.GetAccounts, len(self))[row])
 
     def __iter__(self):
         return iter(self.accounts())
@@ -1824,6 +2189,8 @@ class Account(OriginKeeper):
 
 class Scope(OriginKeeper):
 
+    __slots__ = ()
+
     def __init__(self,origin) -> None:
         assert isinstance(origin, OriginScope)
         self.origin = origin
@@ -1854,6 +2221,8 @@ class Scope(OriginKeeper):
 
 class Position(OriginKeeper):
 
+    __slots__ = ()
+
     def __init__(self, origin = None) -> None:
         if origin is None:
             self.origin = OriginItemPosition()
@@ -1917,7 +2286,9 @@ class State(enum.Enum):  # State enum
     Cleared = FlagsAdapter.EnumToInt(OriginItemStateEnum.Cleared)
     Pending = FlagsAdapter.EnumToInt(OriginItemStateEnum.Pending)
 
-class JournalItem(Scope):
+class JournalItem(Scope, metaclass=ClassPropertyMeta):
+
+    __slots__ = ()
 
     def __init__(self, origin) -> None:
         assert isinstance(origin, OriginItem)
@@ -1984,23 +2355,20 @@ class JournalItem(Scope):
         assert isinstance(o, JournalItem)
         return self.origin != o.origin
 
+    # A single string argument is a tag name; otherwise, tag and value arguments are masks or pattern strings
     def has_tag(self, tag, val = None) -> bool:
         if isinstance(tag, str) and val is None:
             return self.origin.HasTag(tag)
-        assert isinstance(tag, Mask)
         if val is None:
-            return self.origin.HasTag(tag.origin)
-        assert isinstance(val, Mask)
-        return self.origin.HasTag(tag.origin, val.origin)
+            return self.origin.HasTag(Mask.to_omask(tag))
+        return self.origin.HasTag(Mask.to_omask(tag), Mask.to_omask(val))
 
     def get_tag(self, tag, val = None) -> 'Value':
         if isinstance(tag, str) and val is None:
             return Value.to_value(self.origin.GetTag(tag))
-        assert isinstance(tag, Mask)
         if val is None:
-            return Value.to_value(self.origin.GetTag(tag.origin))
-        assert isinstance(val, Mask)
-        return Value.to_value(self.origin.GetTag(tag.origin, val.origin))
+            return Value.to_value(self.origin.GetTag(Mask.to_omask(tag)))
+        return Value.to_value(self.origin.GetTag(Mask.to_omask(tag), Mask.to_omask(val)))
 
     tag = get_tag
 
@@ -2083,6 +2451,8 @@ POST_EXT_CONSIDERED = ExportedConsts.POST_EXT_CONSIDERED
 
 class PostingXData(OriginKeeper):
 
+    __slots__ = ()
+
     flags_adapter = FlagsAdapter.PostXDataFlagsAdapter()
 
     def __init__(self, origin = None) -> None:
@@ -2183,6 +2553,8 @@ POST_COST_CALCULATED = ExportedConsts.POST_COST_CALCULATED
 
 class Posting(JournalItem):
 
+    __slots__ = ()
+
     def __init__(self, origin = None) -> None:
         if not origin is None:
             assert isinstance(origin, OriginPost)
@@ -2193,7 +2565,7 @@ class Posting(JournalItem):
 
     @classmethod
     def from_origin(cls, origin):
-        return Posting(origin=origin) if not origin is None else None
+        return wrapper_cache.get_wrapper(origin, lambda: Posting(origin=origin)) if not origin is None else None
 
     def id(self) -> str:
         return self.origin.Id
@@ -2272,6 +2644,8 @@ class Posting(JournalItem):
 
 class TransactionBase(JournalItem):
 
+    __slots__ = ('_generation', '_list_view', '_list_view_stamp')
+
     def __init__(self, origin) -> None:
         assert isinstance(origin, OriginXactBase)
         super().__init__(origin)
@@ -2281,11 +2655,11 @@ class TransactionBase(JournalItem):
         if origin is None:
             return None
         if isinstance(origin, OriginXact):
-            return Transaction(origin=origin)
+            return Transaction.from_origin(origin)
         if isinstance(origin, OriginPeriodXact):
-            return PeriodicTransaction(origin=origin)
+            return PeriodicTransaction.from_origin(origin)
         if isinstance(origin, OriginAutoXact):
-            return AutomatedTransaction(origin=origin)
+            return AutomatedTransaction.from_origin(origin)
         raise Exception("Incorrect origin for transaction base")
 
     @property
@@ -2297,21 +2671,35 @@ class TransactionBase(JournalItem):
         self.origin.Journal = value.origin if not value is None else None
 
     def __len__(self) -> int:
-        return NetListAdapter.GetPosts(self.origin).Count
+        return NetListAdapter.GetPostsCount(self.origin)
 
-    def __getitem__(self, row):
-        return Posting.from_origin(NetListAdapter.GetPosts(self.origin)[row])
+    def __getitem__(self, row: int) -> 'Posting':
+        """Returns a posting by its position in the transaction.
+
+        Postings are taken from a cached adapter that is a live view over the transaction's postings (not a copy),
+        so changes made through 'origin' or another wrapper of the same transaction are visible without
+        calling invalidate_list_view().
+        """
+        return Posting.from_origin(self.get_list_view(NetListAdapter.GetPosts, len(self))[row])
 
     def add_post(self, post: Posting):
         assert isinstance(post, Posting)
         self.origin.AddPost(post.origin)
+        self.invalidate_list_view()
+        query_cache.clear_journal(self.origin.Journal)
 
     def remove_post(self, post: Posting) -> bool:
         assert isinstance(post, Posting)
-        return self.origin.RemovePost(post.origin)
+        result = self.origin.RemovePost(post.origin)
+        self.invalidate_list_view()
+        query_cache.clear_journal(self.origin.Journal)
+        return result
 
     def finalize(self) -> bool:
-        return self.origin.FinalizeXact()
+        result = self.origin.FinalizeXact()
+        self.invalidate_list_view()
+        query_cache.clear_journal(self.origin.Journal)
+        return result
 
     def posts(self) -> Iterable:
         return PostingList(NetListAdapter.GetPosts(self.origin))
@@ -2321,6 +2709,8 @@ class TransactionBase(JournalItem):
 
 class Transaction(TransactionBase):
 
+    __slots__ = ()
+
     def __init__(self, origin = None) -> None:
         if not origin is None:
             assert isinstance(origin, OriginXact)
@@ -2330,7 +2720,7 @@ class Transaction(TransactionBase):
 
     @classmethod
     def from_origin(cls, origin):
-        return Transaction(origin=origin) if not origin is None else None
+        return wrapper_cache.get_wrapper(origin, lambda: Transaction(origin=origin)) if not origin is None else None
 
     def id(self) -> str:
         return self.origin.Id
@@ -2368,6 +2758,8 @@ class Transaction(TransactionBase):
 
 class PeriodicTransaction(TransactionBase):
 
+    __slots__ = ()
+
     def __init__(self, origin = None) -> None:
         if not origin is None:
             assert isinstance(origin, OriginPeriodXact)
@@ -2377,7 +2769,7 @@ class PeriodicTransaction(TransactionBase):
 
     @classmethod
     def from_origin(cls, origin):
-        return PeriodicTransaction(origin=origin) if not origin is None else None
+        return wrapper_cache.get_wrapper(origin, lambda: PeriodicTransaction(origin=origin)) if not origin is None else None
 
     @property
     def period(self) -> DateInterval:
@@ -2389,6 +2781,8 @@ class PeriodicTransaction(TransactionBase):
 
 class AutomatedTransaction(TransactionBase):
 
+    __slots__ = ()
+
     def __init__(self, origin = None) -> None:
         if not origin is None:
             assert isinstance(origin, OriginAutoXact)
@@ -2398,7 +2792,7 @@ class AutomatedTransaction(TransactionBase):
 
     @classmethod
     def from_origin(cls, origin):
-        return AutomatedTransaction(origin=origin) if not origin is None else None
+        return wrapper_cache.get_wrapper(origin, lambda: AutomatedTransaction(origin=origin)) if not origin is None else None
 
     @property
     def predicate(self) -> Predicate:
@@ -2406,12 +2800,15 @@ class AutomatedTransaction(TransactionBase):
 
     def extend_xact(self, xact_base: TransactionBase):
         self.origin.ExtendXact(xact_base.origin, None)
+        xact_base.invalidate_list_view()
 
 ###########################
 # Ported from py_journal.cc
 
 class FileInfo(OriginKeeper):
 
+    __slots__ = ()
+
     def __init__(self, val = None) -> None:
         if val is None:
             self.origin = OriginJournalFileInfo()
@@ -2442,8 +2839,54 @@ class FileInfo(OriginKeeper):
     def from_stream(self) -> bool:
         return self.origin.FromStream
 
+# Cache of query results keyed by journal identity and query text (leading and trailing spaces are ignored;
+# spaces inside the query are kept since they can be a part of quoted patterns). Cached results are invalidated
+# when journal content is changed by means of this module: journals are read or closed, transactions are added
+# or removed to/from a journal, postings are added or removed to/from a transaction.
+# Changes made in other ways (e.g. by setting posting properties) require calling 'clear_query_cache' explicitly.
+# Entries are stamped with the current date, so queries with relative dates (e.g. 'this month' or 'today')
+# are not served from the cache once the date changes.
+class QueryCache(LruCache):
+
+    @staticmethod
+    def normalize(query_text: str) -> str:
+        return query_text.strip()
+
+    # Returns a list of posts for the query; 'query' function is called to get a new list if it is not cached
+    def get_posts(self, journal_origin, query_text: str, query):
+        posts = self.find_posts(journal_origin, query_text)
+        if posts is None:
+            posts = query()
+            self.put_posts(journal_origin, query_text, posts)
+        return posts
+
+    # Returns a cached list of posts for the query or None
+    def find_posts(self, journal_origin, query_text: str):
+        entry = self.get((RuntimeHelpers.GetHashCode(journal_origin), QueryCache.normalize(query_text)))
+        if entry is None or not NetObject.ReferenceEquals(entry[0], journal_origin) or not entry[2].Equals(TimesCommon.Current.CurrentDate):
+            return None
+        return entry[1]
+
+    def put_posts(self, journal_origin, query_text: str, posts):
+        self.put((RuntimeHelpers.GetHashCode(journal_origin), QueryCache.normalize(query_text)), (journal_origin, posts, TimesCommon.Current.CurrentDate))
+
+    def clear_journal(self, journal_origin):
+        with self._lock:
+            for key in [key for key, entry in self._items.items() if NetObject.ReferenceEquals(entry[0], journal_origin)]:
+                del self._items[key]
+
+query_cache = QueryCache(32)
+
+class JournalRefreshStatus(enum.IntEnum):     # Result of Journal.refresh
+    NotChanged = FlagsAdapter.EnumToInt(OriginJournalRefreshStatusEnum.NotChanged)
+    Appended = FlagsAdapter.EnumToInt(OriginJournalRefreshStatusEnum.Appended)
+    PartiallyReloaded = FlagsAdapter.EnumToInt(OriginJournalRefreshStatusEnum.PartiallyReloaded)
+    Reloaded = FlagsAdapter.EnumToInt(OriginJournalRefreshStatusEnum.Reloaded)
+
 class Journal(OriginKeeper):
 
+    __slots__ = ('_generation', '_list_view', '_list_view_stamp')
+
     def __init__(self, origin = None) -> None:
         if origin is None:
             self.origin = OriginJournal()
@@ -2453,7 +2896,7 @@ class Journal(OriginKeeper):
 
     @classmethod
     def from_origin(cls, origin):
-        return Journal(origin) if not origin is None else None
+        return wrapper_cache.get_wrapper(origin, lambda: Journal(origin)) if not origin is None else None
 
     @property
     def master(self) -> Account:
@@ -2488,7 +2931,7 @@ class Journal(OriginKeeper):
 
     def find_account_re(self, regexp: str) -> Account:
         assert isinstance(regexp, str)
-        return Account.from_origin(self.origin.FindAccountRe(regexp))
+        return Account.from_origin(self.origin.FindAccountRe(mask_cache.get_mask(regexp)))
 
     def register_account(self, name: str, post: Posting) -> Account:
         assert isinstance(name, str) or name is None
@@ -2502,17 +2945,23 @@ class Journal(OriginKeeper):
 
     def add_xact(self, xact: Transaction) -> bool:
         assert isinstance(xact, Transaction)
-        return self.origin.AddXact(xact.origin)
+        result = self.origin.AddXact(xact.origin)
+        self.invalidate_list_view()
+        self.clear_query_cache()
+        return result
 
     def remove_xact(self, xact: Transaction) -> bool:
         assert isinstance(xact, Transaction)
-        return self.origin.RemoveXact(xact.origin)
+        result = self.origin.RemoveXact(xact.origin)
+        self.invalidate_list_view()
+        self.clear_query_cache()
+        return result
 
     def __len__(self) -> int:
-        return NetListAdapter.GetXacts(self.origin).Count
+        return NetListAdapter.GetXactsCount(self.origin)
 
     def __getitem__(self, row: int) -> 'Transaction':
-        return Transaction.from_origin(NetListAdapter.GetXacts(self.origin)[row])
+        return Transaction.from_origin(self.get_list_view(NetListAdapter.GetXactsView, len(self))[row])
 
     def __iter__(self):
         return iter(self.xacts())
@@ -2535,17 +2984,224 @@ class Journal(OriginKeeper):
     def clear_xdata(self):
         self.origin.ClearXData()
 
+    # Query results are cached (see QueryCache); every call returns a new list, so changing it does not affect the cache
     def query(self, query_text:str) -> Iterable:
-        return PostingList(NetListAdapter.GetQuery(self.origin, query_text))
+        journal_origin = self.origin
+        posts = query_cache.get_posts(journal_origin, query_text, lambda: run_session_call(None,
+            lambda executor, completed: executor.Query(journal_origin, query_text, completed),
+            lambda: NetListAdapter.GetQuery(journal_origin, query_text).Origin))
+        return PostingList(NetListAdapter[OriginPost](NetList[OriginPost](posts)))
+
+    def clear_query_cache(self):
+        query_cache.clear_journal(self.origin)
+
+    # Brings the session journal up to date with its files: transactions appended to the last data file are parsed and added
+    # to this journal, and changed files that contain only transactions are parsed again in place of their previous transactions.
+    # Any other change makes the session read the files again. In this case, the wrapper switches to the new journal
+    # and objects obtained from the previous one (transactions, posts, accounts) become obsolete.
+    def refresh(self) -> JournalRefreshStatus:
+        session_origin = session.origin
+        if not NetObject.ReferenceEquals(session_origin.Journal, self.origin):
+            raise Exception("Only the journal of the current session can be refreshed")
+
+        snapshot_dir = journal_snapshot_dir
+        status = JournalRefreshStatus(FlagsAdapter.EnumToInt(run_session_call(session_origin,
+            lambda executor, completed: executor.RefreshJournal(snapshot_dir, completed),
+            lambda: session_origin.RefreshJournal(OriginJournalSnapshotCache(snapshot_dir) if snapshot_dir else None))))
+
+        if status != JournalRefreshStatus.NotChanged:
+            query_cache.clear_journal(self.origin)
+            self.origin = session_origin.Journal
+            wrapper_cache.get_wrapper(self.origin, lambda: self)
+            self.invalidate_list_view()
+        return status
+
+    def to_columns(self, query: str = None) -> 'PostingColumns':
+        assert isinstance(query, str) or query is None
+        return PostingColumns(OriginPostColumns.FromJournal(self.origin, query))
 
     def valid(self) -> bool:
         return self.origin.Valid()
 
+###########################
+# Columnar export
+
+import array
+from decimal import Decimal
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+# Copies a .Net array of primitive values to NumPy array (or to array.array if NumPy is not available).
+# The content is transferred by a single memory copy operation rather than by reading every item through pythonnet.
+def to_parray(narray, typecode: str):
+    size = narray.Length
+    if not numpy is None:
+        result = numpy.empty(size, dtype=typecode)
+        address = result.ctypes.data
+    else:
+        result = array.array(typecode, [0]) * size
+        address = result.buffer_info()[0]
+    if size > 0:
+        Marshal.Copy(narray, 0, IntPtr.__overloads__[Int64](address), size)
+    return result
+
+# Copies a .Net array of strings to Python list. The strings are joined on .Net side so that the whole array
+# crosses pythonnet boundary as a single value (the strings are not expected to contain line breaks).
+def to_pstrings(narray) -> List[str]:
+    return str(NetString.Join("\n", narray)).split("\n") if narray.Length > 0 else []
+
+# Posting attributes collected into columns. Names (accounts, commodities, payees) are represented
+# by integer ids that are indexes in the corresponding name lists.
+class PostingColumns(OriginKeeper):
+
+    __slots__ = ()
+
+    def __init__(self, origin) -> None:
+        assert isinstance(origin, OriginPostColumns)
+        self.origin = origin
+
+    @classmethod
+    def from_origin(cls, origin):
+        return PostingColumns(origin) if not origin is None else None
+
+    def __len__(self) -> int:
+        return self.origin.Count
+
+    # Dates are returned as 'datetime64[D]' NumPy array or as array.array of days since 1970-01-01 if NumPy is not available
+    @property
+    def dates(self):
+        result = to_parray(self.origin.Dates, 'q')
+        return result.view('datetime64[D]') if not numpy is None else result
+
+    @property
+    def account_ids(self):
+        return to_parray(self.origin.AccountIds, 'i')
+
+    @property
+    def quantities(self):
+        return to_parray(self.origin.Quantities, 'd')
+
+    # Exact quantities are returned as Decimal values (None for empty amounts)
+    @property
+    def exact_quantities(self) -> List[Decimal]:
+        return [Decimal(q) if q else None for q in to_pstrings(self.origin.ExactQuantities)]
+
+    @property
+    def commodity_ids(self):
+        return to_parray(self.origin.CommodityIds, 'i')
+
+    @property
+    def payee_ids(self):
+        return to_parray(self.origin.PayeeIds, 'i')
+
+    @property
+    def states(self):
+        return to_parray(self.origin.States, 'i')
+
+    @property
+    def xact_seqs(self):
+        return to_parray(self.origin.XactSeqs, 'q')
+
+    @property
+    def accounts(self) -> List[str]:
+        return to_pstrings(self.origin.Accounts)
+
+    @property
+    def commodities(self) -> List[str]:
+        return to_pstrings(self.origin.Commodities)
+
+    @property
+    def payees(self) -> List[str]:
+        return to_pstrings(self.origin.Payees)
+
+    # Builds pandas DataFrame with a row per posting. Accounts, payees and commodities are categorical columns;
+    # amounts are split into exact quantities (Decimal) and commodities.
+    def to_frame(self):
+        if pandas is None:
+            raise Exception("Module 'pandas' is required to build a data frame; please install it")
+        return pandas.DataFrame({
+            'date': self.dates,
+            'payee': pandas.Categorical.from_codes(self.payee_ids, categories=self.payees),
+            'account': pandas.Categorical.from_codes(self.account_ids, categories=self.accounts),
+            'quantity': pandas.Series(self.exact_quantities, dtype=object),
+            'commodity': pandas.Categorical.from_codes(self.commodity_ids, categories=self.commodities),
+            'state': self.states,
+            'xact_seq': self.xact_seqs
+        })
+
 ###########################
 # Ported from py_session.cc
 
+# Folder for binary snapshots of parsed journals. If it is specified, 'read_journal' loads the journal from a snapshot
+# when the journal files have not changed since the snapshot was saved and parses the files (saving a new snapshot) otherwise.
+# It is taken from "nledger_journal_snapshot_dir" environment variable by default; snapshots are not used if it is empty.
+journal_snapshot_dir = getenv("nledger_journal_snapshot_dir")
+
+# Long session calls (read_journal, execute_command and journal queries) are executed on a .Net thread (session executor)
+# that shares the session with the calling thread. The calling thread waits for the result without holding the interpreter lock,
+# so other Python threads keep running; Python functions called by the report take the lock on the executor thread.
+# Set it to False to execute the calls on the calling thread.
+allow_threads = True
+
+# Experimental, opt-in: set it to True to parse included journal files on worker threads while the including file is being parsed.
+# Parsed files are merged into the journal in the original order; files with directives (and files that follow directives
+# that change parsing, e.g. 'apply account' or 'alias') are parsed as usual (see ParallelParser.IsPlainFile).
+parallel_read = False
+
+_session_executor = None
+_session_executor_lock = threading.Lock()
+
+def get_session_executor() -> SessionExecutor:
+    global _session_executor
+    with _session_executor_lock:
+        if _session_executor is None and not MainApplicationContext.Current is None and not ExtendedSession.Current is None:
+            _session_executor = SessionExecutor(ExtendedSession.Current)
+        return _session_executor
+
+def get_operation_result(operation):
+    """Returns the result of a completed session operation.
+
+    A failed operation re-raises the original .NET exception, so callers can handle it the same way as errors of direct session calls.
+    """
+    if operation.Status == SessionOperationStatus.Failed:
+        raise operation.Exception
+    if operation.Status == SessionOperationStatus.Canceled:
+        raise Exception("Operation is canceled")
+    return operation.Result
+
+def run_session_call(session_origin, submit, call):
+    """Executes a session call on the session executor thread and waits for its result without holding the interpreter lock.
+
+    'submit' adds the operation to the executor (it gets the executor and a completion callback), 'call' is the same call
+    that is executed directly if 'allow_threads' is off, the executor is not available (e.g. the session belongs to another context)
+    or the caller already runs on the executor thread (e.g. a Python function that is called by a report).
+    """
+    executor = get_session_executor() if allow_threads else None
+    if executor is None or executor.IsExecutorThread or not (session_origin is None or NetObject.ReferenceEquals(session_origin, executor.Session)):
+        return call()
+
+    done = threading.Event()
+    operation = submit(executor, NetAction[SessionOperation](lambda operation: done.set()))
+    try:
+        done.wait()
+    except BaseException:
+        operation.Cancel()      # e.g. KeyboardInterrupt stops the running report
+        raise
+
+    return get_operation_result(operation)
+
 class Session(Scope):
 
+    __slots__ = ()
+
     def __init__(self, origin = None) -> None:
         if not origin is None:
             assert isinstance(origin, OriginSession)
@@ -2556,33 +3212,110 @@ class Session(Scope):
         return Session(origin=origin) if not origin is None else None
 
     def get_origin(self):
-        return ExtendedSession.Current
-
-    def read_journal(self, path_name: str) -> Journal:
-        return Journal.from_origin(self.origin.ReadJournal(path_name))
+        # Other threads (e.g. the background thread of ledger.watch) get the session that is served by the session executor
+        origin = ExtendedSession.Current
+        if origin is None and not _session_executor is None:
+            origin = _session_executor.Session
+        return origin
+
+    def read_journal(self, path_name: str, snapshot_dir: str = None) -> Journal:
+        query_cache.clear_journal(self.origin.Journal)
+        snapshot_dir = snapshot_dir or journal_snapshot_dir
+        session_origin = self.origin
+        session_origin.ParallelRead = parallel_read
+        return Journal.from_origin(run_session_call(session_origin,
+            lambda executor, completed: executor.ReadJournal(path_name, snapshot_dir, completed),
+            lambda: session_origin.ReadJournal(path_name, snapshot_dir) if snapshot_dir else session_origin.ReadJournal(path_name)))
 
     def read_journal_from_string(self, data: str) -> Journal:
+        query_cache.clear_journal(self.origin.Journal)
         return Journal.from_origin(self.origin.ReadJournalFromString(data))
 
     def read_journal_files(self) -> Journal:
+        query_cache.clear_journal(self.origin.Journal)
+        self.origin.ParallelRead = parallel_read
         return Journal.from_origin(self.origin.ReadJournalFiles())
 
     def close_journal_files(self):
+        query_cache.clear_journal(self.origin.Journal)
         self.origin.CloseJournalFiles()
 
     def journal(self) -> Journal:
         return Journal.from_origin(self.origin.Journal)
 
+    # Names of the files the journal was read from (data files, included files and the price database)
+    def journal_files(self) -> List[str]:
+        return [str(file_name) for file_name in self.origin.GetJournalFiles()]
+
 session = Session()
 
-def read_journal(path_name: str) -> Journal:
+def read_journal(path_name: str, snapshot_dir: str = None) -> Journal:
     assert isinstance(session, Session)
-    return session.read_journal(path_name)
+    return session.read_journal(path_name, snapshot_dir)
 
 def read_journal_from_string(data: str) -> Journal:
     assert isinstance(session, Session)
     return session.read_journal_from_string(data)
 
+# Pool of independent sessions that execute commands and queries concurrently. Every session has its own journal,
+# commodities and default scope, and runs operations on its own .Net thread that does not hold the Python interpreter lock.
+# Calls are dispatched to the first free session and block only the calling thread, so a pool can be shared by
+# several Python threads (e.g. request handlers of a server):
+#
+#   pool = ledger.SessionPool(4)
+#   pool.read_journal("drewr3.dat")          # every session reads the journal
+#   result = pool.execute_command("bal")     # CommandExecutionResult (Output, Error)
+#
+# Objects returned by a query belong to the session that executed it; they should not be mixed with objects of other sessions.
+class SessionPool:
+
+    def __init__(self, size: int = None) -> None:
+        self.origin = OriginSessionPool(size or os.cpu_count() or 1)
+
+    @property
+    def size(self) -> int:
+        return self.origin.Size
+
+    # The number of operations that are waiting for a free session
+    @property
+    def pending(self) -> int:
+        return self.origin.PendingCount
+
+    def read_journal(self, path_name: str, snapshot_dir: str = None):
+        snapshot_dir = snapshot_dir or journal_snapshot_dir
+        completed = threading.Semaphore(0)
+        operations = list(self.origin.ReadJournal(path_name, snapshot_dir, NetAction[SessionOperation](lambda operation: completed.release())))
+        for operation in operations:
+            completed.acquire()
+        for operation in operations:
+            get_operation_result(operation)
+
+    def execute_command(self, args, readJournalFiles: bool = None):
+        cmd_args = to_command_args(args)
+        return self._wait(lambda completed: self.origin.ExecuteCommand(cmd_args, bool(readJournalFiles), completed))
+
+    def query(self, query_text: str) -> PostingList:
+        posts = self._wait(lambda completed: self.origin.Query(query_text, completed))
+        return PostingList(NetListAdapter[OriginPost](NetList[OriginPost](posts)))
+
+    # Stops accepting new operations and cancels queued ones
+    def close(self):
+        self.origin.Dispose()
+
+    def __enter__(self) -> 'SessionPool':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Submits an operation and waits for its completion without holding the interpreter lock
+    @staticmethod
+    def _wait(submit):
+        done = threading.Event()
+        operation = submit(NetAction[SessionOperation](lambda operation: done.set()))
+        done.wait()
+        return get_operation_result(operation)
+
 ###########################
 # Ported from py_value.cc
 
@@ -2602,6 +3335,8 @@ class ValueType(enum.Enum):  # ValueType enum
 
 class Value(OriginKeeper):
 
+    __slots__ = ()
+
     def __init__(self,val) -> None:
         if isinstance(val, datetime):
             val = to_ndatetime(val)
@@ -2932,6 +3667,73 @@ def mask_value(s: str) -> Value:
 def value_context(val: Value) -> str:
     return OriginValue.ValueContext(val.origin)
 
+###########################
+# Python functions called from ledger expressions
+
+# Marks a function as a batch function. When a ledger expression calls it for a posting (e.g. --display 'myfilter(post)'),
+# the function is called once for a chunk of postings that follow in the journal: it gets a list of values
+# for every argument and returns a list of results (one per posting):
+#
+#   @ledger.batch_function
+#   def myfilter(posts):
+#       return [post.amount > 10 for post in posts]
+#
+# Arguments are evaluated in advance for the chunk, and a prepared result is used only if the arguments
+# evaluated for the posting are the same, so the function should return the same result for the same arguments.
+# Chunks shrink when reports request postings in a different order (e.g. sorted reports).
+def batch_function(func = None, size: int = 256):
+    if size < 1:
+        raise ValueError("Batch size should be a positive number")
+
+    def decorate(func):
+        func.__ledger_batch_size__ = size
+        return func
+
+    return decorate if func is None else decorate(func)
+
+# Marks a function that always returns the same result for the same arguments (e.g. maps a payee to a category).
+# Results are cached by argument values in a bounded LRU cache, so repeated calls from ledger expressions
+# skip both the Python call and the conversion of the result:
+#
+#   @ledger.pure                    # or @ledger.pure(max_size=100)
+#   def category(payee):
+#       return payee.split(' ')[0]
+#
+# Arguments are compared by values (postings, transactions and accounts are compared by identity).
+def pure(func = None, max_size: int = 1024):
+    if max_size < 1:
+        raise ValueError("Cache size should be a positive number")
+
+    def decorate(func):
+        func.__ledger_pure_cache_size__ = max_size
+        return func
+
+    return decorate if func is None else decorate(func)
+
+# Returns statistics of result caches of pure functions that were called from ledger expressions (keyed by function names)
+def pure_stats() -> Dict[str, Dict[str, int]]:
+    return {functor.Name: {"size": functor.ResultCache.Count, "max_size": functor.ResultCache.MaxSize, "hits": functor.ResultCache.Hits,
+                           "misses": functor.ResultCache.Misses, "evictions": functor.ResultCache.Evictions}
+            for functor in PythonSession.Current.GetFunctors() if not functor.ResultCache is None}
+
+# Set it to True to collect timings of Python functions called from ledger expressions (see functor_stats).
+# Statistics are reset when a command starts (execute_command, execute_command_iter and execute_rows).
+profile_functors = False
+
+# Returns statistics of Python functions that were called from ledger expressions by the last command (keyed by function names):
+# the number of calls and cumulative times in seconds - total time of calls, conversion of arguments to Python objects
+# and conversion of returned values. Calls that are served by a result cache or a prepared batch have no conversion time.
+def functor_stats() -> Dict[str, Dict[str, float]]:
+    return {stats.Name: {"calls": stats.Calls, "total_time": stats.TotalTime.TotalSeconds,
+                         "argument_conversion_time": stats.ArgumentConversionTime.TotalSeconds,
+                         "return_conversion_time": stats.ReturnConversionTime.TotalSeconds}
+            for stats in PythonSession.Current.FunctorProfiler.Stats}
+
+def reset_functor_stats():
+    profiler = PythonSession.Current.FunctorProfiler
+    profiler.Reset()
+    profiler.IsEnabled = bool(profile_functors)
+
 ###########################
 # Routine to acquire and release Python output streams
 
@@ -0,0 +1,137 @@
+####################################################################################
+# Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+# Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+# 
+# This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+# Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+# See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+####################################################################################
+
+###########################
+# NLedger asyncio front-end (ledger.aio)
+#
+# Awaitable versions of the session operations that take most of the time:
+#
+#   journal = await ledger.aio.read_journal("drewr3.dat")
+#   result = await ledger.aio.execute_command("bal ^expenses")    # CommandExecutionResult (Output, Error)
+#   posts = await ledger.aio.query("^expenses")                   # PostingList
+#
+# Operations are executed one by one on a dedicated .Net thread (NLedger.Extensibility.SessionExecutor) that shares
+# the session with the thread that imported the module; the default session uses the same executor as synchronous calls
+# (see ledger.allow_threads). The executor thread does not hold the Python interpreter lock
+# while it is working, so other coroutines (and other Python threads) keep running while a report is computed.
+# Cancelling an awaiting task removes its operation from the queue or interrupts it if it is already running.
+#
+# Only one operation runs at a time, so the calls are serialized; synchronous ledger functions should not be called
+# while asynchronous operations are in progress.
+
+import asyncio
+import threading
+
+import ledger
+
+from NLedger.Extensibility import SessionExecutor
+from NLedger.Extensibility import SessionOperation
+from NLedger.Extensibility import SessionOperationStatus
+from System import Action
+
+class AsyncSession:
+
+    def __init__(self, session: ledger.Session = None) -> None:
+        self._session = session or ledger.session
+        assert isinstance(self._session, ledger.Session)
+        self._executor = ledger.get_session_executor() if session is None else None
+        self._owns_executor = self._executor is None
+        if self._owns_executor:
+            self._executor = SessionExecutor(self._session.origin)
+
+    @property
+    def session(self) -> ledger.Session:
+        return self._session
+
+    # The number of operations waiting in the queue
+    @property
+    def pending(self) -> int:
+        return self._executor.PendingCount
+
+    async def read_journal(self, path_name: str, snapshot_dir: str = None) -> ledger.Journal:
+        ledger.query_cache.clear()
+        snapshot_dir = snapshot_dir or ledger.journal_snapshot_dir
+        self._session.origin.ParallelRead = ledger.parallel_read
+        origin = await self._run(lambda completed: self._executor.ReadJournal(path_name, snapshot_dir, completed))
+        return ledger.Journal.from_origin(origin)
+
+    async def execute_command(self, args, readJournalFiles: bool = None):
+        if readJournalFiles:
+            ledger.query_cache.clear()
+        ledger.reset_functor_stats()
+        cmd_args = ledger.to_command_args(args)
+        return await self._run(lambda completed: self._executor.ExecuteCommand(cmd_args, bool(readJournalFiles), completed))
+
+    async def query(self, query_text: str) -> ledger.PostingList:
+        journal_origin = self._session.origin.Journal
+        posts = ledger.query_cache.find_posts(journal_origin, query_text)
+        if posts is None:
+            posts = await self._run(lambda completed: self._executor.Query(query_text, completed))
+            ledger.query_cache.put_posts(journal_origin, query_text, posts)
+        return ledger.PostingList(ledger.NetListAdapter[ledger.OriginPost](ledger.NetList[ledger.OriginPost](posts)))
+
+    # Stops accepting new operations and cancels queued ones (the executor of the default session is kept for synchronous calls)
+    def close(self):
+        if self._owns_executor:
+            self._executor.Dispose()
+
+    async def _run(self, submit):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def set_result(operation):
+            if not future.done():
+                future.set_result(operation)
+
+        # Called on the executor thread
+        def completed(operation):
+            try:
+                loop.call_soon_threadsafe(set_result, operation)
+            except RuntimeError:
+                pass    # the event loop is closed
+
+        operation = submit(Action[SessionOperation](completed))
+        try:
+            await future
+        except asyncio.CancelledError:
+            operation.Cancel()
+            raise
+
+        if operation.Status == SessionOperationStatus.Canceled:
+            raise asyncio.CancelledError()
+        return ledger.get_operation_result(operation)     # failed operations re-raise the .Net exception as synchronous calls do
+
+###########################
+# Module-level functions use the default asynchronous session that is bound to 'ledger.session'
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+def get_session() -> AsyncSession:
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = AsyncSession()
+        return _default_session
+
+async def read_journal(path_name: str, snapshot_dir: str = None) -> ledger.Journal:
+    return await get_session().read_journal(path_name, snapshot_dir)
+
+async def execute_command(args, readJournalFiles: bool = None):
+    return await get_session().execute_command(args, readJournalFiles)
+
+async def query(query_text: str) -> ledger.PostingList:
+    return await get_session().query(query_text)
+
+def close():
+    global _default_session
+    with _default_session_lock:
+        if not _default_session is None:
+            _default_session.close()
+            _default_session = None
@@ -0,0 +1,88 @@
+####################################################################################
+# Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+# Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+# 
+# This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+# Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+# See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+####################################################################################
+
+###########################
+# NLedger parallel report runner (ledger.parallel)
+#
+# Executes a batch of report commands against the same journal in several worker processes:
+#
+#   results = ledger.parallel.run_reports("drewr3.dat", ["bal", "reg ^expenses", ["print", "books"]], workers=4)
+#   for result in results:
+#       print(result.Output if not result.Error else result.Error)
+#
+# Every worker is a separate Python process with its own .Net runtime and session, so workers do not share any state.
+# A worker reads the journal once and executes commands one by one; commands are distributed among workers as they become free.
+# Results are returned in the order of commands. If a journal snapshot folder is specified (see ledger.journal_snapshot_dir),
+# the first worker parses the journal and saves the snapshot, and other workers load the journal from the snapshot.
+#
+# Workers are started by 'spawn' method by default (forking a process with a running .Net runtime is not safe),
+# so the calling script should protect its entry point by "if __name__ == '__main__':".
+
+from typing import Iterable, List, NamedTuple
+import multiprocessing
+import os
+
+import ledger
+
+# Result of a report command; it has the same properties as CommandExecutionResult but can be passed between processes
+class ReportResult(NamedTuple):
+    Output: str
+    Error: str
+
+def run_reports(journal_path: str, commands: Iterable, workers: int = None, snapshot_dir: str = None, start_method: str = "spawn") -> List[ReportResult]:
+    """Executes commands (strings or lists of arguments) against the journal in worker processes; returns results in the order of commands.
+
+    The number of workers is the number of CPU cores by default, but not more than the number of commands.
+    A command that fails (as well as a journal that cannot be read) produces a result with error messages.
+    """
+    commands = [command if isinstance(command, str) else list(command) for command in commands]
+    if not commands:
+        return []
+
+    workers = min(workers or os.cpu_count() or 1, len(commands))
+    snapshot_dir = snapshot_dir or ledger.journal_snapshot_dir
+    context = multiprocessing.get_context(start_method)
+
+    with context.Pool(workers, initializer=_init_worker, initargs=(journal_path, snapshot_dir, context.Lock(), context.Event())) as pool:
+        return pool.map(_run_report, commands, chunksize=1)
+
+###########################
+# Worker process
+
+_load_error = None
+
+def _init_worker(journal_path: str, snapshot_dir: str, loader_lock, loaded):
+    # Only one worker parses the journal when the snapshot is used; others wait for the snapshot and load it
+    if snapshot_dir and loader_lock.acquire(block=False):
+        try:
+            _read_journal(journal_path, snapshot_dir)
+        finally:
+            loaded.set()
+    else:
+        if snapshot_dir:
+            loaded.wait()
+        _read_journal(journal_path, snapshot_dir)
+
+def _read_journal(journal_path: str, snapshot_dir: str):
+    global _load_error
+    # Exceptions must not leave the initializer; otherwise the pool restarts the worker endlessly
+    try:
+        ledger.read_journal(journal_path, snapshot_dir)
+    except Exception as err:
+        _load_error = str(err) or "Cannot read journal %s" % journal_path
+
+def _run_report(args) -> ReportResult:
+    if _load_error:
+        return ReportResult("", _load_error)
+
+    try:
+        result = ledger.execute_command(args)
+        return ReportResult(result.Output, result.Error)
+    except Exception as err:
+        return ReportResult("", str(err))
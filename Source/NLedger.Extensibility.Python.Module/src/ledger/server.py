@@ -0,0 +1,446 @@
+####################################################################################
+# Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+# Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+# 
+# This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+# Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+# See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+####################################################################################
+
+###########################
+# NLedger query service (ledger.server)
+#
+# The service keeps a journal loaded in memory and serves requests over HTTP on a TCP port or a Unix domain socket,
+# so that clients do not pay for parsing the journal on every call:
+#
+#   POST /command   {"args": "bal ^expenses"} or {"args": ["bal", "^expenses"]}  -> {"output": "...", "error": null}
+#   POST /query     {"query": "^expenses"}  -> {"count": 2, "posts": [{"date": "2004-01-01", "payee": "...", ...}]}
+#   POST /reload    reads journal files again  -> {"xacts": 10}
+#   GET  /health    {"status": "ok", "xacts": 10}
+#   GET  /metrics   request counters and latencies per endpoint (answered immediately, bypassing the request queue)
+#
+# GET requests to /command and /query are accepted as well (e.g. "/command?args=bal" or "/query?query=^expenses").
+#
+# Usage: python -m ledger.server -f FILE [--host HOST] [--port PORT | --socket PATH] [--max-pending N] [--timeout SEC]
+#        ledger -f FILE server   (NLedger calls 'main' of this module)
+#
+# NLedger session is not thread-safe and it is bound to the thread that initialized the module, so requests are executed
+# one by one on the thread that calls 'serve'; listener threads only parse requests and wait for results.
+# The number of accepted requests (queued and running) is limited by 'max_pending'; extra requests get "503 Service Unavailable".
+# A request that waits for its result longer than 'request_timeout' gets "504 Gateway Timeout".
+
+from typing import List
+import argparse
+import json
+import os
+import queue
+import socketserver
+import stat
+import sys
+import threading
+import time
+from collections import deque
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import ledger
+
+class ServerBusyError(Exception):
+    pass
+
+class RequestTimeoutError(Exception):
+    pass
+
+class BadRequestError(Exception):
+    pass
+
+###########################
+# Metrics
+
+# Request counters and latencies per endpoint. Latency is the time from accepting a request to getting its result;
+# wait time is the part of it that the request spent in the queue. Percentiles are calculated over the latest 'window' requests.
+class LatencyMetrics:
+
+    def __init__(self, window: int = 1024) -> None:
+        assert isinstance(window, int) and window > 0
+        self._window = window
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self.started = time.time()
+
+    def _get_stats(self, endpoint: str) -> dict:
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = {"count": 0, "errors": 0, "rejected": 0, "timeouts": 0, "total": 0.0, "wait": 0.0, "max": 0.0, "latest": deque(maxlen=self._window)}
+            self._endpoints[endpoint] = stats
+        return stats
+
+    def record(self, endpoint: str, latency: float, wait: float = 0.0, failed: bool = False):
+        with self._lock:
+            stats = self._get_stats(endpoint)
+            stats["count"] += 1
+            stats["errors"] += 1 if failed else 0
+            stats["total"] += latency
+            stats["wait"] += wait
+            stats["max"] = max(stats["max"], latency)
+            stats["latest"].append(latency)
+
+    def reject(self, endpoint: str):
+        with self._lock:
+            self._get_stats(endpoint)["rejected"] += 1
+
+    def timeout(self, endpoint: str):
+        with self._lock:
+            self._get_stats(endpoint)["timeouts"] += 1
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self.started = time.time()
+
+    # Returns a value that is not less than 'p' percent of the (sorted) values
+    @staticmethod
+    def percentile(values: List[float], p: float) -> float:
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+    def to_dict(self) -> dict:
+        ms = lambda seconds: round(seconds * 1000.0, 3)
+        with self._lock:
+            endpoints = {}
+            for endpoint, stats in self._endpoints.items():
+                count = stats["count"]
+                latest = sorted(stats["latest"])
+                endpoints[endpoint] = {
+                    "count": count,
+                    "errors": stats["errors"],
+                    "rejected": stats["rejected"],
+                    "timeouts": stats["timeouts"],
+                    "avg_ms": ms(stats["total"] / count) if count else 0.0,
+                    "avg_wait_ms": ms(stats["wait"] / count) if count else 0.0,
+                    "max_ms": ms(stats["max"]),
+                    "p50_ms": ms(LatencyMetrics.percentile(latest, 50)),
+                    "p95_ms": ms(LatencyMetrics.percentile(latest, 95)),
+                    "p99_ms": ms(LatencyMetrics.percentile(latest, 99))
+                }
+            return {"uptime_sec": round(time.time() - self.started, 3), "endpoints": endpoints}
+
+###########################
+# Request execution
+
+class RequestJob:
+
+    __slots__ = ("action", "accepted", "started", "finished", "result", "error", "done", "abandoned")
+
+    def __init__(self, action) -> None:
+        self.action = action
+        self.accepted = time.perf_counter()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.abandoned = False
+
+    @property
+    def wait_time(self) -> float:
+        return (self.started or self.accepted) - self.accepted
+
+# Queue of requests that are executed on a single (serving) thread. A slot is taken when a request is accepted
+# and released when the request is executed or skipped, so 'max_pending' limits both queued and running requests.
+class RequestExecutor:
+
+    def __init__(self, max_pending: int = 16) -> None:
+        assert isinstance(max_pending, int) and max_pending > 0
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    # Queues the action and waits for its result (called by listener threads)
+    def submit(self, action, timeout: float = None) -> RequestJob:
+        if not self._slots.acquire(blocking=False):
+            raise ServerBusyError("Too many pending requests (%d)" % self.max_pending)
+
+        with self._lock:
+            self._pending += 1
+
+        job = RequestJob(action)
+        self._jobs.put(job)
+
+        if not job.done.wait(timeout):
+            job.abandoned = True
+            raise RequestTimeoutError("Request was not completed in %s sec" % timeout)
+        return job
+
+    # Executes the next queued action; returns False if there was nothing to execute during the timeout (called by the serving thread)
+    def run_pending(self, timeout: float = None) -> bool:
+        try:
+            job = self._jobs.get(timeout=timeout)
+        except queue.Empty:
+            return False
+
+        try:
+            if not job.abandoned:
+                job.started = time.perf_counter()
+                try:
+                    job.result = job.action()
+                except Exception as err:
+                    job.error = err
+                job.finished = time.perf_counter()
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+            job.done.set()
+        return True
+
+###########################
+# HTTP endpoint
+
+class LedgerRequestHandler(BaseHTTPRequestHandler):
+
+    server_version = "NLedgerServer"
+    max_body_size = 1024 * 1024
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        self.handle_request(url.path, params)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        try:
+            params = self.read_json()
+        except BadRequestError as err:
+            self.send_json(400, {"error": str(err)})
+            return
+        self.handle_request(url.path, params)
+
+    def handle_request(self, path: str, params: dict):
+        ledger_server = self.server.ledger_server
+        if path == "/metrics":
+            self.send_json(200, ledger_server.get_metrics())
+            return
+
+        action = ledger_server.get_action(path, params) if isinstance(params, dict) else None
+        if action is None:
+            self.send_json(404 if isinstance(params, dict) else 400, {"error": "Unknown request: %s" % path})
+            return
+
+        metrics = ledger_server.metrics
+        accepted = time.perf_counter()
+        try:
+            job = ledger_server.executor.submit(action, ledger_server.request_timeout)
+        except ServerBusyError as err:
+            metrics.reject(path)
+            self.send_json(503, {"error": str(err)}, {"Retry-After": "1"})
+            return
+        except RequestTimeoutError as err:
+            metrics.timeout(path)
+            self.send_json(504, {"error": str(err)})
+            return
+
+        latency = time.perf_counter() - accepted
+        if job.error is None:
+            metrics.record(path, latency, job.wait_time)
+            self.send_json(200, job.result)
+        else:
+            metrics.record(path, latency, job.wait_time, failed=True)
+            self.send_json(400 if isinstance(job.error, BadRequestError) else 500, {"error": str(job.error)})
+
+    def read_json(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise BadRequestError("Invalid Content-Length")
+        if length > self.max_body_size:
+            raise BadRequestError("Request body is too large")
+        if length == 0:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length).decode("utf-8"))
+        except ValueError as err:
+            raise BadRequestError("Invalid JSON: %s" % err)
+
+    def send_json(self, code: int, data, headers: dict = None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Unix domain socket connections have no client address
+    def address_string(self) -> str:
+        return self.client_address[0] if isinstance(self.client_address, tuple) and self.client_address else "local"
+
+    def log_message(self, format, *args):
+        if self.server.ledger_server.verbose:
+            super().log_message(format, *args)
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+if hasattr(socketserver, "UnixStreamServer"):
+    class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+else:
+    ThreadingUnixHTTPServer = None
+
+###########################
+# Query service
+
+EPOCH = date(1970, 1, 1)
+
+# Converts posting columns (see ledger.PostingColumns) to a list of JSON-compatible rows
+def columns_to_rows(columns) -> List[dict]:
+    accounts, payees, commodities = columns.accounts, columns.payees, columns.commodities
+    return [{
+        "date": (EPOCH + timedelta(days=int(day))).isoformat(),
+        "payee": payees[payee_id],
+        "account": accounts[account_id],
+        "quantity": str(quantity) if not quantity is None else None,
+        "commodity": commodities[commodity_id],
+        "state": int(state),
+        "xact_seq": int(xact_seq)
+    } for day, payee_id, account_id, quantity, commodity_id, state, xact_seq in zip(columns.dates, columns.payee_ids, columns.account_ids,
+        columns.exact_quantities, columns.commodity_ids, columns.states, columns.xact_seqs)]
+
+class LedgerServer:
+
+    def __init__(self, journal_file: str = None, host: str = "localhost", port: int = 9000, socket_path: str = None,
+                 max_pending: int = 16, request_timeout: float = 60.0, snapshot_dir: str = None, verbose: bool = False) -> None:
+        self.journal_file = journal_file
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.request_timeout = request_timeout
+        self.snapshot_dir = snapshot_dir
+        self.verbose = verbose
+        self.executor = RequestExecutor(max_pending)
+        self.metrics = LatencyMetrics()
+        self.journal = None
+        self._listener = None
+        self._listener_thread = None
+
+    # Address of the opened endpoint: either socket path or (host, port)
+    @property
+    def address(self):
+        return self._listener.server_address if not self._listener is None else None
+
+    # Reads journal files; the journal file is specified either explicitly or by session options (e.g. "ledger -f FILE server")
+    def load_journal(self) -> int:
+        ledger.session.close_journal_files()
+        if self.journal_file:
+            self.journal = ledger.session.read_journal(self.journal_file, self.snapshot_dir)
+        else:
+            self.journal = ledger.session.read_journal_files()
+        return len(self.journal)
+
+    def execute_command(self, args) -> dict:
+        if isinstance(args, str):
+            args = args.strip()
+        elif not (isinstance(args, list) and all(isinstance(arg, str) for arg in args)):
+            raise BadRequestError("Command arguments should be either a string or a list of strings")
+        if not args:
+            raise BadRequestError("Command is not specified")
+
+        result = ledger.execute_command(args)
+        return {"output": result.Output, "error": result.Error}
+
+    def query(self, query_text: str) -> dict:
+        if not isinstance(query_text, str) or not query_text.strip():
+            raise BadRequestError("Query is not specified")
+
+        rows = columns_to_rows(self.journal.to_columns(query_text))
+        return {"count": len(rows), "posts": rows}
+
+    def health(self) -> dict:
+        return {"status": "ok", "xacts": len(self.journal) if not self.journal is None else 0}
+
+    # Returns a function that processes the request on the serving thread (or None for unknown requests)
+    def get_action(self, path: str, params: dict):
+        if path == "/command":
+            return lambda: self.execute_command(params.get("args"))
+        if path == "/query":
+            return lambda: self.query(params.get("query"))
+        if path == "/reload":
+            return lambda: {"xacts": self.load_journal()}
+        if path == "/health":
+            return self.health
+        return None
+
+    def get_metrics(self) -> dict:
+        return dict(self.metrics.to_dict(), pending=self.executor.pending, max_pending=self.executor.max_pending)
+
+    # Opens the endpoint and starts accepting requests on a background thread
+    def open(self):
+        assert self._listener is None, "Server is already opened"
+
+        if self.socket_path:
+            if ThreadingUnixHTTPServer is None:
+                raise Exception("Unix domain sockets are not supported on this platform")
+            # Remove a socket file that is left by a previous run
+            if os.path.exists(self.socket_path) and stat.S_ISSOCK(os.stat(self.socket_path).st_mode):
+                os.remove(self.socket_path)
+            self._listener = ThreadingUnixHTTPServer(self.socket_path, LedgerRequestHandler)
+        else:
+            self._listener = ThreadingHTTPServer((self.host, self.port), LedgerRequestHandler)
+
+        self._listener.ledger_server = self
+        self._listener_thread = threading.Thread(target=self._listener.serve_forever, name="ledger-server-listener", daemon=True)
+        self._listener_thread.start()
+
+    # Executes requests on the current thread until the stop event is set (or forever)
+    def serve(self, stop_event: threading.Event = None):
+        while stop_event is None or not stop_event.is_set():
+            self.executor.run_pending(0.1)
+
+    def close(self):
+        if not self._listener is None:
+            self._listener.shutdown()
+            self._listener.server_close()
+            self._listener = None
+            self._listener_thread = None
+            if self.socket_path and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def run(self):
+        xacts = self.load_journal()
+        self.open()
+        print("Ledger server is listening on %s (%d transactions loaded)... (Control-C to exit)" % (self.socket_path or "http://%s:%d" % self.address[:2], xacts))
+        try:
+            self.serve()
+        except KeyboardInterrupt:
+            print("Shutting down server")
+        finally:
+            self.close()
+
+def main(*args) -> int:
+    parser = argparse.ArgumentParser(prog="ledger.server", description="Serves Ledger commands and queries for a journal loaded in memory.")
+    parser.add_argument("-f", "--file", help="journal file (by default, the file specified by session options)")
+    parser.add_argument("--host", default="localhost", help="host name or address to listen (default: localhost)")
+    parser.add_argument("--port", type=int, default=9000, help="TCP port to listen (default: 9000)")
+    parser.add_argument("--socket", help="Unix domain socket path to listen instead of TCP port")
+    parser.add_argument("--max-pending", type=int, default=16, help="maximum number of queued and running requests (default: 16)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="maximum time in seconds that a request waits for its result (default: 60)")
+    parser.add_argument("--snapshot-dir", default=ledger.journal_snapshot_dir, help="folder for journal snapshots (see ledger.journal_snapshot_dir)")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    options = parser.parse_args([str(arg) for arg in args])
+
+    LedgerServer(journal_file=options.file, host=options.host, port=options.port, socket_path=options.socket, max_pending=options.max_pending,
+                 request_timeout=options.timeout, snapshot_dir=options.snapshot_dir, verbose=options.verbose).run()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:]))
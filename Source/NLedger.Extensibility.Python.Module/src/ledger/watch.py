@@ -0,0 +1,225 @@
+####################################################################################
+# Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+# Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+# 
+# This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+# Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+# See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+####################################################################################
+
+###########################
+# NLedger journal watcher (ledger.watch)
+#
+# Keeps the session journal up to date with its files:
+#
+#   watcher = ledger.watch.JournalWatcher(on_refresh=lambda status: print(status))
+#   watcher.start()     # refreshes the journal on a background thread when files change
+#   ...
+#   watcher.stop()
+#
+# The watcher observes all files the journal was read from (data files, included files and the price database).
+# On Linux, it waits for inotify events of their folders, so files that editors replace on saving are noticed too;
+# otherwise (or if inotify is not available) it polls file sizes and modification times. Changes are applied by Journal.refresh():
+# appended transactions are added to the journal, changed files that contain only transactions are parsed again in place of
+# their previous transactions, and any other change makes the session read the journal again.
+#
+# The background thread refreshes the journal through the session executor (see ledger.allow_threads), so refreshing
+# does not conflict with calls on the thread that owns the session. If threads are not allowed, call 'poll()' on that thread instead.
+
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import threading
+
+import ledger
+
+_FileStamp = Optional[Tuple[int, int]]
+
+def _get_stamp(file_name: str) -> _FileStamp:
+    try:
+        stat = os.stat(file_name)
+        return (stat.st_size, stat.st_mtime_ns)
+    except OSError:
+        return None
+
+class _PollingBackend:
+
+    name = "polling"
+
+    def __init__(self, stopped: threading.Event) -> None:
+        self._stopped = stopped
+
+    def watch(self, file_names: Iterable[str]):
+        pass
+
+    # Returns True if files might be changed
+    def wait(self, timeout: float) -> bool:
+        self._stopped.wait(timeout)
+        return True
+
+    def close(self):
+        pass
+
+class _InotifyBackend:
+
+    name = "inotify"
+
+    # Events of a watched folder that can change a file in it (see inotify.h)
+    _IN_MODIFY = 0x00000002
+    _IN_ATTRIB = 0x00000004
+    _IN_CLOSE_WRITE = 0x00000008
+    _IN_MOVED_FROM = 0x00000040
+    _IN_MOVED_TO = 0x00000080
+    _IN_CREATE = 0x00000100
+    _IN_DELETE = 0x00000200
+    _MASK = _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+
+    def __init__(self, stopped: threading.Event) -> None:
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._watches = {}      # folder name => watch descriptor
+
+    def watch(self, file_names: Iterable[str]):
+        folders = set(os.path.dirname(os.path.abspath(file_name)) for file_name in file_names)
+        for folder in folders.difference(self._watches):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(folder), self._MASK)
+            if wd >= 0:
+                self._watches[folder] = wd
+        for folder in set(self._watches).difference(folders):
+            self._libc.inotify_rm_watch(self._fd, self._watches.pop(folder))
+
+    def wait(self, timeout: float) -> bool:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self._fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self._fd)
+
+def _create_backend(use_inotify: bool, stopped: threading.Event):
+    if use_inotify and sys.platform.startswith("linux"):
+        try:
+            return _InotifyBackend(stopped)
+        except (OSError, AttributeError):
+            pass    # no libc or inotify functions (e.g. too many instances)
+    return _PollingBackend(stopped)
+
+class JournalWatcher:
+
+    """Refreshes the journal when its files change.
+
+    'interval' is the polling period in seconds (with inotify, it only limits the time to notice 'stop()');
+    'delay' is the time to wait after a change notification before refreshing, so that a file written in several steps is read once;
+    'on_refresh' gets ledger.JournalRefreshStatus after every refresh, 'on_error' gets exceptions raised by refreshing in the background.
+    """
+
+    def __init__(self, journal: ledger.Journal = None, interval: float = 1.0, delay: float = 0.1, use_inotify: bool = True,
+            on_refresh: Callable[[ledger.JournalRefreshStatus], None] = None, on_error: Callable[[Exception], None] = None) -> None:
+        self._journal = journal or ledger.session.journal()
+        assert isinstance(self._journal, ledger.Journal)
+        self.interval = interval
+        self.delay = delay
+        self.on_refresh = on_refresh
+        self.on_error = on_error
+        self._use_inotify = use_inotify
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._backend = None
+        self._files = []            # type: List[str]
+        self._stamps = {}           # type: Dict[str, _FileStamp]
+        self._update_files({})
+
+    @property
+    def journal(self) -> ledger.Journal:
+        return self._journal
+
+    # Names of the observed files
+    @property
+    def files(self) -> List[str]:
+        return list(self._files)
+
+    # "inotify" or "polling" while the watcher is running; None otherwise
+    @property
+    def backend(self) -> Optional[str]:
+        backend = self._backend
+        return backend.name if not backend is None else None
+
+    @property
+    def is_running(self) -> bool:
+        return not self._thread is None
+
+    def poll(self) -> Optional[ledger.JournalRefreshStatus]:
+        """Refreshes the journal if its files are changed since the previous check; returns the refresh status or None if files are not changed."""
+        with self._lock:
+            stamps = {file_name: _get_stamp(file_name) for file_name in self._files}
+            if stamps == self._stamps:
+                return None
+
+            status = self._journal.refresh()
+            self._update_files(stamps)
+
+        if not self.on_refresh is None:
+            self.on_refresh(status)
+        return status
+
+    def start(self):
+        if not self._thread is None:
+            return
+        if not ledger.allow_threads or ledger.get_session_executor() is None:
+            raise RuntimeError("Watching the journal in the background requires the session executor (ledger.allow_threads); call 'poll()' instead")
+
+        self._stopped.clear()
+        self._backend = _create_backend(self._use_inotify, self._stopped)
+        self._backend.watch(self._files)
+        self._thread = threading.Thread(target=self._run, name="ledger.watch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopped.set()
+        if not thread is threading.current_thread():
+            thread.join()
+        self._thread = None
+        self._backend.close()
+        self._backend = None
+
+    def __enter__(self) -> 'JournalWatcher':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _update_files(self, stamps: Dict[str, _FileStamp]):
+        # Stamps are taken before refreshing, so changes made while the journal was being refreshed are noticed by the next check
+        self._files = ledger.session.journal_files()
+        self._stamps = {file_name: stamps[file_name] if file_name in stamps else _get_stamp(file_name) for file_name in self._files}
+        if not self._backend is None:
+            self._backend.watch(self._files)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if not self._backend.wait(self.interval) or self._stopped.is_set():
+                continue
+            if self.delay and isinstance(self._backend, _InotifyBackend):
+                self._stopped.wait(self.delay)
+            try:
+                self.poll()
+            except Exception as error:
+                if not self.on_error is None:
+                    self.on_error(error)
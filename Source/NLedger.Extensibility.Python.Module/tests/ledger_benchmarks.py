@@ -0,0 +1,184 @@
+####################################################################################
+# Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+# Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+# 
+# This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+# Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+# See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+####################################################################################
+
+# NLedger Python Extensibility module benchmarks (ledger)
+# Usage: [path_to_python_executable] ledger_benchmarks.py [benchmark_name ...]
+
+# Benchmarks are not unit tests: they print measured figures to compare alternative implementations
+# and do not assert anything. The module environment is detected by ledger_tests (the latest compiled binaries
+# are used on development environment), so this file should be located next to ledger_tests.py
+
+import sys
+import gc
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from ledger_tests import get_drewr3_dat_filename
+import ledger
+
+# Helper functions
+
+# Returns the average number of bytes allocated per object created by the factory
+def measure_footprint(factory, count: int = 100000) -> float:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        objects = [factory() for _ in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    # The list holding objects is not a part of the footprint
+    return (after - before - sys.getsizeof(objects)) / count
+
+# Returns the best time (in seconds) of several runs of the action
+def measure_time(action, repeat: int = 5) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def print_row(name: str, value: str):
+    print("  {0:<40}{1:>20}".format(name, value))
+
+# Benchmarks
+
+# Per-wrapper memory footprint: slotted wrappers versus wrappers that carry per-instance dictionaries
+# (the layout that was used before the wrapper classes got '__slots__')
+def benchmark_wrapper_footprint():
+    print("Wrapper memory footprint (bytes per wrapper)")
+
+    ledger.session.close_journal_files()
+    jrn = ledger.session.read_journal(get_drewr3_dat_filename())
+    post_origin = jrn[0][0].origin
+    amount_origin = post_origin.Amount
+
+    class DictAmount(ledger.Amount):
+        pass
+
+    class DictPosting(ledger.Posting):
+        pass
+
+    for name, slotted, unslotted in (
+            ("Amount", lambda: ledger.Amount(None, amount_origin), lambda: DictAmount(None, amount_origin)),
+            ("Posting", lambda: ledger.Posting(post_origin), lambda: DictPosting(post_origin))):
+        before = measure_footprint(unslotted)
+        after = measure_footprint(slotted)
+        print_row(name + " (with __dict__)", "{0:.1f}".format(before))
+        print_row(name + " (with __slots__)", "{0:.1f}".format(after))
+
+# Progress of another Python thread while a long report is running: the report either runs on the calling thread
+# (that holds the interpreter lock inside .Net code) or on the session executor thread (see ledger.allow_threads)
+def benchmark_allow_threads():
+    print("Python thread progress during a report (ticks per second)")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        journal_file = os.path.join(temp_dir, "large.dat")
+        with open(journal_file, "w") as file:
+            for i in range(20000):
+                file.write("2020/%02d/%02d Payee %d\n    Expenses:Category%d    $%d.%02d\n    Assets:Checking\n\n" % (i % 12 + 1, i % 28 + 1, i, i % 50, i % 100, i % 97))
+
+        ledger.session.close_journal_files()
+        ledger.session.read_journal(journal_file)
+
+        for allow_threads in (False, True):
+            ledger.allow_threads = allow_threads
+            ticks = 0
+            stop = threading.Event()
+
+            def ticker():
+                nonlocal ticks
+                while not stop.is_set():
+                    ticks += 1
+                    time.sleep(0.001)
+
+            thread = threading.Thread(target=ticker)
+            thread.start()
+            start = time.perf_counter()
+            ledger.execute_command("reg")
+            elapsed = time.perf_counter() - start
+            stop.set()
+            thread.join()
+
+            print_row("allow_threads=%s (report, sec)" % allow_threads, "{0:.2f}".format(elapsed))
+            print_row("allow_threads=%s (ticks/sec)" % allow_threads, "{0:.0f}".format(ticks / elapsed))
+
+        ledger.allow_threads = True
+        ledger.session.close_journal_files()
+
+# Overhead of a Python function that a ledger expression calls once per posting (arguments and the result
+# are converted by the session's converter table): the same report with and without the function
+def benchmark_functor_calls():
+    print("Python function called once per posting")
+
+    posts_count = 20000
+    with tempfile.TemporaryDirectory() as temp_dir:
+        journal_file = os.path.join(temp_dir, "functor.dat")
+        with open(journal_file, "w") as file:
+            file.write("python\n    def post_amount(post, amount):\n        return amount\n\n")
+            for i in range(posts_count // 2):
+                file.write("2020/%02d/%02d Payee %d\n    Expenses:Category%d    $%d.%02d\n    Assets:Checking\n\n" % (i % 12 + 1, i % 28 + 1, i, i % 50, i % 100, i % 97))
+
+        ledger.session.close_journal_files()
+        ledger.session.read_journal(journal_file)
+
+        plain = measure_time(lambda: ledger.execute_command(["reg", "--amount", "amount"]), 3)
+        python = measure_time(lambda: ledger.execute_command(["reg", "--amount", "post_amount(post, amount)"]), 3)
+
+        print_row("reg (expression, sec)", "{0:.2f}".format(plain))
+        print_row("reg (Python function, sec)", "{0:.2f}".format(python))
+        print_row("per call overhead (usec)", "{0:.1f}".format((python - plain) * 1000000 / posts_count))
+
+        ledger.session.close_journal_files()
+
+# Reading a journal that includes many plain files: sequential reading versus parsing the included files
+# on worker threads while the main file is parsed (see ledger.parallel_read); the gain depends on the number of cores
+def benchmark_parallel_read():
+    files_count = 100
+    xacts_count = 200
+    print("Reading a journal with %d included files (sec, %d cores)" % (files_count, os.cpu_count()))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        journal_file = os.path.join(temp_dir, "main.dat")
+        with open(journal_file, "w") as main_file:
+            for f in range(files_count):
+                file_name = "part%03d.dat" % f
+                main_file.write("include %s\n" % file_name)
+                with open(os.path.join(temp_dir, file_name), "w") as file:
+                    for i in range(xacts_count):
+                        file.write("2020/%02d/%02d Payee %d\n    Expenses:Category%d    $%d.%02d\n    Assets:Checking\n\n" % (i % 12 + 1, i % 28 + 1, i, i % 50, i % 100, i % 97))
+
+        def read_journal():
+            ledger.session.close_journal_files()
+            ledger.session.read_journal(journal_file)
+
+        for parallel_read in (False, True):
+            ledger.parallel_read = parallel_read
+            print_row("parallel_read=%s" % parallel_read, "{0:.2f}".format(measure_time(read_journal, 3)))
+
+        ledger.parallel_read = False
+        ledger.session.close_journal_files()
+
+benchmarks = {
+    "wrapper_footprint": benchmark_wrapper_footprint,
+    "allow_threads": benchmark_allow_threads,
+    "functor_calls": benchmark_functor_calls,
+    "parallel_read": benchmark_parallel_read,
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(benchmarks.keys())
+    for name in names:
+        benchmarks[name]()
@@ -21,6 +21,15 @@ import os.path
 import sys
 import re
 import collections
+import types
+import tempfile
+import asyncio
+import threading
+import time
+import json
+import urllib.request
+import urllib.error
+from decimal import Decimal
 
 # Find path to the latest NLedger.Extensibility.Python.dll on development environment. 
 # It returns path to either debug or release binaries depending what was built later.
@@ -61,6 +70,10 @@ if nledger_dll_path:
     sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'src'))
 
 import ledger
+import ledger.server
+import ledger.aio
+import ledger.parallel
+import ledger.watch
 from ledger import Amount, Position, TransactionBase, Value
 print("Module ledger is properly imported")
 print("Path to NLedger Python dll: " + ledger.nledger_extensibility_python_dll_path)
@@ -68,7 +81,11 @@ print("Path to NLedger Python dll: " + ledger.nledger_extensibility_python_dll_p
 from datetime import datetime
 from datetime import date
 from System import DateTime
+from System import Func as NetFunc
+from System import Object as NetObject
 from NLedger.Utility import Date
+from NLedger.Times import TimesCommon
+from NLedger.Scopus import Session as OriginSession
 
 # Test classes
 
@@ -186,6 +203,71 @@ class LedgerModuleTests(unittest.TestCase):
         self.assertTrue(cmd_output)     # contains some text
         self.assertFalse(cmd_error)     # empty string
 
+    def test_execute_command_iter(self):
+        ledger.session.close_journal_files()
+        filename = get_drewr3_dat_filename()
+        jrn = ledger.read_journal(filename)
+
+        expected = ledger.execute_command("reg ^Expenses").Output
+        lines = list(ledger.execute_command_iter("reg ^Expenses"))
+        self.assertTrue(len(lines) > 1)
+        self.assertTrue(all(line.endswith("\n") for line in lines))
+        self.assertEqual(expected, "".join(lines))
+
+        self.assertEqual(expected, "".join(ledger.execute_command_iter(["reg", "^Expenses"], False, 1)))
+
+        with self.assertRaises(Exception) as cm:
+            list(ledger.execute_command_iter("unknown-command"))
+        self.assertTrue("Error:" in str(cm.exception))
+
+    def test_execute_command_iter_can_be_closed(self):
+        ledger.session.close_journal_files()
+        filename = get_drewr3_dat_filename()
+        jrn = ledger.read_journal(filename)
+
+        lines = ledger.execute_command_iter("reg", capacity=1)
+        self.assertTrue(next(lines))
+        lines.close()
+
+        self.assertFalse(ledger.execute_command("bal ^Expenses").Error)
+
+    def test_execute_commands(self):
+        ledger.session.close_journal_files()
+        filename = get_drewr3_dat_filename()
+        jrn = ledger.read_journal(filename)
+
+        results = ledger.execute_commands(["bal ^Expenses", ["reg", "^Expenses"], "unknown-command"])
+        self.assertEqual(3, len(results))
+        self.assertEqual(ledger.execute_command("bal ^Expenses").Output, results[0].Output)
+        self.assertEqual(ledger.execute_command(["reg", "^Expenses"]).Output, results[1].Output)
+        self.assertFalse(results[0].Error)
+        self.assertTrue("Error:" in results[2].Error)
+        self.assertTrue(all(r.ExecutionTime.TotalSeconds > 0 for r in results))
+
+    def test_execute_rows(self):
+        ledger.session.close_journal_files()
+        filename = get_drewr3_dat_filename()
+        jrn = ledger.read_journal(filename)
+
+        rows = ledger.execute_rows("bal ^Expenses --flat")
+        self.assertTrue(len(rows) > 1)
+        for account, total in rows:
+            self.assertTrue(account.startswith("Expenses:"))
+            self.assertIsInstance(total, ledger.Balance)
+        self.assertEqual("Expenses:Books", rows[1][0])
+        self.assertEqual(ledger.Balance("$20.00"), rows[1][1])
+
+        rows = ledger.execute_rows(["reg", "^Expenses:Books"])
+        self.assertEqual(1, len(rows))
+        self.assertEqual((date(2011, 1, 27), "Book Store", "Expenses:Books"), rows[0][0:3])
+        self.assertIsInstance(rows[0][3], ledger.Amount)
+        self.assertEqual(ledger.Amount("$20.00"), rows[0][3])
+        self.assertEqual(ledger.Balance("$20.00"), rows[0][4])
+
+        with self.assertRaises(Exception) as cm:
+            ledger.execute_rows("print")
+        self.assertTrue("Error:" in str(cm.exception))
+
     def test_session_read_journal(self):
         ledger.session.close_journal_files()
         filename = get_drewr3_dat_filename()
@@ -386,6 +468,140 @@ class ValueListTests(unittest.TestCase):
         self.assertEqual(20, vlist[1].to_long())
         self.assertEqual(30, vlist[2].to_long())
 
+    def test_valuelist_iter_returns_generator(self):
+        vlist = ledger.ValueList((ledger.Value(10), ledger.Value(20)))
+        it = iter(vlist)
+        self.assertIsInstance(it, types.GeneratorType)
+        self.assertEqual(10, next(it).to_long())
+        self.assertEqual(20, next(it).to_long())
+        self.assertRaises(StopIteration, next, it)
+
+    def test_valuelist_iter_wraps_items_lazily(self):
+        wrapped = []
+
+        class TrackingValueList(ledger.ValueList):
+            def to_pitem(self, item):
+                wrapped.append(item)
+                return super().to_pitem(item)
+
+        vlist = TrackingValueList((ledger.Value(10), ledger.Value(20), ledger.Value(30)))
+        for val in vlist:
+            if val.to_long() == 20:
+                break
+        self.assertEqual(2, len(wrapped))
+
+# Wrappers
+
+class OriginKeeperTests(unittest.TestCase):
+
+    def test_originkeeper_wrappers_have_no_dict(self):
+        ledger.session.close_journal_files()
+        jrn = ledger.session.read_journal_from_string("2009/11/01 Panera Bread\n    Expenses:Food    $4.50\n    Assets:Checking\n")
+        xact = jrn[0]
+        post = xact[0]
+        for wrapper in (jrn, xact, post, post.account, post.amount, post.amount.commodity, ledger.Balance(post.amount), ledger.Value(10), ledger.Mask("abc")):
+            self.assertFalse(hasattr(wrapper, '__dict__'), type(wrapper).__name__)
+
+    def test_originkeeper_wrappers_reject_unknown_attributes(self):
+        amount = ledger.Amount(10)
+        with self.assertRaises(AttributeError):
+            amount.unknown_attribute = 1
+
+    def test_originkeeper_wrappers_support_weak_references(self):
+        import weakref
+        amount = ledger.Amount(10)
+        self.assertIs(amount, weakref.ref(amount)())
+
+# Caches
+
+class LruCacheTests(unittest.TestCase):
+
+    def test_lrucache_get_put(self):
+        cache = ledger.LruCache(2)
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", 1)
+        self.assertEqual(1, cache.get("a"))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(1, cache.misses)
+        self.assertEqual(0, cache.evictions)
+
+    def test_lrucache_evicts_least_recently_used(self):
+        cache = ledger.LruCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertTrue("a" in cache)
+        self.assertFalse("b" in cache)
+        self.assertTrue("c" in cache)
+        self.assertEqual(1, cache.evictions)
+
+    def test_lrucache_zero_size_disables_caching(self):
+        cache = ledger.LruCache(0)
+        cache.put("a", 1)
+        self.assertEqual(0, len(cache))
+        self.assertIsNone(cache.get("a"))
+
+    def test_lrucache_max_size_shrinks_cache(self):
+        cache = ledger.LruCache(3)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.put("c", 3)
+        cache.max_size = 1
+        self.assertEqual(1, len(cache))
+        self.assertTrue("c" in cache)
+
+    def test_lrucache_clear_and_stats(self):
+        cache = ledger.LruCache(3)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.clear()
+        self.assertEqual({"size": 0, "max_size": 3, "hits": 1, "misses": 0, "evictions": 0}, cache.stats())
+        cache.reset_stats()
+        self.assertEqual(0, cache.hits)
+
+class WrapperCacheTests(unittest.TestCase):
+
+    def tearDown(self):
+        ledger.wrapper_cache.max_size = 0
+        ledger.wrapper_cache.reset_stats()
+
+    def test_wrappercache_is_disabled_by_default(self):
+        jrn = ledger.Journal()
+        acc = jrn.find_account("Assets:Cash")
+        self.assertIsNot(acc.parent, acc.parent)
+        self.assertEqual(0, len(ledger.wrapper_cache))
+
+    def test_wrappercache_reuses_wrappers(self):
+        ledger.wrapper_cache.max_size = 100
+        jrn = ledger.Journal()
+        acc = jrn.find_account("Assets:Cash")
+        parent = acc.parent
+        self.assertIs(parent, acc.parent)
+        self.assertIs(ledger.commodities.find_or_create("WRC"), ledger.commodities.find_or_create("WRC"))
+        self.assertTrue(ledger.wrapper_cache.hits >= 2)
+
+    def test_wrappercache_distinguishes_origins(self):
+        ledger.wrapper_cache.max_size = 100
+        jrn = ledger.Journal()
+        self.assertIsNot(jrn.find_account("Assets:Cash"), jrn.find_account("Assets:Bank"))
+        self.assertEqual("Assets:Bank", jrn.find_account("Assets:Bank").fullname())
+
+    def test_wrappercache_does_not_keep_wrappers_alive(self):
+        ledger.wrapper_cache.max_size = 100
+        jrn = ledger.Journal()
+        jrn.find_account("Assets:Cash")
+        ledger.wrapper_cache.reset_stats()
+        jrn.find_account("Assets:Cash")
+        self.assertEqual(1, ledger.wrapper_cache.misses)
+
+    def test_wrappercache_evicts_wrappers(self):
+        ledger.wrapper_cache.max_size = 2
+        jrn = ledger.Journal()
+        accounts = [jrn.find_account("Assets:Acc" + str(i)) for i in range(5)]
+        self.assertEqual(2, len(ledger.wrapper_cache))
+        self.assertTrue(ledger.wrapper_cache.evictions >= 3)
+
 # Expressions
 
 class ExprTests(unittest.TestCase):
@@ -449,6 +665,54 @@ class ExprTests(unittest.TestCase):
         expr = ledger.Expr("2")
         self.assertTrue(expr.is_constant())
 
+    def test_expr_call_uses_compiled_expr_cache(self):
+        ledger.expr_cache.clear()
+        ledger.expr_cache.reset_stats()
+
+        ledger.session.close_journal_files()
+        jrn = ledger.session.read_journal_from_string("2009/11/01 Panera Bread\n    Expenses:Food    $4.50\n    Assets:Checking\n")
+        posts = list(jrn[0])
+
+        self.assertEqual(ledger.Amount("$4.50"), ledger.Expr("amount")(posts[0]).to_amount())
+        self.assertEqual(ledger.Amount("$-4.50"), ledger.Expr("amount")(posts[1]).to_amount())
+        self.assertEqual(1, ledger.expr_cache.misses)
+        self.assertEqual(1, ledger.expr_cache.hits)
+
+        self.assertEqual("Panera Bread", ledger.Expr("payee")(posts[0]).to_string())
+        self.assertEqual("Panera Bread", ledger.Expr("payee")(jrn[0]).to_string())
+        self.assertEqual(3, ledger.expr_cache.misses)
+        self.assertEqual(3, len(ledger.expr_cache))
+
+    def test_expr_call_does_not_share_compiled_exprs_between_sessions(self):
+        ledger.expr_cache.clear()
+        ledger.expr_cache.reset_stats()
+
+        ledger.session.close_journal_files()
+        jrn = ledger.session.read_journal_from_string("2009/11/01 Panera Bread\n    Expenses:Food    $4.50\n    Assets:Checking\n")
+        post = list(jrn[0])[0]
+
+        current_session = ledger.session
+        try:
+            for session in [current_session, ledger.Session(OriginSession()), current_session]:
+                ledger.session = session
+                self.assertEqual(ledger.Amount("$4.50"), ledger.Expr("amount")(post).to_amount())
+        finally:
+            ledger.session = current_session
+
+        self.assertEqual(2, ledger.expr_cache.misses)
+        self.assertEqual(1, ledger.expr_cache.hits)
+        self.assertEqual(2, len(ledger.expr_cache))
+
+    def test_expr_call_does_not_cache_changed_expr(self):
+        ledger.expr_cache.clear()
+        ledger.expr_cache.reset_stats()
+
+        expr = ledger.Expr("2+2")
+        expr.set_text("2+3")
+        self.assertEqual("2+3", expr.text())
+        expr(ledger.Posting())
+        self.assertEqual(0, len(ledger.expr_cache))
+
 # Commodities
 
 class CommodityPoolTests(unittest.TestCase):
@@ -1786,6 +2050,22 @@ class AccountTests(unittest.TestCase):
         acnt1.add_account(acnt2)
         self.assertEqual(acnt2.origin, acnt1[0].origin)
 
+    def test_account_getitem_after_origin_changes(self):
+
+        acnt1 = ledger.Account(None, "account 1")
+        acnt2 = ledger.Account(acnt1, "account 2")
+        acnt3 = ledger.Account(acnt1, "account 3")
+        acnt1.add_account(acnt2)
+        self.assertEqual(acnt2.origin, acnt1[0].origin)
+
+        # The number of children is not changed, so the cached copy is used until it is invalidated
+        acnt1.origin.RemoveAccount(acnt2.origin)
+        acnt1.origin.AddAccount(acnt3.origin)
+        self.assertEqual(acnt2.origin, acnt1[0].origin)
+
+        acnt1.invalidate_list_view()
+        self.assertEqual(acnt3.origin, acnt1[0].origin)
+
     def test_account_iter(self):
 
         acnt1 = ledger.Account(None, "account 1")
@@ -2215,6 +2495,28 @@ class MaskTests(unittest.TestCase):
         mask = ledger.Mask("pattern")
         self.assertEqual("pattern", str(mask))
 
+    def test_mask_constructor_interns_patterns(self):
+        ledger.mask_cache.clear()
+        ledger.mask_cache.reset_stats()
+        mask1 = ledger.Mask("interned")
+        mask2 = ledger.Mask("interned")
+        self.assertTrue(ledger.NetObject.ReferenceEquals(mask1.origin, mask2.origin))
+        self.assertEqual(1, ledger.mask_cache.misses)
+        self.assertEqual(1, ledger.mask_cache.hits)
+
+    def test_mask_cache_evicts_masks(self):
+        cache = ledger.MaskCache(1)
+        mask = cache.get_mask("first")
+        cache.get_mask("second")
+        self.assertEqual(1, cache.evictions)
+        self.assertFalse(ledger.NetObject.ReferenceEquals(mask, cache.get_mask("first")))
+
+    def test_mask_to_omask(self):
+        mask = ledger.Mask("pattern")
+        self.assertIs(mask.origin, ledger.Mask.to_omask(mask))
+        self.assertEqual("pattern", ledger.Mask.to_omask("pattern").Str())
+        self.assertRaises(Exception, ledger.Mask.to_omask, 1)
+
 class ValueTests(unittest.TestCase):
 
     def test_value_constructor_takes_bool(self):
@@ -3082,6 +3384,19 @@ class TransactionBaseTests(unittest.TestCase):
         self.assertEqual(post, tbase[0])
         self.assertIsInstance(tbase[0], ledger.Posting)
 
+    def test_transactionbase_getitem_follows_mutations(self):
+        tbase = ledger.TransactionBase(ledger.OriginXact())
+        post1 = ledger.Posting()
+        post2 = ledger.Posting()
+
+        tbase.add_post(post1)
+        self.assertEqual(post1, tbase[0])
+        tbase.add_post(post2)
+        self.assertEqual(post2, tbase[1])
+        tbase.remove_post(post1)
+        self.assertEqual(post2, tbase[0])
+        self.assertEqual(1, len(tbase))
+
     def test_transactionbase_add_post(self):
         tbase = ledger.TransactionBase(ledger.OriginXact())
         tbase.add_post(ledger.Posting())
@@ -4438,6 +4753,16 @@ class JournalItemTests(unittest.TestCase):
         self.assertTrue(item.has_tag(ledger.Mask("tag-2"), ledger.Mask("some-value")))
         self.assertFalse(item.has_tag(ledger.Mask("tag-2"), ledger.Mask("unknown-value")))
 
+    def test_journalitem_has_tag_takes_patterns(self):
+
+        item = ledger.JournalItem(ledger.OriginPost())
+        item.set_tag("tag-2", ledger.string_value("some-value"))
+
+        self.assertTrue(item.has_tag("tag-.", "some-value"))
+        self.assertFalse(item.has_tag("tag-.", "unknown-value"))
+        self.assertTrue(item.has_tag(ledger.Mask("tag-2"), "some"))
+        self.assertFalse(item.has_tag("tag-1", ledger.Mask("some-value")))
+
     def test_journalitem_get_tag(self):
 
         item = ledger.JournalItem(ledger.OriginPost())
@@ -4451,6 +4776,15 @@ class JournalItemTests(unittest.TestCase):
         self.assertEqual("some-value", str(item.get_tag(ledger.Mask("tag-2"), ledger.Mask("some-value"))))
         self.assertFalse(bool(item.get_tag(ledger.Mask("tag-2"), ledger.Mask("unknown-value"))))
 
+    def test_journalitem_get_tag_takes_patterns(self):
+
+        item = ledger.JournalItem(ledger.OriginPost())
+        item.set_tag("tag-2", ledger.string_value("some-value"))
+
+        self.assertEqual("some-value", str(item.get_tag("tag-.", "some-value")))
+        self.assertEqual("some-value", str(item.get_tag(ledger.Mask("tag-2"), "some")))
+        self.assertFalse(bool(item.get_tag("tag-.", "unknown-value")))
+
     def test_journalitem_tag(self):
 
         item = ledger.JournalItem(ledger.OriginPost())
@@ -4610,6 +4944,97 @@ class SessionTests(unittest.TestCase):
         jrn = ledger.session.read_journal(filename)
         self.assertIsInstance(jrn, ledger.Journal)
 
+    def test_session_calls_with_allow_threads(self):
+        filename = get_drewr3_dat_filename()
+        try:
+            results = []
+            for allow_threads in (False, True):
+                ledger.allow_threads = allow_threads
+                ledger.session.close_journal_files()
+                jrn = ledger.session.read_journal(filename)
+                results.append((len(jrn), ledger.execute_command("reg").Output, len(jrn.query("^Expenses")),
+                                [result.Output for result in ledger.execute_commands(["bal", "reg"])], [tuple(str(value) for value in row) for row in ledger.execute_rows("reg ^Expenses")]))
+                with self.assertRaises(Exception):
+                    ledger.session.read_journal("unknown-file.dat")
+            self.assertEqual(results[0], results[1])
+        finally:
+            ledger.allow_threads = True
+
+    def test_session_calls_raise_for_canceled_operations(self):
+        def submit(executor, completed):
+            blocker = threading.Event()
+            executor.Submit(NetFunc[NetObject](lambda: blocker.wait()))    # keeps the next operation in the queue until it is canceled
+            operation = executor.Submit(NetFunc[NetObject](lambda: "result"), completed)
+            operation.Cancel()
+            blocker.set()
+            return operation
+
+        with self.assertRaises(Exception) as context:
+            ledger.run_session_call(None, submit, lambda: "result")
+        self.assertEqual("Operation is canceled", str(context.exception))
+
+    def test_session_calls_keep_other_threads_running(self):
+        ledger.session.close_journal_files()
+        ledger.session.read_journal(get_drewr3_dat_filename())
+        self.assertTrue(ledger.get_session_executor().Session.Equals(ledger.session.origin))
+
+        ticks = []
+        stop = threading.Event()
+
+        def ticker():
+            while not stop.is_set():
+                ticks.append(1)
+                time.sleep(0.001)
+
+        thread = threading.Thread(target=ticker)
+        thread.start()
+        for i in range(20):
+            self.assertFalse(ledger.execute_command("reg").Error)
+        stop.set()
+        thread.join()
+        self.assertTrue(len(ticks) > 0)
+
+    def test_session_read_journal_with_snapshot(self):
+        filename = get_drewr3_dat_filename()
+        ledger.session.close_journal_files()
+        expected = [(xact.payee, str(xact.posts()[0].amount)) for xact in ledger.session.read_journal(filename).xacts()]
+
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            ledger.session.close_journal_files()
+            jrn = ledger.session.read_journal(filename, snapshot_dir)
+            self.assertEqual(expected, [(xact.payee, str(xact.posts()[0].amount)) for xact in jrn.xacts()])
+            self.assertEqual(1, len(os.listdir(snapshot_dir)))
+
+            # The second reading loads the snapshot
+            ledger.session.close_journal_files()
+            jrn = ledger.session.read_journal(filename, snapshot_dir)
+            self.assertEqual(expected, [(xact.payee, str(xact.posts()[0].amount)) for xact in jrn.xacts()])
+
+        ledger.session.close_journal_files()
+
+    def test_session_read_journal_with_parallel_read(self):
+        with tempfile.TemporaryDirectory() as folder:
+            files = {
+                "main.dat": "include 2010.dat\n\n2010/06/01 Employer\n    Assets:Checking  $2,000.00\n    Income:Salary\n\ninclude 2011.dat\n",
+                "2010.dat": "2010/01/01 Opening balance\n    Assets:Checking  $1,000.00\n    Equity:Opening Balances\n",
+                "2011.dat": "2011/01/15 Grocery\n    Expenses:Food  $45.20\n    Assets:Checking\n" }
+            for name, content in files.items():
+                with open(os.path.join(folder, name), "w") as f:
+                    f.write(content)
+
+            try:
+                results = []
+                for parallel_read in (False, True):
+                    ledger.parallel_read = parallel_read
+                    ledger.session.close_journal_files()
+                    jrn = ledger.session.read_journal(os.path.join(folder, "main.dat"))
+                    results.append(([(xact.payee, xact.pos.pathname, xact.pos.beg_line) for xact in jrn.xacts()], [str(source.filename) for source in jrn.sources()]))
+                self.assertEqual(["Opening balance", "Employer", "Grocery"], [payee for payee, pathname, line in results[1][0]])
+                self.assertEqual(results[0], results[1])
+            finally:
+                ledger.parallel_read = False
+                ledger.session.close_journal_files()
+
     def test_session_journal(self):
         jrn = ledger.session.journal()
         self.assertIsInstance(jrn, ledger.Journal)
@@ -4817,6 +5242,63 @@ class JournalTests(unittest.TestCase):
 
         self.assertIsInstance(jrn[0], ledger.Transaction)
 
+    def test_journal_getitem_reuses_list_view(self):
+        ledger.session.close_journal_files()
+        jrn = ledger.session.read_journal(get_drewr3_dat_filename())
+
+        view = jrn.get_list_view(ledger.NetListAdapter.GetXactsView, len(jrn))
+        for i in range(len(jrn)):
+            self.assertIsInstance(jrn[i], ledger.Transaction)
+        self.assertIs(view, jrn.get_list_view(ledger.NetListAdapter.GetXactsView, len(jrn)))
+
+    def test_journal_getitem_follows_add_xact(self):
+        jrn = ledger.Journal()
+        self.assertEqual(0, len(jrn))
+        view = jrn.get_list_view(ledger.NetListAdapter.GetXactsView, len(jrn))
+
+        xact = ledger.Transaction();
+        post = ledger.Posting()
+        post.amount = ledger.Amount("22 JAX")
+        post.account = jrn.find_account("source")
+        xact.add_post(post)
+        post = ledger.Posting()
+        post.amount = ledger.Amount("-22 JAX")
+        post.account = jrn.find_account("destination")
+        xact.add_post(post)
+        jrn.add_xact(xact)
+
+        self.assertEqual(1, len(jrn))
+        self.assertEqual(xact, jrn[0])
+        self.assertIsNot(view, jrn.get_list_view(ledger.NetListAdapter.GetXactsView, len(jrn)))
+
+        jrn.remove_xact(xact)
+        self.assertEqual(0, len(jrn))
+
+    def test_journal_getitem_follows_changes_through_other_wrappers(self):
+        jrn = ledger.Journal()
+
+        def create_xact(quantity: int) -> ledger.Transaction:
+            xact = ledger.Transaction()
+            for amount, account in ((quantity, "source"), (-quantity, "destination")):
+                post = ledger.Posting()
+                post.amount = ledger.Amount("%d JAX" % amount)
+                post.account = jrn.find_account(account)
+                xact.add_post(post)
+            return xact
+
+        xact1 = create_xact(10)
+        xact2 = create_xact(20)
+        self.assertTrue(jrn.add_xact(xact1))
+        self.assertEqual(xact1, jrn[0])
+
+        # The journal view is not a copy, so replacing a transaction without changing their number is visible too
+        other = ledger.Journal(jrn.origin)
+        self.assertTrue(other.remove_xact(xact1))
+        self.assertTrue(other.add_xact(xact2))
+
+        self.assertEqual(1, len(jrn))
+        self.assertEqual(xact2, jrn[0])
+
     def test_journal_iter(self):
         ledger.session.close_journal_files()
         jrn = ledger.session.read_journal(get_drewr3_dat_filename())
@@ -4870,11 +5352,646 @@ class JournalTests(unittest.TestCase):
         for post in jrn.query("^expenses:"):
             self.assertIsInstance(post, ledger.Posting)
 
+    def test_journal_query_uses_query_cache(self):
+        ledger.session.close_journal_files()
+        jrn = ledger.session.read_journal(get_drewr3_dat_filename())
+        ledger.query_cache.reset_stats()
+
+        posts1 = jrn.query("^expenses:")
+        posts2 = jrn.query("  ^expenses:  ")
+        self.assertEqual(1, ledger.query_cache.misses)
+        self.assertEqual(1, ledger.query_cache.hits)
+        self.assertEqual(list(posts1), list(posts2))
+
+        del posts2[0]
+        self.assertEqual(len(posts1), len(jrn.query("^expenses:")))
+
+    def test_journal_query_cache_keeps_spaces_in_patterns(self):
+        ledger.session.close_journal_files()
+        jrn = ledger.session.read_journal_from_string("2009/11/01 Shop A\n    Expenses:Food    $4.50\n    Assets:Checking\n")
+
+        self.assertEqual(2, len(jrn.query("payee 'Shop A'")))
+        self.assertEqual(0, len(jrn.query("payee 'Shop  A'")))
+
+    def test_journal_query_cache_is_invalidated_by_changes(self):
+        ledger.session.close_journal_files()
+        jrn = ledger.session.read_journal_from_string("2009/11/01 Panera Bread\n    Expenses:Food    $4.50\n    Assets:Checking\n")
+        self.assertEqual(1, len(jrn.query("food")))
+
+        xact = ledger.Transaction()
+        post = ledger.Posting()
+        post.amount = ledger.Amount("$1")
+        post.account = jrn.find_account("Expenses:Food")
+        xact.add_post(post)
+        post = ledger.Posting()
+        post.amount = ledger.Amount("$-1")
+        post.account = jrn.find_account("Assets:Checking")
+        xact.add_post(post)
+        jrn.add_xact(xact)
+        jrn.clear_xdata()       # finalizing the transaction marks its postings as visited
+        self.assertEqual(2, len(jrn.query("food")))
+
+        jrn.remove_xact(xact)
+        self.assertEqual(1, len(jrn.query("food")))
+
+        ledger.session.close_journal_files()
+        jrn = ledger.session.read_journal_from_string("2009/11/01 Bookstore\n    Expenses:Books    $4.50\n    Assets:Checking\n")
+        self.assertEqual(0, len(jrn.query("food")))
+
+    def test_journal_query_cache_is_invalidated_by_changes_of_journal_xacts(self):
+        ledger.session.close_journal_files()
+        jrn = ledger.session.read_journal_from_string("2009/11/01 Panera Bread\n    Expenses:Food    $4.50\n    Assets:Checking\n")
+        jrn.query("food")
+        count = len(ledger.query_cache)
+
+        xact = ledger.Transaction()
+        post = ledger.Posting()
+        post.amount = ledger.Amount("$1")
+        post.account = jrn.find_account("Expenses:Food")
+        xact.add_post(post)
+        self.assertEqual(count, len(ledger.query_cache))    # the transaction does not belong to the journal
+
+        post = jrn[0].posts()[0]
+        jrn[0].remove_post(post)
+        self.assertEqual(count - 1, len(ledger.query_cache))
+        self.assertEqual(0, len(jrn.query("food")))
+
+        jrn[0].add_post(post)
+        self.assertEqual(count - 1, len(ledger.query_cache))
+        self.assertEqual(1, len(jrn.query("food")))
+
+    def test_journal_query_cache_checks_current_date(self):
+        ledger.session.close_journal_files()
+        jrn = ledger.session.read_journal_from_string("2009/11/01 Panera Bread\n    Expenses:Food    $4.50\n    Assets:Checking\n\n" +
+            "2009/12/01 Bookstore\n    Expenses:Books    $20.00\n    Assets:Checking\n")
+        try:
+            TimesCommon.Current.Epoch = DateTime(2009, 11, 15)
+            self.assertEqual(["Panera Bread"], [post.xact.payee for post in jrn.query("-p 'this month' expenses")])
+            TimesCommon.Current.Epoch = DateTime(2009, 12, 15)
+            self.assertEqual(["Bookstore"], [post.xact.payee for post in jrn.query("-p 'this month' expenses")])
+        finally:
+            TimesCommon.Current.Epoch = None
+
+    def test_journal_clear_query_cache(self):
+        ledger.session.close_journal_files()
+        jrn = ledger.session.read_journal(get_drewr3_dat_filename())
+        count = len(ledger.query_cache)
+        jrn.query("^expenses:")
+        self.assertEqual(count + 1, len(ledger.query_cache))
+        jrn.clear_query_cache()
+        self.assertEqual(count, len(ledger.query_cache))
+
+    def test_journal_query_iter_stops_on_break(self):
+        ledger.session.close_journal_files()
+        jrn = ledger.session.read_journal(get_drewr3_dat_filename())
+        posts = iter(jrn.query("^expenses:"))
+        self.assertIsInstance(posts, types.GeneratorType)
+        self.assertIsInstance(next(posts), ledger.Posting)
+        posts.close()
+        self.assertRaises(StopIteration, next, posts)
+
+    def test_journal_to_columns(self):
+        ledger.session.close_journal_files()
+        jrn = ledger.session.read_journal_from_string("2009/11/01 * Panera Bread\n    Expenses:Food    $4.50\n    Assets:Checking\n\n2009/11/02 Bookstore\n    Expenses:Books    10 EUR\n    Assets:Checking\n")
+        cols = jrn.to_columns()
+
+        self.assertEqual(4, len(cols))
+        self.assertEqual(["Expenses:Food", "Assets:Checking", "Expenses:Books"], cols.accounts)
+        self.assertEqual([0, 1, 2, 1], list(cols.account_ids))
+        self.assertEqual(["$", "EUR"], cols.commodities)
+        self.assertEqual([0, 0, 1, 1], list(cols.commodity_ids))
+        self.assertEqual(["Panera Bread", "Bookstore"], cols.payees)
+        self.assertEqual([0, 0, 1, 1], list(cols.payee_ids))
+        self.assertEqual([4.5, -4.5, 10, -10], [float(q) for q in cols.quantities])
+        self.assertEqual([ledger.State.Cleared.value, ledger.State.Cleared.value, ledger.State.Uncleared.value, ledger.State.Uncleared.value], list(cols.states))
+        self.assertEqual(4, len(cols.dates))
+        self.assertEqual(4, len(cols.xact_seqs))
+
+    def test_journal_to_columns_with_query(self):
+        ledger.session.close_journal_files()
+        jrn = ledger.session.read_journal(get_drewr3_dat_filename())
+        cols = jrn.to_columns("^expenses:")
+
+        self.assertEqual(len(list(jrn.query("^expenses:"))), len(cols))
+        self.assertTrue(all(cols.accounts[i].startswith("Expenses:") for i in cols.account_ids))
+
+    def test_journal_query_to_columns(self):
+        ledger.session.close_journal_files()
+        jrn = ledger.session.read_journal_from_string("2009/11/01 Exchange\n    Assets:Broker    1,000.123456789 ABC\n    Assets:Checking\n")
+        cols = jrn.query("^assets:broker").to_columns()
+
+        self.assertEqual(1, len(cols))
+        self.assertEqual(["Assets:Broker"], cols.accounts)
+        self.assertEqual([Decimal("1000.123456789")], cols.exact_quantities)
+        self.assertEqual(["ABC"], cols.commodities)
+
+    @unittest.skipIf(ledger.pandas is None, "pandas is not installed")
+    def test_journal_query_to_frame(self):
+        ledger.session.close_journal_files()
+        jrn = ledger.session.read_journal(get_drewr3_dat_filename())
+        frame = jrn.query("^expenses:").to_frame()
+
+        self.assertEqual(len(list(jrn.query("^expenses:"))), len(frame))
+        self.assertEqual(["date", "payee", "account", "quantity", "commodity", "state", "xact_seq"], list(frame.columns))
+        self.assertEqual("category", frame["account"].dtype.name)
+        self.assertEqual("category", frame["payee"].dtype.name)
+        self.assertEqual("category", frame["commodity"].dtype.name)
+        self.assertTrue(all(account.startswith("Expenses:") for account in frame["account"]))
+        self.assertTrue(all(isinstance(quantity, Decimal) for quantity in frame["quantity"]))
+        self.assertEqual(Decimal("37.50") * 6, sum(frame[frame["payee"] == "Organic Co-op"]["quantity"]))
+
     def test_journal_valid(self):
         ledger.session.close_journal_files()
         jrn = ledger.session.read_journal(get_drewr3_dat_filename())
         self.assertTrue(jrn.valid())
 
+    def test_journal_refresh(self):
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, "main.dat")
+            with open(file_name, "w") as f:
+                f.write("2010/01/01 Opening balance\n    Assets:Checking  $1,000.00\n    Equity:Opening Balances\n")
+
+            try:
+                ledger.session.close_journal_files()
+                jrn = ledger.session.read_journal(file_name)
+                xact = jrn.xacts()[0]
+                self.assertEqual(ledger.JournalRefreshStatus.NotChanged, jrn.refresh())
+
+                with open(file_name, "a") as f:
+                    f.write("\n2010/01/15 Grocery\n    Expenses:Food  $45.20\n    Assets:Checking\n")
+                self.assertEqual(ledger.JournalRefreshStatus.Appended, jrn.refresh())
+                self.assertEqual(["Opening balance", "Grocery"], [x.payee for x in jrn.xacts()])
+                self.assertEqual(xact, jrn.xacts()[0])
+                self.assertEqual(5, jrn.xacts()[1].pos.beg_line)
+                self.assertEqual(1, len(jrn.query("food")))
+
+                with open(file_name, "w") as f:
+                    f.write("2010/01/20 Bookstore\n    Expenses:Books  $4.50\n    Assets:Checking\n")
+                self.assertEqual(ledger.JournalRefreshStatus.Reloaded, jrn.refresh())
+                self.assertEqual(["Bookstore"], [x.payee for x in jrn.xacts()])
+                self.assertTrue(NetObject.ReferenceEquals(jrn.origin, ledger.session.journal().origin))
+                self.assertEqual(0, len(jrn.query("food")))
+            finally:
+                ledger.session.close_journal_files()
+
+class ServerTests(unittest.TestCase):
+
+    # Sends a request to the server; returns HTTP status and decoded JSON response
+    @staticmethod
+    def send_request(address, path: str, data = None):
+        request = urllib.request.Request("http://%s:%d%s" % (address[0], address[1], path), method="GET" if data is None else "POST",
+            data=None if data is None else json.dumps(data).encode("utf-8"), headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as err:
+            return err.code, json.loads(err.read().decode("utf-8"))
+
+    # Runs requests on a client thread while the current thread (that owns NLedger session) executes them
+    def run_requests(self, server, requests):
+        results = []
+        stop_event = threading.Event()
+
+        def client():
+            try:
+                for path, data in requests:
+                    results.append(ServerTests.send_request(server.address, path, data))
+            finally:
+                stop_event.set()
+
+        server.open()
+        try:
+            threading.Thread(target=client).start()
+            server.serve(stop_event)
+        finally:
+            server.close()
+        return results
+
+    def test_server_command_calls_main(self):
+        calls = []
+        main = ledger.server.main
+        ledger.server.main = lambda *args: calls.append([str(arg) for arg in args]) or 0
+        try:
+            result = ledger.execute_command(["server", "--", "--port", "0", "--verbose"])
+        finally:
+            ledger.server.main = main
+
+        self.assertFalse(result.Error)
+        self.assertEqual([["--port", "0", "--verbose"]], calls)
+
+    def test_server_command_serves_requests(self):
+        ledger.session.close_journal_files()
+        xacts = len(ledger.read_journal(get_drewr3_dat_filename()))
+        results = []
+        serve = ledger.server.LedgerServer.serve
+
+        # The server started by the command serves requests of a client thread and stops once they are handled
+        def serve_requests(server, stop_event = None):
+            stop_event = threading.Event()
+            def client():
+                try:
+                    results.append(ServerTests.send_request(server.address, "/health"))
+                finally:
+                    stop_event.set()
+            threading.Thread(target=client).start()
+            serve(server, stop_event)
+
+        ledger.server.LedgerServer.serve = serve_requests
+        try:
+            result = ledger.execute_command(["server", "--", "--port", "0", "--file", get_drewr3_dat_filename()])
+        finally:
+            ledger.server.LedgerServer.serve = serve
+
+        self.assertFalse(result.Error)
+        self.assertEqual(1, len(results))
+        self.assertEqual(200, results[0][0])
+        self.assertEqual({"status": "ok", "xacts": xacts}, results[0][1])
+
+    def test_server_executes_commands(self):
+        server = ledger.server.LedgerServer(journal_file=get_drewr3_dat_filename(), port=0)
+        server.load_journal()
+        expected = ledger.execute_command("bal ^expenses").Output
+
+        results = self.run_requests(server, [("/command", {"args": "bal ^expenses"}), ("/command", {"args": ["bal", "^expenses"]}), ("/command?args=bal%20^expenses", None)])
+
+        self.assertEqual([(200, {"output": expected, "error": ""})] * 3, results)
+
+    def test_server_returns_command_errors(self):
+        server = ledger.server.LedgerServer(journal_file=get_drewr3_dat_filename(), port=0)
+        server.load_journal()
+
+        results = self.run_requests(server, [("/command", {"args": "unknown-command"}), ("/command", {"args": 10}), ("/unknown", {})])
+
+        self.assertEqual(200, results[0][0])
+        self.assertIn("unknown-command", results[0][1]["error"])
+        self.assertEqual(400, results[1][0])
+        self.assertEqual(404, results[2][0])
+
+    def test_server_executes_queries(self):
+        server = ledger.server.LedgerServer(journal_file=get_drewr3_dat_filename(), port=0)
+        server.load_journal()
+
+        status, result = self.run_requests(server, [("/query", {"query": "^expenses:food"})])[0]
+
+        self.assertEqual(200, status)
+        self.assertEqual(len(list(server.journal.query("^expenses:food"))), result["count"])
+        self.assertTrue(all(post["account"].startswith("Expenses:Food") for post in result["posts"]))
+        self.assertEqual({"date", "payee", "account", "quantity", "commodity", "state", "xact_seq"}, set(result["posts"][0].keys()))
+
+    def test_server_collects_metrics(self):
+        server = ledger.server.LedgerServer(journal_file=get_drewr3_dat_filename(), port=0)
+        server.load_journal()
+
+        results = self.run_requests(server, [("/health", None), ("/command", {"args": "bal"}), ("/command", {"args": "reg"}), ("/metrics", None)])
+
+        self.assertEqual((200, {"status": "ok", "xacts": len(server.journal)}), results[0])
+        metrics = results[3][1]
+        self.assertEqual(2, metrics["endpoints"]["/command"]["count"])
+        self.assertEqual(0, metrics["endpoints"]["/command"]["errors"])
+        self.assertTrue(metrics["endpoints"]["/command"]["max_ms"] >= metrics["endpoints"]["/command"]["p50_ms"])
+        self.assertEqual(0, metrics["pending"])
+
+    def test_request_executor_limits_pending_requests(self):
+        executor = ledger.server.RequestExecutor(max_pending=1)
+        results = []
+
+        client = threading.Thread(target=lambda: results.append(executor.submit(lambda: "done", 5).result))
+        client.start()
+        while executor.pending == 0:
+            time.sleep(0.01)
+
+        with self.assertRaises(ledger.server.ServerBusyError):
+            executor.submit(lambda: "rejected", 5)
+
+        self.assertTrue(executor.run_pending(5))
+        client.join()
+        self.assertEqual(["done"], results)
+        self.assertEqual(0, executor.pending)
+
+    def test_latency_metrics_calculates_percentiles(self):
+        metrics = ledger.server.LatencyMetrics()
+        for i in range(1, 101):
+            metrics.record("/command", i / 1000.0)
+        metrics.reject("/command")
+
+        stats = metrics.to_dict()["endpoints"]["/command"]
+        self.assertEqual(100, stats["count"])
+        self.assertEqual(1, stats["rejected"])
+        self.assertEqual(50.5, stats["avg_ms"])
+        self.assertEqual(100.0, stats["max_ms"])
+        self.assertEqual(51.0, stats["p50_ms"])
+        self.assertEqual(95.0, stats["p95_ms"])
+
+
+class AioTests(unittest.TestCase):
+
+    def setUp(self):
+        ledger.session.close_journal_files()
+        self.aio_session = ledger.aio.AsyncSession()
+
+    def tearDown(self):
+        self.aio_session.close()
+
+    def test_aio_read_journal_and_execute_command(self):
+        async def run():
+            journal = await self.aio_session.read_journal(get_drewr3_dat_filename())
+            result = await self.aio_session.execute_command("bal ^Expenses")
+            return journal, result
+
+        journal, result = asyncio.run(run())
+        self.assertIsInstance(journal, ledger.Journal)
+        self.assertFalse(result.Error)
+        self.assertEqual(ledger.execute_command("bal ^Expenses").Output, result.Output)
+
+    def test_aio_query(self):
+        async def run():
+            await self.aio_session.read_journal(get_drewr3_dat_filename())
+            return await self.aio_session.query("^Expenses:Books")
+
+        posts = asyncio.run(run())
+        self.assertEqual(1, len(posts))
+        self.assertEqual("Expenses:Books", posts[0].account.fullname())
+
+    def test_aio_keeps_event_loop_running(self):
+        async def ticker(stop: asyncio.Event, ticks: list):
+            while not stop.is_set():
+                ticks.append(1)
+                await asyncio.sleep(0.001)
+
+        async def run():
+            await self.aio_session.read_journal(get_drewr3_dat_filename())
+            stop = asyncio.Event()
+            ticks = []
+            task = asyncio.create_task(ticker(stop, ticks))
+            results = await asyncio.gather(*[self.aio_session.execute_command("reg") for i in range(20)])
+            stop.set()
+            await task
+            return results, ticks
+
+        results, ticks = asyncio.run(run())
+        self.assertEqual(20, len(results))
+        self.assertTrue(all(not r.Error for r in results))
+        self.assertTrue(len(ticks) > 1)
+
+    def test_aio_cancels_queued_requests(self):
+        async def run():
+            await self.aio_session.read_journal(get_drewr3_dat_filename())
+            tasks = [asyncio.create_task(self.aio_session.execute_command("reg")) for i in range(10)]
+            await asyncio.sleep(0)
+            tasks[-1].cancel()
+            return await asyncio.gather(*tasks, return_exceptions=True)
+
+        results = asyncio.run(run())
+        self.assertIsInstance(results[-1], asyncio.CancelledError)
+        self.assertTrue(all(not r.Error for r in results[:-1]))
+
+    def test_aio_raises_errors(self):
+        async def run():
+            return await self.aio_session.read_journal("unknown-file.dat")
+
+        with self.assertRaises(Exception) as expected:
+            ledger.read_journal("unknown-file.dat")
+        with self.assertRaises(type(expected.exception)) as context:
+            asyncio.run(run())
+        self.assertEqual(str(expected.exception), str(context.exception))
+
+
+class SessionPoolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ledger.SessionPool(2)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_session_pool_size(self):
+        self.assertEqual(2, self.pool.size)
+        self.assertEqual(0, self.pool.pending)
+
+    def test_session_pool_execute_command(self):
+        self.pool.read_journal(get_drewr3_dat_filename())
+        result = self.pool.execute_command("bal ^Expenses")
+        self.assertFalse(result.Error)
+        ledger.session.close_journal_files()
+        ledger.read_journal(get_drewr3_dat_filename())
+        self.assertEqual(ledger.execute_command("bal ^Expenses").Output, result.Output)
+
+    def test_session_pool_execute_command_from_threads(self):
+        self.pool.read_journal(get_drewr3_dat_filename())
+        expected = self.pool.execute_command("reg").Output
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.pool.execute_command("reg"))) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(8, len(results))
+        self.assertTrue(all(result.Output == expected for result in results))
+
+    def test_session_pool_query(self):
+        self.pool.read_journal(get_drewr3_dat_filename())
+        posts = self.pool.query("^Expenses:Books")
+        self.assertEqual(1, len(posts))
+        self.assertEqual("Expenses:Books", posts[0].account.fullname())
+
+    def test_session_pool_raises_errors(self):
+        with self.assertRaises(Exception) as expected:
+            ledger.read_journal("unknown-file.dat")
+        with self.assertRaises(type(expected.exception)) as context:
+            self.pool.read_journal("unknown-file.dat")
+        self.assertEqual(str(expected.exception), str(context.exception))
+
+
+
+class ParallelTests(unittest.TestCase):
+
+    def test_parallel_run_reports(self):
+        commands = ["bal ^Expenses", ["reg", "^Expenses"], "print"]
+        results = ledger.parallel.run_reports(get_drewr3_dat_filename(), commands, workers=2)
+
+        ledger.session.close_journal_files()
+        ledger.read_journal(get_drewr3_dat_filename())
+        self.assertEqual([ledger.execute_command(command).Output for command in commands], [result.Output for result in results])
+        self.assertTrue(all(not result.Error for result in results))
+
+    def test_parallel_run_reports_returns_errors(self):
+        results = ledger.parallel.run_reports(get_drewr3_dat_filename(), ["bal", "unknown-command"], workers=2)
+        self.assertFalse(results[0].Error)
+        self.assertTrue(results[1].Error)
+
+        results = ledger.parallel.run_reports("unknown-file.dat", ["bal"])
+        self.assertTrue(results[0].Error)
+
+    def test_parallel_run_reports_uses_snapshots(self):
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            results = ledger.parallel.run_reports(get_drewr3_dat_filename(), ["bal", "reg"], workers=2, snapshot_dir=snapshot_dir)
+            self.assertTrue(all(not result.Error for result in results))
+            self.assertEqual(1, len(os.listdir(snapshot_dir)))
+
+    def test_parallel_run_reports_without_commands(self):
+        self.assertEqual([], ledger.parallel.run_reports(get_drewr3_dat_filename(), []))
+
+class WatchTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.folder = tempfile.TemporaryDirectory()
+        self.main_file = os.path.join(self.folder.name, "main.dat")
+        self.food_file = os.path.join(self.folder.name, "food.dat")
+        with open(self.main_file, "w") as f:
+            f.write("2010/01/01 Opening balance\n    Assets:Checking  $1,000.00\n    Equity:Opening Balances\n\ninclude food.dat\n")
+        with open(self.food_file, "w") as f:
+            f.write("2010/01/15 Grocery\n    Expenses:Food  $45.20\n    Assets:Checking\n")
+        ledger.session.close_journal_files()
+        self.journal = ledger.session.read_journal(self.main_file)
+
+    def tearDown(self) -> None:
+        ledger.session.close_journal_files()
+        self.folder.cleanup()
+
+    def test_watch_files(self):
+        watcher = ledger.watch.JournalWatcher(self.journal)
+        self.assertEqual(["main.dat", "food.dat"], [os.path.basename(file_name) for file_name in watcher.files])
+        self.assertFalse(watcher.is_running)
+        self.assertIsNone(watcher.backend)
+
+    def test_watch_poll(self):
+        statuses = []
+        watcher = ledger.watch.JournalWatcher(self.journal, on_refresh=statuses.append)
+        self.assertIsNone(watcher.poll())
+
+        xact = self.journal.xacts()[0]
+        with open(self.food_file, "w") as f:
+            f.write("2010/01/15 Bakery\n    Expenses:Food  $5.00\n    Assets:Checking\n")
+        self.assertEqual(ledger.JournalRefreshStatus.PartiallyReloaded, watcher.poll())
+        self.assertEqual(["Opening balance", "Bakery"], [x.payee for x in self.journal.xacts()])
+        self.assertEqual(xact, self.journal.xacts()[0])
+
+        with open(self.main_file, "a") as f:
+            f.write("\n2010/01/31 Employer\n    Assets:Checking  $2,000.00\n    Income:Salary\n")
+        self.assertEqual(ledger.JournalRefreshStatus.Appended, watcher.poll())
+        self.assertEqual(["Opening balance", "Bakery", "Employer"], [x.payee for x in self.journal.xacts()])
+
+        self.assertIsNone(watcher.poll())
+        self.assertEqual([ledger.JournalRefreshStatus.PartiallyReloaded, ledger.JournalRefreshStatus.Appended], statuses)
+
+    def test_watch_in_background(self):
+        refreshed = threading.Event()
+        for use_inotify in (True, False):
+            refreshed.clear()
+            with ledger.watch.JournalWatcher(self.journal, interval=0.1, use_inotify=use_inotify, on_refresh=lambda status: refreshed.set()) as watcher:
+                self.assertTrue(watcher.is_running)
+                self.assertIn(watcher.backend, ("inotify", "polling"))
+                with open(self.food_file, "a") as f:
+                    f.write("\n2010/01/16 Bakery\n    Expenses:Food  $5.00\n    Assets:Checking\n")
+                self.assertTrue(refreshed.wait(10))
+            self.assertFalse(watcher.is_running)
+        self.assertEqual(["Opening balance", "Grocery", "Bakery", "Bakery"], [x.payee for x in self.journal.xacts()])
+
+class FunctorTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.folder = tempfile.TemporaryDirectory()
+        self.journal_file = os.path.join(self.folder.name, "functor.dat")
+        with open(self.journal_file, "w") as f:
+            f.write("python\n"
+                    "    import ledger\n"
+                    "    def large(amount):\n"
+                    "        return amount > 50\n"
+                    "    @ledger.batch_function\n"
+                    "    def large_batch(amounts):\n"
+                    "        return [amount > 50 for amount in amounts]\n"
+                    "    @ledger.batch_function(size=4)\n"
+                    "    def chunk_size(posts):\n"
+                    "        return [len(posts)] * len(posts)\n"
+                    "    @ledger.pure(max_size=2)\n"
+                    "    def category(payee):\n"
+                    "        return payee.split(' ')[0]\n\n")
+            for i in range(10):
+                f.write("2010/01/%02d Payee %d\n    Expenses:Food  $%d.00\n    Assets:Checking\n\n" % (i + 1, i, i * 10 + 5))
+        ledger.session.close_journal_files()
+        ledger.session.read_journal(self.journal_file)
+
+    def tearDown(self) -> None:
+        ledger.session.close_journal_files()
+        self.folder.cleanup()
+
+    def test_batch_function_decorator(self):
+        @ledger.batch_function
+        def func1(values):
+            return values
+
+        @ledger.batch_function(size=10)
+        def func2(values):
+            return values
+
+        self.assertEqual(256, func1.__ledger_batch_size__)
+        self.assertEqual(10, func2.__ledger_batch_size__)
+        self.assertEqual([1, 2], func2([1, 2]))
+        with self.assertRaises(ValueError):
+            ledger.batch_function(size=0)
+
+    def test_batch_function_chunks(self):
+        output = ledger.execute_command(["reg", "--format", "%(chunk_size(post))\n"]).Output
+        self.assertEqual(["4"] * 20, output.splitlines())
+
+    def test_batch_function_results(self):
+        for args in (["reg"], ["reg", "--sort", "-amount"], ["reg", "^Expenses"]):
+            expected = ledger.execute_command(args + ["--format", "%(large(amount))\n"]).Output
+            self.assertEqual(expected, ledger.execute_command(args + ["--format", "%(large_batch(amount))\n"]).Output)
+
+        expected = ledger.execute_command(["reg", "--display", "large(amount)"]).Output
+        self.assertEqual(expected, ledger.execute_command(["reg", "--display", "large_batch(amount)"]).Output)
+        self.assertEqual(5, len(expected.splitlines()))
+
+    def test_pure_decorator(self):
+        @ledger.pure
+        def func1(value):
+            return value
+
+        @ledger.pure(max_size=10)
+        def func2(value):
+            return value
+
+        self.assertEqual(1024, func1.__ledger_pure_cache_size__)
+        self.assertEqual(10, func2.__ledger_pure_cache_size__)
+        self.assertEqual(1, func2(1))
+        with self.assertRaises(ValueError):
+            ledger.pure(max_size=0)
+
+    def test_pure_function_cache(self):
+        output = ledger.execute_command(["reg", "--format", "%(category(payee))\n"]).Output
+        self.assertEqual(["Payee"] * 20, output.splitlines())
+
+        stats = ledger.pure_stats()["category"]
+        self.assertEqual(10, stats["misses"])
+        self.assertEqual(10, stats["hits"])
+        self.assertEqual(8, stats["evictions"])
+        self.assertEqual(2, stats["size"])
+        self.assertEqual(2, stats["max_size"])
+
+    def test_functor_stats(self):
+        ledger.profile_functors = True
+        try:
+            ledger.execute_command(["reg", "--format", "%(large(amount))%(category(payee))\n"])
+            stats = ledger.functor_stats()
+            self.assertEqual(20, stats["large"]["calls"])
+            self.assertEqual(20, stats["category"]["calls"])
+            for name in ("large", "category"):
+                self.assertGreater(stats[name]["total_time"], 0)
+                self.assertGreater(stats[name]["argument_conversion_time"], 0)
+                self.assertGreaterEqual(stats[name]["total_time"], stats[name]["argument_conversion_time"] + stats[name]["return_conversion_time"])
+
+            ledger.execute_command(["reg", "--format", "%(large_batch(amount))\n"])
+            stats = ledger.functor_stats()
+            self.assertEqual(["large_batch"], list(stats.keys()))
+            self.assertEqual(20, stats["large_batch"]["calls"])
+        finally:
+            ledger.profile_functors = False
+
+    def test_functor_stats_disabled(self):
+        ledger.execute_command(["reg", "--format", "%(large(amount))\n"])
+        self.assertEqual({}, ledger.functor_stats())
+
 
 if __name__ == '__main__':
     unittest.main()
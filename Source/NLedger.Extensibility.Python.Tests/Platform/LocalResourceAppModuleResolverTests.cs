@@ -23,19 +23,29 @@ namespace NLedger.Extensibility.Python.Tests.Platform
         {
             AppModulePath = Path.GetTempPath();
             AppModuleFile = Path.GetFullPath($"{AppModulePath}/ledger/__init__.py");
+            ServerModuleFile = Path.GetFullPath($"{AppModulePath}/ledger/server.py");
 
-            if (File.Exists(AppModuleFile))
-                File.Delete(AppModuleFile);
+            DeleteModuleFiles();
         }
 
         public void Dispose()
         {
-            if (File.Exists(AppModuleFile))
-                File.Delete(AppModuleFile);
+            DeleteModuleFiles();
+        }
+
+        private void DeleteModuleFiles()
+        {
+            foreach (var moduleFile in LocalResourceAppModuleResolver.ModuleFiles)
+            {
+                var fileName = Path.GetFullPath($"{AppModulePath}/ledger/{moduleFile}");
+                if (File.Exists(fileName))
+                    File.Delete(fileName);
+            }
         }
 
         public string AppModulePath { get; }
         public string AppModuleFile { get; }
+        public string ServerModuleFile { get; }
 
         [Fact]
         public void LocalResourceAppModuleResolver_Constructor_PopulatesProperties()
@@ -79,6 +89,33 @@ namespace NLedger.Extensibility.Python.Tests.Platform
             }
         }
 
+        [Fact]
+        public void LocalResourceAppModuleResolver_GetAppModulePath_CreatesServerModuleFile()
+        {
+            Assert.False(File.Exists(ServerModuleFile));
+            new LocalResourceAppModuleResolver(AppModulePath).GetAppModulePath();
+            Assert.True(File.Exists(ServerModuleFile));
+
+            var content = File.ReadAllText(ServerModuleFile);
+            using (var resource = typeof(LocalResourceAppModuleResolver).Assembly.GetManifestResourceStream("NLedger.Extensibility.Python.server.py"))
+            {
+                using (var reader = new StreamReader(resource))
+                {
+                    string result = reader.ReadToEnd();
+                    Assert.Equal(result, content);
+                }
+            }
+        }
+
+        [Fact]
+        public void LocalResourceAppModuleResolver_GetAppModulePath_CreatesAllModuleFiles()
+        {
+            new LocalResourceAppModuleResolver(AppModulePath).GetAppModulePath();
+
+            foreach (var moduleFile in LocalResourceAppModuleResolver.ModuleFiles)
+                Assert.True(File.Exists(Path.GetFullPath($"{AppModulePath}/ledger/{moduleFile}")));
+        }
+
         [Fact]
         public void LocalResourceAppModuleResolver_GetAppModulePath_CreatesFileOnce()
         {
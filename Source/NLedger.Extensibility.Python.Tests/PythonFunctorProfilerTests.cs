@@ -0,0 +1,51 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using System;
+using System.Diagnostics;
+using System.Linq;
+using Xunit;
+
+namespace NLedger.Extensibility.Python.Tests
+{
+    public class PythonFunctorProfilerTests
+    {
+        [Fact]
+        public void PythonFunctorProfiler_GetStats_ReturnsStatsByName()
+        {
+            var profiler = new PythonFunctorProfiler();
+            Assert.False(profiler.IsEnabled);
+            Assert.Empty(profiler.Stats);
+
+            var stats = profiler.GetStats("func");
+            Assert.Equal("func", stats.Name);
+            Assert.Same(stats, profiler.GetStats("func"));
+            Assert.NotSame(stats, profiler.GetStats("func2"));
+            Assert.Equal(new[] { "func", "func2" }, profiler.Stats.Select(s => s.Name).OrderBy(s => s).ToArray());
+
+            profiler.Reset();
+            Assert.Empty(profiler.Stats);
+            Assert.NotSame(stats, profiler.GetStats("func"));
+        }
+
+        [Fact]
+        public void PythonFunctorStats_AddCall_AccumulatesTimes()
+        {
+            var stats = new PythonFunctorStats("func");
+            stats.AddCall(Stopwatch.Frequency);
+            stats.AddCall(Stopwatch.Frequency);
+            stats.AddArgumentConversion(Stopwatch.Frequency / 2);
+            stats.AddReturnConversion(Stopwatch.Frequency / 4);
+
+            Assert.Equal(2, stats.Calls);
+            Assert.Equal(2, Math.Round(stats.TotalTime.TotalSeconds, 3));
+            Assert.Equal(0.5, Math.Round(stats.ArgumentConversionTime.TotalSeconds, 3));
+            Assert.Equal(0.25, Math.Round(stats.ReturnConversionTime.TotalSeconds, 3));
+        }
+    }
+}
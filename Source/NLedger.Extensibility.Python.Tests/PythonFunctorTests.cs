@@ -69,5 +69,47 @@ namespace NLedger.Extensibility.Python.Tests
             }
         }
 
+        [PythonFact]
+        public void PythonFunctor_Constructor_CreatesBatchEvaluator()
+        {
+            using (var session = new PythonSession())
+            {
+                using (session.GIL())
+                {
+                    var converter = new PythonValueConverter(session);
+                    var scope = Py.CreateScope();
+                    scope.Exec("def func(values):\n    return values\nfunc.__ledger_batch_size__ = 16");
+
+                    Assert.Null(new PythonFunctor("len", scope.Eval("len"), converter).BatchEvaluator);
+
+                    var functor = new PythonFunctor("func", scope.Eval("func"), converter);
+                    Assert.NotNull(functor.BatchEvaluator);
+                    Assert.Equal(16, functor.BatchEvaluator.MaxChunkSize);
+                    Assert.Equal(16, functor.BatchEvaluator.ChunkSize);
+                }
+            }
+        }
+
+        [PythonFact]
+        public void PythonFunctor_Constructor_CreatesResultCache()
+        {
+            using (var session = new PythonSession())
+            {
+                using (session.GIL())
+                {
+                    var converter = new PythonValueConverter(session);
+                    var scope = Py.CreateScope();
+                    scope.Exec("def func(value):\n    return value\nfunc.__ledger_pure_cache_size__ = 32");
+
+                    Assert.Null(new PythonFunctor("len", scope.Eval("len"), converter).ResultCache);
+
+                    var functor = new PythonFunctor("func", scope.Eval("func"), converter);
+                    Assert.NotNull(functor.ResultCache);
+                    Assert.Equal(32, functor.ResultCache.MaxSize);
+                    Assert.Null(functor.BatchEvaluator);
+                }
+            }
+        }
+
     }
 }
@@ -0,0 +1,82 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Amounts;
+using NLedger.Tests;
+using NLedger.Values;
+using System;
+using System.Collections.Generic;
+using Xunit;
+
+namespace NLedger.Extensibility.Python.Tests
+{
+    public class PythonResultCacheTests : TestFixture
+    {
+        [Fact]
+        public void PythonArgumentList_Equals_ComparesValues()
+        {
+            var args = new PythonArgumentList(new List<Value>() { Value.Get(new Amount(10)), Value.StringValue("text") });
+
+            Assert.True(args.Equals(new PythonArgumentList(new List<Value>() { Value.Get(new Amount(10)), Value.StringValue("text") })));
+            Assert.Equal(args.GetHashCode(), new PythonArgumentList(new List<Value>() { Value.Get(new Amount(10)), Value.StringValue("text") }).GetHashCode());
+
+            Assert.False(args.Equals(new PythonArgumentList(new List<Value>() { Value.Get(new Amount(11)), Value.StringValue("text") })));
+            Assert.False(args.Equals(new PythonArgumentList(new List<Value>() { Value.Get(10), Value.StringValue("text") })));
+            Assert.False(args.Equals(new PythonArgumentList(new List<Value>() { Value.Get(new Amount(10)) })));
+        }
+
+        [Fact]
+        public void PythonArgumentList_Equals_ComparesScopesByReference()
+        {
+            var post = new Post();
+            var args = new PythonArgumentList(new List<Value>() { Value.ScopeValue(post) });
+
+            Assert.True(args.Equals(new PythonArgumentList(new List<Value>() { Value.ScopeValue(post) })));
+            Assert.False(args.Equals(new PythonArgumentList(new List<Value>() { Value.ScopeValue(new Post()) })));
+        }
+
+        [Fact]
+        public void PythonResultCache_TryGetValue_ReturnsCachedValues()
+        {
+            var cache = new PythonResultCache(2);
+            var args1 = new PythonArgumentList(new List<Value>() { Value.StringValue("one") });
+            var args2 = new PythonArgumentList(new List<Value>() { Value.StringValue("two") });
+            var args3 = new PythonArgumentList(new List<Value>() { Value.StringValue("three") });
+            Value val;
+
+            Assert.False(cache.TryGetValue(args1, out val));
+            cache.Add(args1, Value.Get(1));
+            cache.Add(args2, Value.Get(2));
+            Assert.True(cache.TryGetValue(new PythonArgumentList(new List<Value>() { Value.StringValue("one") }), out val));
+            Assert.Equal(1, val.AsLong);
+
+            // The least recently used item is evicted
+            cache.Add(args3, Value.Get(3));
+            Assert.Equal(2, cache.Count);
+            Assert.False(cache.TryGetValue(args2, out val));
+            Assert.True(cache.TryGetValue(args1, out val));
+            Assert.True(cache.TryGetValue(args3, out val));
+
+            Assert.Equal(3, cache.Hits);
+            Assert.Equal(2, cache.Misses);
+            Assert.Equal(1, cache.Evictions);
+
+            cache.Clear();
+            cache.ResetStats();
+            Assert.Equal(0, cache.Count);
+            Assert.Equal(0, cache.Hits);
+            Assert.Equal(0, cache.Misses);
+        }
+
+        [Fact]
+        public void PythonResultCache_Constructor_RequiresPositiveSize()
+        {
+            Assert.Throws<ArgumentException>(() => new PythonResultCache(0));
+        }
+    }
+}
@@ -258,5 +258,42 @@ namespace NLedger.Extensibility.Python.Tests
             }
         }
 
+        [PythonFact]
+        public void PythonValueConverter_ConverterTable_DispatchesByType()
+        {
+            PythonSession.PythonModuleInitialization();
+            try
+            {
+                PythonSession.Current.Initialize();
+                using (PythonSession.Current.GIL())
+                {
+                    var converter = new PythonValueConverter(PythonSession.Current);
+                    Assert.NotNull(converter.ConverterTable);
+                    Assert.Equal(PythonSession.Current.PythonSessionConnectionContext.ConverterTable, converter.ConverterTable);
+
+                    // Milliseconds are kept in both directions
+                    var dateTime = new DateTime(2021, 10, 20, 23, 59, 33, 250);
+                    var py = converter.GetPyDateTime(dateTime);
+                    Assert.Equal("2021-10-20 23:59:33.250000", py.ToString());
+                    Assert.Equal(dateTime, converter.GetValue(py).AsDateTime);
+                    Assert.Equal(dateTime, converter.GetDateTime(py));
+                    Assert.Equal(new Date(2021, 10, 20), converter.GetDate(py));
+
+                    // Exact type match: datetime is not dispatched as date
+                    Assert.Equal(ValueTypeEnum.Date, converter.GetValue(converter.GetPyDate(new Date(2021, 10, 20))).Type);
+
+                    // Custom converters
+                    var scope = PythonSession.Current.MainModule.ModuleObject;
+                    scope.Exec("class Custom:\n    pass");
+                    converter.ConverterTable.RegisterFromPython(scope.Eval("Custom"), obj => Value.StringValue("custom"));
+                    Assert.Equal("custom", converter.GetValue(scope.Eval("Custom()")).AsString);
+                }
+            }
+            finally
+            {
+                PythonSession.PythonModuleShutdown();
+            }
+        }
+
     }
 }
@@ -19,6 +19,11 @@ namespace NLedger.Extensibility.Python.Platform
     /// </summary>
     public class LocalResourceAppModuleResolver : IAppModuleResolver
     {
+        /// <summary>
+        /// Files of Ledger module that are embedded into the assembly (resource names are prefixed with the assembly namespace)
+        /// </summary>
+        public static readonly IEnumerable<string> ModuleFiles = new string[] { "__init__.py", "server.py", "aio.py", "parallel.py", "watch.py" };
+
         public LocalResourceAppModuleResolver(string appModulePath = null)
         {
             AppModulePath = appModulePath ?? BuildAppModulePath();
@@ -31,22 +36,30 @@ namespace NLedger.Extensibility.Python.Platform
         {
             if (!IsPathValidated)
             {
-                var targetFileName = Path.GetFullPath($"{AppModulePath}/ledger/__init__.py");
                 var assemblyDate = File.GetLastWriteTime(Assembly.GetExecutingAssembly().Location);
+                var isCreated = false;
 
-                if (!File.Exists(targetFileName) || assemblyDate != File.GetLastWriteTime(targetFileName))
+                foreach (var moduleFile in ModuleFiles)
                 {
-                    Directory.CreateDirectory(Path.GetDirectoryName(targetFileName));
+                    var targetFileName = Path.GetFullPath($"{AppModulePath}/ledger/{moduleFile}");
 
-                    using (var resource = Assembly.GetExecutingAssembly().GetManifestResourceStream("NLedger.Extensibility.Python.__init__.py"))
+                    if (!File.Exists(targetFileName) || assemblyDate != File.GetLastWriteTime(targetFileName))
                     {
-                        using (var file = new FileStream(targetFileName, FileMode.Create, FileAccess.Write))
-                            resource.CopyTo(file);
+                        Directory.CreateDirectory(Path.GetDirectoryName(targetFileName));
+
+                        using (var resource = Assembly.GetExecutingAssembly().GetManifestResourceStream($"NLedger.Extensibility.Python.{moduleFile}"))
+                        {
+                            using (var file = new FileStream(targetFileName, FileMode.Create, FileAccess.Write))
+                                resource.CopyTo(file);
+                        }
+
+                        File.SetLastWriteTime(targetFileName, assemblyDate);
+                        isCreated = true;
                     }
+                }
 
-                    File.SetLastWriteTime(targetFileName, assemblyDate);
+                if (isCreated)
                     OnFileCreated?.Invoke();
-                }
 
                 IsPathValidated = true;
             }
@@ -6,6 +6,7 @@
 // Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
 // See LICENSE.LEDGER file included with the distribution for details and disclaimer.
 // **********************************************************************************
+using Python.Runtime;
 using System;
 using System.Collections.Generic;
 using System.Text;
@@ -54,7 +55,8 @@ namespace NLedger.Extensibility.Python.Platform
 
             lock(SyncRoot)
             {
-                bool isPlatformInitialization = PythonHost == null;
+                // Python engine is already initialized if NLedger is loaded as a Python module (Python is the host)
+                bool isPlatformInitialization = PythonHost == null && !PythonEngine.IsInitialized;
                 if (isPlatformInitialization)
                     PythonHost = new PythonHost(PythonConfigurationReader.Read());
 
@@ -74,7 +76,7 @@ namespace NLedger.Extensibility.Python.Platform
                     return;
 
                 Connections.Remove(pythonConnectionContext);
-                var isPlatformDisposing = !HasActiveConnections && !KeepAlive;
+                var isPlatformDisposing = !HasActiveConnections && !KeepAlive && PythonHost != null;   // the engine of a Python host is not shut down
                 pythonConnectionContext.OnDisconnected(isPlatformDisposing);
 
                 if (isPlatformDisposing)
@@ -0,0 +1,123 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Scopus;
+using NLedger.Values;
+using System;
+using System.Collections.Generic;
+using System.Linq;
+using System.Runtime.CompilerServices;
+using System.Text;
+
+namespace NLedger.Extensibility.Python
+{
+    /// <summary>
+    /// Evaluated arguments of a Python function call. Lists are equal if they have the same values of the same types
+    /// (scopes are compared by reference), so they can be used as keys of prepared or cached results.
+    /// </summary>
+    public sealed class PythonArgumentList : IEquatable<PythonArgumentList>
+    {
+        public static PythonArgumentList Get(CallScope callScope)
+        {
+            if (callScope.Size == 0)
+                return new PythonArgumentList(new List<Value>());
+
+            var val = callScope.Value();
+            return new PythonArgumentList(val.Type == ValueTypeEnum.Sequence ? val.AsSequence.ToList() : new List<Value>() { val });
+        }
+
+        public PythonArgumentList(IList<Value> values)
+        {
+            Values = values ?? throw new ArgumentNullException(nameof(values));
+            HashCode = GetHashCode(values);
+        }
+
+        public IList<Value> Values { get; }
+        public int Count => Values.Count;
+
+        public bool Equals(PythonArgumentList other)
+        {
+            return other != null && HashCode == other.HashCode && IsSameValues(Values, other.Values);
+        }
+
+        public override bool Equals(object obj)
+        {
+            return Equals(obj as PythonArgumentList);
+        }
+
+        public override int GetHashCode()
+        {
+            return HashCode;
+        }
+
+        public override string ToString()
+        {
+            return String.Join(", ", Values);
+        }
+
+        private static bool IsSameValues(IList<Value> x, IList<Value> y)
+        {
+            if (x.Count != y.Count)
+                return false;
+
+            for (int i = 0; i < x.Count; i++)
+                if (!IsSameValue(x[i], y[i]))
+                    return false;
+
+            return true;
+        }
+
+        private static bool IsSameValue(Value x, Value y)
+        {
+            if (Value.IsNullOrEmpty(x) || Value.IsNullOrEmpty(y))
+                return Value.IsNullOrEmpty(x) && Value.IsNullOrEmpty(y);
+
+            if (x.Type != y.Type)
+                return false;
+
+            switch (x.Type)
+            {
+                case ValueTypeEnum.Scope: return x.AsScope == y.AsScope;
+                case ValueTypeEnum.Sequence: return IsSameValues(x.AsSequence, y.AsSequence);
+                case ValueTypeEnum.Any: return Object.Equals(x.AsAny(), y.AsAny());
+                default: return x.IsEqualTo(y);
+            }
+        }
+
+        private static int GetHashCode(IList<Value> values)
+        {
+            int hash = values.Count;
+            foreach (var val in values)
+                hash = hash * 31 + GetHashCode(val);
+            return hash;
+        }
+
+        // Value.GetHashCode is not consistent with value equality, so hash codes are taken from the stored values
+        private static int GetHashCode(Value val)
+        {
+            if (Value.IsNullOrEmpty(val))
+                return 0;
+
+            switch (val.Type)
+            {
+                case ValueTypeEnum.Boolean: return val.AsBoolean.GetHashCode();
+                case ValueTypeEnum.Integer: return val.AsLong.GetHashCode();
+                case ValueTypeEnum.DateTime: return val.AsDateTime.GetHashCode();
+                case ValueTypeEnum.Date: return val.AsDate.GetHashCode();
+                case ValueTypeEnum.String: return val.AsString.GetHashCode();
+                case ValueTypeEnum.Amount: return val.AsAmount.GetHashCode();
+                case ValueTypeEnum.Scope: return RuntimeHelpers.GetHashCode(val.AsScope);
+                case ValueTypeEnum.Sequence: return GetHashCode(val.AsSequence);
+                case ValueTypeEnum.Any: return val.AsAny()?.GetHashCode() ?? 0;
+                default: return (int)val.Type;
+            }
+        }
+
+        private readonly int HashCode;
+    }
+}
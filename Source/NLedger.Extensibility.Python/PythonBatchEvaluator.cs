@@ -0,0 +1,260 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Expressions;
+using NLedger.Scopus;
+using NLedger.Utility;
+using NLedger.Utils;
+using NLedger.Values;
+using Python.Runtime;
+using System;
+using System.Collections.Generic;
+using System.Diagnostics;
+using System.Linq;
+using System.Text;
+
+namespace NLedger.Extensibility.Python
+{
+    /// <summary>
+    /// Evaluates a Python batch function (see ledger.batch_function). When the function is called for a posting,
+    /// its arguments are evaluated for the postings that follow in the journal and the function is called once for the whole chunk.
+    /// Prepared results are returned by the next calls for these postings if their actual arguments are the same
+    /// (so calls from different expressions do not get each other's results). The chunk size is adjusted by the number of used results,
+    /// so reports that take postings in another order do not waste calls.
+    /// </summary>
+    public class PythonBatchEvaluator
+    {
+        public const string BatchSizeAttribute = "__ledger_batch_size__";
+        public const int MaxPreparedChunks = 4;
+
+        public PythonBatchEvaluator(PythonFunctor functor, int maxChunkSize)
+        {
+            if (maxChunkSize < 1)
+                throw new ArgumentException($"Batch size should be a positive number: {maxChunkSize}", nameof(maxChunkSize));
+
+            Functor = functor ?? throw new ArgumentNullException(nameof(functor));
+            MaxChunkSize = maxChunkSize;
+            ChunkSize = maxChunkSize;
+        }
+
+        public PythonFunctor Functor { get; }
+        public int MaxChunkSize { get; }
+        public int ChunkSize { get; private set; }
+
+        /// <summary>
+        /// Returns not evaluated argument expressions or null if the arguments are not expressions.
+        /// They should be taken before the arguments are evaluated.
+        /// </summary>
+        public static ExprOp[] GetArgumentExprs(CallScope callScope)
+        {
+            if (callScope.Size == 0)
+                return null;
+
+            var args = callScope.Args.Type == ValueTypeEnum.Sequence ? callScope.Args.AsSequence : new List<Value>() { callScope.Args };
+            var exprs = new ExprOp[args.Count];
+            for (int i = 0; i < args.Count; i++)
+            {
+                if (args[i].Type != ValueTypeEnum.Any || !(args[i].AsAny() is ExprOp))
+                    return null;
+                exprs[i] = (ExprOp)args[i].AsAny();
+            }
+            return exprs;
+        }
+
+        public Value Calc(CallScope callScope)
+        {
+            var argExprs = GetArgumentExprs(callScope);
+            return Calc(callScope, argExprs, PythonArgumentList.Get(callScope));
+        }
+
+        public Value Calc(CallScope callScope, ExprOp[] argExprs, PythonArgumentList args)
+        {
+            BindScope bindScope = null;
+            var post = argExprs != null ? FindPost(callScope, out bindScope) : null;
+            if (post == null)
+                return CallChunk(new List<PythonArgumentList>() { args })[0];
+
+            foreach (var chunk in PreparedChunks)
+            {
+                PreparedResult prepared;
+                if (chunk.Results.TryGetValue(post, out prepared) && prepared.Args.Equals(args))
+                {
+                    chunk.Results.Remove(post);
+                    chunk.Used++;
+                    if (chunk.Results.Count == 0)
+                    {
+                        PreparedChunks.Remove(chunk);
+                        ChunkSize = Math.Min(MaxChunkSize, ChunkSize * 2);
+                    }
+                    return prepared.Result;
+                }
+            }
+
+            var posts = new List<Post>() { post };
+            var chunkArgs = new List<PythonArgumentList>() { args };
+            foreach (var nextPost in GetFollowingPosts(post).Take(ChunkSize - 1))
+            {
+                var nextArgs = EvaluateArguments(argExprs, new BindScope(bindScope.Parent, nextPost), callScope);
+                if (nextArgs == null)
+                    break;
+
+                posts.Add(nextPost);
+                chunkArgs.Add(nextArgs);
+            }
+
+            var results = CallChunk(chunkArgs);
+
+            if (posts.Count > 1)
+            {
+                var chunk = new PreparedChunk(posts.Count);
+                for (int i = 1; i < posts.Count; i++)
+                    chunk.Results[posts[i]] = new PreparedResult(chunkArgs[i], results[i]);
+                PreparedChunks.Add(chunk);
+
+                if (PreparedChunks.Count > MaxPreparedChunks)
+                {
+                    var oldest = PreparedChunks[0];
+                    PreparedChunks.RemoveAt(0);
+                    if (oldest.Used * 2 < oldest.Count)
+                        ChunkSize = Math.Max(1, ChunkSize / 2);
+                }
+            }
+
+            return results[0];
+        }
+
+        protected virtual IList<Value> CallChunk(IList<PythonArgumentList> chunkArgs)
+        {
+            var stats = Functor.GetProfilerStats();
+            using (Py.GIL())
+            {
+                var startTicks = stats != null ? Stopwatch.GetTimestamp() : 0;
+                var paramCount = chunkArgs[0].Count;
+                var arglist = new PyObject[paramCount];
+                for (int i = 0; i < paramCount; i++)
+                {
+                    var list = new PyList();
+                    foreach (var args in chunkArgs)
+                        list.Append(Functor.PythonValueConverter.GetObject(args.Values[i]));
+                    arglist[i] = list;
+                }
+                stats?.AddArgumentConversion(Stopwatch.GetTimestamp() - startTicks);
+
+                var val = Functor.Obj.Invoke(arglist);
+
+                var results = new List<Value>();
+                try
+                {
+                    startTicks = stats != null ? Stopwatch.GetTimestamp() : 0;
+                    foreach (var elem in (val as PyList) ?? new PyList(val))
+                        results.Add(Functor.PythonValueConverter.GetValue(elem));
+                    stats?.AddReturnConversion(Stopwatch.GetTimestamp() - startTicks);
+                    Logger.Current.Debug("python.interp", () => $"Return from Python batch '{Functor.Name}': {results.Count} results");
+                }
+                catch (Exception ex)
+                {
+                    ErrorContext.Current.AddErrorContext(ex.ToString());
+                    throw new CalcError($"Failed call to Python function '{Functor.Name}'");
+                }
+
+                if (results.Count != chunkArgs.Count)
+                    throw new CalcError($"Python batch function '{Functor.Name}' returned {results.Count} results for {chunkArgs.Count} calls");
+
+                return results;
+            }
+        }
+
+        private static PythonArgumentList EvaluateArguments(ExprOp[] argExprs, Scope scope, CallScope callScope)
+        {
+            var nextScope = new CallScope(scope, callScope.Locus, callScope.Depth);
+            foreach (var expr in argExprs)
+                nextScope.PushBack(Value.Get(expr));
+
+            try
+            {
+                return PythonArgumentList.Get(nextScope);
+            }
+            catch
+            {
+                // Arguments cannot be evaluated in advance; the posting will be evaluated when the report gets to it
+                return null;
+            }
+        }
+
+        private static Post FindPost(CallScope callScope, out BindScope bindScope)
+        {
+            for (var scope = callScope.Parent; scope != null; scope = (scope as ChildScope)?.Parent)
+            {
+                bindScope = scope as BindScope;
+                if (bindScope?.GrandChild is Post)
+                    return (Post)bindScope.GrandChild;
+            }
+
+            bindScope = null;
+            return null;
+        }
+
+        private IEnumerable<Post> GetFollowingPosts(Post post)
+        {
+            var xact = post.Xact;
+            if (xact == null)
+                yield break;
+
+            var postIndex = xact.Posts.IndexOf(post);
+            if (postIndex < 0)
+                yield break;
+
+            for (int i = postIndex + 1; i < xact.Posts.Count; i++)
+                yield return xact.Posts[i];
+
+            var xacts = xact.Journal?.Xacts;
+            if (xacts == null)
+                yield break;
+
+            // Reports usually take transactions in the journal order, so the next chunk most likely starts where the previous one ended
+            var xactIndex = LastXactIndex < xacts.Count && xacts[LastXactIndex] == xact ? LastXactIndex : xacts.IndexOf(xact);
+            if (xactIndex < 0)
+                yield break;
+
+            for (int i = xactIndex + 1; i < xacts.Count; i++)
+            {
+                LastXactIndex = i;
+                foreach (var nextPost in xacts[i].Posts)
+                    yield return nextPost;
+            }
+        }
+
+        private class PreparedResult
+        {
+            public PreparedResult(PythonArgumentList args, Value result)
+            {
+                Args = args;
+                Result = result;
+            }
+
+            public PythonArgumentList Args { get; }
+            public Value Result { get; }
+        }
+
+        private class PreparedChunk
+        {
+            public PreparedChunk(int count)
+            {
+                Count = count;
+                Used = 1;
+            }
+
+            public IDictionary<Post, PreparedResult> Results { get; } = new Dictionary<Post, PreparedResult>();
+            public int Count { get; }
+            public int Used { get; set; }
+        }
+
+        private readonly IList<PreparedChunk> PreparedChunks = new List<PreparedChunk>();
+        private int LastXactIndex;
+    }
+}
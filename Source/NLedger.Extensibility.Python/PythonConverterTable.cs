@@ -0,0 +1,157 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Accounts;
+using NLedger.Amounts;
+using NLedger.Utility;
+using NLedger.Values;
+using NLedger.Xacts;
+using Python.Runtime;
+using System;
+using System.Collections.Generic;
+using System.Text;
+
+namespace NLedger.Extensibility.Python
+{
+    /// <summary>
+    /// Type-dispatch table for conversions between Ledger values and Python objects.
+    /// Python callables (wrapper factories, date classes) are resolved once when the session connects to Python,
+    /// so converting a value is a dictionary lookup and a direct call rather than evaluation of a Python expression.
+    /// </summary>
+    public class PythonConverterTable
+    {
+        public PythonConverterTable(PyModule ledgerModule)
+        {
+            if (ledgerModule == null)
+                throw new ArgumentNullException(nameof(ledgerModule));
+
+            var builtinsModule = Py.Import("builtins");
+            var datetimeModule = Py.Import("datetime");
+
+            PyDateType = datetimeModule.GetAttr("date");
+            PyDateTimeType = datetimeModule.GetAttr("datetime");
+            ToNDate = ledgerModule.GetAttr("to_ndate");
+            ToNDateTime = ledgerModule.GetAttr("to_ndatetime");
+
+            RegisterToPython<Amount>(ledgerModule.GetAttr("Amount").GetAttr("from_origin"));
+            RegisterToPython<Balance>(ledgerModule.GetAttr("Balance").GetAttr("from_origin"));
+            RegisterToPython<Post>(ledgerModule.GetAttr("Posting").GetAttr("from_origin"));
+            RegisterToPython<Xact>(ledgerModule.GetAttr("Transaction").GetAttr("from_origin"));
+            RegisterToPython<PeriodXact>(ledgerModule.GetAttr("PeriodicTransaction").GetAttr("from_origin"));
+            RegisterToPython<AutoXact>(ledgerModule.GetAttr("AutomatedTransaction").GetAttr("from_origin"));
+            RegisterToPython<Account>(ledgerModule.GetAttr("Account").GetAttr("from_origin"));
+            RegisterToPython<Value>(ledgerModule.GetAttr("Value").GetAttr("to_value"));
+
+            RegisterFromPython(builtinsModule.GetAttr("bool"), obj => Value.Get(obj.As<bool>()));
+            RegisterFromPython(builtinsModule.GetAttr("int"), obj => Value.Get(obj.As<int>()));
+            RegisterFromPython(builtinsModule.GetAttr("str"), obj => Value.StringValue(obj.As<string>()));
+
+            RegisterFromPython(PyDateType, obj => Value.Get(GetDate(obj)));
+            RegisterFromPython(PyDateTimeType, obj => Value.Get(GetDateTime(obj)));
+
+            RegisterFromPython(ledgerModule.GetAttr("Balance"), obj => Value.Get(obj.GetAttr("origin").As<Balance>()));
+            RegisterFromPython(ledgerModule.GetAttr("Amount"), obj => Value.Get(obj.GetAttr("origin").As<Amount>()));
+            RegisterFromPython(ledgerModule.GetAttr("Mask"), obj => Value.Get(obj.GetAttr("origin").As<Mask>()));
+            RegisterFromPython(ledgerModule.GetAttr("Posting"), obj => Value.ScopeValue(obj.GetAttr("origin").As<Post>()));
+            RegisterFromPython(ledgerModule.GetAttr("Transaction"), obj => Value.ScopeValue(obj.GetAttr("origin").As<Xact>()));
+            RegisterFromPython(ledgerModule.GetAttr("PeriodicTransaction"), obj => Value.ScopeValue(obj.GetAttr("origin").As<PeriodXact>()));
+            RegisterFromPython(ledgerModule.GetAttr("AutomatedTransaction"), obj => Value.ScopeValue(obj.GetAttr("origin").As<AutoXact>()));
+            RegisterFromPython(ledgerModule.GetAttr("Account"), obj => Value.ScopeValue(obj.GetAttr("origin").As<Account>()));
+            RegisterFromPython(ledgerModule.GetAttr("Value"), obj => obj.GetAttr("origin").As<Value>());
+        }
+
+        public PyObject PyDateType { get; }
+        public PyObject PyDateTimeType { get; }
+        public PyObject ToNDate { get; }
+        public PyObject ToNDateTime { get; }
+
+        /// <summary>
+        /// Registers a Python callable that creates a Python object for a .Net object of the given type (e.g. 'Amount.from_origin')
+        /// </summary>
+        public void RegisterToPython<T>(PyObject factory)
+        {
+            if (factory == null)
+                throw new ArgumentNullException(nameof(factory));
+            if (!factory.IsCallable())
+                throw new ArgumentException($"Python object for type {typeof(T).Name} is not callable", nameof(factory));
+
+            ToPythonFactories[typeof(T)] = factory;
+        }
+
+        /// <summary>
+        /// Registers a converter for Python objects of the given Python type (exact type match; derived types are not dispatched)
+        /// </summary>
+        public void RegisterFromPython(PyObject pythonType, Func<PyObject, Value> converter)
+        {
+            if (pythonType == null)
+                throw new ArgumentNullException(nameof(pythonType));
+            if (converter == null)
+                throw new ArgumentNullException(nameof(converter));
+
+            FromPythonConverters[pythonType.Handle] = converter;
+            PythonTypes[pythonType.Handle] = pythonType;    // keeps the type alive while its handle is used as a key
+        }
+
+        /// <summary>
+        /// Creates a Python object for the .Net object by a registered factory. Returns null if there is no factory for its type.
+        /// </summary>
+        public PyObject GetObject(object val)
+        {
+            PyObject factory;
+            if (val == null || !ToPythonFactories.TryGetValue(val.GetType(), out factory))
+                return null;
+
+            return factory.Invoke(PyObject.FromManagedObject(val));
+        }
+
+        /// <summary>
+        /// Converts the Python object by a converter registered for its exact Python type.
+        /// </summary>
+        public bool TryGetValue(PyObject obj, out Value val)
+        {
+            Func<PyObject, Value> converter;
+            using (var pythonType = obj.GetPythonType())
+            {
+                if (!FromPythonConverters.TryGetValue(pythonType.Handle, out converter))
+                {
+                    val = null;
+                    return false;
+                }
+            }
+
+            val = converter(obj);
+            return true;
+        }
+
+        public PyObject GetPyDate(Date date)
+        {
+            return PyDateType.Invoke(date.Year.ToPython(), date.Month.ToPython(), date.Day.ToPython());
+        }
+
+        public PyObject GetPyDateTime(DateTime dateTime)
+        {
+            return PyDateTimeType.Invoke(dateTime.Year.ToPython(), dateTime.Month.ToPython(), dateTime.Day.ToPython(),
+                dateTime.Hour.ToPython(), dateTime.Minute.ToPython(), dateTime.Second.ToPython(), (dateTime.Millisecond * 1000).ToPython());
+        }
+
+        private static Date GetDate(PyObject obj)
+        {
+            return new Date(obj.GetAttr("year").As<int>(), obj.GetAttr("month").As<int>(), obj.GetAttr("day").As<int>());
+        }
+
+        private static DateTime GetDateTime(PyObject obj)
+        {
+            return new DateTime(obj.GetAttr("year").As<int>(), obj.GetAttr("month").As<int>(), obj.GetAttr("day").As<int>(),
+                obj.GetAttr("hour").As<int>(), obj.GetAttr("minute").As<int>(), obj.GetAttr("second").As<int>(), obj.GetAttr("microsecond").As<int>() / 1000);
+        }
+
+        private readonly IDictionary<Type, PyObject> ToPythonFactories = new Dictionary<Type, PyObject>();
+        private readonly IDictionary<IntPtr, Func<PyObject, Value>> FromPythonConverters = new Dictionary<IntPtr, Func<PyObject, Value>>();
+        private readonly IDictionary<IntPtr, PyObject> PythonTypes = new Dictionary<IntPtr, PyObject>();
+    }
+}
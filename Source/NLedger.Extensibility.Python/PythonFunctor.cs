@@ -14,6 +14,7 @@ using NLedger.Values;
 using Python.Runtime;
 using System;
 using System.Collections.Generic;
+using System.Diagnostics;
 using System.Linq;
 using System.Text;
 
@@ -21,7 +22,7 @@ namespace NLedger.Extensibility.Python
 {
     public class PythonFunctor
     {
-        public PythonFunctor(string name, PyObject obj, IPythonValueConverter pythonValueConverter)
+        public PythonFunctor(string name, PyObject obj, IPythonValueConverter pythonValueConverter, PythonFunctorProfiler profiler = null)
         {
             if (String.IsNullOrWhiteSpace(name))
                 throw new ArgumentNullException(nameof(name));
@@ -29,11 +30,23 @@ namespace NLedger.Extensibility.Python
             Name = name;
             Obj = obj ?? throw new ArgumentNullException(nameof(obj));
             PythonValueConverter = pythonValueConverter ?? throw new ArgumentNullException(nameof(pythonValueConverter));
+            Profiler = profiler;
+
+            using (Py.GIL())
+            {
+                if (Obj.HasAttr(PythonBatchEvaluator.BatchSizeAttribute))
+                    BatchEvaluator = new PythonBatchEvaluator(this, Obj.GetAttr(PythonBatchEvaluator.BatchSizeAttribute).As<int>());
+                if (Obj.HasAttr(PythonResultCache.CacheSizeAttribute))
+                    ResultCache = new PythonResultCache(Obj.GetAttr(PythonResultCache.CacheSizeAttribute).As<int>());
+            }
         }
 
         public string Name { get; }
         public PyObject Obj { get; }
         public IPythonValueConverter PythonValueConverter { get; }
+        public PythonBatchEvaluator BatchEvaluator { get; }
+        public PythonResultCache ResultCache { get; }
+        public PythonFunctorProfiler Profiler { get; }
 
         public ExprFunc ExprFunctor => ExprFunc;
 
@@ -42,6 +55,47 @@ namespace NLedger.Extensibility.Python
         /// </summary>
         public Value ExprFunc(Scope args)
         {
+            var stats = GetProfilerStats();
+            if (stats == null)
+                return Calc(args, null);
+
+            var startTicks = Stopwatch.GetTimestamp();
+            try
+            {
+                return Calc(args, stats);
+            }
+            finally
+            {
+                stats.AddCall(Stopwatch.GetTimestamp() - startTicks);
+            }
+        }
+
+        /// <summary>
+        /// Returns statistics of the function if profiling is enabled; otherwise, null
+        /// </summary>
+        public PythonFunctorStats GetProfilerStats()
+        {
+            return Profiler != null && Profiler.IsEnabled ? Profiler.GetStats(Name) : null;
+        }
+
+        private Value Calc(Scope args, PythonFunctorStats stats)
+        {
+            var callScope = args as CallScope;
+            if (callScope != null && (BatchEvaluator != null || ResultCache != null))
+            {
+                // Argument expressions are needed by the batch evaluator and should be taken before evaluating the arguments
+                var argExprs = BatchEvaluator != null ? PythonBatchEvaluator.GetArgumentExprs(callScope) : null;
+                var arguments = PythonArgumentList.Get(callScope);
+
+                Value cached;
+                if (ResultCache != null && ResultCache.TryGetValue(arguments, out cached))
+                    return Value.Clone(cached);
+
+                var result = BatchEvaluator != null ? BatchEvaluator.Calc(callScope, argExprs, arguments) : CallFunction(arguments, stats);
+                ResultCache?.Add(arguments, Value.Clone(result));
+                return result;
+            }
+
             using (Py.GIL())
             {
                 if (!Obj.IsCallable())
@@ -52,36 +106,33 @@ namespace NLedger.Extensibility.Python
                 }
                 else
                 {
-                    var arglist = GetParamList((CallScope)args).ToArray();
-                    var val = Obj.Invoke(arglist);
-
-                    try
-                    {
-                        var xval = PythonValueConverter.GetValue(val);
-                        Logger.Current.Debug("python.interp", () => $"Return from Python '{Name}': {val.ToString()}");
-                        return xval;
-                    }
-                    catch (Exception ex)
-                    {
-                        ErrorContext.Current.AddErrorContext(ex.ToString());
-                        throw new CalcError($"Failed call to Python function 'Name'");
-                    }
+                    return CallFunction(PythonArgumentList.Get((CallScope)args), stats);
                 }
             }
         }
 
-        private IEnumerable<PyObject> GetParamList(CallScope callScope)
+        private Value CallFunction(PythonArgumentList arguments, PythonFunctorStats stats)
         {
-            if (callScope.Size > 0)
+            using (Py.GIL())
             {
-                if (callScope.Value().Type == ValueTypeEnum.Sequence)
+                var startTicks = stats != null ? Stopwatch.GetTimestamp() : 0;
+                var arglist = arguments.Values.Select(v => PythonValueConverter.GetObject(v)).ToArray();
+                stats?.AddArgumentConversion(Stopwatch.GetTimestamp() - startTicks);
+
+                var val = Obj.Invoke(arglist);
+
+                try
                 {
-                    foreach (var val in callScope.Value().AsSequence)
-                        yield return PythonValueConverter.GetObject(val);
+                    startTicks = stats != null ? Stopwatch.GetTimestamp() : 0;
+                    var xval = PythonValueConverter.GetValue(val);
+                    stats?.AddReturnConversion(Stopwatch.GetTimestamp() - startTicks);
+                    Logger.Current.Debug("python.interp", () => $"Return from Python '{Name}': {val.ToString()}");
+                    return xval;
                 }
-                else
+                catch (Exception ex)
                 {
-                    yield return PythonValueConverter.GetObject(callScope.Value());
+                    ErrorContext.Current.AddErrorContext(ex.ToString());
+                    throw new CalcError($"Failed call to Python function 'Name'");
                 }
             }
         }
@@ -0,0 +1,90 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using System;
+using System.Collections.Generic;
+using System.Diagnostics;
+using System.Text;
+
+namespace NLedger.Extensibility.Python
+{
+    /// <summary>
+    /// Collects timings of Python functions called from ledger expressions (see ledger.functor_stats).
+    /// Functors check IsEnabled once per call, so a disabled profiler does not add measurable overhead.
+    /// </summary>
+    public class PythonFunctorProfiler
+    {
+        public bool IsEnabled { get; set; }
+        public IEnumerable<PythonFunctorStats> Stats => StatsMap.Values;
+
+        /// <summary>
+        /// Returns statistics of the function with the given name (created on the first request)
+        /// </summary>
+        public PythonFunctorStats GetStats(string name)
+        {
+            if (String.IsNullOrWhiteSpace(name))
+                throw new ArgumentNullException(nameof(name));
+
+            PythonFunctorStats stats;
+            if (!StatsMap.TryGetValue(name, out stats))
+                StatsMap.Add(name, stats = new PythonFunctorStats(name));
+
+            return stats;
+        }
+
+        public void Reset()
+        {
+            StatsMap.Clear();
+        }
+
+        private readonly IDictionary<string, PythonFunctorStats> StatsMap = new Dictionary<string, PythonFunctorStats>();
+    }
+
+    /// <summary>
+    /// Call count and cumulative times of a Python function. Total time includes conversions of arguments and results;
+    /// calls that are served by a result cache or a prepared batch chunk have no conversion time.
+    /// </summary>
+    public class PythonFunctorStats
+    {
+        public PythonFunctorStats(string name)
+        {
+            Name = name;
+        }
+
+        public string Name { get; }
+        public long Calls { get; private set; }
+        public TimeSpan TotalTime => ToTimeSpan(TotalTicks);
+        public TimeSpan ArgumentConversionTime => ToTimeSpan(ArgumentConversionTicks);
+        public TimeSpan ReturnConversionTime => ToTimeSpan(ReturnConversionTicks);
+
+        public void AddCall(long elapsedTicks)
+        {
+            Calls++;
+            TotalTicks += elapsedTicks;
+        }
+
+        public void AddArgumentConversion(long elapsedTicks)
+        {
+            ArgumentConversionTicks += elapsedTicks;
+        }
+
+        public void AddReturnConversion(long elapsedTicks)
+        {
+            ReturnConversionTicks += elapsedTicks;
+        }
+
+        private static TimeSpan ToTimeSpan(long stopwatchTicks)
+        {
+            return TimeSpan.FromTicks((long)(stopwatchTicks * ((double)TimeSpan.TicksPerSecond / Stopwatch.Frequency)));
+        }
+
+        private long TotalTicks;
+        private long ArgumentConversionTicks;
+        private long ReturnConversionTicks;
+    }
+}
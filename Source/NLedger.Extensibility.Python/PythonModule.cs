@@ -45,6 +45,11 @@ namespace NLedger.Extensibility.Python
 
         public override string Description => ModuleName;
 
+        /// <summary>
+        /// Functors created for Python functions of the module that were referenced from expressions
+        /// </summary>
+        public IEnumerable<PythonFunctor> Functors => FunctorsMap.Values;
+
         public void DefineGlobal(string name, PyObject obj)
         {
             using(PythonSession.GIL())
@@ -90,7 +95,13 @@ namespace NLedger.Extensibility.Python
                             }
                             else
                             {
-                                return ExprOp.WrapFunctor(new PythonFunctor(name, obj, PythonSession.PythonValueConverter).ExprFunctor);
+                                // Expressions can be compiled for every evaluation (e.g. format elements), so functors are reused
+                                // while the name refers to the same Python object; they keep state between calls (e.g. batch results)
+                                PythonFunctor functor;
+                                if (!FunctorsMap.TryGetValue(name, out functor) || functor.Obj.Handle != obj.Handle)
+                                    FunctorsMap[name] = functor = new PythonFunctor(name, obj, PythonSession.PythonValueConverter, PythonSession.FunctorProfiler);
+
+                                return ExprOp.WrapFunctor(functor.ExprFunctor);
                             }
                         }
                     }
@@ -100,5 +111,6 @@ namespace NLedger.Extensibility.Python
             return null;
         }
 
+        private readonly IDictionary<string, PythonFunctor> FunctorsMap = new Dictionary<string, PythonFunctor>();
     }
 }
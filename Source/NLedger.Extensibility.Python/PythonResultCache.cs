@@ -0,0 +1,87 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Values;
+using System;
+using System.Collections.Generic;
+using System.Text;
+
+namespace NLedger.Extensibility.Python
+{
+    /// <summary>
+    /// Bounded LRU cache of results of a pure Python function (see ledger.pure) keyed by evaluated arguments.
+    /// A hit skips both the Python call and conversions of the arguments and the result.
+    /// </summary>
+    public class PythonResultCache
+    {
+        public const string CacheSizeAttribute = "__ledger_pure_cache_size__";
+
+        public PythonResultCache(int maxSize)
+        {
+            if (maxSize < 1)
+                throw new ArgumentException($"Cache size should be a positive number: {maxSize}", nameof(maxSize));
+
+            MaxSize = maxSize;
+        }
+
+        public int MaxSize { get; }
+        public int Count => Items.Count;
+        public long Hits { get; private set; }
+        public long Misses { get; private set; }
+        public long Evictions { get; private set; }
+
+        public bool TryGetValue(PythonArgumentList args, out Value val)
+        {
+            LinkedListNode<KeyValuePair<PythonArgumentList, Value>> node;
+            if (Items.TryGetValue(args, out node))
+            {
+                Order.Remove(node);
+                Order.AddLast(node);
+                Hits++;
+                val = node.Value.Value;
+                return true;
+            }
+
+            Misses++;
+            val = null;
+            return false;
+        }
+
+        public void Add(PythonArgumentList args, Value val)
+        {
+            LinkedListNode<KeyValuePair<PythonArgumentList, Value>> node;
+            if (Items.TryGetValue(args, out node))
+                Order.Remove(node);
+
+            Items[args] = Order.AddLast(new KeyValuePair<PythonArgumentList, Value>(args, val));
+
+            while (Items.Count > MaxSize)
+            {
+                Items.Remove(Order.First.Value.Key);
+                Order.RemoveFirst();
+                Evictions++;
+            }
+        }
+
+        public void Clear()
+        {
+            Items.Clear();
+            Order.Clear();
+        }
+
+        public void ResetStats()
+        {
+            Hits = 0;
+            Misses = 0;
+            Evictions = 0;
+        }
+
+        private readonly IDictionary<PythonArgumentList, LinkedListNode<KeyValuePair<PythonArgumentList, Value>>> Items = new Dictionary<PythonArgumentList, LinkedListNode<KeyValuePair<PythonArgumentList, Value>>>();
+        private readonly LinkedList<KeyValuePair<PythonArgumentList, Value>> Order = new LinkedList<KeyValuePair<PythonArgumentList, Value>>();
+    }
+}
@@ -65,6 +65,7 @@ namespace NLedger.Extensibility.Python
         public bool IsPythonHost => IsStandaloneSession;
         public IDictionary<PyModule, PythonModule> ModulesMap { get; } = new Dictionary<PyModule, PythonModule>();
         public IPythonValueConverter PythonValueConverter { get; }
+        public PythonFunctorProfiler FunctorProfiler { get; } = new PythonFunctorProfiler();
 
         public PythonSessionConnectionContext PythonSessionConnectionContext { get; private set; }
         public PythonModule MainModule => PythonSessionConnectionContext?.MainModule;
@@ -72,6 +73,15 @@ namespace NLedger.Extensibility.Python
 
         public IDisposable GIL() => Py.GIL();
 
+        /// <summary>
+        /// Returns functors of Python functions that were referenced from expressions (in the main module and imported modules)
+        /// </summary>
+        public IEnumerable<PythonFunctor> GetFunctors()
+        {
+            var modules = MainModule != null ? new[] { MainModule }.Concat(ModulesMap.Values) : ModulesMap.Values;
+            return modules.SelectMany(module => module.Functors).ToList();
+        }
+
         public PythonModule GetOrCreateModule(PyModule pyModule, string name)
         {
             PythonModule pythonModule;
@@ -219,11 +229,11 @@ namespace NLedger.Extensibility.Python
         {
             using (GIL())
             {
-                PyModule serverModule = null;
+                PyObject serverModule = null;
 
                 try
                 {
-                    serverModule = (PyModule)MainModule.ModuleObject.Import("ledger.server");
+                    serverModule = Py.Import("ledger.server");
                 }
                 catch
                 {
@@ -244,7 +254,8 @@ namespace NLedger.Extensibility.Python
 
                     try
                     {
-                        func.ExprFunctor(this);
+                        // Command arguments (e.g. 'ledger server -- --port 9000') are passed to main(*args) as strings
+                        func.ExprFunctor(args);
                         return Value.True;
                     }
                     catch
@@ -24,6 +24,7 @@ namespace NLedger.Extensibility.Python
         public PythonSession PythonSession { get; }
         public PythonModule MainModule { get; private set; }
         public PyModule LedgerModule { get; private set; }
+        public PythonConverterTable ConverterTable { get; private set; }
 
         public override void OnConnected(bool isPlatformInitialization)
         {
@@ -34,6 +35,7 @@ namespace NLedger.Extensibility.Python
             {
                 MainModule = new PythonModule(PythonSession, "__main__", Py.CreateScope());
                 LedgerModule = (PyModule)MainModule.ModuleObject.Import("ledger");
+                ConverterTable = new PythonConverterTable(LedgerModule);
 
                 if (!PythonSession.IsPythonHost && isPlatformInitialization)
                     LedgerModule.Exec("acquire_output_streams()");
@@ -33,6 +33,12 @@ namespace NLedger.Extensibility.Python
 
         public PythonSession PythonSession { get; }
 
+        /// <summary>
+        /// Conversion table of the connected session. Python objects of types that are not registered in the table
+        /// are converted by their type names.
+        /// </summary>
+        public PythonConverterTable ConverterTable => PythonSession.PythonSessionConnectionContext?.ConverterTable;
+
         /// <summary>
         /// Composed from object convert_value_to_python(const value_t& val)
         /// </summary>
@@ -95,6 +101,10 @@ namespace NLedger.Extensibility.Python
 
             using (PythonSession.GIL())
             {
+                Value val;
+                if (ConverterTable?.TryGetValue(obj, out val) == true)
+                    return val;
+
                 var pythonTypeName = obj.GetPythonTypeName();
 
                 if (pythonTypeName == "bool")
@@ -147,31 +157,63 @@ namespace NLedger.Extensibility.Python
             }
         }
 
-        public PyObject GetPyDate(Date date) => GetPyObject("to_pdate(value)", date);
-        public PyObject GetPyDateTime(DateTime dateTime) => GetPyObject("to_pdatetime(value)", dateTime);
-        public PyObject GetPyBool(bool val) => GetPyObject("bool(str(value)=='True')", val);
-        public PyObject GetPyInt(long val) => GetPyObject("int(str(value))", val);
+        public PyObject GetPyDate(Date date)
+        {
+            using (PythonSession.GIL())
+                return GetConverterTable().GetPyDate(date);
+        }
 
-        public PyObject GetPyAmount(Amounts.Amount amount) => GetPyObject("Amount.from_origin(value)", amount);
-        public PyObject GetPyBalance(Balance balance) => GetPyObject("Balance.from_origin(value)", balance);
-        public PyObject GetPyPost(Post post) => GetPyObject("Posting.from_origin(value)", post);
-        public PyObject GetPyXact(Xact xact) => GetPyObject("Transaction.from_origin(value)", xact);
-        public PyObject GetPyPeriodXact(PeriodXact periodXact) => GetPyObject("PeriodicTransaction.from_origin(value)", periodXact);
-        public PyObject GetPyAutoXact(AutoXact autoXact) => GetPyObject("AutomatedTransaction.from_origin(value)", autoXact);
-        public PyObject GetPyAccount(Account account) => GetPyObject("Account.from_origin(value)", account);
-        public PyObject GetPyValue(Value val) => GetPyObject("Value.to_value(value)", val);
+        public PyObject GetPyDateTime(DateTime dateTime)
+        {
+            using (PythonSession.GIL())
+                return GetConverterTable().GetPyDateTime(dateTime);
+        }
 
-        public Date GetDate(PyObject val) => GetPyObject("to_ndate(value)", val).As<Date>();
-        public DateTime GetDateTime(PyObject val) => GetPyObject("to_ndatetime(value)", val).As<DateTime>();
+        public PyObject GetPyBool(bool val)
+        {
+            using (PythonSession.GIL())
+                return val.ToPython();
+        }
 
-        private PyObject GetPyObject(string init_method, object val)
+        public PyObject GetPyInt(long val)
         {
             using (PythonSession.GIL())
-            {
-                var dict = new PyDict();
-                dict["value"] = (val as PyObject) ?? PyObject.FromManagedObject(val);
-                return PythonSession.LedgerModule.Eval(init_method, dict);
-            }
+                return val.ToPython();
+        }
+
+        public PyObject GetPyAmount(Amounts.Amount amount) => GetPyObject(amount);
+        public PyObject GetPyBalance(Balance balance) => GetPyObject(balance);
+        public PyObject GetPyPost(Post post) => GetPyObject(post);
+        public PyObject GetPyXact(Xact xact) => GetPyObject(xact);
+        public PyObject GetPyPeriodXact(PeriodXact periodXact) => GetPyObject(periodXact);
+        public PyObject GetPyAutoXact(AutoXact autoXact) => GetPyObject(autoXact);
+        public PyObject GetPyAccount(Account account) => GetPyObject(account);
+        public PyObject GetPyValue(Value val) => GetPyObject(val);
+
+        public Date GetDate(PyObject val)
+        {
+            using (PythonSession.GIL())
+                return GetConverterTable().ToNDate.Invoke(val).As<Date>();
+        }
+
+        public DateTime GetDateTime(PyObject val)
+        {
+            using (PythonSession.GIL())
+                return GetConverterTable().ToNDateTime.Invoke(val).As<DateTime>();
+        }
+
+        private PyObject GetPyObject(object val)
+        {
+            if (val == null)
+                return PyObject.FromManagedObject(null);
+
+            using (PythonSession.GIL())
+                return GetConverterTable().GetObject(val) ?? throw new InvalidOperationException($"No Python converter for type {val.GetType().Name}");
+        }
+
+        private PythonConverterTable GetConverterTable()
+        {
+            return ConverterTable ?? throw new InvalidOperationException("Python session is not initialized");
         }
 
     }
@@ -269,6 +269,23 @@ namespace NLedger.Tests.Accounts
             Assert.Null(account.FindAccountRe("child"));
         }
 
+        [Fact]
+        public void Account_FindAccountRe_LooksForAccountsByMask()
+        {
+            Account account = new Account(null, "root");
+            Account account1 = account.FindAccount("child");
+
+            Assert.Equal(account1, account.FindAccountRe(new Mask("CHI")));
+            Assert.Null(account.FindAccountRe(new Mask("unknown")));
+        }
+
+        [Fact]
+        public void Account_FindAccountRe_RequiresMask()
+        {
+            Account account = new Account(null, "root");
+            Assert.Throws<ArgumentNullException>(() => account.FindAccountRe((Mask)null));
+        }
+
         [Fact]
         public void Account_AddPost_AddsPostToPostsCollection()
         {
@@ -0,0 +1,151 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Extensibility;
+using NLedger.Extensibility.Net;
+using System;
+using System.Collections.Generic;
+using System.Linq;
+using System.Text;
+using System.Threading;
+using System.Threading.Tasks;
+using Xunit;
+
+namespace NLedger.Tests.Extensibility
+{
+    public class CommandOutputReaderTests
+    {
+        private static readonly string Input = @"
+2009/11/01 Panera Bread
+    Expenses:Food               $4.50
+    Assets:Checking
+
+2009/11/02 Bookstore
+    Expenses:Books              $20.00
+    Assets:Checking
+
+";
+
+        private static IList<string> ReadAll(CommandOutputReader reader)
+        {
+            var lines = new List<string>();
+            while (!reader.IsCompleted)
+            {
+                var line = reader.ReadLine(100);
+                if (line != null)
+                    lines.Add(line);
+            }
+            return lines;
+        }
+
+        [Fact]
+        public void CommandOutputReader_ReadLine_ReturnsOutputLines()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                MainApplicationContext.Current.IsAtty = false;
+                session.ReadJournalFromString(Input);
+                var expected = session.ExecuteCommand("reg").Output;
+
+                using (var reader = new CommandOutputReader(session, "reg"))
+                {
+                    var lines = ReadAll(reader);
+
+                    Assert.Equal(4, lines.Count);
+                    Assert.True(lines.All(line => line.EndsWith("\n")));
+                    Assert.Equal(expected, String.Concat(lines));
+                    Assert.Equal(String.Empty, reader.Error);
+                    Assert.True(reader.WaitForCompletion(1000));
+                }
+            }
+        }
+
+        [Fact]
+        public void CommandOutputReader_ReadLine_ReturnsErrors()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ReadJournalFromString(Input);
+                using (var reader = new CommandOutputReader(session, new string[] { "unknown-command" }))
+                {
+                    Assert.Empty(ReadAll(reader));
+                    Assert.Contains("Error:", reader.Error);
+                }
+            }
+        }
+
+        [Fact]
+        public void CommandOutputReader_Capacity_PausesCommand()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                MainApplicationContext.Current.IsAtty = false;
+                session.ReadJournalFromString(Input);
+                using (var reader = new CommandOutputReader(session, "reg", capacity: 1))
+                {
+                    Assert.False(reader.WaitForCompletion(200));
+                    Assert.Equal(4, ReadAll(reader).Count);
+                    Assert.True(reader.WaitForCompletion(1000));
+                }
+            }
+        }
+
+        [Fact]
+        public void CommandOutputReader_Notify_SignalsLinesAndCompletion()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                MainApplicationContext.Current.IsAtty = false;
+                session.ReadJournalFromString(Input);
+                var expected = session.ExecuteCommand("reg").Output;
+
+                var lines = new List<string>();
+                using (var available = new AutoResetEvent(false))
+                using (var reader = new CommandOutputReader(session, "reg", capacity: 1, notify: r => available.Set()))
+                {
+                    // Lines are read without waiting; the reader signals when the next line or the completion is available
+                    while (!reader.IsCompleted)
+                    {
+                        var line = reader.ReadLine(0);
+                        if (line != null)
+                            lines.Add(line);
+                        else
+                            Assert.True(available.WaitOne(1000));
+                    }
+                }
+
+                Assert.Equal(expected, String.Concat(lines));
+            }
+        }
+
+        [Fact]
+        public void CommandOutputReader_Dispose_InterruptsCommand()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                MainApplicationContext.Current.IsAtty = false;
+                session.ReadJournalFromString(Input);
+                var reader = new CommandOutputReader(session, "reg", capacity: 1);
+                Assert.NotNull(reader.ReadLine(1000));
+
+                reader.Dispose();
+                Assert.True(reader.WaitForCompletion(1000));
+                Assert.Equal(String.Empty, reader.Error);
+
+                // Session is still usable
+                Assert.Equal(String.Empty, session.ExecuteCommand("bal").Error);
+            }
+        }
+
+        [Fact]
+        public void CommandOutputReader_Constructor_RequiresSession()
+        {
+            Assert.Throws<ArgumentNullException>(() => new CommandOutputReader(null, "bal"));
+        }
+    }
+}
@@ -196,6 +196,19 @@ namespace NLedger.Tests.Extensibility.Export
             Assert.Equal(data.Xacts.Count, adapter.Origin.Count);
         }
 
+        [Fact]
+        public void ListAdapter_GetXactsView_ReflectsJournalChanges()
+        {
+            var data = new Journal();
+            var adapter = ListAdapter.GetXactsView(data);
+            Assert.Same(data.Xacts, adapter.Origin);
+
+            var xact = new Xact();
+            data.Xacts.Add(xact);
+            Assert.Equal(1, adapter.Count);
+            Assert.Same(xact, adapter[0]);
+        }
+
         [Fact]
         public void ListAdapter_GetAutoXacts_ReturnsAdapter()
         {
@@ -231,5 +244,41 @@ namespace NLedger.Tests.Extensibility.Export
             }
         }
 
+        [Fact]
+        public void ListAdapter_GetPostsCount_ReturnsNumberOfPosts()
+        {
+            var data = new Xact();
+            data.AddPost(new Post());
+            data.AddPost(new Post());
+            Assert.Equal(2, ListAdapter.GetPostsCount(data));
+            Assert.Equal(0, ListAdapter.GetPostsCount(null));
+        }
+
+        [Fact]
+        public void ListAdapter_GetAccountsCount_ReturnsNumberOfAccounts()
+        {
+            var data = new Account();
+            data.AddAccount(new Account(data, "child1"));
+            data.AddAccount(new Account(data, "child2"));
+            Assert.Equal(2, ListAdapter.GetAccountsCount(data));
+            Assert.Equal(0, ListAdapter.GetAccountsCount(null));
+        }
+
+        [Fact]
+        public void ListAdapter_GetAmountsCount_ReturnsNumberOfAmounts()
+        {
+            var data = new Balance();
+            Assert.Equal(data.Amounts.Count, ListAdapter.GetAmountsCount(data));
+            Assert.Equal(0, ListAdapter.GetAmountsCount(null));
+        }
+
+        [Fact]
+        public void ListAdapter_GetXactsCount_ReturnsNumberOfXacts()
+        {
+            var data = new Journal();
+            Assert.Equal(data.Xacts.Count, ListAdapter.GetXactsCount(data));
+            Assert.Equal(0, ListAdapter.GetXactsCount(null));
+        }
+
     }
 }
@@ -0,0 +1,109 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Extensibility.Export;
+using NLedger.Extensibility.Net;
+using System;
+using System.Collections.Generic;
+using System.Linq;
+using System.Text;
+using System.Threading.Tasks;
+using Xunit;
+
+namespace NLedger.Tests.Extensibility.Export
+{
+    public class PostColumnsTests
+    {
+        private static readonly string Input = @"
+2009/11/01 * Panera Bread
+    Expenses:Food               $4.50
+    Assets:Checking
+
+2009/11/02 Bookstore
+    Expenses:Books              10 EUR
+    Assets:Checking
+
+";
+
+        [Fact]
+        public void PostColumns_FromJournal_CollectsAllPosts()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ReadJournalFromString(Input);
+                var columns = PostColumns.FromJournal(session.Journal);
+
+                Assert.Equal(4, columns.Count);
+                Assert.Equal(new string[] { "Expenses:Food", "Assets:Checking", "Expenses:Books" }, columns.Accounts);
+                Assert.Equal(new int[] { 0, 1, 2, 1 }, columns.AccountIds);
+                Assert.Equal(new string[] { "$", "EUR" }, columns.Commodities);
+                Assert.Equal(new int[] { 0, 0, 1, 1 }, columns.CommodityIds);
+                Assert.Equal(new string[] { "Panera Bread", "Bookstore" }, columns.Payees);
+                Assert.Equal(new int[] { 0, 0, 1, 1 }, columns.PayeeIds);
+                Assert.Equal(new double[] { 4.5, -4.5, 10, -10 }, columns.Quantities);
+                Assert.Equal(new string[] { "4.5", "-4.5", "10", "-10" }, columns.ExactQuantities);
+                Assert.Equal(new int[] { 1, 1, 0, 0 }, columns.States);
+
+                var days = (long)(new DateTime(2009, 11, 1) - PostColumns.Epoch).TotalDays;
+                Assert.Equal(new long[] { days, days, days + 1, days + 1 }, columns.Dates);
+
+                Assert.Equal(columns.XactSeqs[0], columns.XactSeqs[1]);
+                Assert.NotEqual(columns.XactSeqs[1], columns.XactSeqs[2]);
+            }
+        }
+
+        [Fact]
+        public void PostColumns_FromJournal_CollectsQueriedPosts()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ReadJournalFromString(Input);
+                var columns = PostColumns.FromJournal(session.Journal, "^expenses:");
+
+                Assert.Equal(2, columns.Count);
+                Assert.Equal(new string[] { "Expenses:Food", "Expenses:Books" }, columns.Accounts);
+                Assert.Equal(new double[] { 4.5, 10 }, columns.Quantities);
+            }
+        }
+
+        [Fact]
+        public void PostColumns_ExactQuantities_KeepFullPrecision()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ReadJournalFromString(@"
+2009/11/01 Exchange
+    Assets:Broker               1,000.123456789 ABC
+    Assets:Checking             -3 EUR @ $1.2345
+    Assets:Checking
+");
+                var columns = PostColumns.FromJournal(session.Journal);
+
+                Assert.Equal(new string[] { "1000.123456789", "-3", "3.7035", "-1000.123456789" }, columns.ExactQuantities);
+                Assert.Equal(new string[] { "ABC", "EUR", "$" }, columns.Commodities);
+                Assert.Equal(new int[] { 0, 1, 2, 0 }, columns.CommodityIds);
+            }
+        }
+
+        [Fact]
+        public void PostColumns_FromPosts_HandlesEmptySequence()
+        {
+            var columns = PostColumns.FromPosts(Enumerable.Empty<Post>());
+
+            Assert.Equal(0, columns.Count);
+            Assert.Empty(columns.Dates);
+            Assert.Empty(columns.Accounts);
+        }
+
+        [Fact]
+        public void PostColumns_FromPosts_RequiresPosts()
+        {
+            Assert.Throws<ArgumentNullException>(() => PostColumns.FromPosts(null));
+        }
+    }
+}
@@ -0,0 +1,130 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Extensibility;
+using NLedger.Extensibility.Export;
+using NLedger.Extensibility.Net;
+using NLedger.Utility;
+using System;
+using System.Collections.Generic;
+using System.Linq;
+using System.Text;
+using System.Threading.Tasks;
+using Xunit;
+
+namespace NLedger.Tests.Extensibility.Export
+{
+    public class ReportRowsTests
+    {
+        private static readonly string Input = @"
+2009/11/01 * Panera Bread
+    Expenses:Food               $4.50
+    Assets:Checking
+
+2009/11/02 Bookstore
+    Expenses:Books              $20.00
+    Assets:Checking
+
+2009/12/05 Market
+    Expenses:Food               $1.123
+    Assets:Checking
+
+";
+
+        [Fact]
+        public void ReportRows_Balance_CollectsAccountRows()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ReadJournalFromString(Input);
+                var rows = new ReportRows();
+                var result = session.ExecuteCommand(new string[] { "bal", "^Expenses" }, rows);
+
+                Assert.Equal(String.Empty, result.Error);
+                Assert.Equal(new string[] { "Expenses", "Expenses:Books", "Expenses:Food" }, rows.AccountRows.Select(r => r.Account).ToArray());
+                Assert.Equal(new string[] { "$25.623", "$20.000", "$5.623" }, rows.AccountRows.Select(r => r.Total.SingleAmount.ToString()).ToArray());
+                Assert.Empty(rows.PostRows);
+            }
+        }
+
+        [Fact]
+        public void ReportRows_Balance_KeepsFullPrecision()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ReadJournalFromString(Input);
+                var rows = new ReportRows();
+                session.ExecuteCommand(new string[] { "bal", "Food" }, rows);
+
+                Assert.Equal("Expenses:Food", rows.AccountRows.Single().Account);
+                Assert.Equal("5.623", rows.AccountRows.Single().Total.SingleAmount.Number().ToString());
+            }
+        }
+
+        [Fact]
+        public void ReportRows_Balance_HandlesReportOptions()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ReadJournalFromString(Input);
+                var rows = new ReportRows();
+                session.ExecuteCommand(new string[] { "bal", "--depth", "1" }, rows);
+
+                Assert.Equal(new string[] { "Assets", "Expenses" }, rows.AccountRows.Select(r => r.Account).ToArray());
+            }
+        }
+
+        [Fact]
+        public void ReportRows_Register_CollectsPostRows()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ReadJournalFromString(Input);
+                var rows = new ReportRows();
+                var result = session.ExecuteCommand(new string[] { "reg", "^Expenses" }, rows);
+
+                Assert.Equal(String.Empty, result.Error);
+                Assert.Equal(3, rows.PostRows.Count);
+                Assert.Equal(new Date(2009, 11, 1), rows.PostRows[0].Date);
+                Assert.Equal("Panera Bread", rows.PostRows[0].Payee);
+                Assert.Equal("Expenses:Food", rows.PostRows[0].Account);
+                Assert.Equal("$4.500", rows.PostRows[0].Amount.ToString());
+                Assert.Equal(new string[] { "$4.500", "$24.500", "$25.623" }, rows.PostRows.Select(r => r.Total.SingleAmount.ToString()).ToArray());
+                Assert.Empty(rows.AccountRows);
+            }
+        }
+
+        [Fact]
+        public void ReportRows_Register_HandlesReportOptions()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ReadJournalFromString(Input);
+                var rows = new ReportRows();
+                session.ExecuteCommand(new string[] { "reg", "^Expenses", "--monthly" }, rows);
+
+                Assert.Equal(new Date[] { new Date(2009, 11, 1), new Date(2009, 11, 1), new Date(2009, 12, 1) }, rows.PostRows.Select(r => r.Date).ToArray());
+                Assert.Equal(new string[] { "$20.000", "$4.500", "$1.123" }, rows.PostRows.Select(r => r.Amount.ToString()).ToArray());
+            }
+        }
+
+        [Fact]
+        public void ReportRows_ExecuteCommand_RejectsUnsupportedCommands()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ReadJournalFromString(Input);
+                var rows = new ReportRows();
+                var result = session.ExecuteCommand(new string[] { "print" }, rows);
+
+                Assert.Contains("Error:", result.Error);
+                Assert.Empty(rows.PostRows);
+            }
+        }
+    }
+}
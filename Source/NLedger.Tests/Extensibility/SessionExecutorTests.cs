@@ -0,0 +1,223 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Extensibility;
+using NLedger.Extensibility.Export;
+using NLedger.Extensibility.Net;
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.Linq;
+using System.Text;
+using System.Threading;
+using System.Threading.Tasks;
+using Xunit;
+
+namespace NLedger.Tests.Extensibility
+{
+    public class SessionExecutorTests
+    {
+        private static readonly string Input = @"
+2009/11/01 Panera Bread
+    Expenses:Food               $4.50
+    Assets:Checking
+
+";
+
+        [Fact]
+        public void SessionExecutor_ExecuteCommand_ReturnsCommandResult()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                MainApplicationContext.Current.IsAtty = false;
+                session.ReadJournalFromString(Input);
+                using (var executor = new SessionExecutor(session))
+                {
+                    SessionOperation notified = null;
+                    var operation = executor.ExecuteCommand("bal ^Expenses", completed: op => notified = op);
+
+                    Assert.True(operation.Wait(5000));
+                    Assert.Equal(SessionOperationStatus.Completed, operation.Status);
+                    Assert.Equal("$4.50  Expenses:Food", ((SessionExtensions.CommandExecutionResult)operation.Result).Output.Trim());
+
+                    SpinWait.SpinUntil(() => notified != null, 5000);
+                    Assert.Equal(operation, notified);
+                }
+            }
+        }
+
+        [Fact]
+        public void SessionExecutor_ExecuteCommands_ReturnsCommandResults()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                MainApplicationContext.Current.IsAtty = false;
+                session.ReadJournalFromString(Input);
+                using (var executor = new SessionExecutor(session))
+                {
+                    var operation = executor.ExecuteCommands(new[] { new[] { "bal", "^Expenses" }, new[] { "unknown-command" } });
+
+                    Assert.True(operation.Wait(5000));
+                    var results = (IList<SessionExtensions.BatchCommandResult>)operation.Result;
+                    Assert.Equal(2, results.Count);
+                    Assert.Equal("$4.50  Expenses:Food", results[0].Output.Trim());
+                    Assert.False(String.IsNullOrEmpty(results[1].Error));
+                }
+            }
+        }
+
+        [Fact]
+        public void SessionExecutor_ExecuteCommand_FillsReportRows()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ReadJournalFromString(Input);
+                using (var executor = new SessionExecutor(session))
+                {
+                    var rows = new ReportRows();
+                    var operation = executor.ExecuteCommand("reg ^Expenses", rows);
+
+                    Assert.True(operation.Wait(5000));
+                    Assert.True(String.IsNullOrEmpty(((SessionExtensions.CommandExecutionResult)operation.Result).Error));
+                    Assert.Equal("Expenses:Food", rows.PostRows.Single().Account);
+                }
+            }
+        }
+
+        [Fact]
+        public void SessionExecutor_ReadJournal_ReadsJournalFile()
+        {
+            var fileName = Path.GetTempFileName();
+            try
+            {
+                File.WriteAllText(fileName, Input);
+                using (var session = NetSession.CreateStandaloneSession())
+                using (var executor = new SessionExecutor(session))
+                {
+                    var readJournal = executor.ReadJournal(fileName);
+                    var query = executor.Query("expenses");
+
+                    Assert.True(query.Wait(5000));
+                    Assert.Equal(session.Journal, readJournal.Result);
+                    Assert.Equal("Expenses:Food", ((IList<Post>)query.Result).Single().Account.FullName);
+                }
+            }
+            finally
+            {
+                File.Delete(fileName);
+            }
+        }
+
+        [Fact]
+        public void SessionExecutor_Query_RunsJournalQuery()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                var journal = session.ReadJournalFromString(Input);
+                using (var executor = new SessionExecutor(session))
+                {
+                    var query = executor.Query(journal, "food");
+
+                    Assert.True(query.Wait(5000));
+                    Assert.Equal("Expenses:Food", ((IList<Post>)query.Result).Single().Account.FullName);
+                }
+            }
+        }
+
+        [Fact]
+        public void SessionExecutor_IsExecutorThread_IndicatesWorkerThread()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            using (var executor = new SessionExecutor(session))
+            {
+                var operation = executor.Submit(() => executor.IsExecutorThread);
+
+                Assert.True(operation.Wait(5000));
+                Assert.True((bool)operation.Result);
+                Assert.False(executor.IsExecutorThread);
+            }
+        }
+
+        [Fact]
+        public void SessionExecutor_Submit_ReturnsExceptions()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            using (var executor = new SessionExecutor(session))
+            {
+                var operation = executor.Submit(() => { throw new InvalidOperationException("test-error"); });
+
+                Assert.True(operation.Wait(5000));
+                Assert.Equal(SessionOperationStatus.Failed, operation.Status);
+                Assert.Equal("test-error", operation.Exception.Message);
+            }
+        }
+
+        [Fact]
+        public void SessionExecutor_Cancel_SkipsQueuedOperations()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            using (var executor = new SessionExecutor(session))
+            using (var release = new ManualResetEventSlim())
+            {
+                var blocking = executor.Submit(() => { release.Wait(); return null; });
+                var queued = executor.Submit(() => "should-not-run");
+
+                Assert.True(queued.Cancel());
+                release.Set();
+
+                Assert.True(queued.Wait(5000));
+                Assert.True(queued.IsCanceled);
+                Assert.Null(queued.Result);
+                Assert.Equal(SessionOperationStatus.Completed, blocking.Status);
+                Assert.False(queued.Cancel());
+            }
+        }
+
+        [Fact]
+        public void SessionExecutor_Cancel_InterruptsRunningOperation()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            using (var executor = new SessionExecutor(session))
+            using (var started = new ManualResetEventSlim())
+            {
+                var running = executor.Submit(() =>
+                {
+                    started.Set();
+                    while (true)
+                    {
+                        NLedger.Utils.CancellationManager.CheckForSignal();
+                        Thread.Sleep(10);
+                    }
+                });
+
+                Assert.True(started.Wait(5000));
+                Assert.True(running.Cancel());
+                Assert.True(running.Wait(5000));
+                Assert.True(running.IsCanceled);
+
+                // The cancellation signal is discarded after the operation
+                var next = executor.Submit(() => "next");
+                Assert.True(next.Wait(5000));
+                Assert.Equal("next", next.Result);
+            }
+        }
+
+        [Fact]
+        public void SessionExecutor_Dispose_RejectsNewOperations()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                var executor = new SessionExecutor(session);
+                executor.Dispose();
+
+                Assert.True(executor.WaitForCompletion(5000));
+                Assert.Throws<ObjectDisposedException>(() => executor.Submit(() => null));
+            }
+        }
+    }
+}
@@ -74,5 +74,83 @@ namespace NLedger.Tests.Extensibility
             }
         }
 
+        [Fact]
+        public void SessionExtensions_ExecuteCommands_ReturnsResultsForEveryCommand()
+        {
+            using (var session = NLedger.Extensibility.Net.NetSession.CreateStandaloneSession())
+            {
+                MainApplicationContext.Current.IsAtty = false;
+                session.ReadJournalFromString(Input);
+                var results = session.ExecuteCommands(new string[] { "bal ^Expenses", "unknown-command", "bal ^Assets" });
+
+                Assert.Equal(3, results.Count);
+                Assert.Equal("$4.50  Expenses:Food", results[0].Output.Trim());
+                Assert.Equal(String.Empty, results[0].Error);
+                Assert.Equal(String.Empty, results[1].Output);
+                Assert.Contains("Error:", results[1].Error);
+                Assert.Equal("$-4.50  Assets:Checking", results[2].Output.Trim());
+                Assert.True(results.All(r => r.ExecutionTime > TimeSpan.Zero));
+            }
+        }
+
+        [Fact]
+        public void SessionExtensions_ExecuteCommands_ReadsJournalFilesOnce()
+        {
+            var fileName = System.IO.Path.GetTempFileName();
+            try
+            {
+                System.IO.File.WriteAllText(fileName, Input);
+                using (var session = NLedger.Extensibility.Net.NetSession.CreateStandaloneSession())
+                {
+                    MainApplicationContext.Current.IsAtty = false;
+                    session.FileHandler.DataFiles.Add(fileName);
+                    var results = session.ExecuteCommands(new string[][] { new string[] { "bal", "^Expenses" }, new string[] { "bal", "^Expenses" } }, true);
+
+                    Assert.Equal("$4.50  Expenses:Food", results[0].Output.Trim());
+                    Assert.Equal("$4.50  Expenses:Food", results[1].Output.Trim());
+                    Assert.Equal(1, session.Journal.Xacts.Count);
+                }
+            }
+            finally
+            {
+                System.IO.File.Delete(fileName);
+            }
+        }
+
+        [Fact]
+        public void SessionExtensions_ExecuteCommand_WritesToOutputWriter()
+        {
+            using (var session = NLedger.Extensibility.Net.NetSession.CreateStandaloneSession())
+            {
+                MainApplicationContext.Current.IsAtty = false;
+                session.ReadJournalFromString(Input);
+                using (var output = new System.IO.StringWriter())
+                {
+                    var result = session.ExecuteCommand(new string[] { "bal", "^Expenses" }, output);
+                    Assert.Equal("$4.50  Expenses:Food", output.ToString().Trim());
+                    Assert.Equal(String.Empty, result.Output);
+                    Assert.Equal(String.Empty, result.Error);
+
+                    // The writer is not closed by the command
+                    output.Write("more");
+                }
+            }
+        }
+
+        [Fact]
+        public void SessionExtensions_ExecuteCommand_ReturnsErrorForOutputWriter()
+        {
+            using (var session = NLedger.Extensibility.Net.NetSession.CreateStandaloneSession())
+            {
+                session.ReadJournalFromString(Input);
+                using (var output = new System.IO.StringWriter())
+                {
+                    var result = session.ExecuteCommand(new string[] { "unknown-command" }, output);
+                    Assert.Equal(String.Empty, output.ToString());
+                    Assert.Contains("Error:", result.Error);
+                }
+            }
+        }
+
     }
 }
@@ -0,0 +1,122 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Extensibility;
+using NLedger.Extensibility.Net;
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.Linq;
+using System.Text;
+using System.Threading;
+using System.Threading.Tasks;
+using Xunit;
+
+namespace NLedger.Tests.Extensibility
+{
+    public class SessionPoolTests
+    {
+        private static readonly string Input = @"
+2009/11/01 Panera Bread
+    Expenses:Food               $4.50
+    Assets:Checking
+
+";
+
+        [Fact]
+        public void SessionPool_Constructor_CreatesIndependentSessions()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            using (var pool = new SessionPool(3))
+            {
+                Assert.Equal(3, pool.Size);
+                Assert.Equal(3, pool.Executors.Select(executor => executor.Session).Distinct().Count());
+                Assert.DoesNotContain(session, pool.Executors.Select(executor => executor.Session));
+            }
+        }
+
+        [Fact]
+        public void SessionPool_Constructor_RequiresPositiveSize()
+        {
+            Assert.Throws<ArgumentOutOfRangeException>(() => new SessionPool(0));
+        }
+
+        [Fact]
+        public void SessionPool_ExecuteCommand_RunsOnAnySession()
+        {
+            var fileName = Path.GetTempFileName();
+            try
+            {
+                File.WriteAllText(fileName, Input);
+                using (var session = NetSession.CreateStandaloneSession())
+                {
+                    MainApplicationContext.Current.IsAtty = false;
+                    using (var pool = new SessionPool(2))
+                    {
+                        var journals = pool.ReadJournal(fileName);
+                        Assert.True(journals.All(operation => operation.Wait(5000) && operation.Status == SessionOperationStatus.Completed));
+                        Assert.Equal(2, journals.Select(operation => operation.Result).Distinct().Count());
+
+                        var operations = Enumerable.Range(0, 6).Select(i => pool.ExecuteCommand("bal ^Expenses")).ToList();
+                        var query = pool.Query("expenses");
+
+                        foreach (var operation in operations)
+                        {
+                            Assert.True(operation.Wait(5000));
+                            Assert.Equal("$4.50  Expenses:Food", ((SessionExtensions.CommandExecutionResult)operation.Result).Output.Trim());
+                        }
+                        Assert.True(query.Wait(5000));
+                        Assert.Equal("Expenses:Food", ((IList<Post>)query.Result).Single().Account.FullName);
+                    }
+                }
+            }
+            finally
+            {
+                File.Delete(fileName);
+            }
+        }
+
+        [Fact]
+        public void SessionPool_Submit_RunsOperationsConcurrently()
+        {
+            using (var pool = new SessionPool(2))
+            using (var barrier = new Barrier(2))
+            {
+                var first = pool.Submit(session => barrier.SignalAndWait(5000) ? session : null);
+                var second = pool.Submit(session => barrier.SignalAndWait(5000) ? session : null);
+
+                Assert.True(first.Wait(10000));
+                Assert.True(second.Wait(10000));
+                Assert.NotNull(first.Result);
+                Assert.NotNull(second.Result);
+                Assert.NotEqual(first.Result, second.Result);
+            }
+        }
+
+        [Fact]
+        public void SessionPool_Dispose_CancelsQueuedOperations()
+        {
+            var pool = new SessionPool(1);
+            using (var started = new ManualResetEventSlim())
+            using (var release = new ManualResetEventSlim())
+            {
+                var blocking = pool.Submit(session => { started.Set(); release.Wait(); return null; });
+                var queued = pool.Submit(session => "should-not-run");
+
+                Assert.True(started.Wait(5000));
+                pool.Dispose();
+                release.Set();
+
+                Assert.True(pool.WaitForCompletion(5000));
+                Assert.Equal(SessionOperationStatus.Completed, blocking.Status);
+                Assert.True(queued.IsCanceled);
+                Assert.Throws<ObjectDisposedException>(() => pool.Submit(session => null));
+            }
+        }
+    }
+}
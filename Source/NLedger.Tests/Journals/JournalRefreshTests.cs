@@ -0,0 +1,419 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Extensibility;
+using NLedger.Extensibility.Net;
+using NLedger.Journals;
+using System;
+using System.IO;
+using System.Linq;
+using System.Text;
+using Xunit;
+
+namespace NLedger.Tests.Journals
+{
+    public class JournalRefreshTests : IDisposable
+    {
+        private const string MainFile = @"
+include prices.dat
+
+2010/01/01 * Opening balance
+    Assets:Checking                   $1,000.00
+    Equity:Opening Balances
+
+2010/01/15 Grocery
+    Expenses:Food                        $45.20
+    Assets:Checking
+
+include food.dat
+
+2010/01/31 Employer
+    Assets:Checking                   $2,000.00
+    Income:Salary
+";
+
+        private const string FoodFile = @"
+2010/01/16 Bakery
+    Expenses:Food                         $5.00
+    Assets:Checking
+
+2010/01/17 Butcher
+    Expenses:Food                        $12.00
+    Assets:Checking
+";
+
+        private const string PricesFile = @"
+P 2010/01/01 EUR $1.40
+";
+
+        private const string AppendedText = @"
+2010/02/01 Restaurant
+    Expenses:Food                         20.00 EUR
+    Assets:Checking
+
+P 2010/02/01 EUR $1.35
+";
+
+        private static readonly string[] Commands =
+        {
+            "bal", "reg", "print", "prices", "reg --exchange $", "accounts", "commodities",
+            "reg --format \"%(filename):%(beg_line)-%(end_line):%(beg_pos)-%(end_pos) %(payee)\\n\""
+        };
+
+        public JournalRefreshTests()
+        {
+            Folder = Path.Combine(Path.GetTempPath(), "nledger-refresh-tests-" + Guid.NewGuid().ToString("N"));
+            Directory.CreateDirectory(Folder);
+
+            File.WriteAllText(Path.Combine(Folder, "main.dat"), MainFile);
+            File.WriteAllText(Path.Combine(Folder, "prices.dat"), PricesFile);
+            File.WriteAllText(Path.Combine(Folder, "food.dat"), FoodFile);
+        }
+
+        public string Folder { get; }
+        public string JournalFile => Path.Combine(Folder, "main.dat");
+
+        public void Dispose()
+        {
+            if (Directory.Exists(Folder))
+                Directory.Delete(Folder, true);
+        }
+
+        [Fact]
+        public void Session_RefreshJournal_ReturnsNotChangedForSameFiles()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                var journal = session.ReadJournal(JournalFile);
+
+                Assert.Equal(JournalRefreshStatusEnum.NotChanged, session.RefreshJournal());
+                Assert.Same(journal, session.Journal);
+                Assert.Equal(5, journal.Xacts.Count);
+            }
+        }
+
+        [Fact]
+        public void Session_RefreshJournal_ParsesAppendedTransactions()
+        {
+            string output;
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                var journal = session.ReadJournal(JournalFile);
+                var firstXact = journal.Xacts.First();
+
+                File.AppendAllText(JournalFile, AppendedText);
+
+                Assert.Equal(JournalRefreshStatusEnum.Appended, session.RefreshJournal());
+                Assert.Same(journal, session.Journal);
+                Assert.Same(firstXact, journal.Xacts.First());
+                Assert.Equal(new[] { "Opening balance", "Grocery", "Bakery", "Butcher", "Employer", "Restaurant" }, journal.Xacts.Select(xact => xact.Payee));
+                Assert.Equal(new FileInfo(JournalFile).Length, journal.Sources.Single(source => source.FileName == JournalFile).Size);
+                output = RunCommands(session);
+
+                Assert.Equal(JournalRefreshStatusEnum.NotChanged, session.RefreshJournal());
+            }
+
+            Assert.Equal(ReadAndRunCommands(), output);
+        }
+
+        [Fact]
+        public void Session_RefreshJournal_ParsesSeveralAppends()
+        {
+            string output;
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                var journal = session.ReadJournal(JournalFile);
+
+                File.AppendAllText(JournalFile, AppendedText);
+                Assert.Equal(JournalRefreshStatusEnum.Appended, session.RefreshJournal());
+
+                File.AppendAllText(JournalFile, AppendedText.Replace("Restaurant", "Cafe"));
+                Assert.Equal(JournalRefreshStatusEnum.Appended, session.RefreshJournal());
+
+                Assert.Same(journal, session.Journal);
+                Assert.Equal(new[] { "Opening balance", "Grocery", "Bakery", "Butcher", "Employer", "Restaurant", "Cafe" }, journal.Xacts.Select(xact => xact.Payee));
+                output = RunCommands(session);
+            }
+
+            Assert.Equal(ReadAndRunCommands(), output);
+        }
+
+        [Fact]
+        public void Session_RefreshJournal_ReloadsRewrittenFiles()
+        {
+            string output;
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                var journal = session.ReadJournal(JournalFile);
+
+                File.WriteAllText(JournalFile, MainFile.Replace("Grocery", "Groceries") + AppendedText);
+
+                Assert.Equal(JournalRefreshStatusEnum.Reloaded, session.RefreshJournal());
+                Assert.NotSame(journal, session.Journal);
+                Assert.Equal(new[] { "Opening balance", "Groceries", "Bakery", "Butcher", "Employer", "Restaurant" }, session.Journal.Xacts.Select(xact => xact.Payee));
+                output = RunCommands(session);
+            }
+
+            Assert.Equal(ReadAndRunCommands(), output);
+        }
+
+        [Fact]
+        public void Session_RefreshJournal_ReloadsIfIncludedFileIsChanged()
+        {
+            string output;
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                var journal = session.ReadJournal(JournalFile);
+
+                File.AppendAllText(Path.Combine(Folder, "prices.dat"), "P 2010/03/01 EUR $1.30\n");
+
+                Assert.Equal(JournalRefreshStatusEnum.Reloaded, session.RefreshJournal());
+                Assert.NotSame(journal, session.Journal);
+                output = RunCommands(session);
+            }
+
+            Assert.Equal(ReadAndRunCommands(), output);
+        }
+
+        [Fact]
+        public void Session_RefreshJournal_ParsesChangedFilesWithTransactionsOnly()
+        {
+            string output;
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                var journal = session.ReadJournal(JournalFile);
+                var firstXact = journal.Xacts.First();
+                var lastXact = journal.Xacts.Last();
+
+                File.WriteAllText(Path.Combine(Folder, "food.dat"), FoodFile.Replace("Butcher", "Fishmonger").Replace("$12.00", "$14.00") + AppendedText.Replace("P 2010/02/01 EUR $1.35", ""));
+
+                Assert.Equal(JournalRefreshStatusEnum.PartiallyReloaded, session.RefreshJournal());
+                Assert.Same(journal, session.Journal);
+                Assert.Same(firstXact, journal.Xacts.First());
+                Assert.Same(lastXact, journal.Xacts.Last());
+                Assert.Equal(new[] { "Opening balance", "Grocery", "Bakery", "Fishmonger", "Restaurant", "Employer" }, journal.Xacts.Select(xact => xact.Payee));
+                Assert.Equal(4, journal.FindAccount("Expenses:Food").Posts.Count);
+                output = RunCommands(session);
+
+                Assert.Equal(JournalRefreshStatusEnum.NotChanged, session.RefreshJournal());
+            }
+
+            Assert.Equal(ReadAndRunCommands(), output);
+        }
+
+        [Fact]
+        public void Session_RefreshJournal_ReloadsFilesWithDirectives()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                var journal = session.ReadJournal(JournalFile);
+
+                File.WriteAllText(Path.Combine(Folder, "food.dat"), "account Expenses:Food\n" + FoodFile);
+                Assert.Equal(JournalRefreshStatusEnum.Reloaded, session.RefreshJournal());
+
+                File.WriteAllText(Path.Combine(Folder, "food.dat"), FoodFile);
+                Assert.Equal(JournalRefreshStatusEnum.Reloaded, session.RefreshJournal());
+
+                File.WriteAllText(Path.Combine(Folder, "food.dat"), FoodFile.Replace("Butcher", "Fishmonger"));
+                Assert.Equal(JournalRefreshStatusEnum.PartiallyReloaded, session.RefreshJournal());
+            }
+        }
+
+        [Fact]
+        public void Session_RefreshJournal_ReloadsFilesWithPricesOrCosts()
+        {
+            const string exchangeXact = "\n2010/01/18 Exchange\n    Assets:Euro                          10.00 EUR @ $1.45\n    Assets:Checking\n";
+
+            AssertRefreshMatchesReading(JournalRefreshStatusEnum.Reloaded, FoodFile, FoodFile + exchangeXact);
+            AssertRefreshMatchesReading(JournalRefreshStatusEnum.Reloaded, FoodFile + exchangeXact, FoodFile + exchangeXact.Replace("$1.45", "$1.50"));
+            AssertRefreshMatchesReading(JournalRefreshStatusEnum.Reloaded, FoodFile + exchangeXact, FoodFile);
+            AssertRefreshMatchesReading(JournalRefreshStatusEnum.Reloaded, FoodFile, FoodFile + "\nP 2010/01/20 EUR $1.50\n");
+            AssertRefreshMatchesReading(JournalRefreshStatusEnum.Reloaded, FoodFile + "\nP 2010/01/20 EUR $1.50\n", FoodFile + "\nP 2010/01/20 EUR $1.55\n");
+        }
+
+        [Fact]
+        public void Session_RefreshJournal_ReloadsIfAccountsOrCommoditiesAreNotUsed()
+        {
+            var changedFile = FoodFile.Replace("Expenses:Food                        $12.00", "Expenses:Meat                        12.00 CAD");
+            var changedAccountFile = FoodFile.Replace("Expenses:Food                        $12.00", "Expenses:Meat                        $12.00");
+
+            AssertRefreshMatchesReading(JournalRefreshStatusEnum.PartiallyReloaded, FoodFile, changedFile);
+            AssertRefreshMatchesReading(JournalRefreshStatusEnum.Reloaded, changedFile, FoodFile);
+            AssertRefreshMatchesReading(JournalRefreshStatusEnum.Reloaded, changedAccountFile, FoodFile);
+        }
+
+        [Fact]
+        public void Session_RefreshJournal_ReloadsIfRemovedAmountsHadLargestPrecision()
+        {
+            var preciseFile = FoodFile.Replace("$5.00", "$5.12345");
+
+            AssertRefreshMatchesReading(JournalRefreshStatusEnum.PartiallyReloaded, FoodFile, preciseFile);
+            AssertRefreshMatchesReading(JournalRefreshStatusEnum.Reloaded, preciseFile, FoodFile);
+            AssertRefreshMatchesReading(JournalRefreshStatusEnum.PartiallyReloaded, preciseFile, preciseFile.Replace("Butcher", "Fishmonger"));
+        }
+
+        [Fact]
+        public void Session_RefreshJournal_RenumbersItemsThatFollowChangedFiles()
+        {
+            const string bookstoreXact = "\n2010/01/18 Bookstore\n    Expenses:Books                       $15.00\n    Assets:Checking\n";
+
+            AssertRefreshMatchesReading(JournalRefreshStatusEnum.PartiallyReloaded, FoodFile, FoodFile + bookstoreXact + bookstoreXact.Replace("Bookstore", "Library"));
+            AssertRefreshMatchesReading(JournalRefreshStatusEnum.PartiallyReloaded, FoodFile, bookstoreXact);
+        }
+
+        [Fact]
+        public void Session_RefreshJournal_ParsesAppendedTransactionsAfterChangedFiles()
+        {
+            string[] sequences;
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ReadJournal(JournalFile);
+
+                File.WriteAllText(Path.Combine(Folder, "food.dat"), FoodFile.Replace("Butcher", "Fishmonger") + "\n2010/01/18 Bookstore\n    Expenses:Books  $15.00\n    Assets:Checking\n");
+                Assert.Equal(JournalRefreshStatusEnum.PartiallyReloaded, session.RefreshJournal());
+
+                // Appended transactions continue numbering of the data file
+                File.AppendAllText(JournalFile, "\n2010/02/02 Cinema\n    Expenses:Books  $10.00\n    Assets:Checking\n");
+                Assert.Equal(JournalRefreshStatusEnum.Appended, session.RefreshJournal());
+                sequences = GetSequences(session.Journal);
+            }
+
+            Assert.Equal(ReadSequences(), sequences);
+        }
+
+        [Fact]
+        public void Session_RefreshJournal_ReloadsFilesIncludedInApplyBlocks()
+        {
+            File.WriteAllText(JournalFile, MainFile.Replace("include food.dat", "apply account Personal\ninclude food.dat\nend apply account"));
+
+            string output;
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                var journal = session.ReadJournal(JournalFile);
+
+                File.WriteAllText(Path.Combine(Folder, "food.dat"), FoodFile.Replace("Butcher", "Fishmonger"));
+
+                Assert.Equal(JournalRefreshStatusEnum.Reloaded, session.RefreshJournal());
+                Assert.NotSame(journal, session.Journal);
+                output = RunCommands(session);
+            }
+
+            Assert.Equal(ReadAndRunCommands(), output);
+        }
+
+        [Fact]
+        public void Session_GetJournalFiles_ReturnsParsedFiles()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ReadJournal(JournalFile);
+                Assert.Equal(new[] { "main.dat", "prices.dat", "food.dat" }, session.GetJournalFiles().Select(Path.GetFileName));
+            }
+        }
+
+        [Fact]
+        public void Session_RefreshJournal_ReloadsIfFileEndsInsideBlock()
+        {
+            File.AppendAllText(JournalFile, "\napply account Personal\n");
+
+            string output;
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                var journal = session.ReadJournal(JournalFile);
+
+                File.AppendAllText(JournalFile, AppendedText);
+
+                Assert.Equal(JournalRefreshStatusEnum.Reloaded, session.RefreshJournal());
+                Assert.NotSame(journal, session.Journal);
+                output = RunCommands(session);
+            }
+
+            Assert.Equal(ReadAndRunCommands(), output);
+        }
+
+        [Fact]
+        public void Session_RefreshJournal_ReloadsIfAppendedTextHasDirectives()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                var journal = session.ReadJournal(JournalFile);
+
+                File.AppendAllText(JournalFile, "\nalias Food=Expenses:Food\n" + AppendedText);
+
+                Assert.Equal(JournalRefreshStatusEnum.Reloaded, session.RefreshJournal());
+                Assert.NotSame(journal, session.Journal);
+            }
+        }
+
+        [Fact]
+        public void Session_RefreshJournal_RequiresJournalFiles()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ReadJournalFromString(MainFile.Replace("include prices.dat", "").Replace("include food.dat", ""));
+                Assert.Throws<InvalidOperationException>(() => session.RefreshJournal());
+            }
+        }
+
+        // Reads the journal with the initial content of food.dat, changes the file and checks that the refreshed journal gives the same reports
+        // and sequence numbers as reading the files
+        private void AssertRefreshMatchesReading(JournalRefreshStatusEnum expectedStatus, string initialFoodFile, string changedFoodFile)
+        {
+            File.WriteAllText(Path.Combine(Folder, "food.dat"), initialFoodFile);
+
+            string output;
+            string[] sequences;
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ReadJournal(JournalFile);
+
+                File.WriteAllText(Path.Combine(Folder, "food.dat"), changedFoodFile);
+
+                Assert.Equal(expectedStatus, session.RefreshJournal());
+                output = RunCommands(session);
+                sequences = GetSequences(session.Journal);
+            }
+
+            Assert.Equal(ReadAndRunCommands(), output);
+            Assert.Equal(ReadSequences(), sequences);
+        }
+
+        private string ReadAndRunCommands()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ReadJournal(JournalFile);
+                return RunCommands(session);
+            }
+        }
+
+        private string[] ReadSequences()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+                return GetSequences(session.ReadJournal(JournalFile));
+        }
+
+        // Returns sequence numbers of transactions and their postings
+        private static string[] GetSequences(Journal journal)
+        {
+            return journal.Xacts.Select(xact => String.Format("{0}: {1} ({2})", xact.Payee, xact.Pos.Sequence, String.Join(", ", xact.Posts.Select(post => post.Pos.Sequence)))).ToArray();
+        }
+
+        private static string RunCommands(NetSession session)
+        {
+            var sb = new StringBuilder();
+            foreach (var command in Commands)
+            {
+                var result = session.ExecuteCommand(command);
+                sb.AppendLine(result.Output);
+                sb.AppendLine(result.Error);
+            }
+            return sb.ToString();
+        }
+    }
+}
@@ -0,0 +1,182 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Extensibility;
+using NLedger.Extensibility.Net;
+using NLedger.Journals;
+using NLedger.Textual;
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.Linq;
+using System.Text;
+using Xunit;
+
+namespace NLedger.Tests.Journals
+{
+    public class JournalSnapshotTests : IDisposable
+    {
+        private static readonly string Input = @"
+= /^Income/
+    (Liabilities:Tithe)                    0.12
+
+~ monthly in 2010
+    Assets:Checking                     $500.00
+    Income:Salary
+
+P 2010/01/01 AAPL $30.00
+P 2010/02/01 AAPL $35.00
+
+2010/01/01 * (101) Opening balance
+    Assets:Checking                   $1,000.00
+    Equity:Opening Balances
+
+2010/01/05 ! Broker  ; :trade:
+    Assets:Broker                 10 AAPL {$30.00} [2010/01/04] @ $30.00
+    ; Lot: first
+    Assets:Checking
+
+2010/01/31 Employer
+    Assets:Checking                   $2,000.00 = $2,700.00
+    Income:Salary
+";
+
+        private static readonly string[] Commands = { "bal", "reg", "print", "bal --lots", "reg --exchange $", "prices", "reg --budget", "tags" };
+
+        public JournalSnapshotTests()
+        {
+            Folder = Path.Combine(Path.GetTempPath(), "nledger-snapshot-tests-" + Guid.NewGuid().ToString("N"));
+            SnapshotFolder = Path.Combine(Folder, "snapshots");
+            JournalFile = Path.Combine(Folder, "journal.dat");
+
+            Directory.CreateDirectory(Folder);
+            File.WriteAllText(JournalFile, Input);
+        }
+
+        public string Folder { get; }
+        public string SnapshotFolder { get; }
+        public string JournalFile { get; }
+
+        public void Dispose()
+        {
+            if (Directory.Exists(Folder))
+                Directory.Delete(Folder, true);
+        }
+
+        [Fact]
+        public void JournalSnapshot_ReadJournal_SavesSnapshotOnFirstReading()
+        {
+            Assert.False(Directory.Exists(SnapshotFolder));
+
+            var output = RunCommands(SnapshotFolder);
+
+            Assert.Single(Directory.GetFiles(SnapshotFolder, "*" + JournalSnapshotCache.SnapshotFileExtension));
+            Assert.Equal(RunCommands(null), output);
+        }
+
+        [Fact]
+        public void JournalSnapshot_ReadJournal_LoadsSnapshotWithSameContent()
+        {
+            var expected = RunCommands(null);
+            RunCommands(SnapshotFolder);
+            var snapshotFile = Directory.GetFiles(SnapshotFolder).Single();
+            var snapshotTime = File.GetLastWriteTimeUtc(snapshotFile);
+
+            var output = RunCommands(SnapshotFolder);
+
+            Assert.Equal(snapshotTime, File.GetLastWriteTimeUtc(snapshotFile));  // snapshot is loaded, not saved again
+            Assert.Equal(expected, output);
+        }
+
+        [Fact]
+        public void JournalSnapshot_ReadJournal_ParsesChangedFiles()
+        {
+            RunCommands(SnapshotFolder);
+            File.AppendAllText(JournalFile, "\n2010/02/01 Grocery\n    Expenses:Food    $20.00\n    Assets:Checking\n");
+
+            var output = RunCommands(SnapshotFolder);
+
+            Assert.Contains("Expenses:Food", output);
+            Assert.Equal(RunCommands(null), output);
+        }
+
+        [Fact]
+        public void JournalSnapshot_ReadJournal_DoesNotSaveRestrictedJournals()
+        {
+            File.AppendAllText(JournalFile, "\ndefine lot_price=20\n");
+
+            RunCommands(SnapshotFolder);
+
+            Assert.False(Directory.Exists(SnapshotFolder) && Directory.GetFiles(SnapshotFolder).Any());
+        }
+
+        [Fact]
+        public void JournalSnapshot_ReadJournal_IgnoresCorruptedSnapshots()
+        {
+            var expected = RunCommands(SnapshotFolder);
+            var snapshotFile = Directory.GetFiles(SnapshotFolder).Single();
+            var content = File.ReadAllBytes(snapshotFile);
+            File.WriteAllBytes(snapshotFile, content.Take(content.Length / 2).ToArray());
+
+            Assert.Equal(expected, RunCommands(SnapshotFolder));
+        }
+
+        [Fact]
+        public void JournalSnapshot_Read_ReturnsFalseForDifferentSettings()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                var tracker = new ParseTracker();
+                session.ParsingContext.Tracker = tracker;
+                session.ReadJournal(JournalFile);
+
+                using (var stream = new MemoryStream())
+                {
+                    JournalSnapshot.Write(stream, session.Journal, "settings", tracker);
+
+                    stream.Position = 0;
+                    Assert.False(JournalSnapshot.Read(stream, new Journal(), "other settings"));
+                    stream.Position = 0;
+                    Assert.True(JournalSnapshot.IsActual(stream, "settings"));
+                }
+            }
+        }
+
+        [Fact]
+        public void JournalSnapshot_Write_RequiresUnrestrictedTracker()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                var tracker = new ParseTracker();
+                tracker.AddRestriction("eval directive");
+
+                Assert.Throws<NotSupportedException>(() => JournalSnapshot.Write(new MemoryStream(), session.Journal, "settings", tracker));
+            }
+        }
+
+        private string RunCommands(string snapshotFolder)
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                if (snapshotFolder == null)
+                    session.ReadJournal(JournalFile);
+                else
+                    session.ReadJournal(JournalFile, snapshotFolder);
+
+                var sb = new StringBuilder();
+                foreach (var command in Commands)
+                {
+                    var result = session.ExecuteCommand(command);
+                    sb.AppendLine(result.Output);
+                    sb.AppendLine(result.Error);
+                }
+                return sb.ToString();
+            }
+        }
+    }
+}
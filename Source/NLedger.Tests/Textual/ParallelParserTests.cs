@@ -0,0 +1,265 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Extensibility;
+using NLedger.Extensibility.Net;
+using NLedger.Journals;
+using NLedger.Textual;
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.Linq;
+using System.Text;
+using System.Threading;
+using Xunit;
+
+namespace NLedger.Tests.Textual
+{
+    public class ParallelParserTests : IDisposable
+    {
+        private static readonly IDictionary<string, string> Files = new Dictionary<string, string>()
+        {
+            { "main.dat", @"
+include checking-2010.dat
+include broker-2010.dat
+
+2010/01/20 Employer
+    Assets:Checking                   $2,000.00
+    Income:Salary
+
+include budget.dat
+
+apply account Personal
+include checking-2011.dat
+end apply account
+
+include savings.dat
+include cards/*.dat
+" },
+            { "checking-2010.dat", @"
+; Checking account, 2010
+2010/01/01 * (101) Opening balance
+    Assets:Checking                   $1,000.00
+    Equity:Opening Balances
+
+2010/01/15 Grocery
+    Expenses:Food                        $45.20
+    Assets:Checking
+" },
+            { "broker-2010.dat", @"
+P 2010/01/01 AAPL $30.00
+P 2010/02/01 AAPL $35.00
+
+2010/01/05 ! Broker  ; :trade:
+    Assets:Broker                 10 AAPL {$30.00} [2010/01/04] @ $30.00
+    ; Lot: first
+    Assets:Checking
+" },
+            { "budget.dat", @"
+~ monthly in 2010
+    Expenses:Food                        $50.00
+    Assets:Checking
+" },
+            { "checking-2011.dat", @"
+2011/01/10 Grocery
+    Expenses:Food                         10.00 EUR
+    Assets:Checking
+" },
+            { "savings.dat", @"
+account Assets:Savings
+    note Savings account
+
+2011/03/01 Transfer
+    Assets:Savings                      $100.00
+    Assets:Checking
+" },
+            { Path.Combine("cards", "visa.dat"), @"
+2011/02/01 Restaurant
+    Expenses:Food                        $30.00
+    Liabilities:Visa
+" },
+            { Path.Combine("cards", "amex.dat"), @"
+2011/02/02 Books
+    Expenses:Books                       $15.50
+    Liabilities:Amex
+" }
+        };
+
+        private static readonly string[] Commands = { "bal", "reg", "print", "bal --lots", "reg --exchange $", "prices", "reg --budget", "accounts", "commodities", "payees", "tags" };
+
+        public ParallelParserTests()
+        {
+            Folder = Path.Combine(Path.GetTempPath(), "nledger-parallel-tests-" + Guid.NewGuid().ToString("N"));
+            Directory.CreateDirectory(Path.Combine(Folder, "cards"));
+
+            foreach (var file in Files)
+                File.WriteAllText(Path.Combine(Folder, file.Key), file.Value);
+        }
+
+        public string Folder { get; }
+
+        public void Dispose()
+        {
+            if (Directory.Exists(Folder))
+                Directory.Delete(Folder, true);
+        }
+
+        [Fact]
+        public void ParallelParser_ReadJournal_GivesSameResultAsSequentialReading()
+        {
+            Assert.Equal(RunCommands(false), RunCommands(true));
+        }
+
+        [Fact]
+        public void ParallelParser_ReadJournal_KeepsJournalSources()
+        {
+            Assert.Equal(GetSources(false), GetSources(true));
+        }
+
+        [Fact]
+        public void ParallelParser_TryMerge_MergesPlainFiles()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            using (var parser = new ParallelParser(session.Journal, 2))
+            {
+                var checking = Path.Combine(Folder, "checking-2010.dat");
+                var broker = Path.Combine(Folder, "broker-2010.dat");
+                parser.Prefetch(checking);
+                parser.Prefetch(broker);
+                WaitForWorkers(parser);
+
+                ParallelParser.ParsedFile parsedFile;
+                Assert.True(parser.TryMerge(checking, session.Journal.Master, null, out parsedFile));
+                Assert.Equal(2, parsedFile.Count);
+                Assert.True(parser.TryMerge(broker, session.Journal.Master, null, out parsedFile));
+                Assert.Equal(1, parsedFile.Count);
+
+                Assert.Equal(2, parser.MergedFiles);
+                Assert.Equal(new[] { "Opening balance", "Grocery", "Broker" }, session.Journal.Xacts.Select(xact => xact.Payee));
+                Assert.Equal(new[] { 0, 3, 0 }, session.Journal.Xacts.Select(xact => xact.Pos.Sequence));
+                Assert.NotNull(session.Journal.FindAccount("Assets:Checking", false));
+                Assert.Equal(3, session.Journal.FindAccount("Assets:Checking", false).Posts.Count);
+            }
+        }
+
+        [Fact]
+        public void ParallelParser_TryMerge_IgnoresFilesWithDirectives()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            using (var parser = new ParallelParser(session.Journal, 1))
+            {
+                var savings = Path.Combine(Folder, "savings.dat");
+                parser.Prefetch(savings);
+                WaitForWorkers(parser);
+
+                ParallelParser.ParsedFile parsedFile;
+                Assert.False(parser.TryMerge(savings, session.Journal.Master, null, out parsedFile));
+                Assert.Null(parsedFile);
+                Assert.Empty(session.Journal.Xacts);
+            }
+        }
+
+        [Fact]
+        public void ParallelParser_Prefetch_PrefetchesFilesIncludedByFilesWithDirectives()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            using (var parser = new ParallelParser(session.Journal, 1))
+            {
+                var main = Path.Combine(Folder, "main.dat");
+                parser.Prefetch(main);
+                WaitForWorkers(parser);
+
+                // The worker scans the file for include directives instead of parsing it
+                ParallelParser.ParsedFile parsedFile;
+                Assert.False(parser.TryMerge(main, session.Journal.Master, null, out parsedFile));
+                WaitForWorkers(parser);
+
+                Assert.True(parser.TryMerge(Path.Combine(Folder, "checking-2010.dat"), session.Journal.Master, null, out parsedFile));
+                Assert.Equal(2, parsedFile.Count);
+            }
+        }
+
+        [Fact]
+        public void ParallelParser_TryMerge_IgnoresFilesAffectedByJournalSettings()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            using (var parser = new ParallelParser(session.Journal, 1))
+            {
+                var checking = Path.Combine(Folder, "checking-2010.dat");
+                parser.Prefetch(checking);
+                WaitForWorkers(parser);
+
+                session.Journal.AccountAliases["Checking"] = session.Journal.FindAccount("Assets:Checking");
+
+                ParallelParser.ParsedFile parsedFile;
+                Assert.False(parser.TryMerge(checking, session.Journal.Master, null, out parsedFile));
+                Assert.Empty(session.Journal.Xacts);
+            }
+        }
+
+        [Fact]
+        public void ParallelParser_TryMerge_ReturnsFalseForUnknownFiles()
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            using (var parser = new ParallelParser(session.Journal, 1))
+            {
+                ParallelParser.ParsedFile parsedFile;
+                Assert.False(parser.TryMerge(Path.Combine(Folder, "checking-2010.dat"), session.Journal.Master, null, out parsedFile));
+            }
+        }
+
+        [Fact]
+        public void ParallelParser_IsPlainFile_AcceptsTransactionsPricesAndComments()
+        {
+            Assert.True(ParallelParser.IsPlainFile(new StringReader(Files["checking-2010.dat"])));
+            Assert.True(ParallelParser.IsPlainFile(new StringReader(Files["broker-2010.dat"])));
+            Assert.True(ParallelParser.IsPlainFile(new StringReader(Files["budget.dat"])));
+
+            Assert.False(ParallelParser.IsPlainFile(new StringReader(Files["main.dat"])));
+            Assert.False(ParallelParser.IsPlainFile(new StringReader(Files["savings.dat"])));
+            Assert.False(ParallelParser.IsPlainFile(new StringReader("2010/01/01 Test\n    A    $10 = $20\n    B\n")));
+            Assert.False(ParallelParser.IsPlainFile(new StringReader("2010/01/01 Test\n    A    ($10 * 2)\n    B\n")));
+            Assert.False(ParallelParser.IsPlainFile(new StringReader("2010/01/01 Test\n    ; Rate:: 10\n    A    $10\n    B\n")));
+            Assert.False(ParallelParser.IsPlainFile(new StringReader("= /Food/\n    (Budget)    -1\n")));
+        }
+
+        private static void WaitForWorkers(ParallelParser parser)
+        {
+            while (parser.PendingCount > 0)
+                Thread.Sleep(10);
+        }
+
+        private string RunCommands(bool parallelRead)
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ParallelRead = parallelRead;
+                session.ReadJournal(Path.Combine(Folder, "main.dat"));
+
+                var sb = new StringBuilder();
+                foreach (var command in Commands)
+                {
+                    var result = session.ExecuteCommand(command);
+                    sb.AppendLine(result.Output);
+                    sb.AppendLine(result.Error);
+                }
+                return sb.ToString();
+            }
+        }
+
+        private string[] GetSources(bool parallelRead)
+        {
+            using (var session = NetSession.CreateStandaloneSession())
+            {
+                session.ParallelRead = parallelRead;
+                session.ReadJournal(Path.Combine(Folder, "main.dat"));
+                return session.Journal.Sources.Select(source => source.FileName).ToArray();
+            }
+        }
+    }
+}
@@ -121,7 +121,15 @@ namespace NLedger.Accounts
 
         public Account FindAccountRe(string regexp)
         {
-            return DoFindAccountRe(this, new Mask(regexp));
+            return FindAccountRe(new Mask(regexp));
+        }
+
+        public Account FindAccountRe(Mask regex)
+        {
+            if (regex == null)
+                throw new ArgumentNullException(nameof(regex));
+
+            return DoFindAccountRe(this, regex);
         }
 
         public Value Amount(bool realOnly = false, Expr expr = null)
@@ -469,7 +477,7 @@ namespace NLedger.Accounts
                 if (args[0].Type == ValueTypeEnum.String)
                     return Value.ScopeValue(acct.FindAccount(args.Get<string>(0), false));
                 else if (args[0].Type == ValueTypeEnum.Mask)
-                    return Value.ScopeValue(acct.FindAccountRe(args.Get<Mask>(0).ToString()));
+                    return Value.ScopeValue(acct.FindAccountRe(args.Get<Mask>(0)));
                 else
                     return Value.Empty;
             }
@@ -303,6 +303,35 @@ namespace NLedger
             return Value.ToDecimal();
         }
 
+        /// <summary>
+        /// Returns a lossless textual representation of the value (numerator and denominator for rational values).
+        /// ParseExact turns it back into the same value.
+        /// </summary>
+        public string ToExactString()
+        {
+            if (!HasValue)
+                throw new InvalidOperationException("Cannot get an exact string of an uninitialized value");
+
+            return Value.ToString("B", CultureInfo.InvariantCulture);
+        }
+
+        public static BigInt<T> ParseExact(string s, int precision = 0, bool keepPrecision = false)
+        {
+            if (String.IsNullOrEmpty(s))
+                throw new ArgumentNullException(nameof(s));
+
+            var pos = s.IndexOf('/');
+            if (pos < 0)
+                return ParseInvariant(s, precision, keepPrecision);
+
+            var numerator = ParseInvariant(s.Substring(0, pos), precision, keepPrecision);
+            var denominator = ParseInvariant(s.Substring(pos + 1), precision, keepPrecision);
+
+            T value;
+            numerator.Value.Divide(out value, ref denominator.Value);
+            return new BigInt<T>(value, precision, keepPrecision);
+        }
+
         public int Compare(BigInt<T> bigInt)
         {
             if (!HasValue)
@@ -317,6 +346,13 @@ namespace NLedger
                 return Value.CompareTo(ref bigInt.Value) < 0 ? -1 : 1;
         }
 
+        private static BigInt<T> ParseInvariant(string s, int precision, bool keepPrecision)
+        {
+            T value;
+            Empty.Parse(out value, s, CultureInfo.InvariantCulture);
+            return new BigInt<T>(value, precision, keepPrecision);
+        }
+
         private T Value;
         private readonly static T Empty = new T();
 
@@ -62,6 +62,20 @@ namespace NLedger.Commodities
             }
         }
 
+        /// <summary>
+        /// Enumerates all recorded prices (source commodity, date and price) in the order the price graph keeps them.
+        /// Adding them to an empty history in the same order restores the same graph.
+        /// </summary>
+        public IEnumerable<Tuple<Commodity, DateTime, Amount>> GetPrices()
+        {
+            foreach (EdgeDescriptor<Commodity, PriceGraphEdge> edgeDescriptor in PriceGraph.Edges)
+            {
+                // An edge keeps prices in terms of either of its commodities; the source is the opposite one
+                foreach (KeyValuePair<DateTime, Amount> pricePair in edgeDescriptor.Edge.Prices)
+                    yield return new Tuple<Commodity, DateTime, Amount>(edgeDescriptor.GetInvertedVertex(pricePair.Value.Commodity), pricePair.Key, pricePair.Value);
+            }
+        }
+
         public void MapPrices(Action<DateTime, Amount> fn, Commodity source, DateTime moment, DateTime oldest = default(DateTime), bool bidirectionally = false)
         {
             Logger.Current.Debug("history.map", () => String.Format("Mapping prices for source commodity: {0}", source));
@@ -0,0 +1,202 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Scopus;
+using NLedger.Utility;
+using System;
+using System.Collections.Concurrent;
+using System.Collections.Generic;
+using System.Globalization;
+using System.IO;
+using System.Linq;
+using System.Text;
+using System.Threading;
+
+namespace NLedger.Extensibility
+{
+    /// <summary>
+    /// Executes a Ledger command on a background thread and returns its output line by line while the report is being written.
+    /// </summary>
+    /// <remarks>
+    /// The command runs with the application context of the thread that created the reader, so the caller should not use
+    /// other Ledger objects until the reader is completed. Output lines are passed through a bounded buffer: when the consumer
+    /// does not read them, the command is paused, so the memory consumption does not depend on the size of the report.
+    /// Consumers that should not block in ReadLine (e.g. callers that hold an interpreter lock) can pass a notification callback
+    /// that is called on the command thread when a line is added or the command is completed, and read lines with a zero timeout.
+    /// </remarks>
+    public sealed class CommandOutputReader : IDisposable
+    {
+        public const int DefaultCapacity = 256;
+
+        public CommandOutputReader(Session session, string args, bool readJournalFiles = false, int capacity = DefaultCapacity, Action<CommandOutputReader> notify = null)
+            : this(session, CommandLine.PreprocessSingleQuotes(args), readJournalFiles, capacity, notify)
+        { }
+
+        public CommandOutputReader(Session session, IEnumerable<string> args, bool readJournalFiles = false, int capacity = DefaultCapacity, Action<CommandOutputReader> notify = null)
+        {
+            if (session == null)
+                throw new ArgumentNullException(nameof(session));
+            if (args == null)
+                throw new ArgumentNullException(nameof(args));
+            if (capacity <= 0)
+                throw new ArgumentOutOfRangeException(nameof(capacity));
+
+            Context = MainApplicationContext.Current ?? throw new InvalidOperationException("Application context is not initialized for the current thread");
+            Session = session;
+            Args = args.ToList();
+            ReadJournalFiles = readJournalFiles;
+            Notify = notify;
+            Lines = new BlockingCollection<string>(capacity);
+            Culture = CultureInfo.CurrentCulture;
+            UICulture = CultureInfo.CurrentUICulture;
+
+            Worker = new Thread(Run) { IsBackground = true, Name = "NLedger command output" };
+            Worker.Start();
+        }
+
+        /// <summary>
+        /// Indicates that the command has finished and all output lines have been read
+        /// </summary>
+        public bool IsCompleted => Lines.IsCompleted;
+
+        /// <summary>
+        /// Error messages of the command. It is empty if the command succeeded and is only meaningful when the reader is completed
+        /// </summary>
+        public string Error { get; private set; } = String.Empty;
+
+        /// <summary>
+        /// Returns the next output line including its line terminator (the last line may not have it).
+        /// Returns null if no line is available within the timeout or the output is over (check IsCompleted to distinguish these cases).
+        /// </summary>
+        public string ReadLine(int millisecondsTimeout = Timeout.Infinite)
+        {
+            string line;
+            return Lines.TryTake(out line, millisecondsTimeout) ? line : null;
+        }
+
+        /// <summary>
+        /// Waits for the command thread to finish
+        /// </summary>
+        public bool WaitForCompletion(int millisecondsTimeout = Timeout.Infinite)
+        {
+            return Worker.Join(millisecondsTimeout);
+        }
+
+        /// <summary>
+        /// Interrupts the command if it is still running. Use WaitForCompletion to make sure that the command thread is finished.
+        /// </summary>
+        public void Dispose()
+        {
+            Cancellation.Cancel();
+        }
+
+        private void Run()
+        {
+            try
+            {
+                using (Context.AcquireCurrentThread())
+                {
+                    Thread.CurrentThread.CurrentCulture = Culture;
+                    Thread.CurrentThread.CurrentUICulture = UICulture;
+
+                    using (var writer = new LineWriter(this))
+                    {
+                        var result = Session.ExecuteCommand(Args, writer, ReadJournalFiles);
+                        if (String.IsNullOrEmpty(result.Error))
+                            writer.Complete();
+                        Error = Cancellation.IsCancellationRequested ? String.Empty : result.Error;
+                    }
+                }
+            }
+            catch (OperationCanceledException)
+            { }
+            catch (Exception ex)
+            {
+                Error = String.Format("Error: {0}", ex.Message);
+            }
+            finally
+            {
+                Lines.CompleteAdding();
+                Notify?.Invoke(this);
+            }
+        }
+
+        private void Add(string line)
+        {
+            Lines.Add(line, Cancellation.Token);
+            Notify?.Invoke(this);
+        }
+
+        /// <summary>
+        /// Text writer that sends every completed line to the reader buffer
+        /// </summary>
+        private class LineWriter : TextWriter
+        {
+            public LineWriter(CommandOutputReader reader)
+            {
+                Reader = reader;
+            }
+
+            public override Encoding Encoding => Encoding.Unicode;
+
+            public override void Write(char value)
+            {
+                Buffer.Append(value);
+                if (value == '\n')
+                    Send();
+            }
+
+            public override void Write(string value)
+            {
+                if (String.IsNullOrEmpty(value))
+                    return;
+
+                int start = 0;
+                int pos;
+                while ((pos = value.IndexOf('\n', start)) >= 0)
+                {
+                    Buffer.Append(value, start, pos - start + 1);
+                    Send();
+                    start = pos + 1;
+                }
+                Buffer.Append(value, start, value.Length - start);
+            }
+
+            public override void Write(char[] buffer, int index, int count)
+            {
+                Write(new string(buffer, index, count));
+            }
+
+            public void Complete()
+            {
+                if (Buffer.Length > 0)
+                    Send();
+            }
+
+            private void Send()
+            {
+                Reader.Add(Buffer.ToString());
+                Buffer.Clear();
+            }
+
+            private readonly CommandOutputReader Reader;
+            private readonly StringBuilder Buffer = new StringBuilder();
+        }
+
+        private readonly MainApplicationContext Context;
+        private readonly Session Session;
+        private readonly IEnumerable<string> Args;
+        private readonly bool ReadJournalFiles;
+        private readonly Action<CommandOutputReader> Notify;
+        private readonly BlockingCollection<string> Lines;
+        private readonly CultureInfo Culture;
+        private readonly CultureInfo UICulture;
+        private readonly Thread Worker;
+        private readonly CancellationTokenSource Cancellation = new CancellationTokenSource();
+    }
+}
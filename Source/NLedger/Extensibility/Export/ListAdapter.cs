@@ -55,5 +55,14 @@ namespace NLedger.Extensibility.Export
         public static ListAdapter<Xacts.PeriodXact> GetPeriodXacts(Journals.Journal journal) => new ListAdapter<Xacts.PeriodXact>(journal?.PeriodXacts?.ToList());
         public static ListAdapter<Journals.JournalFileInfo> GetFileInfos(Journals.Journal journal) => new ListAdapter<Journals.JournalFileInfo>(journal?.Sources?.ToList());
         public static ListAdapter<Post> GetQuery(Journals.Journal journal, string query) => new ListAdapter<Post>(Journals.JournalExtensions.Query(journal, query).ToList());
+
+        // Views wrap the original collection rather than its copy, so they always reflect its current content
+        public static ListAdapter<Xacts.Xact> GetXactsView(Journals.Journal journal) => new ListAdapter<Xacts.Xact>(journal?.Xacts);
+
+        // Item counters allow getting a size of a collection without materializing its adapter
+        public static int GetPostsCount(Xacts.XactBase xact) => xact?.Posts?.Count ?? 0;
+        public static int GetAccountsCount(Accounts.Account acnt) => acnt?.Accounts?.Count ?? 0;
+        public static int GetAmountsCount(NLedger.Balance bal) => bal?.Amounts?.Count ?? 0;
+        public static int GetXactsCount(Journals.Journal journal) => journal?.Xacts?.Count ?? 0;
     }
 }
@@ -0,0 +1,136 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Journals;
+using System;
+using System.Collections.Generic;
+using System.Linq;
+using System.Text;
+
+namespace NLedger.Extensibility.Export
+{
+    /// <summary>
+    /// Columnar representation of a sequence of posts. It collects post attributes into arrays of primitive types
+    /// and replaces repeating names (accounts, commodities, payees) with indexes in name tables.
+    /// Connectors can take the whole data set in one call and copy the arrays in bulk rather than access every post individually.
+    /// </summary>
+    public class PostColumns
+    {
+        public static readonly DateTime Epoch = new DateTime(1970, 1, 1);
+
+        /// <summary>
+        /// Collects columns for either all journal posts (if the query is empty) or posts returned by the query.
+        /// </summary>
+        public static PostColumns FromJournal(Journal journal, string query = null)
+        {
+            if (journal == null)
+                throw new ArgumentNullException(nameof(journal));
+
+            var posts = String.IsNullOrWhiteSpace(query) ? journal.Xacts.SelectMany(xact => xact.Posts) : journal.Query(query);
+            return FromPosts(posts);
+        }
+
+        public static PostColumns FromPosts(IEnumerable<Post> posts)
+        {
+            if (posts == null)
+                throw new ArgumentNullException(nameof(posts));
+
+            return new PostColumns(posts as ICollection<Post> ?? posts.ToList());
+        }
+
+        public int Count { get; }
+
+        /// <summary>
+        /// Post dates represented as the number of days since 1970-01-01
+        /// </summary>
+        public long[] Dates { get; }
+        public int[] AccountIds { get; }
+        public double[] Quantities { get; }
+
+        /// <summary>
+        /// Exact (unrounded) quantities without commodities; empty strings stand for null amounts
+        /// </summary>
+        public string[] ExactQuantities { get; }
+        public int[] CommodityIds { get; }
+        public int[] PayeeIds { get; }
+        public int[] States { get; }
+        public long[] XactSeqs { get; }
+
+        public string[] Accounts { get; }
+        public string[] Commodities { get; }
+        public string[] Payees { get; }
+
+        protected PostColumns(ICollection<Post> posts)
+        {
+            Count = posts.Count;
+
+            Dates = new long[Count];
+            AccountIds = new int[Count];
+            Quantities = new double[Count];
+            ExactQuantities = new string[Count];
+            CommodityIds = new int[Count];
+            PayeeIds = new int[Count];
+            States = new int[Count];
+            XactSeqs = new long[Count];
+
+            var accounts = new NameTable();
+            var commodities = new NameTable();
+            var payees = new NameTable();
+
+            int index = 0;
+            foreach (var post in posts)
+            {
+                Dates[index] = (long)((DateTime)post.GetDate() - Epoch).TotalDays;
+                AccountIds[index] = accounts.GetId(post.Account?.FullName);
+                PayeeIds[index] = payees.GetId(post.Xact != null ? post.Payee : null);
+                States[index] = (int)post.State;
+                XactSeqs[index] = post.Xact?.Seq ?? 0;
+
+                var amount = post.Amount;
+                if (amount == null || amount.IsEmpty)
+                {
+                    Quantities[index] = Double.NaN;
+                    ExactQuantities[index] = String.Empty;
+                    CommodityIds[index] = commodities.GetId(null);
+                }
+                else
+                {
+                    Quantities[index] = amount.ToDouble();
+                    ExactQuantities[index] = amount.Number().ToFullString();
+                    CommodityIds[index] = commodities.GetId(amount.Commodity?.Symbol);
+                }
+
+                index++;
+            }
+
+            Accounts = accounts.Names.ToArray();
+            Commodities = commodities.Names.ToArray();
+            Payees = payees.Names.ToArray();
+        }
+
+        private class NameTable
+        {
+            public List<string> Names { get; } = new List<string>();
+
+            public int GetId(string name)
+            {
+                name = name ?? String.Empty;
+
+                int id;
+                if (!Ids.TryGetValue(name, out id))
+                {
+                    Ids.Add(name, id = Names.Count);
+                    Names.Add(name);
+                }
+                return id;
+            }
+
+            private readonly IDictionary<string, int> Ids = new Dictionary<string, int>();
+        }
+    }
+}
@@ -0,0 +1,172 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Accounts;
+using NLedger.Chain;
+using NLedger.Expressions;
+using NLedger.Output;
+using NLedger.Scopus;
+using NLedger.Utility;
+using NLedger.Values;
+using System;
+using System.Collections.Generic;
+using System.Linq;
+using System.Text;
+
+namespace NLedger.Extensibility.Export
+{
+    /// <summary>
+    /// Balance report row: full account name and its total as it would be displayed by the balance command
+    /// </summary>
+    public sealed class AccountRow
+    {
+        public AccountRow(string account, Balance total)
+        {
+            Account = account;
+            Total = total;
+        }
+
+        public string Account { get; }
+        public Balance Total { get; }
+    }
+
+    /// <summary>
+    /// Register report row: post attributes, the displayed amount and the running total
+    /// </summary>
+    public sealed class PostRow
+    {
+        public PostRow(Date date, string payee, string account, Value amount, Balance total)
+        {
+            Date = date;
+            Payee = payee;
+            Account = account;
+            Amount = amount;
+            Total = total;
+        }
+
+        public Date Date { get; }
+        public string Payee { get; }
+        public string Account { get; }
+        public Value Amount { get; }
+        public Balance Total { get; }
+    }
+
+    /// <summary>
+    /// Collects results of balance and register commands as rows instead of formatted text.
+    /// The commands go through the regular report pipeline (options, queries, filters and sorting),
+    /// only the final formatting handlers are replaced with handlers that collect values.
+    /// </summary>
+    public class ReportRows
+    {
+        public IList<AccountRow> AccountRows { get; } = new List<AccountRow>();
+        public IList<PostRow> PostRows { get; } = new List<PostRow>();
+
+        /// <summary>
+        /// Returns a command function that fills the rows for the given verb or an empty function if the verb is not supported
+        /// </summary>
+        public ExprFunc GetCommand(Report report, string verb)
+        {
+            if (report == null)
+                throw new ArgumentNullException(nameof(report));
+
+            switch (verb)
+            {
+                case "b":
+                case "bal":
+                case "balance":
+                    return scope => new Reporter<Account, AccountHandler>(new AccountRowsCollector(report, AccountRows), report, "#balance", report.AccountsReport).Handle((CallScope)scope);
+
+                case "r":
+                case "reg":
+                case "register":
+                    return scope => new Reporter<Post, PostHandler>(new PostRowsCollector(report, PostRows), report, "#register", report.PostsReport).Handle((CallScope)scope);
+
+                default:
+                    return Expr.EmptyFunc;
+            }
+        }
+
+        public void Clear()
+        {
+            AccountRows.Clear();
+            PostRows.Clear();
+        }
+
+        private static Balance ToBalance(Value value)
+        {
+            return Value.IsNullOrEmpty(value) ? new Balance() : new Balance(value.AsBalance);
+        }
+
+        /// <summary>
+        /// Selects displayed accounts in the same way as FormatAccounts does
+        /// </summary>
+        private class AccountRowsCollector : FormatAccounts
+        {
+            public AccountRowsCollector(Report report, IList<AccountRow> rows)
+                : base(report, String.Empty)
+            {
+                Rows = rows;
+            }
+
+            public override int PostAccount(Account account, bool flat)
+            {
+                if (!flat && account.Parent != null)
+                    PostAccount(account.Parent, flat);
+
+                if (account.XData.ToDisplay && !account.XData.Displayed)
+                {
+                    account.XData.Displayed = true;
+
+                    var callScope = new CallScope(new BindScope(Report, account));
+                    Rows.Add(new AccountRow(account.FullName, ToBalance(Report.DisplayValue(Report.FnDisplayTotal(callScope)))));
+                    return 1;
+                }
+                return 0;
+            }
+
+            public override void Flush()
+            {
+                if (Report.DisplayHandler.Handled)
+                    DispPred.Parse(Report.DisplayHandler.Str());
+
+                MarkAccounts(Report.Session.Journal.Master, Report.FlatHandler.Handled);
+
+                foreach (var account in PostedAccounts)
+                    PostAccount(account, Report.FlatHandler.Handled);
+            }
+
+            private readonly IList<AccountRow> Rows;
+        }
+
+        private class PostRowsCollector : PostHandler
+        {
+            public PostRowsCollector(Report report, IList<PostRow> rows)
+                : base(null)
+            {
+                Report = report;
+                Rows = rows;
+            }
+
+            public override void Handle(Post post)
+            {
+                if (!post.HasXData || !post.XData.Displayed)
+                {
+                    var callScope = new CallScope(new BindScope(Report, post));
+                    var amount = Report.DisplayValue(Report.FnDisplayAmount(callScope));
+                    var total = Report.DisplayValue(Report.FnDisplayTotal(callScope));
+
+                    Rows.Add(new PostRow(post.GetDate(), post.Payee, post.ReportedAccount.FullName, Value.Clone(amount), ToBalance(total)));
+                    post.XData.Displayed = true;
+                }
+            }
+
+            private readonly Report Report;
+            private readonly IList<PostRow> Rows;
+        }
+    }
+}
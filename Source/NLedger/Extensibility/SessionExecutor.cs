@@ -0,0 +1,414 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Extensibility.Export;
+using NLedger.Journals;
+using NLedger.Scopus;
+using NLedger.Utility;
+using NLedger.Utils;
+using System;
+using System.Collections.Concurrent;
+using System.Collections.Generic;
+using System.Globalization;
+using System.Linq;
+using System.Text;
+using System.Threading;
+
+namespace NLedger.Extensibility
+{
+    /// <summary>
+    /// Executes session operations one by one on a dedicated thread. The thread shares the application context
+    /// of the thread that created the executor, so the caller can wait for results without blocking its own work.
+    /// </summary>
+    /// <remarks>
+    /// Operations are executed in the order they were submitted. Queued operations can be canceled without running;
+    /// a running operation is interrupted by the cancellation signal (e.g. a report stops at the next handled post).
+    /// Other session calls should not be made from other threads while operations are running.
+    /// </remarks>
+    public sealed class SessionExecutor : IDisposable
+    {
+        public SessionExecutor(Session session)
+        {
+            Session = session ?? throw new ArgumentNullException(nameof(session));
+            Context = MainApplicationContext.Current ?? throw new InvalidOperationException("Application context is not initialized for the current thread");
+            Culture = CultureInfo.CurrentCulture;
+            UICulture = CultureInfo.CurrentUICulture;
+            Queues = new[] { Operations };
+
+            Worker = new Thread(Run) { IsBackground = true, Name = "NLedger session executor" };
+            Worker.Start();
+        }
+
+        /// <summary>
+        /// Creates an executor that owns its application context (see SessionPool). The session is created on the executor thread;
+        /// besides its own operations, the executor takes operations from the shared queue when its own queue is empty.
+        /// </summary>
+        internal SessionExecutor(MainApplicationContext context, Func<Session> sessionFactory, BlockingCollection<SessionOperation> sharedOperations)
+        {
+            if (sessionFactory == null)
+                throw new ArgumentNullException(nameof(sessionFactory));
+            if (sharedOperations == null)
+                throw new ArgumentNullException(nameof(sharedOperations));
+
+            Context = context ?? throw new ArgumentNullException(nameof(context));
+            Culture = CultureInfo.CurrentCulture;
+            UICulture = CultureInfo.CurrentUICulture;
+            Queues = new[] { Operations, sharedOperations };
+
+            Exception initializationError = null;
+            using (var initialized = new ManualResetEventSlim())
+            {
+                Worker = new Thread(() => Run(() =>
+                {
+                    try
+                    {
+                        Session = sessionFactory();
+                        Session.SetSessionContext(Session);
+                        Scope.DefaultScope = new Report(Session);
+                        return true;
+                    }
+                    catch (Exception ex)
+                    {
+                        initializationError = ex;
+                        Operations.CompleteAdding();
+                        return false;
+                    }
+                    finally
+                    {
+                        initialized.Set();
+                    }
+                }))
+                { IsBackground = true, Name = "NLedger session executor" };
+
+                Worker.Start();
+                initialized.Wait();
+            }
+
+            if (initializationError != null)
+                throw new InvalidOperationException(String.Format("Cannot create a session: {0}", initializationError.Message), initializationError);
+        }
+
+        public Session Session { get; private set; }
+
+        /// <summary>
+        /// The number of operations that are waiting in the queue
+        /// </summary>
+        public int PendingCount => Operations.Count;
+
+        /// <summary>
+        /// Indicates whether the caller runs on the executor thread (e.g. a custom function called by a running operation)
+        /// </summary>
+        public bool IsExecutorThread => Thread.CurrentThread == Worker;
+
+        public SessionOperation ExecuteCommand(string args, bool readJournalFiles = false, Action<SessionOperation> completed = null)
+        {
+            return ExecuteCommand(CommandLine.PreprocessSingleQuotes(args), readJournalFiles, completed);
+        }
+
+        public SessionOperation ExecuteCommand(IEnumerable<string> args, bool readJournalFiles = false, Action<SessionOperation> completed = null)
+        {
+            if (args == null)
+                throw new ArgumentNullException(nameof(args));
+
+            var argsList = args.ToList();
+            return Submit(() => Session.ExecuteCommand(argsList, readJournalFiles), completed);
+        }
+
+        /// <summary>
+        /// Executes a sequence of commands (see SessionExtensions.ExecuteCommands); the result is a list of BatchCommandResult
+        /// </summary>
+        public SessionOperation ExecuteCommands(IEnumerable<IEnumerable<string>> commands, bool readJournalFiles = false, Action<SessionOperation> completed = null)
+        {
+            if (commands == null)
+                throw new ArgumentNullException(nameof(commands));
+
+            var commandsList = commands.Select(args => args.ToList()).ToList();
+            return Submit(() => Session.ExecuteCommands(commandsList, readJournalFiles), completed);
+        }
+
+        /// <summary>
+        /// Executes a balance or register command that fills the rows (see SessionExtensions.ExecuteCommand); the result is CommandExecutionResult
+        /// </summary>
+        public SessionOperation ExecuteCommand(string args, ReportRows rows, bool readJournalFiles = false, Action<SessionOperation> completed = null)
+        {
+            return ExecuteCommand(CommandLine.PreprocessSingleQuotes(args), rows, readJournalFiles, completed);
+        }
+
+        public SessionOperation ExecuteCommand(IEnumerable<string> args, ReportRows rows, bool readJournalFiles = false, Action<SessionOperation> completed = null)
+        {
+            if (args == null)
+                throw new ArgumentNullException(nameof(args));
+            if (rows == null)
+                throw new ArgumentNullException(nameof(rows));
+
+            var argsList = args.ToList();
+            return Submit(() => Session.ExecuteCommand(argsList, rows, readJournalFiles), completed);
+        }
+
+        public SessionOperation ReadJournal(string pathName, string snapshotDirectory = null, Action<SessionOperation> completed = null)
+        {
+            if (String.IsNullOrEmpty(pathName))
+                throw new ArgumentNullException(nameof(pathName));
+
+            return Submit(() => String.IsNullOrEmpty(snapshotDirectory) ? Session.ReadJournal(pathName) : Session.ReadJournal(pathName, snapshotDirectory), completed);
+        }
+
+        /// <summary>
+        /// Brings the journal up to date with its files; the result is JournalRefreshStatusEnum
+        /// </summary>
+        public SessionOperation RefreshJournal(string snapshotDirectory = null, Action<SessionOperation> completed = null)
+        {
+            return Submit(() => Session.RefreshJournal(String.IsNullOrEmpty(snapshotDirectory) ? null : new JournalSnapshotCache(snapshotDirectory)), completed);
+        }
+
+        /// <summary>
+        /// Runs a journal query; the result is a list of posts
+        /// </summary>
+        public SessionOperation Query(string query, Action<SessionOperation> completed = null)
+        {
+            return Submit(() => Session.Journal.Query(query).ToList(), completed);
+        }
+
+        /// <summary>
+        /// Runs a query for the journal that belongs to the executor's context; the result is a list of posts
+        /// </summary>
+        public SessionOperation Query(Journal journal, string query, Action<SessionOperation> completed = null)
+        {
+            if (journal == null)
+                throw new ArgumentNullException(nameof(journal));
+
+            return Submit(() => journal.Query(query).ToList(), completed);
+        }
+
+        /// <summary>
+        /// Adds an operation to the queue. The completion callback is called on the executor thread when the operation
+        /// is finished, failed or skipped because of cancellation.
+        /// </summary>
+        public SessionOperation Submit(Func<object> action, Action<SessionOperation> completed = null)
+        {
+            if (action == null)
+                throw new ArgumentNullException(nameof(action));
+
+            return Enqueue(Operations, new SessionOperation(session => action(), completed), nameof(SessionExecutor));
+        }
+
+        /// <summary>
+        /// Waits for the executor thread to finish after the executor is disposed
+        /// </summary>
+        public bool WaitForCompletion(int millisecondsTimeout = Timeout.Infinite)
+        {
+            return Worker.Join(millisecondsTimeout);
+        }
+
+        /// <summary>
+        /// Stops accepting new operations and cancels queued ones. A running operation is completed.
+        /// </summary>
+        public void Dispose()
+        {
+            Operations.CompleteAdding();
+            foreach (var operation in Operations.ToArray())
+                operation.Cancel();
+        }
+
+        internal static SessionOperation Enqueue(BlockingCollection<SessionOperation> operations, SessionOperation operation, string objectName)
+        {
+            try
+            {
+                operations.Add(operation);
+            }
+            catch (InvalidOperationException)
+            {
+                throw new ObjectDisposedException(objectName);
+            }
+            return operation;
+        }
+
+        internal void Interrupt()
+        {
+            Context.CancellationSignal = CaughtSignalEnum.INTERRUPTED;
+        }
+
+        private void Run()
+        {
+            Run(null);
+        }
+
+        private void Run(Func<bool> initialize)
+        {
+            using (Context.AcquireCurrentThread())
+            {
+                Thread.CurrentThread.CurrentCulture = Culture;
+                Thread.CurrentThread.CurrentUICulture = UICulture;
+
+                if (initialize != null && !initialize())
+                    return;
+
+                // The own queue has priority over the shared one; the loop ends when both are completed
+                SessionOperation operation;
+                while (BlockingCollection<SessionOperation>.TryTakeFromAny(Queues, out operation, Timeout.Infinite) >= 0)
+                {
+                    if (operation.Start(this))
+                    {
+                        object result = null;
+                        Exception exception = null;
+                        try
+                        {
+                            result = operation.Action(Session);
+                        }
+                        catch (Exception ex)
+                        {
+                            exception = ex;
+                        }
+
+                        operation.Complete(result, exception, () => Context.CancellationSignal = CaughtSignalEnum.NONE_CAUGHT);
+                    }
+
+                    operation.NotifyCompleted();
+                }
+            }
+        }
+
+        private readonly MainApplicationContext Context;
+        private readonly CultureInfo Culture;
+        private readonly CultureInfo UICulture;
+        private readonly Thread Worker;
+        private readonly BlockingCollection<SessionOperation> Operations = new BlockingCollection<SessionOperation>();
+        private readonly BlockingCollection<SessionOperation>[] Queues;
+    }
+
+    public enum SessionOperationStatus
+    {
+        Queued,
+        Running,
+        Completed,
+        Failed,
+        Canceled
+    }
+
+    /// <summary>
+    /// Operation submitted to SessionExecutor
+    /// </summary>
+    public sealed class SessionOperation
+    {
+        internal SessionOperation(Func<Session, object> action, Action<SessionOperation> completed)
+        {
+            Action = action;
+            Completed = completed;
+        }
+
+        public SessionOperationStatus Status
+        {
+            get { return _Status; }
+            internal set { _Status = value; }
+        }
+
+        public bool IsCompleted => Status != SessionOperationStatus.Queued && Status != SessionOperationStatus.Running;
+        public bool IsCanceled => Status == SessionOperationStatus.Canceled;
+
+        /// <summary>
+        /// The value returned by the operation (CommandExecutionResult, Journal or a list of posts)
+        /// </summary>
+        public object Result { get; private set; }
+
+        /// <summary>
+        /// The exception thrown by the operation if the status is Failed
+        /// </summary>
+        public Exception Exception { get; private set; }
+
+        /// <summary>
+        /// Cancels the operation if it is queued or requests interruption if it is running. Returns false if the operation is already completed.
+        /// </summary>
+        public bool Cancel()
+        {
+            lock (SyncRoot)
+            {
+                if (Status == SessionOperationStatus.Queued)
+                {
+                    Status = SessionOperationStatus.Canceled;
+                    return true;
+                }
+
+                if (Status == SessionOperationStatus.Running)
+                {
+                    IsCancellationRequested = true;
+                    Executor.Interrupt();
+                    return true;
+                }
+
+                return false;
+            }
+        }
+
+        public bool Wait(int millisecondsTimeout = Timeout.Infinite)
+        {
+            return CompletedEvent.Wait(millisecondsTimeout);
+        }
+
+        internal Func<Session, object> Action { get; }
+
+        /// <summary>
+        /// Marks the operation as running on the executor; returns false if the operation was canceled while it was queued
+        /// </summary>
+        internal bool Start(SessionExecutor executor)
+        {
+            lock (SyncRoot)
+            {
+                if (Status != SessionOperationStatus.Queued)
+                    return false;
+
+                Executor = executor;
+                Status = SessionOperationStatus.Running;
+                return true;
+            }
+        }
+
+        internal void Complete(object result, Exception exception, Action resetCancellation)
+        {
+            lock (SyncRoot)
+            {
+                resetCancellation();
+
+                if (IsCancellationRequested)
+                {
+                    Status = SessionOperationStatus.Canceled;
+                }
+                else if (exception != null)
+                {
+                    Exception = exception;
+                    Status = SessionOperationStatus.Failed;
+                }
+                else
+                {
+                    Result = result;
+                    Status = SessionOperationStatus.Completed;
+                }
+            }
+        }
+
+        internal void NotifyCompleted()
+        {
+            CompletedEvent.Set();
+            try
+            {
+                Completed?.Invoke(this);
+            }
+            catch (Exception ex)
+            {
+                // Callback errors must not stop the executor thread
+                Logger.Current.Debug("session.executor", () => String.Format("Completion callback failed: {0}", ex.Message));
+            }
+        }
+
+        private SessionExecutor Executor;
+        private bool IsCancellationRequested;
+        private readonly Action<SessionOperation> Completed;
+        private readonly ManualResetEventSlim CompletedEvent = new ManualResetEventSlim();
+        private readonly object SyncRoot = new object();
+        private volatile SessionOperationStatus _Status;
+    }
+}
@@ -7,10 +7,12 @@
 // See LICENSE.LEDGER file included with the distribution for details and disclaimer.
 // **********************************************************************************
 using NLedger.Expressions;
+using NLedger.Extensibility.Export;
 using NLedger.Scopus;
 using NLedger.Utility;
 using System;
 using System.Collections.Generic;
+using System.Diagnostics;
 using System.IO;
 using System.Linq;
 using System.Text;
@@ -43,6 +45,24 @@ namespace NLedger.Extensibility
             public string Error { get; }
         }
 
+        /// <summary>
+        /// Result of a command that is executed in a batch. It adds the execution time to the command result.
+        /// </summary>
+        public class BatchCommandResult
+        {
+            public BatchCommandResult(CommandExecutionResult result, TimeSpan executionTime)
+            {
+                Result = result ?? throw new ArgumentNullException(nameof(result));
+                ExecutionTime = executionTime;
+            }
+
+            public CommandExecutionResult Result { get; }
+            public TimeSpan ExecutionTime { get; }
+
+            public string Output => Result.Output;
+            public string Error => Result.Error;
+        }
+
         /// <summary>
         /// Executes a Ledger command with arguments and returns the output as a text. Helpful for third-party integration software.
         /// </summary>
@@ -69,6 +89,116 @@ namespace NLedger.Extensibility
         /// The main purppose is to allow command execution in integration mode (when GlobalScope is not initialized).
         /// It supports all Ledger capabilities excepting Output, Pager and Options flags that are managed on GlobalScope layer.</remarks>
         public static CommandExecutionResult ExecuteCommand(this Session session, IEnumerable<string> args, bool readJournalFiles = false)
+        {
+            using (var output = new StringWriter())
+            {
+                var result = ExecuteCommand(session, args, output, readJournalFiles);
+                return String.IsNullOrEmpty(result.Error) ? CommandExecutionResult.Success(output.ToString()) : result;
+            }
+        }
+
+        /// <summary>
+        /// Executes a sequence of Ledger commands in one call and returns results and execution time for every command.
+        /// </summary>
+        /// <param name="session">Current session instance</param>
+        /// <param name="commands">Strings that contain commands with arguments</param>
+        /// <param name="readJournalFiles">Optional flag indicating whether journal files should be read before executing the first command</param>
+        /// <returns>Command results in the same order as commands</returns>
+        public static IList<BatchCommandResult> ExecuteCommands(this Session session, IEnumerable<string> commands, bool readJournalFiles = false)
+        {
+            if (commands == null)
+                throw new ArgumentNullException(nameof(commands));
+
+            return ExecuteCommands(session, commands.Select(command => CommandLine.PreprocessSingleQuotes(command)), readJournalFiles);
+        }
+
+        /// <summary>
+        /// Executes a sequence of Ledger commands in one call and returns results and execution time for every command.
+        /// </summary>
+        /// <param name="session">Current session instance</param>
+        /// <param name="commands">Enumerables of strings that contain commands with arguments</param>
+        /// <param name="readJournalFiles">Optional flag indicating whether journal files should be read before executing the first command</param>
+        /// <returns>Command results in the same order as commands</returns>
+        /// <remarks>Commands share the session journal and commodity pool (including prices). The journal is read only once
+        /// (by the first command, so its execution time includes reading), whereas ExecuteCommand re-reads the files on every call
+        /// with readJournalFiles flag. Every command gets its own report options; a failed command does not stop the batch.</remarks>
+        public static IList<BatchCommandResult> ExecuteCommands(this Session session, IEnumerable<IEnumerable<string>> commands, bool readJournalFiles = false)
+        {
+            if (session == null)
+                throw new ArgumentNullException(nameof(session));
+            if (commands == null)
+                throw new ArgumentNullException(nameof(commands));
+
+            var results = new List<BatchCommandResult>();
+            using (var output = new StringWriter())
+            {
+                var stopwatch = new Stopwatch();
+                foreach (var args in commands)
+                {
+                    stopwatch.Restart();
+                    var result = ExecuteCommand(session, args, output, readJournalFiles && results.Count == 0, null);
+                    if (String.IsNullOrEmpty(result.Error))
+                        result = CommandExecutionResult.Success(output.ToString());
+                    stopwatch.Stop();
+
+                    results.Add(new BatchCommandResult(result, stopwatch.Elapsed));
+                    output.GetStringBuilder().Clear();
+                }
+            }
+            return results;
+        }
+
+        /// <summary>
+        /// Executes a Ledger command with arguments and writes the output to the given text writer as the report produces it.
+        /// </summary>
+        /// <param name="session">Current session instance</param>
+        /// <param name="args">Enumerable of strings that contains a command with arguments</param>
+        /// <param name="output">Text writer that receives the command output. It is flushed but not closed when the command finishes</param>
+        /// <param name="readJournalFiles">Optional flag indicating whether it should read journal files before executing the command</param>
+        /// <returns>Command execution result; Output property is always empty because the text is written to the output writer</returns>
+        public static CommandExecutionResult ExecuteCommand(this Session session, IEnumerable<string> args, TextWriter output, bool readJournalFiles = false)
+        {
+            if (output == null)
+                throw new ArgumentNullException(nameof(output));
+
+            return ExecuteCommand(session, args, output, readJournalFiles, null);
+        }
+
+        /// <summary>
+        /// Executes a balance or register command with arguments and collects the report as rows rather than formatted text.
+        /// </summary>
+        /// <param name="session">Current session instance</param>
+        /// <param name="args">String that contains a command with arguments</param>
+        /// <param name="rows">Rows object that receives the report</param>
+        /// <param name="readJournalFiles">Optional flag indicating whether it should read journal files before executing the command</param>
+        /// <returns>Command execution result; Output property contains only text that the command might print out additionally (e.g. warnings)</returns>
+        public static CommandExecutionResult ExecuteCommand(this Session session, string args, ReportRows rows, bool readJournalFiles = false)
+        {
+            return ExecuteCommand(session, CommandLine.PreprocessSingleQuotes(args), rows, readJournalFiles);
+        }
+
+        /// <summary>
+        /// Executes a balance or register command with arguments and collects the report as rows rather than formatted text.
+        /// </summary>
+        /// <param name="session">Current session instance</param>
+        /// <param name="args">Enumerable of strings that contains a command with arguments</param>
+        /// <param name="rows">Rows object that receives the report</param>
+        /// <param name="readJournalFiles">Optional flag indicating whether it should read journal files before executing the command</param>
+        /// <returns>Command execution result; Output property contains only text that the command might print out additionally (e.g. warnings)</returns>
+        /// <remarks>Commands are processed in the same way as text commands (including all report options) but other commands than balance and register are not supported.</remarks>
+        public static CommandExecutionResult ExecuteCommand(this Session session, IEnumerable<string> args, ReportRows rows, bool readJournalFiles = false)
+        {
+            if (rows == null)
+                throw new ArgumentNullException(nameof(rows));
+
+            using (var output = new StringWriter())
+            {
+                var result = ExecuteCommand(session, args, output, readJournalFiles, rows.GetCommand);
+                return String.IsNullOrEmpty(result.Error) ? CommandExecutionResult.Success(output.ToString()) : result;
+            }
+        }
+
+        private static CommandExecutionResult ExecuteCommand(Session session, IEnumerable<string> args, TextWriter output, bool readJournalFiles, Func<Report, string, ExprFunc> lookupCommand)
         {
             if (session == null)
                 throw new ArgumentNullException(nameof(session));
@@ -92,8 +222,8 @@ namespace NLedger.Extensibility
                 // Command execution scope
                 var boundScope = new BindScope(session, scopeReport);
 
-                // LookForPrecommand
-                ExprFunc command = boundScope.Lookup(SymbolKindEnum.PRECOMMAND, verb)?.AsFunction ?? Expr.EmptyFunc;
+                // LookForPrecommand (custom command lookups do not support pre-commands)
+                ExprFunc command = lookupCommand == null ? boundScope.Lookup(SymbolKindEnum.PRECOMMAND, verb)?.AsFunction ?? Expr.EmptyFunc : Expr.EmptyFunc;
 
                 // if it is not a pre-command...
                 if (command.IsNullOrEmpty())
@@ -104,25 +234,24 @@ namespace NLedger.Extensibility
                     scopeReport.NormalizeOptions(verb);
 
                     // LookForCommand
-                    command = boundScope.Lookup(SymbolKindEnum.COMMAND, verb)?.AsFunction ?? Expr.EmptyFunc;
+                    command = lookupCommand == null ? boundScope.Lookup(SymbolKindEnum.COMMAND, verb)?.AsFunction ?? Expr.EmptyFunc : lookupCommand(scopeReport, verb);
                     if (command.IsNullOrEmpty())
                         throw new LogicError(String.Format(LogicError.ErrorMessageUnrecognizedCommand, verb));
                 }
 
                 // Specify isolated output stream
-                using (scopeReport.OutputStream = new StringWriter())
-                {
-                    // Compose command args
-                    CallScope commandArgs = new CallScope(boundScope);
-                    foreach (string arg in args)
-                        commandArgs.PushBack(Values.Value.Get(arg));
+                scopeReport.OutputStream = output;
 
-                    // Execute command
-                    command(commandArgs);
+                // Compose command args
+                CallScope commandArgs = new CallScope(boundScope);
+                foreach (string arg in args)
+                    commandArgs.PushBack(Values.Value.Get(arg));
 
-                    // Command execution results
-                    return CommandExecutionResult.Success(scopeReport.OutputStream.ToString());
-                }
+                // Execute command
+                command(commandArgs);
+                output.Flush();
+
+                return CommandExecutionResult.Empty;
             }
             catch (Exception ex)
             {
@@ -140,6 +269,10 @@ namespace NLedger.Extensibility
 
             finally
             {
+                // The output writer belongs to the caller, so it is detached rather than closed
+                if (scopeReport.OutputStream == output)
+                    scopeReport.OutputStream = null;
+
                 scopeReport.QuickClose();
                 Scope.DefaultScope = currentReport;
             }
@@ -0,0 +1,145 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Journals;
+using NLedger.Scopus;
+using NLedger.Utility;
+using System;
+using System.Collections.Concurrent;
+using System.Collections.Generic;
+using System.Linq;
+using System.Text;
+using System.Threading;
+
+namespace NLedger.Extensibility
+{
+    /// <summary>
+    /// Pool of independent sessions that execute operations concurrently. Every session has its own application context
+    /// (journal, commodity pool, default scope etc) and a dedicated executor thread.
+    /// </summary>
+    /// <remarks>
+    /// Commands and queries are put into a shared queue and taken by the first free session, so they should not depend
+    /// on the session they run on: either all sessions read the same journal (ReadJournal) or commands read their files themselves.
+    /// Objects returned by an operation belong to the session that executed it.
+    /// </remarks>
+    public sealed class SessionPool : IDisposable
+    {
+        public SessionPool(int size, Func<Session> sessionFactory = null)
+        {
+            if (size <= 0)
+                throw new ArgumentOutOfRangeException(nameof(size));
+
+            sessionFactory = sessionFactory ?? (() => new Session());
+            var executors = new List<SessionExecutor>();
+            try
+            {
+                for (int i = 0; i < size; i++)
+                    executors.Add(new SessionExecutor(CreateContext(MainApplicationContext.Current), sessionFactory, Operations));
+            }
+            catch
+            {
+                Operations.CompleteAdding();
+                executors.ForEach(executor => executor.Dispose());
+                throw;
+            }
+            Executors = executors.AsReadOnly();
+        }
+
+        public IReadOnlyList<SessionExecutor> Executors { get; }
+        public int Size => Executors.Count;
+
+        /// <summary>
+        /// The number of operations that are waiting for a free session
+        /// </summary>
+        public int PendingCount => Operations.Count;
+
+        /// <summary>
+        /// Reads the journal by every session in the pool; returns operations in the order of sessions
+        /// </summary>
+        public IList<SessionOperation> ReadJournal(string pathName, string snapshotDirectory = null, Action<SessionOperation> completed = null)
+        {
+            return Executors.Select(executor => executor.ReadJournal(pathName, snapshotDirectory, completed)).ToList();
+        }
+
+        public SessionOperation ExecuteCommand(string args, bool readJournalFiles = false, Action<SessionOperation> completed = null)
+        {
+            return ExecuteCommand(CommandLine.PreprocessSingleQuotes(args), readJournalFiles, completed);
+        }
+
+        public SessionOperation ExecuteCommand(IEnumerable<string> args, bool readJournalFiles = false, Action<SessionOperation> completed = null)
+        {
+            if (args == null)
+                throw new ArgumentNullException(nameof(args));
+
+            var argsList = args.ToList();
+            return Submit(session => session.ExecuteCommand(argsList, readJournalFiles), completed);
+        }
+
+        /// <summary>
+        /// Runs a journal query on a free session; the result is a list of posts
+        /// </summary>
+        public SessionOperation Query(string query, Action<SessionOperation> completed = null)
+        {
+            return Submit(session => session.Journal.Query(query).ToList(), completed);
+        }
+
+        /// <summary>
+        /// Adds an operation to the shared queue; it is executed by the first free session.
+        /// </summary>
+        public SessionOperation Submit(Func<Session, object> action, Action<SessionOperation> completed = null)
+        {
+            if (action == null)
+                throw new ArgumentNullException(nameof(action));
+
+            return SessionExecutor.Enqueue(Operations, new SessionOperation(action, completed), nameof(SessionPool));
+        }
+
+        /// <summary>
+        /// Waits for all session threads to finish after the pool is disposed
+        /// </summary>
+        public bool WaitForCompletion(int millisecondsTimeout = Timeout.Infinite)
+        {
+            var deadline = DateTime.UtcNow.AddMilliseconds(millisecondsTimeout);
+            return Executors.All(executor => executor.WaitForCompletion(millisecondsTimeout == Timeout.Infinite
+                ? Timeout.Infinite : Math.Max(0, (int)(deadline - DateTime.UtcNow).TotalMilliseconds)));
+        }
+
+        /// <summary>
+        /// Stops accepting new operations and cancels queued ones. Running operations are completed.
+        /// </summary>
+        public void Dispose()
+        {
+            Operations.CompleteAdding();
+            foreach (var operation in Operations.ToArray())
+                operation.Cancel();
+
+            foreach (var executor in Executors)
+                executor.Dispose();
+        }
+
+        /// <summary>
+        /// Creates an isolated context that inherits console and environment settings of the current one
+        /// </summary>
+        private static MainApplicationContext CreateContext(MainApplicationContext current)
+        {
+            if (current == null)
+                return new MainApplicationContext();
+
+            var context = new MainApplicationContext(current.ApplicationServiceProvider);
+            context.ArgsOnly = current.ArgsOnly;
+            context.InitFile = current.InitFile;
+            context.IsAtty = current.IsAtty;
+            context.TimeZone = current.TimeZone;
+            context.DefaultPager = current.DefaultPager;
+            context.SetEnvironmentVariables(current.EnvironmentVariables);
+            return context;
+        }
+
+        private readonly BlockingCollection<SessionOperation> Operations = new BlockingCollection<SessionOperation>();
+    }
+}
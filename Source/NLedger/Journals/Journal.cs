@@ -258,6 +258,11 @@ namespace NLedger.Journals
             return Master.FindAccountRe(regexp);
         }
 
+        public Account FindAccountRe(Mask regex)
+        {
+            return Master.FindAccountRe(regex);
+        }
+
         /// <summary>
         /// ported from journal_t::add_account
         /// </summary>
@@ -0,0 +1,124 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Accounts;
+using NLedger.Textual;
+using NLedger.Times;
+using NLedger.Utility;
+using System;
+using System.Collections.Generic;
+using System.Linq;
+
+namespace NLedger.Journals
+{
+    /// <summary>
+    /// Describes journal files at the moment they were read: Session.RefreshJournal compares them with the current files
+    /// to find out whether the data was only appended to the last data file and can be parsed without reading the journal again.
+    /// </summary>
+    internal sealed class JournalRefreshState
+    {
+        public JournalRefreshState(Journal journal, Account master, ParseTracker tracker, string lastFile, int lastFileSequence)
+        {
+            if (journal == null)
+                throw new ArgumentNullException(nameof(journal));
+            if (tracker == null)
+                throw new ArgumentNullException(nameof(tracker));
+
+            Journal = journal;
+            Master = master;
+            Files = tracker.Files.Where(pathName => FileSystem.FileExists(pathName)).Select(pathName => new JournalFileInfo(pathName)).ToList();
+            UnclosedFiles = tracker.UnclosedFiles.ToList();
+            StatefulFiles = tracker.StatefulFiles.ToList();
+            IncludedFiles = tracker.IncludedFiles.ToList();
+            IsRestricted = tracker.IsRestricted || tracker.IsEpochChanged;
+            Epoch = TimesCommon.Current.Epoch;
+            LastFile = lastFile;
+            LastFileSequence = lastFileSequence;
+        }
+
+        public Journal Journal { get; }
+        public Account Master { get; }
+        public IList<JournalFileInfo> Files { get; private set; }
+        public IList<string> UnclosedFiles { get; }
+        public IList<string> StatefulFiles { get; }
+        public IList<ParseTracker.IncludedFile> IncludedFiles { get; }
+        public bool IsRestricted { get; }
+        public DateTime? Epoch { get; }
+        public string LastFile { get; }
+        public int LastFileSequence { get; set; }
+
+        /// <summary>
+        /// Returns the recorded information about files that were changed or deleted since they were read
+        /// </summary>
+        public IEnumerable<JournalFileInfo> GetChangedFiles()
+        {
+            return Files.Where(info => !FileSystem.FileExists(info.FileName) ||
+                FileSystem.FileSize(info.FileName) != info.Size || FileSystem.LastWriteTime(info.FileName) != info.ModTime).ToList();
+        }
+
+        /// <summary>
+        /// Checks whether text appended to the file can be parsed as a continuation of the journal
+        /// </summary>
+        public bool CanAppend(string pathName)
+        {
+            return !IsRestricted && pathName == LastFile && !UnclosedFiles.Contains(pathName) && TimesCommon.Current.Epoch == Epoch;
+        }
+
+        /// <summary>
+        /// Checks whether transactions of the file can be removed from the journal and parsed again without reading other files
+        /// </summary>
+        public bool CanReload(string pathName)
+        {
+            return !IsRestricted && !StatefulFiles.Contains(pathName) && !UnclosedFiles.Contains(pathName) && TimesCommon.Current.Epoch == Epoch && IsIncludedOnce(pathName);
+        }
+
+        /// <summary>
+        /// Returns the include directive of the file (null for data files)
+        /// </summary>
+        public ParseTracker.IncludedFile GetIncludedFile(string pathName)
+        {
+            return IncludedFiles.FirstOrDefault(file => file.PathName == pathName);
+        }
+
+        /// <summary>
+        /// Adds information about a file that was parsed again
+        /// </summary>
+        public void AddTracker(ParseTracker tracker)
+        {
+            foreach (var pathName in tracker.UnclosedFiles.Where(pathName => !UnclosedFiles.Contains(pathName)))
+                UnclosedFiles.Add(pathName);
+            foreach (var pathName in tracker.StatefulFiles.Where(pathName => !StatefulFiles.Contains(pathName)))
+                StatefulFiles.Add(pathName);
+        }
+
+        /// <summary>
+        /// Checks that the file and the files that include it are included once, so the sequence numbers that follow
+        /// the include directives can be updated when the number of items in the file is changed
+        /// </summary>
+        private bool IsIncludedOnce(string pathName)
+        {
+            var pathNames = new HashSet<string>();
+            while (pathNames.Add(pathName))
+            {
+                var files = IncludedFiles.Where(file => file.PathName == pathName).ToList();
+                if (files.Count != 1)
+                    return files.Count == 0;
+                pathName = files[0].ParentPathName;
+            }
+            return false;
+        }
+
+        /// <summary>
+        /// Records the current size and modification time of the file (the list is replaced, so it can be read by other threads)
+        /// </summary>
+        public void UpdateFile(string pathName)
+        {
+            Files = Files.Select(info => info.FileName == pathName ? new JournalFileInfo(pathName) : info).ToList();
+        }
+    }
+}
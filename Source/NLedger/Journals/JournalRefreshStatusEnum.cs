@@ -0,0 +1,36 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+namespace NLedger.Journals
+{
+    /// <summary>
+    /// Result of Session.RefreshJournal
+    /// </summary>
+    public enum JournalRefreshStatusEnum
+    {
+        /// <summary>
+        /// Journal files are not changed
+        /// </summary>
+        NotChanged,
+
+        /// <summary>
+        /// Transactions appended to the last data file are added to the journal
+        /// </summary>
+        Appended,
+
+        /// <summary>
+        /// Transactions of changed files are removed from the journal and the files are parsed again
+        /// </summary>
+        PartiallyReloaded,
+
+        /// <summary>
+        /// Journal files are read again into a new journal
+        /// </summary>
+        Reloaded
+    }
+}
@@ -0,0 +1,1125 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Accounts;
+using NLedger.Amounts;
+using NLedger.Annotate;
+using NLedger.Commodities;
+using NLedger.Expressions;
+using NLedger.Items;
+using NLedger.Textual;
+using NLedger.Times;
+using NLedger.Utility;
+using NLedger.Utility.BigValues;
+using NLedger.Values;
+using NLedger.Xacts;
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.Linq;
+using System.Text;
+
+namespace NLedger.Journals
+{
+    using BigInt = BigInt<BigRational>;
+
+    /// <summary>
+    /// Binary snapshot of a parsed journal. It keeps the commodity pool (commodities, annotations and prices),
+    /// the account tree, transactions with their postings, automated and periodic transactions and journal-level mappings.
+    /// The snapshot also records every source file (name, size and modification time) so that it can be
+    /// restored instead of parsing the files again as long as none of them has changed.
+    /// </summary>
+    /// <remarks>
+    /// Expressions (amount expressions, value expressions, checks and predicates of automated transactions)
+    /// are stored as text and parsed again on loading. Content that cannot be stored (e.g. values referring to scopes)
+    /// makes Write throw NotSupportedException; the caller is expected to parse the journal in this case.
+    /// </remarks>
+    public static class JournalSnapshot
+    {
+        public const int Signature = 0x534A4C4E; // "NLJS"
+        public const int FormatVersion = 1;
+
+        public static void Write(Stream stream, Journal journal, string settings, ParseTracker tracker)
+        {
+            if (stream == null)
+                throw new ArgumentNullException(nameof(stream));
+            if (journal == null)
+                throw new ArgumentNullException(nameof(journal));
+            if (tracker == null)
+                throw new ArgumentNullException(nameof(tracker));
+            if (tracker.IsRestricted)
+                throw new NotSupportedException(String.Format("Journal cannot be saved as a snapshot because of: {0}", String.Join(", ", tracker.Restrictions)));
+
+            using (var writer = new SnapshotWriter(stream, journal))
+            {
+                writer.Write(Signature);
+                writer.Write(FormatVersion);
+                writer.WriteString(settings);
+
+                writer.WriteCount(tracker.Files.Count);
+                foreach (var fileName in tracker.Files)
+                {
+                    var fileInfo = new JournalFileInfo(fileName);
+                    writer.WriteString(fileInfo.FileName);
+                    writer.Write(fileInfo.Size);
+                    writer.Write(fileInfo.ModTime.Ticks);
+                }
+
+                writer.Write(tracker.IsEpochChanged);
+                if (tracker.IsEpochChanged)
+                    writer.WriteDateTime(TimesCommon.Current.Epoch);
+
+                writer.WriteJournal();
+            }
+        }
+
+        /// <summary>
+        /// Checks whether the snapshot was made with the same settings and none of its source files has changed.
+        /// </summary>
+        public static bool IsActual(Stream stream, string settings)
+        {
+            if (stream == null)
+                throw new ArgumentNullException(nameof(stream));
+
+            using (var reader = new SnapshotReader(stream, null))
+                return reader.ReadHeader(settings);
+        }
+
+        /// <summary>
+        /// Populates an empty journal with the snapshot content. Returns false (and does not change anything)
+        /// if the snapshot is not actual anymore.
+        /// </summary>
+        public static bool Read(Stream stream, Journal journal, string settings)
+        {
+            if (stream == null)
+                throw new ArgumentNullException(nameof(stream));
+            if (journal == null)
+                throw new ArgumentNullException(nameof(journal));
+
+            using (var reader = new SnapshotReader(stream, journal))
+            {
+                if (!reader.ReadHeader(settings))
+                    return false;
+
+                if (reader.ReadBoolean())
+                    TimesCommon.Current.Epoch = reader.ReadDateTime();
+
+                reader.ReadJournal();
+                return true;
+            }
+        }
+
+        /// <summary>
+        /// Adds the snapshot content to a journal the same way as including the source file would do: transactions are appended,
+        /// accounts and commodities are matched by names and the journal settings are kept. Returns false (and does not change anything)
+        /// if the snapshot is not actual anymore or it changes the epoch.
+        /// </summary>
+        public static bool Merge(Stream stream, Journal journal)
+        {
+            if (stream == null)
+                throw new ArgumentNullException(nameof(stream));
+            if (journal == null)
+                throw new ArgumentNullException(nameof(journal));
+
+            using (var reader = new SnapshotReader(stream, journal, true))
+            {
+                if (!reader.ReadHeader(String.Empty) || reader.ReadBoolean())
+                    return false;
+
+                reader.ReadJournal();
+                return true;
+            }
+        }
+
+        private const int EndMarker = 0x444E45; // "END"
+
+        private const AmountParseFlagsEnum ExprParseFlags = AmountParseFlagsEnum.PARSE_NO_MIGRATE;
+        private const AmountParseFlagsEnum AmountExprParseFlags = AmountParseFlagsEnum.PARSE_NO_MIGRATE | AmountParseFlagsEnum.PARSE_NO_REDUCE |
+            AmountParseFlagsEnum.PARSE_SINGLE | AmountParseFlagsEnum.PARSE_NO_ASSIGN;
+
+        private const byte AmountNull = 0;
+        private const byte AmountEmpty = 1;
+        private const byte AmountValue = 2;
+
+        [Flags]
+        private enum AnnotationFlags : byte
+        {
+            None = 0x00,
+            PriceNotPerUnit = 0x01,
+            PriceFixated = 0x02,
+            PriceCalculated = 0x04,
+            DateCalculated = 0x08,
+            TagCalculated = 0x10,
+            ValueExprCalculated = 0x20
+        }
+
+        [Flags]
+        private enum AccountFlags : byte
+        {
+            None = 0x00,
+            Known = 0x01,
+            Temp = 0x02,
+            Generated = 0x04
+        }
+
+        private sealed class SnapshotWriter : BinaryWriter
+        {
+            public SnapshotWriter(Stream stream, Journal journal)
+                : base(stream, Encoding.UTF8, true)
+            {
+                Journal = journal;
+            }
+
+            public Journal Journal { get; }
+
+            public void WriteCount(int count)
+            {
+                Write7BitEncodedInt(count);
+            }
+
+            /// <summary>
+            /// Strings are written once; repeating strings (payees, file names, tags) are replaced with references
+            /// </summary>
+            public void WriteString(string value)
+            {
+                if (value == null)
+                {
+                    Write7BitEncodedInt(0);
+                    return;
+                }
+
+                int index;
+                if (Strings.TryGetValue(value, out index))
+                {
+                    Write7BitEncodedInt(index + 2);
+                }
+                else
+                {
+                    Strings.Add(value, Strings.Count);
+                    Write7BitEncodedInt(1);
+                    Write(value);
+                }
+            }
+
+            public void WriteDateTime(DateTime? value)
+            {
+                Write(value.HasValue);
+                if (value.HasValue)
+                    Write(value.Value.ToBinary());
+            }
+
+            public void WriteDate(Date? value)
+            {
+                WriteDateTime(value.HasValue ? (DateTime?)(DateTime)value.Value : null);
+            }
+
+            public void WriteExpr(Expr expr)
+            {
+                if (expr != null && String.IsNullOrEmpty(expr.Text) && !expr.IsEmpty)
+                    throw new NotSupportedException("Expression without source text cannot be saved");
+
+                WriteString(expr?.Text);
+            }
+
+            public void WriteCommodity(Commodity commodity)
+            {
+                int id;
+                if (!CommodityIds.TryGetValue(commodity, out id))
+                    throw new NotSupportedException(String.Format("Commodity {0} is not in the commodity pool", commodity));
+
+                WriteCount(id);
+            }
+
+            public void WriteAmount(Amount amount)
+            {
+                if (amount == null)
+                {
+                    Write(AmountNull);
+                }
+                else if (amount.IsEmpty)
+                {
+                    Write(AmountEmpty);
+                }
+                else
+                {
+                    Write(AmountValue);
+                    WriteString(amount.Quantity.ToExactString());
+                    WriteCount(amount.Quantity.Precision);
+                    Write(amount.Quantity.KeepPrecision);
+                    WriteCommodity(amount.Commodity);
+                }
+            }
+
+            public void WriteValue(Value value)
+            {
+                var type = Value.IsNullOrEmpty(value) ? ValueTypeEnum.Void : value.Type;
+                Write((byte)type);
+
+                switch (type)
+                {
+                    case ValueTypeEnum.Void: break;
+                    case ValueTypeEnum.Boolean: Write(value.AsBoolean); break;
+                    case ValueTypeEnum.Date: WriteDate(value.AsDate); break;
+                    case ValueTypeEnum.DateTime: WriteDateTime(value.AsDateTime); break;
+                    case ValueTypeEnum.Integer: Write(value.AsLong); break;
+                    case ValueTypeEnum.Amount: WriteAmount(value.AsAmount); break;
+                    case ValueTypeEnum.String: WriteString(value.AsString); break;
+                    case ValueTypeEnum.Mask: WriteString(value.AsMask.Str()); break;
+
+                    case ValueTypeEnum.Balance:
+                        var amounts = value.AsBalance.Amounts.Values;
+                        WriteCount(amounts.Count);
+                        foreach (var amount in amounts)
+                            WriteAmount(amount);
+                        break;
+
+                    case ValueTypeEnum.Sequence:
+                        var sequence = value.AsSequence;
+                        WriteCount(sequence.Count);
+                        foreach (var item in sequence)
+                            WriteValue(item);
+                        break;
+
+                    default:
+                        throw new NotSupportedException(String.Format("Values of type {0} cannot be saved", type));
+                }
+            }
+
+            public void WriteItem(Item item)
+            {
+                Write((int)item.Flags);
+                Write((int)item.State);
+                WriteDate(item.Date);
+                WriteDate(item.DateAux);
+                WriteString(item.Note);
+
+                Write(item.HasPos);
+                if (item.HasPos)
+                {
+                    WriteString(item.Pos.PathName);
+                    Write(item.Pos.BegPos);
+                    Write(item.Pos.BegLine);
+                    Write(item.Pos.EndPos);
+                    Write(item.Pos.EndLine);
+                    Write(item.Pos.Sequence);
+                }
+
+                var metadata = item.GetMetadata()?.ToList() ?? new List<KeyValuePair<string, ItemTag>>();
+                WriteCount(metadata.Count);
+                foreach (var tag in metadata)
+                {
+                    WriteString(tag.Key);
+                    WriteValue(tag.Value.Value);
+                    Write(tag.Value.IsParsed);
+                }
+            }
+
+            public void WritePost(Post post)
+            {
+                PostIds[post] = PostIds.Count;
+
+                WriteItem(post);
+                WriteAccount(post.Account);
+                WriteDateTime(post.Checkin);
+                WriteDateTime(post.Checkout);
+                WriteAmount(post.Amount);
+                WriteExpr(post.AmountExpr);
+                WriteAmount(post.AssignedAmount);
+                WriteAmount(post.Cost);
+                WriteAmount(post.GivenCost);
+            }
+
+            public void WriteAccount(Account account)
+            {
+                if (account == null)
+                {
+                    WriteCount(0);
+                    return;
+                }
+
+                int id;
+                if (!AccountIds.TryGetValue(account, out id))
+                    throw new NotSupportedException(String.Format("Account {0} does not belong to the journal", account.FullName));
+
+                WriteCount(id + 1);
+            }
+
+            public void WriteJournal()
+            {
+                var pool = CommodityPool.Current;
+
+                // Commodities are created in the original order because it affects the way how they are sorted
+                var commodities = pool.Commodities.Values.Distinct().Concat(pool.AnnotatedCommodities.Values).OrderBy(c => c, Commodity.DefaultComparer).ToList();
+                for (int i = 0; i < commodities.Count; i++)
+                    CommodityIds[commodities[i]] = i;
+
+                WriteCount(commodities.Count);
+                foreach (var commodity in commodities)
+                {
+                    Write(commodity.IsAnnotated);
+                    if (commodity.IsAnnotated)
+                    {
+                        var details = ((AnnotatedCommodity)commodity).Details;
+                        if (details.Price != null && !details.Price.IsEmpty && CommodityIds[details.Price.Commodity] >= CommodityIds[commodity])
+                            throw new NotSupportedException("Annotation price refers to a commodity that was created after the annotated commodity");
+
+                        WriteCommodity(commodity.Referent);
+                        WriteAmount(details.Price);
+                        WriteDate(details.Date);
+                        WriteString(details.Tag);
+                        WriteExpr(details.ValueExpr);
+                        Write((byte)GetAnnotationFlags(details));
+                    }
+                    else
+                    {
+                        WriteString(commodity.BaseSymbol);
+                    }
+                }
+
+                var aliases = pool.Commodities.Where(kv => kv.Key != kv.Value.BaseSymbol).ToList();
+                WriteCount(aliases.Count);
+                foreach (var alias in aliases)
+                {
+                    WriteString(alias.Key);
+                    WriteCommodity(alias.Value);
+                }
+
+                Write(pool.DefaultCommodity != null);
+                if (pool.DefaultCommodity != null)
+                    WriteCommodity(pool.DefaultCommodity);
+
+                var prices = pool.CommodityPriceHistory.GetPrices().ToList();
+                WriteCount(prices.Count);
+                foreach (var price in prices)
+                {
+                    WriteCommodity(price.Item1);
+                    WriteDateTime(price.Item2);
+                    WriteAmount(price.Item3);
+                }
+
+                // Accounts
+                var accounts = new List<Account>();
+                CollectAccounts(Journal.Master, accounts);
+                for (int i = 0; i < accounts.Count; i++)
+                    AccountIds[accounts[i]] = i;
+
+                WriteCount(accounts.Count);
+                foreach (var account in accounts)
+                {
+                    if (account.DeferredPosts != null && account.DeferredPosts.Any())
+                        throw new NotSupportedException(String.Format("Account {0} has deferred postings", account.FullName));
+
+                    if (account != Journal.Master)
+                    {
+                        WriteAccount(account.Parent);
+                        WriteString(account.Name);
+                    }
+                    WriteString(account.Note);
+                    WriteExpr(account.ValueExpr);
+                    Write((byte)((account.IsKnownAccount ? AccountFlags.Known : AccountFlags.None) |
+                        (account.IsTempAccount ? AccountFlags.Temp : AccountFlags.None) |
+                        (account.IsGeneratedAccount ? AccountFlags.Generated : AccountFlags.None)));
+                }
+
+                // Journal settings and mappings
+                WriteAccount(Journal.Bucket);
+                WriteExpr(Journal.ValueExpr);
+                Write(Journal.NoAliases);
+                Write(Journal.RecursiveAliases);
+                Write(Journal.DayBreak);
+                Write(Journal.CheckPayees);
+                Write((int)Journal.CheckingStyle);
+
+                WriteCount(Journal.AccountAliases.Count);
+                foreach (var alias in Journal.AccountAliases)
+                {
+                    WriteString(alias.Key);
+                    WriteAccount(alias.Value);
+                }
+
+                WriteCount(Journal.PayeeUUIDMapping.Count);
+                foreach (var mapping in Journal.PayeeUUIDMapping)
+                {
+                    WriteString(mapping.Key);
+                    WriteString(mapping.Value);
+                }
+
+                WriteCount(Journal.PayeesForUnknownAccounts.Count);
+                foreach (var mapping in Journal.PayeesForUnknownAccounts)
+                {
+                    WriteString(mapping.Item1.Str());
+                    WriteAccount(mapping.Item2);
+                }
+
+                WriteCount(Journal.PayeeAliasMappings.Count);
+                foreach (var mapping in Journal.PayeeAliasMappings)
+                {
+                    WriteString(mapping.Item1.Str());
+                    WriteString(mapping.Item2);
+                }
+
+                WriteCount(Journal.KnownTags.Count);
+                foreach (var tag in Journal.KnownTags)
+                    WriteString(tag);
+
+                WriteCount(Journal.KnownPayees.Count);
+                foreach (var payee in Journal.KnownPayees)
+                    WriteString(payee);
+
+                var checkExprs = Journal.TagCheckExprsMap.SelectMany(kv => kv.Value.Select(pair => new KeyValuePair<string, CheckExprPair>(kv.Key, pair))).ToList();
+                WriteCount(checkExprs.Count);
+                foreach (var checkExpr in checkExprs)
+                {
+                    WriteString(checkExpr.Key);
+                    WriteCheckExpr(checkExpr.Value);
+                }
+
+                // Transactions
+                var xactIds = new Dictionary<Xact, int>();
+
+                WriteCount(Journal.Xacts.Count);
+                foreach (var xact in Journal.Xacts)
+                {
+                    xactIds[xact] = xactIds.Count;
+
+                    WriteItem(xact);
+                    WriteString(xact.Code);
+                    WriteString(xact.Payee);
+
+                    WriteCount(xact.Posts.Count);
+                    foreach (var post in xact.Posts)
+                    {
+                        WritePost(post);
+                    }
+                }
+
+                WriteCount(Journal.ChecksumMapping.Count);
+                foreach (var mapping in Journal.ChecksumMapping)
+                {
+                    int xactId;
+                    if (!xactIds.TryGetValue(mapping.Value, out xactId))
+                        throw new NotSupportedException("Checksum mapping refers to a transaction that does not belong to the journal");
+
+                    WriteString(mapping.Key);
+                    WriteCount(xactId);
+                }
+
+                WriteCount(Journal.AutoXacts.Count);
+                foreach (var autoXact in Journal.AutoXacts)
+                {
+                    WriteItem(autoXact);
+
+                    // Predicates are stored in their printed form; make sure that it gives the same expression back
+                    var predicate = autoXact.Predicate.Print();
+                    var keeper = autoXact.Predicate.WhatToKeep;
+                    if (new Predicate(predicate, keeper, ExprParseFlags).Print() != predicate)
+                        throw new NotSupportedException(String.Format("Predicate '{0}' cannot be saved", predicate));
+
+                    WriteString(predicate);
+                    Write(keeper.KeepPrice);
+                    Write(keeper.KeepDate);
+                    Write(keeper.KeepTag);
+                    Write(keeper.OnlyActuals);
+                    Write(autoXact.TryQuickMatch);
+
+                    Write(autoXact.CheckExprs != null);
+                    if (autoXact.CheckExprs != null)
+                    {
+                        WriteCount(autoXact.CheckExprs.Count);
+                        foreach (var checkExpr in autoXact.CheckExprs)
+                            WriteCheckExpr(checkExpr);
+                    }
+
+                    WriteCount(autoXact.Posts.Count);
+                    foreach (var post in autoXact.Posts)
+                        WritePost(post);
+
+                    Write(autoXact.DeferredNotes != null);
+                    if (autoXact.DeferredNotes != null)
+                    {
+                        WriteCount(autoXact.DeferredNotes.Count);
+                        foreach (var note in autoXact.DeferredNotes)
+                        {
+                            WriteString(note.TagData);
+                            Write(note.OverwriteExisting);
+                            WriteCount(note.ApplyToPost != null ? autoXact.Posts.IndexOf(note.ApplyToPost) + 1 : 0);
+                        }
+                    }
+                }
+
+                WriteCount(Journal.PeriodXacts.Count);
+                foreach (var periodXact in Journal.PeriodXacts)
+                {
+                    WriteItem(periodXact);
+                    WriteString(periodXact.PeriodSting);
+
+                    WriteCount(periodXact.Posts.Count);
+                    foreach (var post in periodXact.Posts)
+                        WritePost(post);
+                }
+
+                // Postings in the order they were added to accounts
+                foreach (var account in accounts)
+                {
+                    WriteCount(account.Posts.Count);
+                    foreach (var post in account.Posts)
+                    {
+                        int postId;
+                        if (!PostIds.TryGetValue(post, out postId))
+                            throw new NotSupportedException(String.Format("Account {0} refers to a posting that does not belong to the journal", account.FullName));
+
+                        WriteCount(postId);
+                    }
+                }
+
+                WriteCount(Journal.Sources.Count);
+                foreach (var source in Journal.Sources)
+                {
+                    Write(source.FromStream);
+                    WriteString(source.FileName);
+                }
+
+                // Commodity details go last because parsing expressions above might have updated them
+                foreach (var commodity in commodities.Where(c => !c.IsAnnotated))
+                {
+                    WriteCount(commodity.Precision);
+                    Write((int)commodity.Flags);
+                    WriteString(commodity.Name);
+                    WriteString(commodity.Note);
+                    WriteExpr(commodity.ValueExpr);
+                    WriteAmount(commodity.Smaller);
+                    WriteAmount(commodity.Larger);
+                }
+
+                Write(EndMarker);
+            }
+
+            private void WriteCheckExpr(CheckExprPair checkExpr)
+            {
+                WriteExpr(checkExpr.Expr);
+                Write((byte)checkExpr.CheckExprKind);
+            }
+
+            private static void CollectAccounts(Account account, IList<Account> accounts)
+            {
+                accounts.Add(account);
+                foreach (var child in account.Accounts.Values)
+                    CollectAccounts(child, accounts);
+            }
+
+            private static AnnotationFlags GetAnnotationFlags(Annotation details)
+            {
+                return (details.IsPriceNotPerUnit ? AnnotationFlags.PriceNotPerUnit : AnnotationFlags.None) |
+                    (details.IsPriceFixated ? AnnotationFlags.PriceFixated : AnnotationFlags.None) |
+                    (details.IsPriceCalculated ? AnnotationFlags.PriceCalculated : AnnotationFlags.None) |
+                    (details.IsDateCalculated ? AnnotationFlags.DateCalculated : AnnotationFlags.None) |
+                    (details.IsTagCalculated ? AnnotationFlags.TagCalculated : AnnotationFlags.None) |
+                    (details.IsValueExprCalculated ? AnnotationFlags.ValueExprCalculated : AnnotationFlags.None);
+            }
+
+            private readonly IDictionary<string, int> Strings = new Dictionary<string, int>();
+            private readonly IDictionary<Commodity, int> CommodityIds = new Dictionary<Commodity, int>();
+            private readonly IDictionary<Account, int> AccountIds = new Dictionary<Account, int>();
+            private readonly IDictionary<Post, int> PostIds = new Dictionary<Post, int>();
+        }
+
+        private sealed class SnapshotReader : BinaryReader
+        {
+            public SnapshotReader(Stream stream, Journal journal, bool isMerge = false)
+                : base(stream, Encoding.UTF8, true)
+            {
+                Journal = journal;
+                IsMerge = isMerge;
+            }
+
+            public Journal Journal { get; }
+            public bool IsMerge { get; }
+
+            public bool ReadHeader(string settings)
+            {
+                if (BaseStream.Length < sizeof(int) * 2 || ReadInt32() != Signature || ReadInt32() != FormatVersion)
+                    return false;
+
+                if (ReadString() != settings)
+                    return false;
+
+                int count = ReadCount();
+                for (int i = 0; i < count; i++)
+                {
+                    var fileName = ReadString();
+                    var size = ReadInt64();
+                    var modTime = ReadInt64();
+
+                    if (!FileSystem.FileExists(fileName))
+                        return false;
+
+                    var fileInfo = new JournalFileInfo(fileName);
+                    if (fileInfo.Size != size || fileInfo.ModTime.Ticks != modTime)
+                        return false;
+                }
+
+                return true;
+            }
+
+            public int ReadCount()
+            {
+                return Read7BitEncodedInt();
+            }
+
+            public override string ReadString()
+            {
+                int code = Read7BitEncodedInt();
+                if (code == 0)
+                    return null;
+
+                if (code == 1)
+                {
+                    var value = base.ReadString();
+                    Strings.Add(value);
+                    return value;
+                }
+
+                return Strings[code - 2];
+            }
+
+            public DateTime? ReadDateTime()
+            {
+                return ReadBoolean() ? DateTime.FromBinary(ReadInt64()) : (DateTime?)null;
+            }
+
+            public Date? ReadDate()
+            {
+                var dateTime = ReadDateTime();
+                return dateTime.HasValue ? (Date)dateTime.Value : (Date?)null;
+            }
+
+            public Expr ReadExpr(AmountParseFlagsEnum flags = ExprParseFlags)
+            {
+                var text = ReadString();
+                return text != null ? new Expr(text, flags) : null;
+            }
+
+            public Commodity ReadCommodity()
+            {
+                int id = ReadCount();
+                if (id >= Commodities.Count)
+                    throw new InvalidDataException("Reference to a commodity that is not created yet");
+
+                return Commodities[id];
+            }
+
+            public Amount ReadAmount()
+            {
+                var kind = ReadByte();
+                if (kind == AmountNull)
+                    return null;
+                if (kind == AmountEmpty)
+                    return new Amount();
+
+                var quantity = ReadString();
+                var precision = ReadCount();
+                var keepPrecision = ReadBoolean();
+                return new Amount(BigInt.ParseExact(quantity, precision, keepPrecision), ReadCommodity());
+            }
+
+            public Value ReadValue()
+            {
+                var type = (ValueTypeEnum)ReadByte();
+                switch (type)
+                {
+                    case ValueTypeEnum.Void: return new Value();
+                    case ValueTypeEnum.Boolean: return new Value(ReadBoolean());
+                    case ValueTypeEnum.Date: return new Value(ReadDate().Value);
+                    case ValueTypeEnum.DateTime: return new Value(ReadDateTime().Value);
+                    case ValueTypeEnum.Integer: return new Value(ReadInt64());
+                    case ValueTypeEnum.Amount: return new Value(ReadAmount());
+                    case ValueTypeEnum.String: return Value.StringValue(ReadString());
+                    case ValueTypeEnum.Mask: return new Value(new Mask(ReadString()));
+
+                    case ValueTypeEnum.Balance:
+                        var balance = new Balance();
+                        int amounts = ReadCount();
+                        for (int i = 0; i < amounts; i++)
+                            balance.Add(ReadAmount());
+                        return new Value(balance);
+
+                    case ValueTypeEnum.Sequence:
+                        var sequence = new List<Value>();
+                        int items = ReadCount();
+                        for (int i = 0; i < items; i++)
+                            sequence.Add(ReadValue());
+                        return new Value(sequence);
+
+                    default:
+                        throw new InvalidDataException(String.Format("Unexpected value type {0}", type));
+                }
+            }
+
+            public void ReadItem(Item item)
+            {
+                item.Flags = (SupportsFlagsEnum)ReadInt32();
+                item.State = (ItemStateEnum)ReadInt32();
+                item.Date = ReadDate();
+                item.DateAux = ReadDate();
+                item.Note = ReadString();
+
+                if (ReadBoolean())
+                {
+                    item.Pos = new ItemPosition()
+                    {
+                        PathName = ReadString(),
+                        BegPos = ReadInt64(),
+                        BegLine = ReadInt32(),
+                        EndPos = ReadInt32(),
+                        EndLine = ReadInt32(),
+                        Sequence = ReadInt32()
+                    };
+                }
+
+                int tags = ReadCount();
+                for (int i = 0; i < tags; i++)
+                {
+                    var tag = ReadString();
+                    var value = ReadValue();
+                    item.SetTag(tag, value, true, ReadBoolean());
+                }
+            }
+
+            public Post ReadPost()
+            {
+                var post = new Post();
+                ReadItem(post);
+                post.Account = ReadAccount();
+                post.Checkin = ReadDateTime();
+                post.Checkout = ReadDateTime();
+                post.Amount = ReadAmount();
+                post.AmountExpr = ReadExpr(AmountExprParseFlags);
+                post.AssignedAmount = ReadAmount();
+                post.Cost = ReadAmount();
+                post.GivenCost = ReadAmount();
+
+                Posts.Add(post);
+                return post;
+            }
+
+            public Account ReadAccount()
+            {
+                int id = ReadCount();
+                if (id > Accounts.Count)
+                    throw new InvalidDataException("Reference to an account that is not created yet");
+
+                return id > 0 ? Accounts[id - 1] : null;
+            }
+
+            public void ReadJournal()
+            {
+                var pool = CommodityPool.Current;
+
+                int commodities = ReadCount();
+                for (int i = 0; i < commodities; i++)
+                {
+                    if (ReadBoolean())
+                    {
+                        var referent = ReadCommodity();
+                        var details = new Annotation(ReadAmount(), ReadDate(), ReadString());
+                        details.ValueExpr = ReadExpr();
+
+                        var flags = (AnnotationFlags)ReadByte();
+                        details.IsPriceNotPerUnit = flags.HasFlag(AnnotationFlags.PriceNotPerUnit);
+                        details.IsPriceFixated = flags.HasFlag(AnnotationFlags.PriceFixated);
+                        details.IsPriceCalculated = flags.HasFlag(AnnotationFlags.PriceCalculated);
+                        details.IsDateCalculated = flags.HasFlag(AnnotationFlags.DateCalculated);
+                        details.IsTagCalculated = flags.HasFlag(AnnotationFlags.TagCalculated);
+                        details.IsValueExprCalculated = flags.HasFlag(AnnotationFlags.ValueExprCalculated);
+
+                        Commodities.Add(pool.FindOrCreate(referent, details));
+                    }
+                    else
+                    {
+                        var symbol = ReadString();
+                        var commodity = IsMerge ? pool.Find(symbol) : null;
+                        if (commodity != null)
+                            MergedCommodities.Add(commodity);
+
+                        Commodities.Add(commodity ?? pool.FindOrCreate(symbol));
+                    }
+                }
+
+                int aliases = ReadCount();
+                for (int i = 0; i < aliases; i++)
+                {
+                    var alias = ReadString();
+                    pool.Commodities[alias] = ReadCommodity();
+                }
+
+                if (ReadBoolean())
+                    pool.DefaultCommodity = ReadCommodity();
+
+                int prices = ReadCount();
+                for (int i = 0; i < prices; i++)
+                {
+                    var source = ReadCommodity();
+                    var when = ReadDateTime().Value;
+                    pool.CommodityPriceHistory.AddPrice(source, when, ReadAmount());
+                }
+
+                // Accounts
+                int accounts = ReadCount();
+                for (int i = 0; i < accounts; i++)
+                {
+                    Account account;
+                    if (i == 0)
+                    {
+                        account = Journal.Master;
+                        account.Note = ReadString() ?? (IsMerge ? account.Note : null);
+                    }
+                    else
+                    {
+                        var parent = ReadAccount();
+                        var name = ReadString();
+                        var note = ReadString();
+
+                        // Merged accounts are matched by names
+                        if (IsMerge && parent.Accounts.TryGetValue(name, out account))
+                        {
+                            account.Note = note ?? account.Note;
+                        }
+                        else
+                        {
+                            account = new Account(parent, name, note);
+                            parent.AddAccount(account);
+                        }
+                    }
+                    Accounts.Add(account);
+
+                    account.ValueExpr = ReadExpr() ?? (IsMerge ? account.ValueExpr : null);
+                    var flags = (AccountFlags)ReadByte();
+                    account.IsKnownAccount = flags.HasFlag(AccountFlags.Known) || (IsMerge && account.IsKnownAccount);
+                    account.IsTempAccount = flags.HasFlag(AccountFlags.Temp) || (IsMerge && account.IsTempAccount);
+                    account.IsGeneratedAccount = flags.HasFlag(AccountFlags.Generated) || (IsMerge && account.IsGeneratedAccount);
+                }
+
+                // Journal settings and mappings (merged content does not change the settings)
+                var bucket = ReadAccount();
+                var valueExpr = ReadExpr();
+                var noAliases = ReadBoolean();
+                var recursiveAliases = ReadBoolean();
+                var dayBreak = ReadBoolean();
+                var checkPayees = ReadBoolean();
+                var checkingStyle = (JournalCheckingStyleEnum)ReadInt32();
+
+                if (!IsMerge)
+                {
+                    Journal.Bucket = bucket;
+                    Journal.ValueExpr = valueExpr;
+                    Journal.NoAliases = noAliases;
+                    Journal.RecursiveAliases = recursiveAliases;
+                    Journal.DayBreak = dayBreak;
+                    Journal.CheckPayees = checkPayees;
+                    Journal.CheckingStyle = checkingStyle;
+                }
+
+                int count = ReadCount();
+                for (int i = 0; i < count; i++)
+                {
+                    var alias = ReadString();
+                    Journal.AccountAliases[alias] = ReadAccount();
+                }
+
+                count = ReadCount();
+                for (int i = 0; i < count; i++)
+                {
+                    var uuid = ReadString();
+                    Journal.PayeeUUIDMapping[uuid] = ReadString();
+                }
+
+                count = ReadCount();
+                for (int i = 0; i < count; i++)
+                {
+                    var mask = new Mask(ReadString());
+                    Journal.PayeesForUnknownAccounts.Add(new Tuple<Mask, Account>(mask, ReadAccount()));
+                }
+
+                count = ReadCount();
+                for (int i = 0; i < count; i++)
+                {
+                    var mask = new Mask(ReadString());
+                    Journal.PayeeAliasMappings.Add(new Tuple<Mask, string>(mask, ReadString()));
+                }
+
+                count = ReadCount();
+                for (int i = 0; i < count; i++)
+                    Journal.KnownTags.Add(ReadString());
+
+                count = ReadCount();
+                for (int i = 0; i < count; i++)
+                    Journal.KnownPayees.Add(ReadString());
+
+                count = ReadCount();
+                for (int i = 0; i < count; i++)
+                {
+                    var tag = ReadString();
+                    Journal.TagCheckExprsMap.Add(tag, ReadCheckExpr());
+                }
+
+                // Transactions
+                int firstXact = Journal.Xacts.Count;
+                int xacts = ReadCount();
+                for (int i = 0; i < xacts; i++)
+                {
+                    var xact = new Xact();
+                    ReadItem(xact);
+                    xact.Code = ReadString();
+                    xact.Payee = ReadString();
+
+                    int xactPosts = ReadCount();
+                    for (int j = 0; j < xactPosts; j++)
+                    {
+                        xact.AddPost(ReadPost());
+                    }
+
+                    xact.Journal = Journal;
+                    Journal.Xacts.Add(xact);
+                }
+
+                count = ReadCount();
+                for (int i = 0; i < count; i++)
+                {
+                    var checksum = ReadString();
+                    Journal.ChecksumMapping[checksum] = Journal.Xacts[firstXact + ReadCount()];
+                }
+
+                int autoXacts = ReadCount();
+                for (int i = 0; i < autoXacts; i++)
+                {
+                    var item = new Post();
+                    ReadItem(item);
+
+                    var predicate = ReadString();
+                    var keeper = new AnnotationKeepDetails(ReadBoolean(), ReadBoolean(), ReadBoolean(), ReadBoolean());
+                    var autoXact = new AutoXact(new Predicate(predicate, keeper, ExprParseFlags));
+                    autoXact.CopyDetails(item);
+                    autoXact.TryQuickMatch = ReadBoolean();
+
+                    if (ReadBoolean())
+                    {
+                        autoXact.CheckExprs = new List<CheckExprPair>();
+                        int checkExprs = ReadCount();
+                        for (int j = 0; j < checkExprs; j++)
+                            autoXact.CheckExprs.Add(ReadCheckExpr());
+                    }
+
+                    int autoPosts = ReadCount();
+                    for (int j = 0; j < autoPosts; j++)
+                        autoXact.AddPost(ReadPost());
+
+                    if (ReadBoolean())
+                    {
+                        int notes = ReadCount();
+                        for (int j = 0; j < notes; j++)
+                        {
+                            var tagData = ReadString();
+                            var overwriteExisting = ReadBoolean();
+                            int postId = ReadCount();
+                            autoXact.ActivePost = postId > 0 ? autoXact.Posts[postId - 1] : null;
+                            autoXact.ParseTags(tagData, null, overwriteExisting);
+                        }
+                        autoXact.ActivePost = null;
+                    }
+
+                    autoXact.Journal = Journal;
+                    Journal.AutoXacts.Add(autoXact);
+                }
+
+                int periodXacts = ReadCount();
+                for (int i = 0; i < periodXacts; i++)
+                {
+                    var item = new Post();
+                    ReadItem(item);
+
+                    var periodXact = new PeriodXact(ReadString());
+                    periodXact.CopyDetails(item);
+
+                    int periodPosts = ReadCount();
+                    for (int j = 0; j < periodPosts; j++)
+                        periodXact.AddPost(ReadPost());
+
+                    periodXact.Journal = Journal;
+                    Journal.PeriodXacts.Add(periodXact);
+                }
+
+                // Postings in the order they were added to accounts
+                foreach (var account in Accounts)
+                {
+                    count = ReadCount();
+                    for (int i = 0; i < count; i++)
+                        account.Posts.Add(Posts[ReadCount()]);
+                }
+
+                count = ReadCount();
+                for (int i = 0; i < count; i++)
+                {
+                    var fromStream = ReadBoolean();
+                    var fileName = ReadString();
+
+                    // Included files are not journal sources
+                    if (!IsMerge)
+                        Journal.Sources.Add(fromStream ? new JournalFileInfo() : new JournalFileInfo(fileName));
+                }
+
+                // Commodity details
+                foreach (var commodity in Commodities.Where(c => !c.IsAnnotated))
+                {
+                    // Existing commodities keep their details; the style is updated the same way as parsing an amount does
+                    if (MergedCommodities.Contains(commodity))
+                    {
+                        var precision = ReadCount();
+                        var commodityFlags = (CommodityFlagsEnum)ReadInt32();
+                        var name = ReadString();
+                        var note = ReadString();
+                        var commodityValueExpr = ReadExpr();
+                        var smaller = ReadAmount();
+                        var larger = ReadAmount();
+
+                        commodity.Precision = Math.Max(commodity.Precision, precision);
+                        commodity.Flags |= commodityFlags;
+                        commodity.Base.Name = commodity.Name ?? name;
+                        commodity.Base.Note = commodity.Note ?? note;
+                        commodity.ValueExpr = commodity.ValueExpr ?? commodityValueExpr;
+                        commodity.Smaller = commodity.Smaller ?? smaller;
+                        commodity.Larger = commodity.Larger ?? larger;
+                        continue;
+                    }
+
+                    commodity.Precision = ReadCount();
+                    commodity.Flags = (CommodityFlagsEnum)ReadInt32();
+                    commodity.Base.Name = ReadString();
+                    commodity.Base.Note = ReadString();
+                    commodity.ValueExpr = ReadExpr();
+                    commodity.Smaller = ReadAmount();
+                    commodity.Larger = ReadAmount();
+                }
+
+                if (ReadInt32() != EndMarker)
+                    throw new InvalidDataException("Snapshot is corrupted");
+            }
+
+            private CheckExprPair ReadCheckExpr()
+            {
+                var expr = ReadExpr();
+                return new CheckExprPair(expr, (CheckExprKindEnum)ReadByte());
+            }
+
+            private readonly IList<string> Strings = new List<string>();
+            private readonly IList<Commodity> Commodities = new List<Commodity>();
+            private readonly IList<Account> Accounts = new List<Account>();
+            private readonly IList<Post> Posts = new List<Post>();
+            private readonly ISet<Commodity> MergedCommodities = new HashSet<Commodity>();
+        }
+    }
+}
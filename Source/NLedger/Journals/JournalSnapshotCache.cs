@@ -0,0 +1,133 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Textual;
+using NLedger.Utility;
+using NLedger.Utils;
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.Linq;
+using System.Text;
+
+namespace NLedger.Journals
+{
+    /// <summary>
+    /// Folder with journal snapshots. Every snapshot file is named after the hash of the reading settings
+    /// (data files and session options), so different sets of journal files do not overwrite each other's snapshots.
+    /// </summary>
+    public sealed class JournalSnapshotCache
+    {
+        public const string SnapshotFileExtension = ".nljs";
+
+        public JournalSnapshotCache(string directory)
+        {
+            if (String.IsNullOrWhiteSpace(directory))
+                throw new ArgumentNullException(nameof(directory));
+
+            Directory = directory;
+        }
+
+        public string Directory { get; }
+
+        public string GetSnapshotPath(string settings)
+        {
+            return Path.Combine(Directory, SHA1.GetHash(settings ?? String.Empty) + SnapshotFileExtension);
+        }
+
+        /// <summary>
+        /// Populates the journal from the snapshot if it exists and all source files are unchanged.
+        /// The journal is expected to be empty; otherwise the snapshot is not used.
+        /// </summary>
+        /// <remarks>
+        /// If the snapshot file is corrupted, the method throws InvalidDataException or IOException; the journal might be partially populated in this case.
+        /// </remarks>
+        public bool TryLoad(Journal journal, string settings)
+        {
+            if (journal == null)
+                throw new ArgumentNullException(nameof(journal));
+
+            if (!IsEmpty(journal))
+                return false;
+
+            var snapshotPath = GetSnapshotPath(settings);
+            if (!File.Exists(snapshotPath))
+                return false;
+
+            using (var stream = new FileStream(snapshotPath, FileMode.Open, FileAccess.Read, FileShare.Read))
+            {
+                var isLoaded = JournalSnapshot.Read(stream, journal, settings);
+                Logger.Current.Debug("journal.snapshot", () => String.Format("Snapshot {0} is {1}", snapshotPath, isLoaded ? "loaded" : "outdated"));
+                return isLoaded;
+            }
+        }
+
+        /// <summary>
+        /// Saves the journal as a snapshot. Journals that cannot be restored without parsing (see ParseTracker.Restrictions)
+        /// or contain data that cannot be saved are skipped; the method returns false in this case.
+        /// </summary>
+        public bool TrySave(Journal journal, string settings, ParseTracker tracker)
+        {
+            if (journal == null)
+                throw new ArgumentNullException(nameof(journal));
+            if (tracker == null)
+                throw new ArgumentNullException(nameof(tracker));
+
+            var snapshotPath = GetSnapshotPath(settings);
+            if (tracker.IsRestricted)
+            {
+                Logger.Current.Debug("journal.snapshot", () => String.Format("Snapshot {0} is not saved because of: {1}", snapshotPath, String.Join(", ", tracker.Restrictions)));
+                DeleteFile(snapshotPath);
+                return false;
+            }
+
+            var tempPath = snapshotPath + "." + Guid.NewGuid().ToString("N");
+            try
+            {
+                System.IO.Directory.CreateDirectory(Directory);
+                using (var stream = new FileStream(tempPath, FileMode.CreateNew, FileAccess.Write, FileShare.None))
+                    JournalSnapshot.Write(stream, journal, settings, tracker);
+
+                DeleteFile(snapshotPath);
+                File.Move(tempPath, snapshotPath);
+                return true;
+            }
+            catch (NotSupportedException ex)
+            {
+                Logger.Current.Debug("journal.snapshot", () => String.Format("Snapshot {0} is not saved: {1}", snapshotPath, ex.Message));
+                DeleteFile(tempPath);
+                DeleteFile(snapshotPath);
+                return false;
+            }
+            catch (Exception ex) when (ex is IOException || ex is UnauthorizedAccessException)
+            {
+                // Another process might save the same snapshot at the moment; the snapshot is optional anyway
+                Logger.Current.Debug("journal.snapshot", () => String.Format("Snapshot {0} is not saved: {1}", snapshotPath, ex.Message));
+                DeleteFile(tempPath);
+                return false;
+            }
+        }
+
+        private static bool IsEmpty(Journal journal)
+        {
+            return !journal.Xacts.Any() && !journal.AutoXacts.Any() && !journal.PeriodXacts.Any() &&
+                !journal.Sources.Any() && !journal.Master.Accounts.Any();
+        }
+
+        private static void DeleteFile(string path)
+        {
+            try
+            {
+                if (File.Exists(path))
+                    File.Delete(path);
+            }
+            catch (Exception ex) when (ex is IOException || ex is UnauthorizedAccessException)
+            { }
+        }
+    }
+}
@@ -10,14 +10,17 @@ using NLedger.Accounts;
 using NLedger.Amounts;
 using NLedger.Commodities;
 using NLedger.Expressions;
+using NLedger.Items;
 using NLedger.Journals;
 using NLedger.Textual;
 using NLedger.Times;
 using NLedger.Utility;
 using NLedger.Utils;
 using NLedger.Values;
+using NLedger.Xacts;
 using System;
 using System.Collections.Generic;
+using System.IO;
 using System.Linq;
 using System.Text;
 using System.Threading.Tasks;
@@ -89,6 +92,19 @@ namespace NLedger.Scopus
         public ParseContextStack ParsingContext { get; private set; }
         public Expr ValueExpr { get; private set; }
 
+        /// <summary>
+        /// Enables parsing data files and included files on worker threads (see ParallelParser). The feature is experimental
+        /// and is off by default; it is ignored if any option other than --file and --price-db is specified.
+        /// </summary>
+        public bool ParallelRead { get; set; }
+
+        /// <summary>
+        /// The state of journal files after the last successful ReadJournalFiles (see RefreshJournal)
+        /// </summary>
+        private JournalRefreshState RefreshState { get; set; }
+        private string LastDataFile { get; set; }
+        private int LastDataFileSequence { get; set; }
+
         public override string Description
         {
             get { return CurrentSessionKey; }
@@ -190,8 +206,54 @@ namespace NLedger.Scopus
                 ParsingContext.Pop();
             }
 
+            using (var prefetcher = CreateParallelParser())
+            {
+                ParsingContext.Prefetcher = prefetcher;
+                try
+                {
+                    xactCount += ReadDataFiles(acct, prefetcher);
+                }
+                finally
+                {
+                    ParsingContext.Prefetcher = null;
+                }
+            }
+
+            Logger.Current.Debug("ledger.read", () => String.Format("xact_count [{0}] == journal->xacts.size() [{1}]", xactCount, Journal.Xacts.Count));
+            if (xactCount != Journal.Xacts.Count)
+                throw new InvalidOperationException("assert(xact_count == journal->xacts.size())");
+
+            if (populatedDataFiles)
+                FileHandler.DataFiles.Clear();
+
+            Validator.Verify(() => Journal.Valid());
+
+            return Journal.Xacts.Count();
+        }
+
+        private int ReadDataFiles(Account acct, ParallelParser prefetcher)
+        {
+            int xactCount = 0;
+
+            // The first file is parsed on the current thread while workers parse the others
+            foreach (string pathName in FileHandler.DataFiles.Skip(1).Where(pathName => pathName != "-" && !FileSystem.IsStdIn(pathName)))
+                prefetcher?.Prefetch(pathName);
+
             foreach(string pathName in FileHandler.DataFiles)
             {
+                ParallelParser.ParsedFile parsedFile;
+                if (prefetcher != null && prefetcher.TryMerge(pathName, acct, null, out parsedFile))
+                {
+                    ParsingContext.Tracker?.AddFile(parsedFile.PathName);
+                    if (parsedFile.Count > 0)
+                        Journal.Sources.Add(new JournalFileInfo(parsedFile.PathName));
+
+                    LastDataFile = parsedFile.PathName;
+                    LastDataFileSequence = parsedFile.Sequence;
+                    xactCount += parsedFile.Count;
+                    continue;
+                }
+
                 if (pathName == "-" || FileSystem.IsStdIn(pathName)) // (pathname == "-" || pathname == "/dev/stdin")
                 {
                     // To avoid problems with stdin and pipes, etc., we read the entire
@@ -216,19 +278,24 @@ namespace NLedger.Scopus
                     ParsingContext.Pop();
                     throw;
                 }
+
+                LastDataFile = ParsingContext.GetCurrent().PathName;
+                LastDataFileSequence = ParsingContext.GetCurrent().Sequence;
                 ParsingContext.Pop();
             }
 
-            Logger.Current.Debug("ledger.read", () => String.Format("xact_count [{0}] == journal->xacts.size() [{1}]", xactCount, Journal.Xacts.Count));
-            if (xactCount != Journal.Xacts.Count)
-                throw new InvalidOperationException("assert(xact_count == journal->xacts.size())");
-
-            if (populatedDataFiles)
-                FileHandler.DataFiles.Clear();
+            return xactCount;
+        }
 
-            Validator.Verify(() => Journal.Valid());
+        /// <summary>
+        /// Returns a parallel parser if it is enabled and no options that change parsing are specified
+        /// </summary>
+        private ParallelParser CreateParallelParser()
+        {
+            if (!ParallelRead || Options.Options.Any(opt => opt.Handled && opt != FileHandler && opt != PriceDbHandler))
+                return null;
 
-            return Journal.Xacts.Count();
+            return new ParallelParser(Journal);
         }
 
         /// <summary>
@@ -242,7 +309,24 @@ namespace NLedger.Scopus
             if (MasterAccountHandler.Handled)
                 masterAccount = MasterAccountHandler.Str();
 
-            int count = ReadData(masterAccount);
+            RefreshState = null;
+            var tracker = ParsingContext.Tracker ?? new ParseTracker();
+            bool ownTracker = ParsingContext.Tracker == null;
+
+            int count;
+            ParsingContext.Tracker = tracker;
+            try
+            {
+                count = ReadData(masterAccount);
+            }
+            finally
+            {
+                if (ownTracker)
+                    ParsingContext.Tracker = null;
+            }
+
+            var master = String.IsNullOrEmpty(masterAccount) ? Journal.Master : Journal.FindAccount(masterAccount);
+            RefreshState = new JournalRefreshState(Journal, master, tracker, LastDataFile, LastDataFileSequence);
 
             info?.Finish(); // INFO_FINISH
 
@@ -251,6 +335,46 @@ namespace NLedger.Scopus
             return Journal;
         }
 
+        /// <summary>
+        /// Reads journal files or restores the journal from a snapshot if the files are not changed since the snapshot was made.
+        /// A new snapshot is saved every time the files are parsed.
+        /// </summary>
+        public Journal ReadJournalFiles(JournalSnapshotCache snapshotCache)
+        {
+            if (snapshotCache == null)
+                throw new ArgumentNullException(nameof(snapshotCache));
+
+            RefreshState = null;
+            var settings = GetSnapshotSettings();
+            try
+            {
+                if (snapshotCache.TryLoad(Journal, settings))
+                {
+                    Logger.Current.Info(() => String.Format("Found {0} transactions in the journal snapshot", Journal.Xacts.Count));
+                    return Journal;
+                }
+            }
+            catch (Exception ex) when (ex is IOException || ex is InvalidDataException || ex is FormatException)
+            {
+                Logger.Current.Info(() => String.Format("Journal snapshot is ignored: {0}", ex.Message));
+                CloseJournalFiles();
+            }
+
+            var tracker = new ParseTracker();
+            ParsingContext.Tracker = tracker;
+            try
+            {
+                ReadJournalFiles();
+            }
+            finally
+            {
+                ParsingContext.Tracker = null;
+            }
+
+            snapshotCache.TrySave(Journal, settings, tracker);
+            return Journal;
+        }
+
         public Journal ReadJournal(string pathName)
         {
             FileHandler.DataFiles.Clear();
@@ -259,9 +383,21 @@ namespace NLedger.Scopus
             return ReadJournalFiles();
         }
 
+        public Journal ReadJournal(string pathName, string snapshotDirectory)
+        {
+            if (String.IsNullOrEmpty(snapshotDirectory))
+                return ReadJournal(pathName);
+
+            FileHandler.DataFiles.Clear();
+            FileHandler.DataFiles.Add(pathName);
+
+            return ReadJournalFiles(new JournalSnapshotCache(snapshotDirectory));
+        }
+
         public Journal ReadJournalFromString(string data)
         {
             FileHandler.DataFiles.Clear();
+            RefreshState = null;
 
             ParsingContext.Push(new TextualReader(FileSystem.GetStreamReaderFromString(data)));
 
@@ -282,8 +418,333 @@ namespace NLedger.Scopus
             return Journal;
         }
 
+        /// <summary>
+        /// Describes everything that affects reading journal files besides their content: the list of files,
+        /// session options, the current year (dates without a year depend on it) and the library version.
+        /// </summary>
+        private string GetSnapshotSettings()
+        {
+            var sb = new StringBuilder();
+            sb.AppendLine(typeof(Session).Assembly.GetName().Version.ToString());
+
+            foreach (var pathName in FileHandler.DataFiles)
+                sb.AppendLine(String.Format("file={0}", FileSystem.ResolvePath(pathName)));
+
+            if (!PriceDbHandler.Handled)
+            {
+                var priceDbPath = FileSystem.HomePath(DefaultPriceDbFileName);
+                sb.AppendLine(String.Format("pricedb={0}", FileSystem.FileExists(priceDbPath) ? priceDbPath : String.Empty));
+            }
+
+            foreach (var option in Options.Options.Where(opt => opt.Handled && opt != FileHandler))
+                sb.AppendLine(String.Format("{0}={1}", option.Desc, option.Value));
+
+            var epoch = TimesCommon.Current.Epoch;
+            sb.AppendLine(String.Format("epoch={0}", epoch.HasValue ? epoch.Value.ToString("o") : TimesCommon.Current.CurrentDate.Year.ToString()));
+
+            return sb.ToString();
+        }
+
+        /// <summary>
+        /// Brings the journal up to date with its files. If the only change is text appended to the last data file,
+        /// the appended transactions are parsed and added to the current journal. If changed files contain only transactions
+        /// (no directives, prices or costs), their transactions are replaced with the parsed content of the files and the rest of the journal is kept.
+        /// Any other change (or a journal that was restored from a snapshot) makes the session read the files again into a new journal;
+        /// objects of the previous journal become obsolete.
+        /// </summary>
+        public JournalRefreshStatusEnum RefreshJournal(JournalSnapshotCache snapshotCache = null)
+        {
+            if (!FileHandler.DataFiles.Any() || FileHandler.DataFiles.Any(pathName => pathName == "-" || FileSystem.IsStdIn(pathName)))
+                throw new InvalidOperationException("Journal was not read from files");
+
+            var state = RefreshState;
+            if (state != null && state.Journal == Journal)
+            {
+                var changedFiles = state.GetChangedFiles().ToList();
+                if (!changedFiles.Any())
+                    return JournalRefreshStatusEnum.NotChanged;
+
+                if (changedFiles.Count == 1 && ReadAppendedData(state, changedFiles.Single()))
+                    return JournalRefreshStatusEnum.Appended;
+
+                if (ReloadChangedFiles(state, changedFiles))
+                    return JournalRefreshStatusEnum.PartiallyReloaded;
+            }
+
+            Logger.Current.Info(() => "Journal files are changed; reading the journal again");
+            CloseJournalFiles();
+
+            if (snapshotCache != null)
+                ReadJournalFiles(snapshotCache);
+            else
+                ReadJournalFiles();
+
+            return JournalRefreshStatusEnum.Reloaded;
+        }
+
+        /// <summary>
+        /// Returns names of the files that the journal was read from, including included files
+        /// </summary>
+        public IEnumerable<string> GetJournalFiles()
+        {
+            var state = RefreshState;
+            if (state != null && state.Journal == Journal)
+                return state.Files.Select(info => info.FileName).ToList();
+
+            return Journal.Sources.Where(info => !info.FromStream).Select(info => info.FileName).ToList();
+        }
+
+        /// <summary>
+        /// Parses text that was appended to the file since it was read. Returns false if the change is not a plain append
+        /// of complete transactions (or prices) that could be parsed as a continuation of the file.
+        /// </summary>
+        private bool ReadAppendedData(JournalRefreshState state, JournalFileInfo fileInfo)
+        {
+            string pathName = fileInfo.FileName;
+            if (!state.CanAppend(pathName) || !FileSystem.FileExists(pathName))
+                return false;
+
+            var content = FileSystem.GetFileBytes(pathName);
+            int position = (int)fileInfo.Size;
+            if (content.Length <= position || (position > 0 && content[position - 1] != '\n'))
+                return false;
+
+            var appendedText = Encoding.UTF8.GetString(content, position, content.Length - position);
+            var firstLine = appendedText.Split('\n').FirstOrDefault(line => !String.IsNullOrWhiteSpace(line));
+            if (firstLine == null || Char.IsWhiteSpace(firstLine[0]) || !ParallelParser.IsPlainFile(new StringReader(appendedText)))
+                return false;
+
+            int lineNumOffset = 0;
+            for (int i = 0; i < position; i++)
+            {
+                if (content[i] == '\n')
+                    lineNumOffset++;
+            }
+
+            Logger.Current.Info(() => String.Format("Reading data appended to file \"{0}\"", pathName));
+
+            int firstSource = Journal.Sources.Count;
+            RefreshState = null;    // the journal can be partially updated if parsing fails
+
+            ParsingContext.Push(ParseContext.OpenForReading(pathName, content, position, lineNumOffset));
+            ParsingContext.GetCurrent().Journal = Journal;
+            ParsingContext.GetCurrent().Master = state.Master;
+            ParsingContext.GetCurrent().Sequence = state.LastFileSequence;
+
+            try
+            {
+                Journal.Read(ParsingContext);
+                state.LastFileSequence = ParsingContext.GetCurrent().Sequence;
+            }
+            finally
+            {
+                ParsingContext.Pop();
+            }
+
+            UpdateJournalSource(pathName, firstSource, false);
+            Validator.Verify(() => Journal.Valid());
+
+            // The file might be changed again while it was being parsed; the next refresh reads the journal again in this case
+            if (FileSystem.FileSize(pathName) == content.Length)
+            {
+                state.UpdateFile(pathName);
+                RefreshState = state;
+            }
+
+            return true;
+        }
+
+        /// <summary>
+        /// Removes transactions of changed files from the journal and parses the files again; new transactions take the place of the removed ones.
+        /// Returns false (the journal is not modified) if any of the files cannot be parsed separately from the rest of the journal:
+        /// files with directives (including prices) or costs, files without transactions, files included in apply blocks, journals with settings that affect parsing.
+        /// Returns false as well (the journal should be read again) if the parsed files leave accounts or commodities that only the removed transactions used.
+        /// </summary>
+        private bool ReloadChangedFiles(JournalRefreshState state, IEnumerable<JournalFileInfo> changedFiles)
+        {
+            if (Journal.ChecksumMapping.Any() || !ParallelParser.HasDefaultJournalSettings(Journal))
+                return false;
+
+            var files = new List<Tuple<string, byte[], int>>();
+            foreach (var fileInfo in changedFiles)
+            {
+                string pathName = fileInfo.FileName;
+                if (!state.CanReload(pathName) || !FileSystem.FileExists(pathName))
+                    return false;
+
+                var content = FileSystem.GetFileBytes(pathName);
+                using (var reader = new StreamReader(new MemoryStream(content)))
+                {
+                    if (!ParallelParser.IsPlainFile(reader))
+                        return false;
+                }
+
+                // Transactions of a file without directives follow each other
+                int index = Journal.Xacts.IndexOf(Journal.Xacts.FirstOrDefault(xact => xact.Pos?.PathName == pathName));
+                if (index < 0 || Journal.Xacts.Skip(index).TakeWhile(xact => xact.Pos?.PathName == pathName).Count() != Journal.Xacts.Count(xact => xact.Pos?.PathName == pathName))
+                    return false;
+
+                // Prices recorded for costs stay in the commodity pool when transactions are removed
+                if (Journal.Xacts.Skip(index).TakeWhile(xact => xact.Pos?.PathName == pathName).Any(xact => xact.Posts.Any(post => post.Cost != null)))
+                    return false;
+
+                files.Add(Tuple.Create(pathName, content, index));
+            }
+
+            RefreshState = null;    // the journal can be partially updated if parsing fails
+
+            // Files with later transactions go first, so the positions of earlier transactions are not changed
+            bool isUpToDate = true;
+            foreach (var file in files.OrderByDescending(file => file.Item3))
+            {
+                if (!ReloadFile(state, file.Item1, file.Item2, file.Item3))
+                {
+                    Logger.Current.Info(() => String.Format("File \"{0}\" cannot be read separately from the journal", file.Item1));
+                    return false;
+                }
+
+                // The file might be changed again while it was being parsed; the next refresh reads the journal again in this case
+                if (FileSystem.FileSize(file.Item1) == file.Item2.Length)
+                    state.UpdateFile(file.Item1);
+                else
+                    isUpToDate = false;
+            }
+
+            Validator.Verify(() => Journal.Valid());
+
+            if (isUpToDate)
+                RefreshState = state;
+            return true;
+        }
+
+        /// <summary>
+        /// Replaces transactions of the file with its parsed content. Returns false if the result differs from reading all files:
+        /// the content adds prices, the removed transactions were the only users of an account or a commodity
+        /// or they had amounts with the largest precision of a commodity (the precision would be lower after reading all files).
+        /// </summary>
+        private bool ReloadFile(JournalRefreshState state, string pathName, byte[] content, int index)
+        {
+            Logger.Current.Info(() => String.Format("Reading file \"{0}\" again", pathName));
+
+            var removedPosts = new List<Post>();
+            var removedAccounts = new HashSet<Account>();   // RemovePost clears accounts of posts
+            foreach (var xact in Journal.Xacts.Skip(index).TakeWhile(xact => xact.Pos?.PathName == pathName).ToList())
+            {
+                foreach (var post in xact.Posts.Where(post => post.Account != null))
+                {
+                    removedAccounts.Add(post.Account);
+                    post.Account.RemovePost(post);
+                }
+                removedPosts.AddRange(xact.Posts);
+                Journal.RemoveXact(xact);
+            }
+
+            foreach (var periodXact in Journal.PeriodXacts.Where(xact => xact.Pos?.PathName == pathName).ToList())
+                Journal.PeriodXacts.Remove(periodXact);
+
+            int firstXact = Journal.Xacts.Count;
+            int firstSource = Journal.Sources.Count;
+
+            var tracker = new ParseTracker();
+            ParsingContext.Tracker = tracker;
+            ParsingContext.Push(ParseContext.OpenForReading(pathName, content, 0, 0));
+            ParsingContext.GetCurrent().Journal = Journal;
+            ParsingContext.GetCurrent().Master = state.Master;
+
+            int sequence;
+            try
+            {
+                Journal.Read(ParsingContext);
+                sequence = ParsingContext.GetCurrent().Sequence;
+            }
+            finally
+            {
+                ParsingContext.Pop();
+                ParsingContext.Tracker = null;
+            }
+
+            state.AddTracker(tracker);
+            UpdateJournalSource(pathName, firstSource, true);
+
+            // Parsed transactions are added to the end of the journal; they are moved to the place of the removed ones
+            var xacts = Journal.Xacts.Skip(firstXact).ToList();
+            while (Journal.Xacts.Count > firstXact)
+                Journal.Xacts.RemoveAt(Journal.Xacts.Count - 1);
+            for (int i = 0; i < xacts.Count; i++)
+                Journal.Xacts.Insert(index + i, xacts[i]);
+
+            // Price directives make the file stateful; costs add prices to commodity histories
+            if (tracker.StatefulFiles.Any() || xacts.Any(xact => xact.Posts.Any(post => post.Cost != null)))
+                return false;
+
+            if (removedAccounts.Any(account => !HasPosts(account)))
+                return false;
+
+            // Commodity precision is the largest precision of parsed amounts, so it is kept only if other amounts have it
+            var amounts = Journal.Xacts.SelectMany(xact => xact.Posts).Where(post => post.Amount != null && post.Amount.HasCommodity).Select(post => post.Amount).ToList();
+            var removedCommodities = removedPosts.Where(post => post.Amount != null && post.Amount.HasCommodity).Select(post => post.Amount.Commodity).Distinct().ToList();
+            if (!removedCommodities.All(commodity => amounts.Any(amount => amount.Commodity == commodity && amount.Precision >= commodity.Precision)))
+                return false;
+
+            UpdateSequences(state, pathName, sequence);
+            return true;
+        }
+
+        /// <summary>
+        /// Items of a file are numbered from zero; an include directive takes as many numbers as its file has items.
+        /// If the number of items in the reloaded file is changed, items that follow the include directives in the including files are renumbered.
+        /// </summary>
+        private void UpdateSequences(JournalRefreshState state, string pathName, int sequence)
+        {
+            var includedFile = state.GetIncludedFile(pathName);
+            int delta = sequence - (includedFile?.Count ?? (pathName == state.LastFile ? state.LastFileSequence : sequence));
+
+            for (; includedFile != null && delta != 0; includedFile = state.GetIncludedFile(pathName))
+            {
+                pathName = includedFile.ParentPathName;
+                int nextSequence = includedFile.Sequence + includedFile.Count;
+
+                var xacts = Journal.Xacts.Cast<XactBase>().Concat(Journal.PeriodXacts).Where(xact => xact.Pos?.PathName == pathName).ToList();
+                foreach (var item in xacts.Concat<Item>(xacts.SelectMany(xact => xact.Posts)).Where(item => item.Pos != null && item.Pos.Sequence >= nextSequence))
+                    item.Pos.Sequence += delta;
+
+                foreach (var file in state.IncludedFiles.Where(file => file != includedFile && file.ParentPathName == pathName && file.Sequence >= nextSequence))
+                    file.Sequence += delta;
+
+                includedFile.Count += delta;
+            }
+
+            if (pathName == state.LastFile)
+                state.LastFileSequence += delta;
+        }
+
+        private static bool HasPosts(Account account)
+        {
+            return account.Posts.Any() || account.Accounts.Values.Any(HasPosts);
+        }
+
+        /// <summary>
+        /// Journal.Read adds a new source for a file with transactions; an existing source of the file is updated instead.
+        /// New sources of included files are removed (only data files have sources).
+        /// </summary>
+        private void UpdateJournalSource(string pathName, int firstSource, bool isIncludedFile)
+        {
+            int index = Journal.Sources.IndexOf(Journal.Sources.FirstOrDefault(info => info.FileName == pathName));
+            bool isExisting = index >= 0 && index < firstSource;
+
+            if (isExisting)
+                Journal.Sources[index] = new JournalFileInfo(pathName);
+
+            if (isExisting || isIncludedFile)
+            {
+                while (Journal.Sources.Count > firstSource)
+                    Journal.Sources.RemoveAt(firstSource);
+            }
+        }
+
         public void CloseJournalFiles()
         {
+            RefreshState = null;
             Journal = null;
             Amount.Shutdown();
 
@@ -296,7 +757,7 @@ namespace NLedger.Scopus
             if (args[0].Type == ValueTypeEnum.String)
                 return Value.ScopeValue(Journal.FindAccount(args[0].AsString));
             else if (args[0].Type == ValueTypeEnum.Mask)
-                return Value.ScopeValue(Journal.FindAccountRe(args[0].AsMask.ToString()));
+                return Value.ScopeValue(Journal.FindAccountRe(args[0].AsMask));
             else
                 return null;
         }
@@ -0,0 +1,426 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Abstracts;
+using NLedger.Abstracts.Impl;
+using NLedger.Accounts;
+using NLedger.Commodities;
+using NLedger.Journals;
+using NLedger.Scopus;
+using NLedger.Times;
+using NLedger.Utility;
+using NLedger.Utils;
+using System;
+using System.Collections.Concurrent;
+using System.Collections.Generic;
+using System.Globalization;
+using System.IO;
+using System.Linq;
+using System.Text;
+using System.Threading;
+using System.Threading.Tasks;
+
+namespace NLedger.Textual
+{
+    /// <summary>
+    /// Parses included journal files on worker threads while the including file is being parsed. Every file is parsed
+    /// into its own journal (in an isolated application context) and saved as a snapshot; when the parser reaches
+    /// the include directive, the snapshot is merged into the journal, so transactions, postings and sequence numbers
+    /// get exactly the same order as if the file were parsed at this point.
+    /// </summary>
+    /// <remarks>
+    /// Only plain files (transactions, periodic transactions, prices and comments) are parsed in advance; a file is merged
+    /// only if nothing that precedes the include directive can change the way how it is parsed (applied accounts and tags,
+    /// aliases, automated transactions, default commodity, etc.). Otherwise, the file is parsed at the include directive as usual.
+    /// Files with directives are scanned for nested include directives on worker threads, so the including thread
+    /// reads every file only once.
+    /// </remarks>
+    public sealed class ParallelParser : IDisposable
+    {
+        /// <summary>
+        /// Result of parsing a file on a worker thread
+        /// </summary>
+        public sealed class ParsedFile
+        {
+            public ParsedFile(string pathName, int count, int sequence, byte[] snapshot)
+            {
+                PathName = pathName;
+                Count = count;
+                Sequence = sequence;
+                Snapshot = snapshot;
+            }
+
+            public string PathName { get; }
+            public int Count { get; }
+            public int Sequence { get; }
+            public byte[] Snapshot { get; }
+        }
+
+        public ParallelParser(Journal journal, int maxDegreeOfParallelism = 0)
+        {
+            Journal = journal ?? throw new ArgumentNullException(nameof(journal));
+
+            var context = MainApplicationContext.Current ?? throw new InvalidOperationException("Application context is not initialized for the current thread");
+            FileSystemProvider = context.ApplicationServiceProvider.FileSystemProvider;
+            TimeZone = context.TimeZone;
+            Epoch = TimesCommon.Current.Epoch;
+            CheckingStyle = journal.CheckingStyle;
+            Culture = CultureInfo.CurrentCulture;
+            UICulture = CultureInfo.CurrentUICulture;
+
+            MaxDegreeOfParallelism = maxDegreeOfParallelism > 0 ? maxDegreeOfParallelism : Environment.ProcessorCount;
+            for (int i = 0; i < MaxDegreeOfParallelism; i++)
+                new Thread(Run) { IsBackground = true, Name = "NLedger parallel parser" }.Start();
+        }
+
+        public Journal Journal { get; }
+        public int MaxDegreeOfParallelism { get; }
+
+        /// <summary>
+        /// The number of files that are not taken by worker threads yet
+        /// </summary>
+        public int PendingCount => PendingFiles.Count;
+
+        /// <summary>
+        /// The number of files that were parsed on worker threads and merged into the journal
+        /// </summary>
+        public int MergedFiles { get; private set; }
+
+        /// <summary>
+        /// Schedules parsing a file on a worker thread
+        /// </summary>
+        public void Prefetch(string pathName)
+        {
+            if (String.IsNullOrEmpty(pathName))
+                return;
+
+            lock (Files)
+            {
+                if (Files.ContainsKey(pathName) || PendingFiles.IsAddingCompleted)
+                    return;
+
+                var file = new PrefetchedFile(pathName);
+                Files.Add(pathName, file);
+                PendingFiles.Add(file);
+            }
+        }
+
+        /// <summary>
+        /// Schedules parsing files that are included by the given file. Every file is scanned only once,
+        /// so it does nothing if the file has been already scanned by a worker thread.
+        /// </summary>
+        public void PrefetchIncludes(string pathName)
+        {
+            if (String.IsNullOrEmpty(pathName) || !ScannedFiles.TryAdd(pathName, true) || !FileSystem.FileExists(pathName))
+                return;
+
+            try
+            {
+                using (var reader = FileSystem.GetStreamReader(pathName))
+                {
+                    string line;
+                    while ((line = reader.ReadLine()) != null)
+                    {
+                        var arg = GetIncludeArgument(line.TrimEnd());
+                        if (!String.IsNullOrEmpty(arg))
+                        {
+                            foreach (var iter in TextualParser.FindIncludedFiles(TextualParser.ResolveIncludePath(arg, pathName)))
+                                Prefetch(iter);
+                        }
+                    }
+                }
+            }
+            catch (Exception ex)
+            {
+                // Problems with included files are reported when the including file is parsed
+                Logger.Current.Debug(DebugParallelParser, () => String.Format("Cannot prefetch files included by {0}: {1}", pathName, ex.Message));
+            }
+        }
+
+        /// <summary>
+        /// Merges a file that was parsed on a worker thread into the journal. If the file has not been parsed in advance
+        /// or the journal state does not allow using the result, it returns false and the caller should parse the file.
+        /// A file that is not taken by a worker yet is not parsed on a worker anymore.
+        /// </summary>
+        public bool TryMerge(string pathName, Account master, ApplyStack applyStack, out ParsedFile parsedFile)
+        {
+            parsedFile = null;
+
+            if (String.IsNullOrEmpty(pathName))
+                return false;
+
+            PrefetchedFile file;
+            lock (Files)
+            {
+                if (!Files.TryGetValue(pathName, out file))
+                    return false;
+
+                Files.Remove(pathName);
+            }
+
+            if (file.TrySkip() || !CanMerge(master, applyStack))
+                return false;
+
+            var result = file.Completion.Task.Result;
+            if (result == null)
+                return false;
+
+            using (var stream = new MemoryStream(result.Snapshot, false))
+            {
+                if (!JournalSnapshot.Merge(stream, Journal))
+                    return false;
+            }
+
+            Logger.Current.Debug(DebugParallelParser, () => String.Format("Merged file {0} ({1} transactions)", result.PathName, result.Count));
+
+            MergedFiles++;
+            parsedFile = result;
+            return true;
+        }
+
+        public void Dispose()
+        {
+            lock (Files)
+            {
+                PendingFiles.CompleteAdding();
+                foreach (var file in Files.Values)
+                    file.TrySkip();
+                Files.Clear();
+            }
+        }
+
+        /// <summary>
+        /// Checks whether files can be parsed in a separate journal. Plain files contain only transactions, periodic transactions,
+        /// prices and comments; postings with balance assertions, amount expressions or typed metadata are not accepted.
+        /// </summary>
+        public static bool IsPlainFile(TextReader reader)
+        {
+            if (reader == null)
+                throw new ArgumentNullException(nameof(reader));
+
+            // The following constructs make the file parsed serially at its include directive:
+            // - any directive, i.e. a line that does not start with a digit, a comment char, whitespace, '~' or 'P ':
+            //   account, alias, apply/end, bucket (A), commodity, C, D, define, eval, include, N, option, payee, python,
+            //   import, tag, year (Y), assert/check/expr, automated transactions ('='), time log entries (i, o) etc;
+            // - postings with '=' (balance assertions and assignments, fixed lot prices);
+            // - postings with '(' after the amount position (amount expressions);
+            // - typed metadata ('::') in comments.
+            // Files that define checksums (UUID) are also parsed serially (see ReadFile).
+            string line;
+            while ((line = reader.ReadLine()) != null)
+            {
+                line = line.TrimEnd();
+                if (line.Length == 0)
+                    continue;
+
+                int commentPos = line.IndexOf(';');
+                string text = commentPos >= 0 ? line.Substring(0, commentPos) : line;
+                if (commentPos >= 0 && line.IndexOf("::", commentPos) >= 0)
+                    return false;
+
+                char firstChar = line[0];
+                if (Char.IsWhiteSpace(firstChar))
+                {
+                    text = text.Trim();
+                    if (text.IndexOf('=') >= 0)
+                        return false;
+
+                    // The amount follows the account name after two spaces or a tab
+                    int amountPos = text.IndexOf("  ", StringComparison.Ordinal);
+                    int tabPos = text.IndexOf('\t');
+                    if (tabPos >= 0 && (amountPos < 0 || tabPos < amountPos))
+                        amountPos = tabPos;
+
+                    if (amountPos >= 0 && text.IndexOf('(', amountPos) >= 0)
+                        return false;
+                }
+                else if (!firstChar.IsCommentChar() && !Char.IsDigit(firstChar) && firstChar != '~' &&
+                    !(firstChar == 'P' && line.Length > 1 && Char.IsWhiteSpace(line[1])))
+                {
+                    return false;
+                }
+            }
+
+            return true;
+        }
+
+        private sealed class PrefetchedFile
+        {
+            public PrefetchedFile(string pathName)
+            {
+                PathName = pathName;
+            }
+
+            public string PathName { get; }
+            public TaskCompletionSource<ParsedFile> Completion { get; } = new TaskCompletionSource<ParsedFile>();
+
+            /// <summary>
+            /// Marks a pending file as taken by a worker
+            /// </summary>
+            public bool TryStart()
+            {
+                return Interlocked.CompareExchange(ref State, Started, Pending) == Pending;
+            }
+
+            /// <summary>
+            /// Marks a pending file as not needed anymore
+            /// </summary>
+            public bool TrySkip()
+            {
+                return Interlocked.CompareExchange(ref State, Skipped, Pending) == Pending;
+            }
+
+            private const int Pending = 0;
+            private const int Started = 1;
+            private const int Skipped = 2;
+
+            private int State;
+        }
+
+        private static string GetIncludeArgument(string line)
+        {
+            if (line.Length == 0 || Char.IsWhiteSpace(line[0]))
+                return null;
+
+            if (line.StartsWith("!") || line.StartsWith("@"))
+                line = line.Remove(0, 1);
+
+            string arg = StringExtensions.NextElement(ref line);
+            return line == TextualParser.IncludeToken ? arg : null;
+        }
+
+        private bool CanMerge(Account master, ApplyStack applyStack)
+        {
+            if (master != Journal.Master || TimesCommon.Current.Epoch != Epoch || Journal.CheckingStyle != CheckingStyle)
+                return false;
+
+            // Applied accounts, tags, years and fixed prices
+            for (var stack = applyStack; stack != null; stack = stack.Parent)
+            {
+                if (stack.Size > 1)
+                    return false;
+            }
+
+            if (!HasDefaultJournalSettings(Journal))
+                return false;
+
+            // Commodity settings that affect parsing amounts (built-in time commodities have the same conversions in every pool)
+            var pool = CommodityPool.Current;
+            return pool.DefaultCommodity == null && !pool.Commodities.Any(kv => kv.Key != kv.Value.BaseSymbol ||
+                kv.Value.Flags.HasFlag(CommodityFlagsEnum.COMMODITY_STYLE_DECIMAL_COMMA) || kv.Value.Flags.HasFlag(CommodityFlagsEnum.COMMODITY_STYLE_NO_MIGRATE) ||
+                (!kv.Value.Flags.HasFlag(CommodityFlagsEnum.COMMODITY_BUILTIN) && (kv.Value.Smaller != null || kv.Value.Larger != null)));
+        }
+
+        /// <summary>
+        /// Checks that the journal has no settings that make parsing transactions depend on the order of files
+        /// (checking modes, aliases, automated transactions and payee mappings)
+        /// </summary>
+        internal static bool HasDefaultJournalSettings(Journal journal)
+        {
+            if (journal.CheckingStyle == JournalCheckingStyleEnum.CHECK_WARNING || journal.CheckingStyle == JournalCheckingStyleEnum.CHECK_ERROR ||
+                journal.CheckPayees || journal.DayBreak || journal.Bucket != null)
+                return false;
+
+            return !(journal.AccountAliases.Any() || journal.AutoXacts.Any() || journal.PayeesForUnknownAccounts.Any() ||
+                journal.PayeeAliasMappings.Any() || journal.PayeeUUIDMapping.Any() || journal.TagCheckExprsMap.Any());
+        }
+
+        private void Run()
+        {
+            Thread.CurrentThread.CurrentCulture = Culture;
+            Thread.CurrentThread.CurrentUICulture = UICulture;
+
+            foreach (var file in PendingFiles.GetConsumingEnumerable())
+            {
+                if (file.TryStart())
+                    file.Completion.SetResult(ParseFile(file.PathName));
+            }
+        }
+
+        private ParsedFile ParseFile(string pathName)
+        {
+            // Errors are not written to the console: the file is parsed again at the include directive in this case
+            var provider = new ApplicationServiceProvider(
+                fileSystemProviderFactory: () => FileSystemProvider,
+                virtualConsoleProviderFactory: () => new VirtualConsoleProvider(TextReader.Null, TextWriter.Null, TextWriter.Null));
+            var context = new MainApplicationContext(provider) { IsAtty = false, TimeZone = TimeZone };
+
+            using (context.AcquireCurrentThread())
+            {
+                try
+                {
+                    return ReadFile(pathName);
+                }
+                catch (Exception ex)
+                {
+                    // The file is parsed at the include directive that reports the error
+                    Logger.Current.Debug(DebugParallelParser, () => String.Format("Cannot parse file {0}: {1}", pathName, ex.Message));
+                    return null;
+                }
+            }
+        }
+
+        private ParsedFile ReadFile(string pathName)
+        {
+            bool isPlainFile;
+            using (var reader = FileSystem.GetStreamReader(pathName))
+                isPlainFile = IsPlainFile(reader);
+
+            // Plain files have no include directives; other files are parsed at the include directive,
+            // so only their nested includes are prefetched
+            if (!isPlainFile)
+            {
+                PrefetchIncludes(pathName);
+                return null;
+            }
+
+            ScannedFiles.TryAdd(pathName, true);
+
+            var session = new Session();
+            Session.SetSessionContext(session);
+            Scope.DefaultScope = new Report(session);
+
+            TimesCommon.Current.Epoch = Epoch;
+            session.Journal.CheckingStyle = CheckingStyle;
+
+            var contextStack = new ParseContextStack() { Tracker = new ParseTracker() };
+            contextStack.Push(pathName);
+            try
+            {
+                var current = contextStack.GetCurrent();
+                current.Journal = session.Journal;
+
+                int count = session.Journal.Read(contextStack);
+                if (session.Journal.ChecksumMapping.Any())
+                    return null;
+
+                using (var stream = new MemoryStream())
+                {
+                    JournalSnapshot.Write(stream, session.Journal, String.Empty, contextStack.Tracker);
+                    return new ParsedFile(current.PathName, count, current.Sequence, stream.ToArray());
+                }
+            }
+            finally
+            {
+                contextStack.Pop();
+            }
+        }
+
+        private const string DebugParallelParser = "textual.parallel";
+
+        private readonly IFileSystemProvider FileSystemProvider;
+        private readonly TimeZoneInfo TimeZone;
+        private readonly DateTime? Epoch;
+        private readonly JournalCheckingStyleEnum CheckingStyle;
+        private readonly CultureInfo Culture;
+        private readonly CultureInfo UICulture;
+        private readonly IDictionary<string, PrefetchedFile> Files = new Dictionary<string, PrefetchedFile>();
+        private readonly ConcurrentDictionary<string, bool> ScannedFiles = new ConcurrentDictionary<string, bool>();
+        private readonly BlockingCollection<PrefetchedFile> PendingFiles = new BlockingCollection<PrefetchedFile>();
+    }
+}
@@ -12,6 +12,7 @@ using NLedger.Scopus;
 using NLedger.Utility;
 using System;
 using System.Collections.Generic;
+using System.IO;
 using System.Linq;
 using System.Text;
 using System.Threading.Tasks;
@@ -42,6 +43,22 @@ namespace NLedger.Textual
             return parseContext;
         }
 
+        /// <summary>
+        /// Opens file content for reading from the given byte position (e.g. to parse text appended to a file that was read before).
+        /// Positions and line numbers of parsed items are the same as if the whole file were parsed.
+        /// </summary>
+        public static ParseContext OpenForReading(string pathName, byte[] content, long position, int lineNumOffset)
+        {
+            if (content == null)
+                throw new ArgumentNullException(nameof(content));
+
+            var stream = new MemoryStream(content);
+            stream.Position = position;
+
+            ITextualReader reader = new TextualReader(new StreamReader(stream));
+            return new ParseContext(reader, FileSystem.GetParentPath(pathName)) { PathName = pathName, LineNumOffset = lineNumOffset };
+        }
+
         public ParseContext(string currentPath)
         {
             CurrentPath = currentPath;
@@ -63,6 +80,7 @@ namespace NLedger.Textual
         public int Count { get; set; }
         public long LineBegPos { get; set; }
         public int LineNum { get; set; }
+        public int LineNumOffset { get; set; }
         public long CurrPos { get; set; }
         public int Errors { get; set; }
         public int Sequence { get; set; }
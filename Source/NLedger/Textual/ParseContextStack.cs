@@ -25,6 +25,16 @@ namespace NLedger.Textual
             get { return ParsingContext.Count; }
         }
 
+        /// <summary>
+        /// Optional tracker that is notified about every opened file and about directives with side effects
+        /// </summary>
+        public ParseTracker Tracker { get; set; }
+
+        /// <summary>
+        /// Optional parser that reads included files on worker threads in advance
+        /// </summary>
+        public ParallelParser Prefetcher { get; set; }
+
         public void Push()
         {
             Push(new ParseContext(FileSystem.CurrentPath()));
@@ -52,6 +62,7 @@ namespace NLedger.Textual
 
         public void Push(ParseContext context)
         {
+            Tracker?.AddFile(context.PathName);
             ParsingContext.Push(context);
         }
 
@@ -0,0 +1,105 @@
+﻿// **********************************************************************************
+// Copyright (c) 2015-2023, Dmitry Merzlyakov.  All rights reserved.
+// Licensed under the FreeBSD Public License. See LICENSE file included with the distribution for details and disclaimer.
+// 
+// This file is part of NLedger that is a .Net port of C++ Ledger tool (ledger-cli.org). Original code is licensed under:
+// Copyright (c) 2003-2023, John Wiegley.  All rights reserved.
+// See LICENSE.LEDGER file included with the distribution for details and disclaimer.
+// **********************************************************************************
+using NLedger.Times;
+using System;
+using System.Collections.Generic;
+using System.Linq;
+using System.Text;
+using System.Threading.Tasks;
+
+namespace NLedger.Textual
+{
+    /// <summary>
+    /// Collects information about a parsing session: which files were read and which directives had effects
+    /// that go beyond the journal and the commodity pool (options, expressions, scripts, time log entries).
+    /// Journal snapshots rely on it to decide whether the parsed result can be restored without parsing.
+    /// </summary>
+    public sealed class ParseTracker
+    {
+        public ParseTracker()
+        {
+            InitialEpoch = TimesCommon.Current.Epoch;
+        }
+
+        public IList<string> Files { get; } = new List<string>();
+        public IList<string> Restrictions { get; } = new List<string>();
+        public IList<string> UnclosedFiles { get; } = new List<string>();
+        public IList<string> StatefulFiles { get; } = new List<string>();
+        public IList<IncludedFile> IncludedFiles { get; } = new List<IncludedFile>();
+        public DateTime? InitialEpoch { get; }
+
+        public bool IsRestricted
+        {
+            get { return Restrictions.Any(); }
+        }
+
+        public bool IsEpochChanged
+        {
+            get { return TimesCommon.Current.Epoch != InitialEpoch; }
+        }
+
+        public void AddFile(string pathName)
+        {
+            if (String.IsNullOrEmpty(pathName))
+                AddRestriction("input stream");
+            else if (!Files.Contains(pathName))
+                Files.Add(pathName);
+        }
+
+        /// <summary>
+        /// Registers a file that ends inside a block (apply or comment directive); the block would cover text appended to the file
+        /// </summary>
+        public void AddUnclosedFile(string pathName)
+        {
+            if (!String.IsNullOrEmpty(pathName) && !UnclosedFiles.Contains(pathName))
+                UnclosedFiles.Add(pathName);
+        }
+
+        /// <summary>
+        /// Registers a file that contains directives (their effects stay in the journal or the parser) or is included inside an apply block;
+        /// transactions of such files cannot be parsed again separately from the rest of the journal
+        /// </summary>
+        public void AddStatefulFile(string pathName)
+        {
+            if (!String.IsNullOrEmpty(pathName) && !StatefulFiles.Contains(pathName))
+                StatefulFiles.Add(pathName);
+        }
+
+        /// <summary>
+        /// Registers an include directive: items of the included file take 'count' sequence numbers of the including file starting from 'sequence'
+        /// </summary>
+        public void AddIncludedFile(string parentPathName, string pathName, int sequence, int count)
+        {
+            if (!String.IsNullOrEmpty(pathName))
+                IncludedFiles.Add(new IncludedFile(parentPathName, pathName, sequence, count));
+        }
+
+        public void AddRestriction(string reason)
+        {
+            if (!Restrictions.Contains(reason))
+                Restrictions.Add(reason);
+        }
+
+        public sealed class IncludedFile
+        {
+            public IncludedFile(string parentPathName, string pathName, int sequence, int count)
+            {
+                ParentPathName = parentPathName;
+                PathName = pathName;
+                Sequence = sequence;
+                Count = count;
+            }
+
+            public string ParentPathName { get; }
+            public string PathName { get; }
+            public int Sequence { get; set; }
+            public int Count { get; set; }
+        }
+    }
+}
@@ -109,7 +109,9 @@ namespace NLedger.Textual
             if (In.IsEof())
                 return;
 
-            Context.LineNum = 0;
+            ContextStack.Prefetcher?.PrefetchIncludes(Context.PathName);
+
+            Context.LineNum = Context.LineNumOffset;
             Context.CurrPos = In.Position;
 
             ErrorFlag = false;
@@ -146,6 +148,9 @@ namespace NLedger.Textual
                 }
             }
 
+            if (ApplyStack.Size > 1)
+                ContextStack.Tracker?.AddUnclosedFile(Context.PathName);
+
             if (ApplyStack.IsFrontType<DateTime?>())
                 TimesCommon.Current.Epoch = ApplyStack.Front<DateTime?>().Value;
 
@@ -209,6 +214,8 @@ namespace NLedger.Textual
                 ReadPeriodXactDirective(line, textualReader);
             else
             {
+                ContextStack.Tracker?.AddStatefulFile(Context.PathName);
+
                 if (line.StartsWith("!") || line.StartsWith("@"))
                     line = line.Remove(0, 1);
 
@@ -302,6 +309,7 @@ namespace NLedger.Textual
                 ExprOp op = Lookup(SymbolKindEnum.DIRECTIVE, line);
                 if (op != null)
                 {
+                    ContextStack.Tracker?.AddRestriction("custom directive");
                     CallScope args = new CallScope(this);
                     args.PushBack(Value.StringValue(line));
                     op.AsFunction(args);
@@ -899,6 +907,7 @@ namespace NLedger.Textual
         private void ReadPythonDirective(string line, ITextualReader textualReader)
         {
             var extendedSession = ExtendedSession.Current ?? throw new ParseError(ParseError.ParseError_PythonDirectiveSeenButPythonSupportIsMissing);
+            ContextStack.Tracker?.AddRestriction("python directive");
 
             var script = new StringBuilder(line?.Trim());
             int indent = 0;
@@ -931,6 +940,7 @@ namespace NLedger.Textual
         private void ReadImportDirective(string line)
         {
             var extendedSession = ExtendedSession.Current ?? throw new ParseError(ParseError.ParseError_ImportDirectiveSeenButPythonSupportIsMissing);
+            ContextStack.Tracker?.AddRestriction("import directive");
             extendedSession.ImportOption(line?.Trim());
         }
 
@@ -977,14 +987,85 @@ namespace NLedger.Textual
         /// </summary>
         private void ReadIncludeDirective(string line)
         {
-            string fileName;
             Logger.Current.Debug(DebugTextualInclude, () => "include: " + line);
 
+            string fileName = ResolveIncludePath(line, Context.PathName);
+
+            // New files that match a wildcard change the result without touching any of the included files
+            if (FileSystem.GetFileName(fileName).IndexOfAny(IncludeWildcards) >= 0)
+                ContextStack.Tracker?.AddRestriction("include with wildcards");
+
+            bool filesFound = false;
+            foreach (string iter in FindIncludedFiles(fileName))
+            {
+                Journal journal = Context.Journal;
+                Account master = TopAccount;
+                Scope scope = Context.Scope;
+                //int errors = Context.Errors;
+                //int count = Context.Count;
+                //int sequence = Context.Sequence;
+
+                Logger.Current.Debug(DebugTextualInclude, () => "Including: " + iter);
+                Logger.Current.Debug(DebugTextualInclude, () => "Master account: " + master.FullName);
+
+                filesFound = true;
+
+                for (var stack = ApplyStack; stack != null; stack = stack.Parent)
+                {
+                    if (stack.Size > 1)
+                        ContextStack.Tracker?.AddStatefulFile(iter);
+                }
+
+                // The file might be already parsed by a worker thread
+                ParallelParser.ParsedFile parsedFile;
+                if (ContextStack.Prefetcher != null && journal == ContextStack.Prefetcher.Journal && ContextStack.Prefetcher.TryMerge(iter, master, ApplyStack, out parsedFile))
+                {
+                    ContextStack.Tracker?.AddFile(parsedFile.PathName);
+                    ContextStack.Tracker?.AddIncludedFile(Context.PathName, parsedFile.PathName, Context.Sequence, parsedFile.Sequence);
+                    Context.Count += parsedFile.Count;
+                    Context.Sequence += parsedFile.Sequence;
+                    continue;
+                }
+
+                ContextStack.Push(iter);
+
+                ContextStack.GetCurrent().Journal = journal;
+                ContextStack.GetCurrent().Master = master;
+                ContextStack.GetCurrent().Scope = scope;
+
+                try
+                {
+                    var instance = new TextualParser(ContextStack, ContextStack.GetCurrent(), this, NoAssertions);
+                    instance.ApplyStack.PushFront("account", master);
+                    instance.Parse();
+                }
+                finally
+                {
+                    Context.Errors += ContextStack.GetCurrent().Errors;
+                    Context.Count += ContextStack.GetCurrent().Count;
+                    ContextStack.Tracker?.AddIncludedFile(Context.PathName, ContextStack.GetCurrent().PathName, Context.Sequence, ContextStack.GetCurrent().Sequence);
+                    Context.Sequence += ContextStack.GetCurrent().Sequence;
+
+                    ContextStack.Pop();
+                }
+            }
+
+            if (!filesFound)
+                throw new RuntimeError(String.Format(RuntimeError.ErrorMessageFileToIncludeWasNotFound, fileName));
+        }
+
+        /// <summary>
+        /// Resolves the argument of an include directive (a file name or a mask) relative to the including file
+        /// </summary>
+        internal static string ResolveIncludePath(string line, string parentPathName)
+        {
+            string fileName;
+
             if (line[0] != '/' && line[0] != '\\' && line[0] != '~')
             {
                 Logger.Current.Debug(DebugTextualInclude, () => "received a relative path");
-                Logger.Current.Debug(DebugTextualInclude, () => "parent file path: " + Context.PathName);
-                var parent_Path = FileSystem.GetDirectoryName(Context.PathName);
+                Logger.Current.Debug(DebugTextualInclude, () => "parent file path: " + parentPathName);
+                var parent_Path = FileSystem.GetDirectoryName(parentPathName);
 
                 if (String.IsNullOrWhiteSpace(parent_Path))
                     fileName = FileSystem.Combine(line, ".");
@@ -1002,10 +1083,17 @@ namespace NLedger.Textual
             fileName = FileSystem.ResolvePath(fileName);
             Logger.Current.Debug(DebugTextualInclude, () => "resolved path: " + fileName);
 
+            return fileName;
+        }
+
+        /// <summary>
+        /// Returns the files that match the resolved path of an include directive
+        /// </summary>
+        internal static IEnumerable<string> FindIncludedFiles(string fileName)
+        {
             string parentPath = FileSystem.GetParentPath(fileName);
             var glob = Mask.AssignGlob(String.Format("^{0}$", FileSystem.GetFileName(fileName)));
 
-            bool filesFound = false;
             if (FileSystem.DirectoryExists(parentPath))
             {
                 foreach (string iter in FileSystem.GetDirectoryFiles(parentPath))
@@ -1013,45 +1101,9 @@ namespace NLedger.Textual
                     // DM - is_regular_file is not needed
                     string fileBase = FileSystem.GetFileName(iter);
                     if (glob.Match(fileBase))
-                    {
-                        Journal journal = Context.Journal;
-                        Account master = TopAccount;
-                        Scope scope = Context.Scope;
-                        //int errors = Context.Errors;
-                        //int count = Context.Count;
-                        //int sequence = Context.Sequence;
-
-                        Logger.Current.Debug(DebugTextualInclude, () => "Including: " + iter);
-                        Logger.Current.Debug(DebugTextualInclude, () => "Master account: " + master.FullName);
-
-                        ContextStack.Push(iter);
-
-                        ContextStack.GetCurrent().Journal = journal;
-                        ContextStack.GetCurrent().Master = master;
-                        ContextStack.GetCurrent().Scope = scope;
-
-                        try
-                        {
-                            var instance = new TextualParser(ContextStack, ContextStack.GetCurrent(), this, NoAssertions);
-                            instance.ApplyStack.PushFront("account", master);
-                            instance.Parse();
-                        }
-                        finally
-                        {
-                            Context.Errors += ContextStack.GetCurrent().Errors;
-                            Context.Count += ContextStack.GetCurrent().Count;
-                            Context.Sequence += ContextStack.GetCurrent().Sequence;
-
-                            ContextStack.Pop();
-                        }
-
-                        filesFound = true;
-                    }
+                        yield return iter;
                 }
             }
-
-            if (!filesFound)
-                throw new RuntimeError(String.Format(RuntimeError.ErrorMessageFileToIncludeWasNotFound, fileName));
         }
 
         /// <summary>
@@ -1084,6 +1136,7 @@ namespace NLedger.Textual
         /// </summary>
         private void ReadEvalDirective(string line)
         {
+            ContextStack.Tracker?.AddRestriction("eval directive");
             Expr expr = new Expr(line);
             expr.Calc(Context.Scope);
         }
@@ -1186,9 +1239,11 @@ namespace NLedger.Textual
                 if (!String.IsNullOrEmpty(line))
                 {
                     if (line.StartsWith(EndCommentToken) || line.StartsWith(EndTestToken))
-                        break;
+                        return;
                 }
             }
+
+            ContextStack.Tracker?.AddUnclosedFile(Context.PathName);
         }
 
         /// <summary>
@@ -1371,6 +1426,7 @@ namespace NLedger.Textual
                 {
                     // jww (2012-02-27): Make account into symbol scopes so that this
                     // can be used to override definitions within the account.
+                    ContextStack.Tracker?.AddRestriction("eval directive");
                     BindScope boundScope = new BindScope(Context.Scope, account);
                     new Expr(b).Calc(boundScope);
                 } else if (keyword == "note")
@@ -1486,12 +1542,14 @@ namespace NLedger.Textual
         /// <remarks>ported from clock_in_directive</remarks>
         private void ReadClockInDirective(string line, bool capitalized)
         {
+            ContextStack.Tracker?.AddRestriction("time log entry");
             TimeLog.ClockIn(CreateClockInOutEvent(line, capitalized));
         }
 
         /// <remarks>ported from clock_out_directive</remarks>
         private void ReadClockOutDirective(string line, bool capitalized)
         {
+            ContextStack.Tracker?.AddRestriction("time log entry");
             Context.Count += TimeLog.ClockOut(CreateClockInOutEvent(line, capitalized));
         }
 
@@ -1651,10 +1709,13 @@ namespace NLedger.Textual
                 }
             }
 
+            ContextStack.Tracker?.AddRestriction("option directive");
             if (!Option.ProcessOption(Context.PathName, line.Substring(2), Context.Scope, p, line))
                 throw new OptionError(String.Format(OptionError.ErrorMessage_IllegalOption, line.Substring(2)));
         }
 
+        private static readonly char[] IncludeWildcards = new char[] { '*', '?', '[' };
+
         private const string DebugTextualParse = "textual.parse";
         private const string DebugTextualInclude = "textual.include";
         private const string DebugTimesEpoch = "times.epoch";
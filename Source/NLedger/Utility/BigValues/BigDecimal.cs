@@ -142,6 +142,10 @@ namespace NLedger.Utility.BigValues
 
         public string ToString(string format, IFormatProvider formatProvider)
         {
+            // "B" stands for the exact form; decimal values are exact in their default representation
+            if (format == "B")
+                return Value.ToString(formatProvider);
+
             return Value.ToString(format, formatProvider);
         }
 
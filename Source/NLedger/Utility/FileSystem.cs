@@ -93,6 +93,16 @@ namespace NLedger.Utility
             }
         }
 
+        public static byte[] GetFileBytes(string fileName)
+        {
+            using (var fileStream = FileSystemProvider.OpenRead(fileName))
+            using (var memoryStream = new MemoryStream())
+            {
+                fileStream.CopyTo(memoryStream);
+                return memoryStream.ToArray();
+            }
+        }
+
         public static void PutStringToFile(string fileName, string str)
         {
             FileSystemProvider.AppendAllText(fileName, str);
@@ -26,6 +26,11 @@ namespace NLedger.Utility.Graph
             get { return Vertices.Values; }
         }
 
+        IEnumerable<EdgeDescriptor<V, E>> IGraph<V, E>.Edges
+        {
+            get { return Edges; }
+        }
+
         public VertexDescriptor<V, E> FindVertexDescriptor(V vertex)
         {
             VertexDescriptor<V, E> vertexDescriptor1;
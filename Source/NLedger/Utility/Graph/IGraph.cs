@@ -18,6 +18,7 @@ namespace NLedger.Utility.Graph
     {
         int NumVertices { get; }
         IEnumerable<VertexDescriptor<V, E>> Vertices { get; }
+        IEnumerable<EdgeDescriptor<V, E>> Edges { get; }
         VertexDescriptor<V, E> FindVertexDescriptor(V vertex);
         bool HasVertex(V vertex);
         void AddVertex(V vertex);